@@ -3,4 +3,16 @@
 python manage.py migrate --no-input
 python manage.py collectstatic --no-input
 
-gunicorn spotter_route.wsgi:application --bind 0.0.0.0:8000
\ No newline at end of file
+# GUNICORN_WORKER_CLASS is sync, gthread (GUNICORN_THREADS per worker) or uvicorn; ASGI=True means uvicorn
+WORKER_CLASS=${GUNICORN_WORKER_CLASS:-sync}
+if [ "$ASGI" = "True" ]; then
+    WORKER_CLASS=uvicorn
+fi
+
+if [ "$WORKER_CLASS" = "uvicorn" ]; then
+    gunicorn spotter_route.asgi:application -k uvicorn.workers.UvicornWorker --bind 0.0.0.0:8000 --workers ${GUNICORN_WORKERS:-1}
+elif [ "$WORKER_CLASS" = "gthread" ]; then
+    gunicorn spotter_route.wsgi:application -k gthread --threads ${GUNICORN_THREADS:-4} --bind 0.0.0.0:8000 --workers ${GUNICORN_WORKERS:-1}
+else
+    gunicorn spotter_route.wsgi:application --bind 0.0.0.0:8000 --workers ${GUNICORN_WORKERS:-1}
+fi
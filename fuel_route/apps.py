@@ -6,6 +6,8 @@ class FuelRouteConfig(AppConfig):
     name = 'fuel_route'
 
     def ready(self):
+        import fuel_route.signals  # noqa: F401
+
         logging.info("Fuel Route application is ready")
         # You can add any startup logic here, such as:
         # - Loading initial data
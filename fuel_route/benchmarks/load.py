@@ -0,0 +1,226 @@
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+import numpy as np
+from django.conf import settings
+
+from fuel_route.benchmarks.routes import LANES, REGIONAL_LANE_SHARE, REGIONAL_LANES
+
+# Gunicorn application and worker arguments of each worker class the load tests compare
+WORKER_CLASSES = {
+    "sync": ("spotter_route.wsgi:application", ["--worker-class", "sync"]),
+    "gthread": ("spotter_route.wsgi:application", ["--worker-class", "gthread"]),
+    "uvicorn": ("spotter_route.asgi:application", ["--worker-class", "uvicorn.workers.UvicornWorker"]),
+}
+
+
+def jitter_location(location: str, jitter: float, rng: random.Random) -> str:
+    """
+    ``location`` moved by up to ``jitter`` degrees on each axis; place names are kept as they are.
+    """
+    if not jitter:
+        return location
+    try:
+        _lat, _lon = map(float, location.split(','))
+    except ValueError:
+        return location
+    return f"{_lat + rng.uniform(-jitter, jitter):.6f},{_lon + rng.uniform(-jitter, jitter):.6f}"
+
+
+def lane_mix(
+    count: int,
+    lanes: Optional[Sequence[Tuple[str, str]]] = None,
+    repeat_share: float = 0.5,
+    jitter: float = 0.01,
+    seed=0,
+) -> List[dict]:
+    """
+    Request payloads drawn from ``lanes``, or from regional and long-haul lanes
+    in ``REGIONAL_LANE_SHARE`` proportions. ``repeat_share`` of them are exact
+    repeats, answered by the route result cache once warm; the rest
+    are moved by up to ``jitter`` degrees so they miss every cache.
+    """
+    _rng = random.Random(seed)
+    _payloads = []
+    for _ in range(count):
+        if lanes is not None:
+            _start, _end = _rng.choice(lanes)
+        else:
+            _start, _end = _rng.choice(REGIONAL_LANES if _rng.random() < REGIONAL_LANE_SHARE else LANES)
+        if _rng.random() >= repeat_share:
+            _start, _end = jitter_location(_start, jitter, _rng), jitter_location(_end, jitter, _rng)
+        _payloads.append({"start": _start, "end": _end})
+    return _payloads
+
+
+@dataclass
+class LoadResult:
+    latencies: List[float]
+    statuses: Counter
+    elapsed: float
+
+    @property
+    def throughput(self) -> float:
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+    def percentile_ms(self, percentile: float) -> float:
+        return float(np.percentile(np.array(self.latencies) * 1000, percentile)) if self.latencies else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": len(self.latencies),
+            "ok": self.statuses.get(200, 0),
+            "statuses": {str(_status): _count for _status, _count in self.statuses.items()},
+            "seconds": self.elapsed,
+            "throughput": self.throughput,
+            "p50_ms": self.percentile_ms(50),
+            "p95_ms": self.percentile_ms(95),
+            "p99_ms": self.percentile_ms(99),
+            "max_ms": max(self.latencies) * 1000 if self.latencies else 0.0,
+        }
+
+
+async def run_load(url: str, payloads: List[dict], concurrency: int) -> LoadResult:
+    """
+    Posts ``payloads`` to ``url`` with ``concurrency`` requests in flight,
+    timing each one until its whole body is read.
+    """
+    _latencies: List[float] = []
+    _statuses: Counter = Counter()
+    _next = iter(payloads)
+
+    async def _worker(session: aiohttp.ClientSession):
+        for _payload in _next:
+            _begin = time.perf_counter()
+            try:
+                async with session.post(url, json=_payload) as response:
+                    await response.read()
+                    _statuses[response.status] += 1
+            except aiohttp.ClientError as e:
+                _statuses[type(e).__name__] += 1
+            except asyncio.TimeoutError:
+                _statuses["timeout"] += 1
+            _latencies.append(time.perf_counter() - _begin)
+
+    _start = time.perf_counter()
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=concurrency), timeout=aiohttp.ClientTimeout(total=300)
+    ) as session:
+        await asyncio.gather(*[_worker(session) for _ in range(concurrency)])
+    return LoadResult(_latencies, _statuses, time.perf_counter() - _start)
+
+
+class GunicornServer:
+    """
+    The app served by gunicorn in a subprocess with one of ``WORKER_CLASSES``,
+    the way ``entrypoint.sh`` serves it. ``env`` overrides settings of the
+    server, like the ORS URL of a mock server.
+    """
+
+    def __init__(
+        self,
+        worker_class: str,
+        workers: int,
+        threads: int = 1,
+        env: Optional[Dict[str, str]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        startup_seconds: float = 60,
+    ):
+        if worker_class not in WORKER_CLASSES:
+            raise ValueError(f"Unknown worker class {worker_class}, expected one of {', '.join(WORKER_CLASSES)}")
+        self.worker_class = worker_class
+        self.workers = workers
+        self.threads = threads
+        self.env = env or {}
+        self.host = host
+        self.port = port
+        self.startup_seconds = startup_seconds
+        self._process: Optional[subprocess.Popen] = None
+        self._log = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> str:
+        """
+        Starts gunicorn and waits until it answers HTTP. Returns the base URL.
+        """
+        if not self.port:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as _socket:
+                _socket.bind((self.host, 0))
+                self.port = _socket.getsockname()[1]
+        _application, _arguments = WORKER_CLASSES[self.worker_class]
+        if self.worker_class == "gthread":
+            _arguments = _arguments + ["--threads", str(self.threads)]
+        self._log = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            [
+                sys.executable, "-m", "gunicorn", _application,
+                "--bind", f"{self.host}:{self.port}", "--workers", str(self.workers), "--timeout", "300",
+            ] + _arguments,
+            cwd=str(settings.BASE_DIR),
+            env={**os.environ, **self.env},
+            stdout=self._log,
+            stderr=subprocess.STDOUT,
+        )
+        self._wait_ready()
+        return self.base_url
+
+    def _wait_ready(self) -> None:
+        _deadline = time.monotonic() + self.startup_seconds
+        while time.monotonic() < _deadline:
+            if self._process.poll() is not None:
+                _log, _code = self.log(), self._process.returncode
+                self.stop()
+                raise RuntimeError(f"gunicorn exited with {_code}:\n{_log}")
+            try:
+                urllib.request.urlopen(f"{self.base_url}/metrics/", timeout=5).close()
+                return
+            except urllib.error.HTTPError:
+                # Any HTTP answer, a 404 with metrics disabled included, means it is serving
+                return
+            except OSError:
+                time.sleep(0.2)
+        _log = self.log()
+        self.stop()
+        raise RuntimeError(f"gunicorn did not answer within {self.startup_seconds:.0f}s:\n{_log}")
+
+    def log(self) -> str:
+        if self._log is None:
+            return ""
+        self._log.seek(0)
+        return self._log.read().decode(errors="replace")[-4000:]
+
+    def stop(self) -> None:
+        if self._process is None:
+            return
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+        self._process = None
+        self._log.close()
+        self._log = None
+
+    def __enter__(self) -> "GunicornServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import socket
+import threading
+from typing import Optional
+
+import numpy as np
+from aiohttp import web
+
+from fuel_route.services.route_geometry import haversine_miles
+
+
+class MockORSServer:
+    """
+    Local stand-in for the openrouteservice endpoints used by the app, served by
+    aiohttp on a background thread so benchmarks measure our side of the calls
+    instead of the network and the API quota.
+
+    Responses are deterministic for a given request and wait ``latency_ms``
+    before answering, to mimic the round trip to the hosted API.
+    """
+
+    def __init__(self, latency_ms: float = 50, host: str = "127.0.0.1", port: int = 0, vertex_miles: float = 0.5):
+        self.latency = latency_ms / 1000
+        self.host = host
+        self.port = port
+        self.vertex_miles = vertex_miles
+        self.requests = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+        self._socket: Optional[socket.socket] = None
+
+    @property
+    def base_url(self) -> str:
+        _host, _port = self._socket.getsockname()[:2]
+        return f"http://{_host}:{_port}"
+
+    def start(self) -> str:
+        """
+        Starts serving on ``port`` (a free one by default) and returns the base URL.
+        """
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.bind((self.host, self.port))
+        self._loop = asyncio.new_event_loop()
+        _ready = threading.Event()
+        self._thread = threading.Thread(target=self._serve, args=(_ready,), daemon=True)
+        self._thread.start()
+        _ready.wait()
+        return self.base_url
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._socket.close()
+        self._loop = None
+
+    def __enter__(self) -> "MockORSServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _serve(self, ready: threading.Event) -> None:
+        asyncio.set_event_loop(self._loop)
+        _app = web.Application()
+        _app.router.add_get("/geocode/search", self._geocode)
+        _app.router.add_post("/v2/directions/{profile}/{format}", self._directions)
+        self._runner = web.AppRunner(_app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        self._loop.run_until_complete(web.SockSite(self._runner, self._socket).start())
+        ready.set()
+        self._loop.run_forever()
+
+    async def _geocode(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        return web.json_response(self.geocode_response(request.query.get("text", "")))
+
+    async def _directions(self, request: web.Request) -> web.Response:
+        """
+        Straight lines between the waypoints, with a vertex every ``vertex_miles``,
+        in the GeoJSON shape of ORS directions (distances in miles).
+        """
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        _body = await request.json()
+        _waypoints = np.asarray(_body["coordinates"], dtype=float)
+        _coordinates, _distance = self.polyline_for(_waypoints, self.vertex_miles)
+        _lons, _lats = _coordinates[:, 0], _coordinates[:, 1]
+        _bbox = [float(_lons.min()), float(_lats.min()), float(_lons.max()), float(_lats.max())]
+        return web.json_response({
+            "type": "FeatureCollection",
+            "bbox": _bbox,
+            "features": [{
+                "bbox": _bbox,
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": np.round(_coordinates, 6).tolist()},
+                "properties": {
+                    "summary": {"distance": _distance, "duration": _distance / 55 * 3600},
+                    "way_points": [0, len(_coordinates) - 1],
+                },
+            }],
+            "metadata": {
+                "attribution": "mock",
+                "service": "routing",
+                "timestamp": 0,
+                "query": {"coordinates": _body["coordinates"], "profile": request.match_info["profile"]},
+                "engine": {"version": "mock"},
+            },
+        })
+
+    @staticmethod
+    def polyline_for(waypoints: np.ndarray, vertex_miles: float):
+        """
+        Vertices along the straight legs between ``waypoints`` and the total length in miles.
+        """
+        _legs = haversine_miles(waypoints[:-1, 0], waypoints[:-1, 1], waypoints[1:, 0], waypoints[1:, 1])
+        _parts = []
+        for _index, _leg in enumerate(_legs):
+            _steps = max(int(np.ceil(_leg / vertex_miles)), 1)
+            _t = np.linspace(0.0, 1.0, _steps, endpoint=False)[:, None]
+            _parts.append(waypoints[_index] + (waypoints[_index + 1] - waypoints[_index]) * _t)
+        _parts.append(waypoints[-1:])
+        return np.vstack(_parts), float(_legs.sum())
+
+    @classmethod
+    def geocode_response(cls, text: str) -> dict:
+        """
+        Pelias search response with the one address ``point_for`` gives ``text``.
+        """
+        _lon, _lat = cls.point_for(text)
+        return {
+            "geocoding": {"version": "0.2", "query": {"text": text}},
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [_lon, _lat]},
+                "properties": {"label": text, "layer": "address", "source": "mock"},
+            }],
+        }
+
+    @staticmethod
+    def point_for(text: str):
+        """
+        Stable pseudo-random ``(lon, lat)`` inside the contiguous US for a text.
+        """
+        _digest = hashlib.sha256(text.encode()).digest()
+        _x = int.from_bytes(_digest[:4], "big") / 2 ** 32
+        _y = int.from_bytes(_digest[4:8], "big") / 2 ** 32
+        return round(-122 + _x * 47, 6), round(30 + _y * 17, 6)
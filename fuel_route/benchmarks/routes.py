@@ -0,0 +1,135 @@
+from typing import List, Tuple
+
+import numpy as np
+from django.contrib.gis.geos import LineString, Point, Polygon
+from django.contrib.gis.measure import D
+
+from fuel_route.benchmarks.mock_services import MockORSServer
+from fuel_route.data.models import FuelStationModel
+from fuel_route.services.route_geometry import METERS_PER_DEGREE, RouteGeometry, haversine_miles
+
+
+def synthetic_route(
+    length_mi: float,
+    min_lat: float = 32.0,
+    max_lat: float = 36.0,
+    bucket_degrees: float = 0.25,
+) -> Tuple[LineString, float]:
+    """
+    Builds a west-to-east route of roughly ``length_mi`` miles through the stations
+    stored in a latitude band, so the corridor query always has stations to find.
+
+    Returns the route and its length in miles, measured like the controller does.
+    """
+    _band = Polygon.from_bbox((-125.0, min_lat, -66.0, max_lat))
+    _band.srid = 4326
+    _points = sorted(
+        FuelStationModel.objects.filter(location__within=_band).values_list("location", flat=True),
+        key=lambda point: point.x,
+    )
+    # One vertex per longitude bucket keeps the polyline from zig-zagging
+    _vertices = []
+    _last_bucket = None
+    for _point in _points:
+        _bucket = int(_point.x // bucket_degrees)
+        if _bucket != _last_bucket:
+            _vertices.append(_point.coords)
+            _last_bucket = _bucket
+
+    _route = _vertices[:1]
+    _length = 0.0
+    for _coords in _vertices[1:]:
+        if _length >= length_mi:
+            break
+        _length += float(haversine_miles(_route[-1][0], _route[-1][1], _coords[0], _coords[1]))
+        _route.append(_coords)
+
+    if len(_route) < 2 or _length < length_mi:
+        raise ValueError(f"Not enough stations between {min_lat} and {max_lat} for a {length_mi} mi route")
+
+    route = LineString(_route, srid=4326)
+    return route, D(m=route.transform(5069, clone=True).length).mi
+
+
+# Long-haul lanes as "lat,lon" pairs, the format the API accepts for coordinates
+LANES = [
+    ("40.7128,-74.0060", "34.0522,-118.2437"),  # New York - Los Angeles
+    ("41.8781,-87.6298", "29.7604,-95.3698"),  # Chicago - Houston
+    ("33.7490,-84.3880", "39.7392,-104.9903"),  # Atlanta - Denver
+    ("47.6062,-122.3321", "37.7749,-122.4194"),  # Seattle - San Francisco
+    ("32.7767,-96.7970", "25.7617,-80.1918"),  # Dallas - Miami
+    ("39.9526,-75.1652", "41.4993,-81.6944"),  # Philadelphia - Cleveland
+    ("35.1495,-90.0490", "33.4484,-112.0740"),  # Memphis - Phoenix
+    ("44.9778,-93.2650", "39.0997,-94.5786"),  # Minneapolis - Kansas City
+]
+
+# Regional lanes of 150-500 miles, most of the loads a carrier plans
+REGIONAL_LANES = [
+    ("34.0522,-118.2437", "36.1699,-115.1398"),  # Los Angeles - Las Vegas
+    ("29.7604,-95.3698", "29.4241,-98.4936"),  # Houston - San Antonio
+    ("41.8781,-87.6298", "39.7684,-86.1581"),  # Chicago - Indianapolis
+    ("33.7490,-84.3880", "35.2271,-80.8431"),  # Atlanta - Charlotte
+    ("40.7128,-74.0060", "42.3601,-71.0589"),  # New York - Boston
+    ("32.7767,-96.7970", "35.4676,-97.5164"),  # Dallas - Oklahoma City
+    ("45.5152,-122.6784", "47.6062,-122.3321"),  # Portland - Seattle
+    ("39.7392,-104.9903", "40.7608,-111.8910"),  # Denver - Salt Lake City
+]
+
+# Share of regional lanes in the load test lane mix, the rest are long-haul ``LANES``
+REGIONAL_LANE_SHARE = 0.7
+
+
+# Straight line the lanes of ``lane_of_length`` are measured along, Seattle - Miami (~2,730 mi)
+BENCHMARK_AXIS = ((-122.3321, 47.6062), (-80.1918, 25.7617))
+
+
+def lane_of_length(length_mi: float) -> Tuple[str, str]:
+    """
+    Lane starting in Seattle and ending ``length_mi`` straight-line miles along
+    ``BENCHMARK_AXIS``, as "lat,lon" strings. Road routes come out longer.
+    """
+    _axis = RouteGeometry(MockORSServer.polyline_for(np.asarray(BENCHMARK_AXIS), 10)[0])
+    if length_mi > _axis.length:
+        raise ValueError(f"Lanes along the benchmark axis are at most {_axis.length:.0f} mi long")
+    _lon, _lat = _axis.point_at(length_mi)
+    return f"{BENCHMARK_AXIS[0][1]},{BENCHMARK_AXIS[0][0]}", f"{_lat:.6f},{_lon:.6f}"
+
+
+def corridor_stations(
+    coordinates,
+    per_100_miles: float,
+    spread_km: float,
+    rng: np.random.Generator,
+    first_opis_id: int = 900_000_000,
+) -> List[FuelStationModel]:
+    """
+    Unsaved stations scattered along a route polyline, ``per_100_miles`` per 100
+    route miles at up to ``spread_km`` from it, with prices between $3 and $4.50.
+    Stations farther than the corridor half width test the corridor filter.
+    """
+    geometry = RouteGeometry(coordinates)
+    _count = int(round(geometry.length / 100 * per_100_miles))
+    _mileages = np.sort(rng.uniform(0.0, geometry.length, _count))
+    _offsets = rng.uniform(0.0, spread_km * 1000, _count)
+    _bearings = rng.uniform(0.0, 2 * np.pi, _count)
+    _prices = np.round(rng.uniform(3.0, 4.5, _count), 3)
+    _racks = rng.integers(1, 500, _count)
+
+    stations = []
+    for _index in range(_count):
+        _lon, _lat = geometry.point_at(_mileages[_index])
+        _lat += _offsets[_index] * np.sin(_bearings[_index]) / METERS_PER_DEGREE
+        _lon += _offsets[_index] * np.cos(_bearings[_index]) / (METERS_PER_DEGREE * np.cos(np.radians(_lat)))
+        _opis_id = first_opis_id + _index
+        stations.append(FuelStationModel(
+            opis_id=_opis_id,
+            truckstop_name=f"Benchmark station {_opis_id}",
+            address=f"Mile {_mileages[_index]:.1f}",
+            city="Benchmark",
+            state="BM",
+            rack_id=int(_racks[_index]),
+            location=Point(float(_lon), float(_lat), srid=4326),
+            retail_price=float(_prices[_index]),
+        ))
+    return stations
+
@@ -0,0 +1,232 @@
+import contextvars
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from fuel_route.controllers.fuel_route_controller import FuelRouteController
+from fuel_route.data.data_types import Coordinates, VehicleSpec
+from fuel_route.data.exceptions import FuelStationNotFoundException
+from fuel_route.data.serializers import LocationField
+from fuel_route.services.corridor_cache import CorridorCache
+from fuel_route.services.route_simplifier import RouteSimplifier
+from fuel_route.services.station_index import StationIndex
+
+logger = logging.getLogger(__name__)
+
+# Start lat/lon, end lat/lon, the vehicle and the vehicles compared with it
+LaneKey = Tuple[float, float, float, float, VehicleSpec, Tuple[VehicleSpec, ...]]
+
+
+class BatchRouteController:
+    """
+    Plans many lanes at once for fleet dispatch.
+
+    Every distinct location is geocoded once and every distinct start/end pair and
+    vehicle is routed and planned once, however many lanes share it. Each lane goes
+    through the thread pool on its own and is yielded as soon as it is planned;
+    corridors not in the corridor cache come from one pass over the station index
+    for the routes that come back together.
+    """
+
+    def __init__(self, max_workers: int = None, coordinates_format: str = "json"):
+        self.route_controller = FuelRouteController()
+        self.max_workers = max_workers or settings.BATCH_ROUTE_WORKERS
+        self.coordinates_format = coordinates_format
+
+    def plan_lanes(self, lanes: List[dict]) -> Iterator[dict]:
+        """
+        Yields one result per lane, in completion order, tagged with the lane's
+        index in ``lanes``. Failed lanes yield an ``error`` instead of a route.
+
+        Every lane moves on as soon as its own inputs are ready: it is routed once
+        both its locations are geocoded and planned once its route is back, while
+        other lanes are still being geocoded or routed. Corridors of the routes
+        that come back together are searched in one pass.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # Geocode every distinct location once
+            _places = {
+                location for lane in lanes for location in (lane['start'], lane['end'])
+                if not isinstance(location, Coordinates)
+            }
+            _pending: Dict[Future, Tuple[str, object]] = {
+                self._submit(executor, self._geocode, place): ("geocode", place) for place in _places
+            }
+            _geocodes = {}
+            _waiting = list(range(len(lanes)))
+            lane_groups: Dict[LaneKey, List[int]] = {}
+            # Response, or failure, of every group already planned, for lanes joining it late
+            _planned: Dict[LaneKey, object] = {}
+
+            while True:
+                # Lanes with both locations geocoded join their group, routed once however many share it
+                _still_waiting = []
+                for _index in _waiting:
+                    lane = lanes[_index]
+                    if any(
+                        not isinstance(location, Coordinates) and location not in _geocodes
+                        for location in (lane['start'], lane['end'])
+                    ):
+                        _still_waiting.append(_index)
+                        continue
+                    _start = self._resolve(lane['start'], _geocodes)
+                    _end = self._resolve(lane['end'], _geocodes)
+                    _error = next((value for value in (_start, _end) if isinstance(value, Exception)), None)
+                    if _error is not None:
+                        yield self._error(_index, lane, _error)
+                        continue
+                    _vehicles = (lane.get('vehicle') or VehicleSpec(), tuple(lane.get('compare_vehicles') or ()))
+                    key = (_start.lat, _start.lon, _end.lat, _end.lon, *_vehicles)
+                    if key in _planned:
+                        yield self._result(_index, lane, _planned[key])
+                        continue
+                    if key not in lane_groups:
+                        lane_groups[key] = []
+                        _pending[self._submit(executor, self._get_directions, key)] = ("directions", key)
+                    lane_groups[key].append(_index)
+                _waiting = _still_waiting
+
+                if not _pending:
+                    return
+                _done, _ = wait(_pending, return_when=FIRST_COMPLETED)
+                _routed = {}
+                for future in _done:
+                    _stage, item = _pending.pop(future)
+                    try:
+                        _value = future.result()
+                    except Exception as e:
+                        _value = e
+                    if _stage == "geocode":
+                        _geocodes[item] = _value
+                    elif _stage == "directions" and not isinstance(_value, Exception):
+                        _routed[item] = _value
+                    else:
+                        # Planned, or failed to route: every lane of the group is done
+                        _planned[item] = _value
+                        for _index in lane_groups.pop(item):
+                            yield self._result(_index, lanes[_index], _value)
+
+                if _routed:
+                    _keys = list(_routed)
+                    _corridors = self._corridors(_keys, _routed) if settings.FUEL_STOP_SOLVER != "query" else {}
+                    for key in _keys:
+                        _future = self._submit(executor, self._plan_lane, key, _routed[key], _corridors.get(key))
+                        _pending[_future] = ("plan", key)
+
+    def _result(self, index: int, lane: dict, response) -> dict:
+        if isinstance(response, Exception):
+            return self._error(index, lane, response)
+        return {
+            "index": index,
+            "start": self._label(lane['start']),
+            "end": self._label(lane['end']),
+            **response,
+        }
+
+    def _corridors(self, keys: List[LaneKey], directions: dict) -> dict:
+        """
+        Corridors of the routes found in the ``CorridorCache``, and of the others
+        in one pass over the station index when corridors come from the index.
+        Routes left out are looked up when they are planned.
+        """
+        _features = {key: directions[key].features[0] for key in keys}
+        simplifier = RouteSimplifier.for_stage("corridor")
+        _routes = {key: simplifier.simplify(feature.geometry.coordinates) for key, feature in _features.items()}
+        _corridors = {}
+        cache = CorridorCache.default() if settings.CORRIDOR_CACHE_ENABLED else None
+        _cache_keys = {}
+        if cache is not None:
+            for key, feature in _features.items():
+                _cache_keys[key] = cache.make_key(
+                    _routes[key], feature.properties.summary.distance,
+                    FuelRouteController.CORRIDOR_KM, settings.STATION_CORRIDOR_SOURCE,
+                )
+                corridor = cache.get(_cache_keys[key])
+                if corridor is not None:
+                    _corridors[key] = corridor
+
+        _missing = [key for key in keys if key not in _corridors]
+        if not _missing or settings.STATION_CORRIDOR_SOURCE != "index":
+            return _corridors
+        _found = StationIndex.get().corridors(
+            [_routes[key] for key in _missing],
+            [_features[key].properties.summary.distance for key in _missing],
+            FuelRouteController.CORRIDOR_KM,
+        )
+        for key, corridor in zip(_missing, _found):
+            if corridor is None:
+                _corridors[key] = FuelStationNotFoundException("No fuel stations found along the route")
+                continue
+            _corridors[key] = corridor
+            if cache is not None:
+                cache.set(_cache_keys[key], corridor)
+        return _corridors
+
+    def _geocode(self, location) -> Coordinates:
+        with self.route_controller._route_errors():
+            return self.route_controller._ensure_coordinates(location)
+
+    def _get_directions(self, key: LaneKey):
+        with self.route_controller._route_errors():
+            return self.route_controller.ors_client.get_directions(
+                start=Coordinates(lat=key[0], lon=key[1]), end=Coordinates(lat=key[2], lon=key[3]),
+                vehicle_profile=key[4].routing_profile,
+            )
+
+    def _plan_lane(self, key: LaneKey, directions_response, corridor) -> dict:
+        controller = self.route_controller
+        with controller._route_errors():
+            if isinstance(corridor, Exception):
+                raise corridor
+            fuel_stops, _new_route, _vehicle_plans = controller._plan_fuel_stops(
+                directions_response, corridor=corridor, vehicle=key[4], compare_vehicles=list(key[5]),
+            )
+            _new_directions = controller._final_directions(directions_response, fuel_stops, _new_route, key[4])
+            route = controller._build_route(
+                f"{key[0]},{key[1]}", f"{key[2]},{key[3]}", fuel_stops, _new_directions, key[4], _vehicle_plans
+            )
+        return controller._route_response(
+            route, controller.route_map_service.store_route(route), self.coordinates_format
+        )
+
+    @classmethod
+    def _submit(cls, executor: ThreadPoolExecutor, function, *args) -> Future:
+        """
+        ``function`` on the pool in a copy of the caller's context, so the spans
+        it finishes join the request's trace.
+        """
+        return executor.submit(contextvars.copy_context().run, cls._in_thread, function, *args)
+
+    @staticmethod
+    def _in_thread(function, *args):
+        try:
+            return function(*args)
+        finally:
+            # Pool threads are not request threads, close their connections like a request would
+            close_old_connections()
+
+    @staticmethod
+    def _resolve(location, geocodes: dict):
+        return location if isinstance(location, Coordinates) else geocodes[location]
+
+    @staticmethod
+    def _label(location) -> str:
+        return LocationField().to_representation(location)
+
+    @staticmethod
+    def _error(index: int, lane: dict, error: Exception) -> dict:
+        """
+        ``ValueError`` carries a message meant for the client, like the single
+        route endpoints; anything else is logged and reported generically.
+        """
+        if not isinstance(error, ValueError):
+            logger.error(f"Lane {index} failed: {error!r}")
+        return {
+            "index": index,
+            "start": BatchRouteController._label(lane['start']),
+            "end": BatchRouteController._label(lane['end']),
+            "error": str(error) if isinstance(error, ValueError) else "Unable to plan this lane",
+        }
@@ -1,74 +1,340 @@
-from django.contrib.gis.geos import LineString, Point
-from django.contrib.gis.measure import D
-from folium import PolyLine
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Optional
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.gis.geos import LineString
+from django.urls import reverse
+
+from fuel_route.services.async_db import database_sync_to_async
+from fuel_route.services.async_ors_client import AsyncORSClient
+from fuel_route.services.corridor_cache import CorridorCache
 from fuel_route.services.ors_service_client import ORSClient
 from fuel_route.services.fuel_station_service import FuelStationService
-from fuel_route.data.data_types import Route, Coordinates
+from fuel_route.services.fuel_stop_solvers import WindowFuelStopSolver, get_fuel_stop_solver
+from fuel_route.services.route_geometry import RouteGeometry
+from fuel_route.services.route_simplifier import RouteSimplifier
+from fuel_route.services.route_map_service import RouteMapService
+from fuel_route.services.route_result_cache import RouteResultCache
+from fuel_route.services.route_stitcher import RouteStitcher
+from fuel_route.services.station_index import StationIndex
+from fuel_route.services.tracing import span
+from fuel_route.data.data_types import Route, Coordinates, StationCorridor, VehicleSpec
+from fuel_route.data.enums import CORRIDOR_KM
 from fuel_route.data.exceptions import (
     RouteNotFoundException,
     FuelStationNotFoundException,
     InvalidCoordinatesException,
+    StaleStationIndexException,
+    GeocodeNotFoundException,
 )
 from fuel_route.data.serializers import RouteOutputSerializer
-import folium
 
 
 class FuelRouteController:
+    # Half width of the station corridor around a route, kept with the constants the
+    # route result cache hashes into its keys
+    CORRIDOR_KM = CORRIDOR_KM
+
     def __init__(self):
         self.fuel_station_service = FuelStationService()
-        self.ors_client: ORSClient = ORSClient()
+        self.ors_client: ORSClient = ORSClient.shared()
+        self.route_map_service = RouteMapService()
 
-    def get_optimal_route(self, start, end, include_map_html=True):
-        try:
-            route = self.optimize_route(start, end)
-            map_html = self._create_route_map(route)
-            output_serializer = RouteOutputSerializer(route)
-            response = { "route": output_serializer.data }
-            if include_map_html:
-                response["map_html"] = map_html
-            return response
-        except ValueError as e:
-            raise e
-
-    def optimize_route(self, start, end) -> Route:
-        try:
+    def get_optimal_route(
+        self, start, end, include_map_html=False, coordinates_format="json", vehicle=None, compare_vehicles=None
+    ):
+        def _compute():
+            route = self.optimize_route(start, end, vehicle, compare_vehicles)
+            route_id = self.route_map_service.store_route(route)
+            return self._route_response(route, route_id, coordinates_format)
+
+        if settings.ROUTE_RESULT_CACHE_ENABLED:
+            _cache = RouteResultCache.default()
+            response = _cache.resolve(
+                _cache.make_key(start, end, coordinates_format, vehicle, compare_vehicles), _compute
+            )
+            response = self._for_request(response, start, end)
+        else:
+            response = _compute()
+        if include_map_html:
+            response["map_html"] = self.route_map_service.get_map_html(response["route_id"])
+        return response
+
+    async def get_optimal_route_async(
+        self, start, end, include_map_html=False, coordinates_format="json", vehicle=None, compare_vehicles=None
+    ):
+        async def _compute():
+            route = await self.optimize_route_async(start, end, vehicle, compare_vehicles)
+            route_id = await database_sync_to_async(self.route_map_service.store_route)(route)
+            return self._route_response(route, route_id, coordinates_format)
+
+        if settings.ROUTE_RESULT_CACHE_ENABLED:
+            _cache = RouteResultCache.default()
+            response = await _cache.resolve_async(
+                lambda: _cache.make_key(start, end, coordinates_format, vehicle, compare_vehicles), _compute
+            )
+            response = self._for_request(response, start, end)
+        else:
+            response = await _compute()
+        if include_map_html:
+            response["map_html"] = await database_sync_to_async(self.route_map_service.get_map_html)(
+                response["route_id"]
+            )
+        return response
+
+    def optimize_route(
+        self, start, end, vehicle: Optional[VehicleSpec] = None, compare_vehicles: List[VehicleSpec] = None
+    ) -> Route:
+        """
+        Route for ``vehicle`` (the default truck when ``None``). Every vehicle of
+        ``compare_vehicles`` also gets a plan over the same directions and corridor.
+        """
+        vehicle = vehicle or VehicleSpec()
+        with self._route_errors():
             start_coords = self._ensure_coordinates(start)
             end_coords = self._ensure_coordinates(end)
 
-            directions_response = self.ors_client.get_directions(
-                start=start_coords, end=end_coords
+            with span("directions") as _span:
+                directions_response = self.ors_client.get_directions(
+                    start=start_coords, end=end_coords, vehicle_profile=vehicle.routing_profile
+                )
+                _span.set(vertices=len(directions_response.features[0].geometry.coordinates))
+            fuel_stops, _new_route, _vehicle_plans = self._plan_fuel_stops(
+                directions_response, vehicle=vehicle, compare_vehicles=compare_vehicles
+            )
+            _new_directions = self._final_directions(directions_response, fuel_stops, _new_route, vehicle)
+            return self._build_route(start, end, fuel_stops, _new_directions, vehicle, _vehicle_plans)
+
+    async def optimize_route_async(
+        self, start, end, vehicle: Optional[VehicleSpec] = None, compare_vehicles: List[VehicleSpec] = None
+    ) -> Route:
+        """
+        Same steps as ``optimize_route``: both endpoints are geocoded concurrently,
+        ORS is called over the worker's pooled aiohttp session and the station
+        work runs on the thread pool through ``database_sync_to_async``.
+        """
+        vehicle = vehicle or VehicleSpec()
+        with self._route_errors():
+            ors_client = AsyncORSClient.shared()
+            start_coords, end_coords = await asyncio.gather(
+                self._ensure_coordinates_async(ors_client, start),
+                self._ensure_coordinates_async(ors_client, end),
+            )
+
+            with span("directions") as _span:
+                directions_response = await ors_client.get_directions(
+                    start=start_coords, end=end_coords, vehicle_profile=vehicle.routing_profile
+                )
+                _span.set(vertices=len(directions_response.features[0].geometry.coordinates))
+            fuel_stops, _new_route, _vehicle_plans = await database_sync_to_async(self._plan_fuel_stops)(
+                directions_response, vehicle=vehicle, compare_vehicles=compare_vehicles
             )
-            _coordinates = directions_response.features[0].geometry.coordinates
-            route = LineString([Point(lon, lat) for lon, lat in _coordinates], srid=4326)
-            _distance = directions_response.features[0].properties.summary.distance
-            print(f"Distance: {_distance}")
-            fuel_stations_by_distance_to_start = self.fuel_station_service.get_stations_along_route(
-                route=route, max_distance_km=1
+            _new_directions = await self._final_directions_async(
+                ors_client, directions_response, fuel_stops, _new_route, vehicle
             )
-            fuel_stops, _new_route = self.fuel_station_service.calculate_optimal_fuel_stops(fuel_stations_by_distance_to_start, route, _distance)
-            _new_directions = self.ors_client.get_directions_from_multipoint(
-                route=[Coordinates(lat=_point.coords[1], lon=_point.coords[0]) for _point in _new_route]
+            # Geometry, snapping and costing are CPU-bound, so they stay off the event loop
+            return await sync_to_async(self._build_route, thread_sensitive=False)(
+                start, end, fuel_stops, _new_directions, vehicle, _vehicle_plans
             )
-            _distance = _new_directions.features[0].properties.summary.distance
-            print(f"New distance: {_distance}")
-            _coordinates = _new_directions.features[0].geometry.coordinates
-            route = LineString([Point(lon, lat) for lon, lat in _coordinates], srid=4326)
-            _total_distance = D(m=route.transform(5069, clone=True).length).mi
-            total_cost = self.fuel_station_service.calculate_total_cost(route=route, fuel_stops=fuel_stops, total_distance=_total_distance)
-            return Route(str(start), str(end), _total_distance, fuel_stops, total_cost, _coordinates)
+
+    def _plan_fuel_stops(
+        self,
+        directions_response,
+        corridor: Optional[StationCorridor] = None,
+        vehicle: Optional[VehicleSpec] = None,
+        compare_vehicles: List[VehicleSpec] = None,
+    ):
+        """
+        Stops of ``vehicle``, the waypoints through them, and the ``VehiclePlan``
+        of every vehicle in ``compare_vehicles`` (``None`` when there are none),
+        all solved over one corridor. ``corridor`` skips the corridor lookup when
+        the caller already has it.
+        """
+        vehicle = vehicle or VehicleSpec()
+        _coordinates = directions_response.features[0].geometry.coordinates
+        _distance = directions_response.features[0].properties.summary.distance
+        if settings.FUEL_STOP_SOLVER == "query":
+            with span("corridor", vertices=len(_coordinates)) as _span:
+                # Corridor and offset queries run on the reduced polyline; the distance is the full route's
+                route = LineString(RouteSimplifier.for_stage("corridor").simplify(_coordinates), srid=4326)
+                fuel_stations_by_distance_to_start = self.fuel_station_service.get_stations_along_route(
+                    route=route, max_distance_km=self.CORRIDOR_KM
+                )
+                # Already evaluated by get_stations_along_route, so this reads the result cache
+                _span.set(simplified_vertices=route.num_points, stations=len(fuel_stations_by_distance_to_start))
+            with span("optimizer", solver="query") as _span:
+                fuel_stops, _new_route = self.fuel_station_service.calculate_optimal_fuel_stops(
+                    fuel_stations_by_distance_to_start, route, _distance,
+                    max_millage_per_tank=vehicle.range_miles, starting_fuel=vehicle.starting_range_miles,
+                )
+                _span.set(stops=len(fuel_stops))
+            if not compare_vehicles:
+                return fuel_stops, _new_route, None
+            # The re-query loop plans one vehicle; the others get the same heuristic over the fetched corridor
+            corridor = self.fuel_station_service.build_corridor(fuel_stations_by_distance_to_start, _distance)
+            with span("optimizer", solver="window", stations=len(corridor), vehicles=len(compare_vehicles)):
+                _plans = WindowFuelStopSolver().solve_many(corridor, _distance, compare_vehicles)
+                return fuel_stops, _new_route, self.fuel_station_service.vehicle_plans(
+                    corridor, _plans, compare_vehicles, RouteGeometry(_coordinates), _distance
+                )
+
+        try:
+            return self._plan_in_memory(directions_response, corridor, vehicle, compare_vehicles)
+        except StaleStationIndexException:
+            # A planned stop was deleted after the station index or the cached corridor was loaded
+            StationIndex.invalidate()
+            if settings.CORRIDOR_CACHE_ENABLED:
+                CorridorCache.default().recheck_generation()
+            return self._plan_in_memory(directions_response, None, vehicle, compare_vehicles)
+
+    def _plan_in_memory(
+        self,
+        directions_response,
+        corridor: Optional[StationCorridor],
+        vehicle: VehicleSpec,
+        compare_vehicles: List[VehicleSpec] = None,
+    ):
+        """
+        ``_plan_fuel_stops`` of the in-memory solvers, looking the corridor up
+        when ``corridor`` is ``None``.
+        """
+        _coordinates = directions_response.features[0].geometry.coordinates
+        _distance = directions_response.features[0].properties.summary.distance
+        if corridor is None:
+            with span("corridor", vertices=len(_coordinates)) as _span:
+                route = LineString(RouteSimplifier.for_stage("corridor").simplify(_coordinates), srid=4326)
+                corridor = self.fuel_station_service.get_corridor(
+                    route=route, total_distance=_distance, max_distance_km=self.CORRIDOR_KM
+                )
+                _span.set(simplified_vertices=route.num_points, stations=len(corridor))
+        else:
+            route = LineString(_coordinates, srid=4326)
+        _vehicles = [vehicle] + list(compare_vehicles or [])
+        with span(
+            "optimizer", solver=settings.FUEL_STOP_SOLVER, stations=len(corridor), vehicles=len(_vehicles)
+        ) as _span:
+            _plans = get_fuel_stop_solver(settings.FUEL_STOP_SOLVER).solve_many(corridor, _distance, _vehicles)
+            fuel_stops, _new_route = self.fuel_station_service.calculate_optimal_fuel_stops_in_memory(
+                corridor, route, _distance, plan=_plans[0],
+            )
+            _vehicle_plans = None
+            if compare_vehicles:
+                _vehicle_plans = self.fuel_station_service.vehicle_plans(
+                    corridor, _plans[1:], _vehicles[1:], RouteGeometry(_coordinates), _distance
+                )
+            _span.set(stops=len(fuel_stops))
+        return fuel_stops, _new_route, _vehicle_plans
+
+    def _final_directions(self, directions_response, fuel_stops, new_route, vehicle: Optional[VehicleSpec] = None):
+        """
+        Directions through the chosen stops: routed again as a whole, or stitched
+        from ``directions_response`` depending on ``ROUTE_STITCHING``, with the
+        detour legs of ``legs`` mode fetched in parallel.
+        """
+        _mode = RouteStitcher.mode()
+        _profile = (vehicle or VehicleSpec()).routing_profile
+        with span("final_directions", mode=_mode, stops=len(fuel_stops)):
+            if _mode == "none":
+                return self.ors_client.get_directions_from_multipoint(
+                    route=[Coordinates(lat=_point.coords[1], lon=_point.coords[0]) for _point in new_route],
+                    vehicle_profile=_profile,
+                )
+            stitcher = RouteStitcher.for_mode(_mode, directions_response, fuel_stops)
+            if _mode == "estimate" or not fuel_stops:
+                return stitcher.stitch()
+            _waypoints = stitcher.leg_waypoints()
+            with ThreadPoolExecutor(max_workers=len(_waypoints)) as executor:
+                # Each leg runs in a copy of this context, so its spans join the request's trace
+                _futures = [
+                    executor.submit(
+                        contextvars.copy_context().run, self.ors_client.get_directions_from_multipoint,
+                        route=waypoints, vehicle_profile=_profile,
+                    )
+                    for waypoints in _waypoints
+                ]
+                _legs = [future.result() for future in _futures]
+            return stitcher.stitch(_legs)
+
+    @staticmethod
+    async def _final_directions_async(
+        ors_client: AsyncORSClient, directions_response, fuel_stops, new_route, vehicle: Optional[VehicleSpec] = None
+    ):
+        _mode = RouteStitcher.mode()
+        _profile = (vehicle or VehicleSpec()).routing_profile
+        with span("final_directions", mode=_mode, stops=len(fuel_stops)):
+            if _mode == "none":
+                return await ors_client.get_directions_from_multipoint(
+                    route=[Coordinates(lat=_point.coords[1], lon=_point.coords[0]) for _point in new_route],
+                    vehicle_profile=_profile,
+                )
+            stitcher = RouteStitcher.for_mode(_mode, directions_response, fuel_stops)
+            if _mode == "estimate" or not fuel_stops:
+                return stitcher.stitch()
+            _legs = await asyncio.gather(*(
+                ors_client.get_directions_from_multipoint(route=waypoints, vehicle_profile=_profile)
+                for waypoints in stitcher.leg_waypoints()
+            ))
+            return stitcher.stitch(list(_legs))
+
+    def _build_route(
+        self, start, end, fuel_stops, directions_response, vehicle: Optional[VehicleSpec] = None, vehicle_plans=None
+    ) -> Route:
+        vehicle = vehicle or VehicleSpec()
+        _coordinates = directions_response.features[0].geometry.coordinates
+        with span("cost", vertices=len(_coordinates), stops=len(fuel_stops)):
+            route = LineString(_coordinates, srid=4326)
+            geometry = RouteGeometry(_coordinates)
+            _total_distance = geometry.length
+            self.fuel_station_service.locate_stops(geometry, fuel_stops)
+            total_cost = self.fuel_station_service.calculate_total_cost(
+                route=route, fuel_stops=fuel_stops, total_distance=_total_distance,
+                fuel_efficiency=vehicle.mpg, geometry=geometry,
+                max_millage_per_tank=vehicle.range_miles, starting_fuel=vehicle.starting_range_miles,
+            )
+        return Route(
+            str(start), str(end), _total_distance, fuel_stops, total_cost, _coordinates, vehicle, vehicle_plans
+        )
+
+    @staticmethod
+    def _route_response(route: Route, route_id: str, coordinates_format: str = "json") -> dict:
+        with span("serialization", format=coordinates_format, vertices=len(route.coordinates)):
+            output_serializer = RouteOutputSerializer(route, context={"coordinates_format": coordinates_format})
+            return {
+                "route": output_serializer.data,
+                "route_id": route_id,
+                "map_url": reverse("route_map", args=[route_id]),
+            }
+
+    @staticmethod
+    def _for_request(response: dict, start, end) -> dict:
+        """
+        Copy of a cached response naming the endpoints as this request did; the
+        cache key only keeps them normalized.
+        """
+        return dict(response, route=dict(response["route"], start=str(start), end=str(end)))
+
+    @staticmethod
+    @contextmanager
+    def _route_errors():
+        try:
+            yield
         except RouteNotFoundException:
             raise ValueError("Unable to find route")
         except FuelStationNotFoundException:
             raise ValueError("No fuel stations found along the route")
-        except InvalidCoordinatesException as e:
+        except (InvalidCoordinatesException, GeocodeNotFoundException) as e:
             raise ValueError(str(e))
 
     def _ensure_coordinates(self, location) -> Coordinates:
         if isinstance(location, Coordinates):
             return location
         elif isinstance(location, str):
-            coords = self.ors_client.geocode(location)
+            with span("geocode"):
+                coords = self.ors_client.geocode(location)
 
             if coords is None:
                 raise InvalidCoordinatesException(
@@ -80,86 +346,15 @@ class FuelRouteController:
                 f"Invalid location type: {type(location)}"
             )
 
-    def _create_route_map(self, route: Route):
-        m = folium.Map(location=[route.coordinates[0][1], route.coordinates[0][0]], zoom_start=6)
-
-        folium.Marker([route.coordinates[0][1], route.coordinates[0][0]], popup="Start",
-                      icon=folium.Icon(color="green")).add_to(m)
-        folium.Marker([route.coordinates[-1][1], route.coordinates[-1][0]], popup="End",
-                      icon=folium.Icon(color="red")).add_to(m)
-
-        _line_string = LineString([Point(lon, lat) for lon, lat in route.coordinates], srid=4326)
-        _total_distance = D(m=_line_string.transform(5069, clone=True).length).mi
-        print(f"Total distance: {_total_distance}")
-        prev_stop = None
-        total_distance = 0
-        print(f"Number of fuel stops: {len(route.fuel_stops)}")
-        for i, stop in enumerate(route.fuel_stops):
-            _location = stop.location.coords
-            route_array = route.coordinates
-            curr_idx = 0
-            for _index, _coord in enumerate(route_array):
-                if abs(round(_coord[0], 3) - round(_location[0], 3)) < 0.002 and abs(round(_coord[1], 3) == round(_location[1], 3)) < 0.002:
-                    curr_idx = _index
-                    break
-            for _index, _coord in enumerate(route_array):
-                if curr_idx != 0:
-                    break
-                if abs(round(_coord[0], 3) - round(_location[0], 3)) < 0.02 and abs(round(_coord[1], 3) == round(_location[1], 3)) < 0.01:
-                    curr_idx = _index
-                    break
-
-            _partial_route = route_array[:curr_idx]
-            _partial_line_string = LineString(_partial_route, srid=4326)
-            _partial_distance = D(m=_partial_line_string.transform(5069, clone=True).length).mi
-            folium.Marker(
-                location=[_location[1], _location[0]],
-                popup=f"{stop.truckstop_name}<br>Price: ${stop.retail_price:.2f}, Distance to last point: {stop.distance.mi if not prev_stop else stop.distance_to_last_point.mi:.4f} mi, Distance to route: {stop.distance_to_route.mi:.4f} mi",
-                icon=folium.Icon(color="blue", icon="gas-pump", prefix="fa")
-            ).add_to(m)
-            if prev_stop is None:
-                segment_distance = _partial_distance
-                midpoint = [(route.coordinates[0][1] + stop.location.y) / 2,
-                            (route.coordinates[0][0] + stop.location.x) / 2]
-            else:
-                segment_distance = _partial_distance - total_distance
-                midpoint = [(prev_stop.location.y + stop.location.y) / 2,
-                            (prev_stop.location.x + stop.location.x) / 2]
-            total_distance += segment_distance
-
-            folium.Marker(
-                midpoint,
-                icon=folium.DivIcon(html=f'<div style="font-size: 12pt;font-weight: bolder;">{segment_distance:.1f} mi</div>')
-            ).add_to(m)
-
-            prev_stop = stop
-
-
-        segment_distance = _total_distance - total_distance
-        midpoint = [(prev_stop.location.y + route.coordinates[-1][1]) / 2,
-                    (prev_stop.location.x + route.coordinates[-1][0]) / 2]
-        folium.Marker(
-            midpoint,
-            icon=folium.DivIcon(
-                html=f'<div style="font-size: 12pt;font-weight: bolder;">{segment_distance:.1f} mi</div>')
-        ).add_to(m)
-        total_distance += segment_distance
-        # Create a PolyLine for the complete route
-        PolyLine(
-            [(lat, lon) for lon, lat in route.coordinates],
-            weight=5,
-            color="red",
-            opacity=0.8
-        ).add_to(m)
-
-        folium.Marker(
-            [route.coordinates[0][1], route.coordinates[0][0]],
-            icon=folium.DivIcon(
-                html=f'<div style="font-size: 12pt"><strong>Total: {total_distance:.1f} mi</strong></div>'),
-            popup=f"Total distance: {total_distance:.1f} miles"
-        ).add_to(m)
-
-
-        m.fit_bounds([(lat, lon) for lon, lat in route.coordinates])
-
-        return m._repr_html_()
\ No newline at end of file
+    @staticmethod
+    async def _ensure_coordinates_async(ors_client: AsyncORSClient, location) -> Coordinates:
+        if isinstance(location, Coordinates):
+            return location
+        elif isinstance(location, str):
+            with span("geocode"):
+                _lat, _lon = await ors_client.geocode(location)
+            return Coordinates(lat=_lat, lon=_lon)
+        else:
+            raise InvalidCoordinatesException(
+                f"Invalid location type: {type(location)}"
+            )
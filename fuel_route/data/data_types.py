@@ -1,8 +1,12 @@
 from dataclasses import dataclass
 from dataclasses_json import dataclass_json, LetterCase
 from typing import List, Optional
+
+import numpy as np
 from django.contrib.gis.geos import Point
 
+from fuel_route.data.enums import FuelType, VEHICLE_DEFAULTS, VEHICLE_ROUTING_PROFILES, VehicleType
+
 
 @dataclass
 class Coordinates:
@@ -23,6 +27,64 @@ class FuelStation:
     id: Optional[int]
 
 
+@dataclass(frozen=True)
+class VehicleSpec:
+    """
+    Fuel parameters of the vehicle a route is planned for, in gallons and mpg.
+    ``tanks`` saddle tanks of ``tank_gallons`` each are filled together; the
+    vehicle leaves with ``starting_fuel_gallons`` (full when ``None``) and never
+    plans to burn the last ``reserve_gallons``.
+    """
+    vehicle_type: VehicleType = VehicleType.TRUCK
+    fuel_type: FuelType = FuelType.DIESEL
+    tank_gallons: float = VEHICLE_DEFAULTS[VehicleType.TRUCK]["tank_gallons"]
+    tanks: int = 1
+    mpg: float = VEHICLE_DEFAULTS[VehicleType.TRUCK]["mpg"]
+    starting_fuel_gallons: Optional[float] = None
+    reserve_gallons: float = 0.0
+
+    @classmethod
+    def for_type(cls, vehicle_type: VehicleType, **overrides) -> "VehicleSpec":
+        """
+        Spec with the ``VEHICLE_DEFAULTS`` of ``vehicle_type``, overridden by
+        every keyword that is not ``None``.
+        """
+        _fields = dict(VEHICLE_DEFAULTS[vehicle_type])
+        _fields.update({_name: _value for _name, _value in overrides.items() if _value is not None})
+        return cls(vehicle_type=vehicle_type, **_fields)
+
+    @property
+    def capacity_gallons(self) -> float:
+        return self.tank_gallons * self.tanks
+
+    @property
+    def range_miles(self) -> float:
+        """
+        Miles driven on a full load of fuel down to the reserve.
+        """
+        return max(self.capacity_gallons - self.reserve_gallons, 0.0) * self.mpg
+
+    @property
+    def starting_range_miles(self) -> float:
+        _gallons = self.capacity_gallons if self.starting_fuel_gallons is None else self.starting_fuel_gallons
+        return max(min(_gallons, self.capacity_gallons) - self.reserve_gallons, 0.0) * self.mpg
+
+    @property
+    def routing_profile(self) -> str:
+        return VEHICLE_ROUTING_PROFILES[self.vehicle_type].value
+
+
+@dataclass
+class VehiclePlan:
+    """
+    Fuel stops and fuel cost planned for one of several vehicles compared on
+    the same route.
+    """
+    vehicle: VehicleSpec
+    fuel_stops: list
+    total_cost: float
+
+
 @dataclass
 class Route:
     start: str
@@ -31,6 +93,82 @@ class Route:
     fuel_stops: List[FuelStation]
     total_cost: float
     coordinates: List[List[float]]
+    vehicle: Optional[VehicleSpec] = None
+    vehicle_plans: Optional[List[VehiclePlan]] = None
+
+
+@dataclass
+class MapStop:
+    """
+    What the map shows of a fuel stop.
+    """
+    id: Optional[int]
+    truckstop_name: str
+    retail_price: float
+    lon: float
+    lat: float
+
+
+@dataclass
+class MapRoute:
+    """
+    What the map endpoint keeps of a computed route: its lon/lat vertices and
+    the stops along it.
+    """
+    coordinates: np.ndarray
+    fuel_stops: List[MapStop]
+
+
+@dataclass
+class StationCorridor:
+    """
+    Stations found along a route, flattened into parallel arrays.
+
+    Entries keep the order of the corridor query (distance to the route start),
+    so index ``i`` of every array refers to ``stations[i]``. Distances are in miles.
+    ``stations`` is ``None`` when the corridor was built without loading the rows.
+    """
+    stations: Optional[list]
+    station_ids: np.ndarray
+    lons: np.ndarray
+    lats: np.ndarray
+    prices: np.ndarray
+    distances_from_start: np.ndarray
+    offsets: np.ndarray
+    distances_to_route: np.ndarray
+
+    def __len__(self):
+        return len(self.station_ids)
+
+
+@dataclass
+class FuelStopPlan:
+    """
+    Result of a fuel stop solver: corridor indices of the chosen stops and the
+    distance in miles covered since the previous stop (or the route start).
+
+    Solvers that plan partial fills also report the gallons bought at each stop
+    and the cost of those purchases.
+    """
+    stop_indices: List[int]
+    leg_distances: List[float]
+    gallons: Optional[List[float]] = None
+    total_cost: Optional[float] = None
+
+
+@dataclass
+class PriceRefreshResult:
+    """
+    Outcome of a price-only refresh: CSV rows staged, staged rows skipped for a
+    blank or non-numeric OPIS id or price, distinct stations of the file found in
+    the table, stations whose price changed, and distinct OPIS ids of the file
+    that are not imported yet.
+    """
+    staged_rows: int
+    skipped_rows: int
+    matched: int
+    updated: int
+    unknown: int
 
 
 class ExtendedFuelStation(FuelStation):
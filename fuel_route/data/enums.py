@@ -32,3 +32,24 @@ class VehicleProfile(Enum):
 
 # Constants
 METERS_TO_MILES = 1609.34
+
+# Half width in km of the station corridor searched around a route
+CORRIDOR_KM = 1
+
+# Fuel, tank size in gallons and fuel economy in mpg assumed for each vehicle type. The
+# truck's make the 500 mi tank at 6 mpg the planner has always used.
+VEHICLE_DEFAULTS = {
+    VehicleType.TRUCK: {"fuel_type": FuelType.DIESEL, "tank_gallons": 500 / 6, "mpg": 6.0},
+    VehicleType.VAN: {"fuel_type": FuelType.GASOLINE, "tank_gallons": 25.0, "mpg": 16.0},
+    VehicleType.CAR: {"fuel_type": FuelType.GASOLINE, "tank_gallons": 14.0, "mpg": 30.0},
+}
+
+# ORS directions profile of each vehicle type
+VEHICLE_ROUTING_PROFILES = {
+    VehicleType.TRUCK: VehicleProfile.TRUCK,
+    VehicleType.VAN: VehicleProfile.CAR,
+    VehicleType.CAR: VehicleProfile.CAR,
+}
+
+# Sphere radius used by PostGIS ST_DistanceSphere
+EARTH_RADIUS_METERS = 6370986
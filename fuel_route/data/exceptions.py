@@ -4,8 +4,14 @@ class RouteNotFoundException(Exception):
 class FuelStationNotFoundException(Exception):
     pass
 
+class StaleStationIndexException(FuelStationNotFoundException):
+    pass
+
 class InvalidCoordinatesException(Exception):
     pass
 
 class GeocodeNotFoundException(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class InvalidPriceFileException(Exception):
+    pass
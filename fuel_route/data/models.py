@@ -1,4 +1,6 @@
 from django.contrib.gis.db import models
+from django.db.models import F
+from django.utils import timezone
 
 from fuel_route.data.data_types import FuelStation
 
@@ -12,14 +14,11 @@ class FuelStationModel(models.Model):
     state = models.CharField(max_length=2)
     rack_id = models.IntegerField()
     location = models.PointField(srid=4326)
+    # ``location`` in CONUS Albers (meters), kept up to date by a database trigger
+    # on every insert and every update of ``location``
+    location_5069 = models.PointField(srid=5069, null=True, editable=False)
     retail_price = models.FloatField()
 
-    class Meta:
-        indexes = [
-            models.Index(fields=['location']),
-            models.Index(fields=['opis_id'])
-        ]
-
     def to_base(self) -> FuelStation:
         return FuelStation(
             id=self.id,
@@ -31,4 +30,58 @@ class FuelStationModel(models.Model):
             rack_id=self.rack_id,
             location=self.location,
             retail_price=self.retail_price
-        )
\ No newline at end of file
+        )
+
+
+class StationTableGenerationModel(models.Model):
+    """
+    Single-row counter bumped on every write to the fuel station table, so
+    per-worker copies of station data know when they have to be reloaded.
+    """
+    id = models.AutoField(primary_key=True)
+    generation = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def current(cls) -> int:
+        return cls.objects.filter(pk=1).values_list('generation', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls) -> None:
+        _updated = cls.objects.filter(pk=1).update(
+            generation=F('generation') + 1, updated_at=timezone.now()
+        )
+        if not _updated:
+            cls.objects.get_or_create(pk=1, defaults={'generation': 1})
+
+
+class DirectionsCacheModel(models.Model):
+    """
+    Shared tier of the ORS directions cache. ``key`` hashes the rounded waypoints,
+    the profile and the request options.
+    """
+    id = models.AutoField(primary_key=True)
+    key = models.CharField(max_length=64, unique=True)
+    profile = models.CharField(max_length=32)
+    coordinates = models.JSONField()
+    response = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+
+class GeocodeCacheModel(models.Model):
+    """
+    Resolved geocodes shared by the API and the importers, keyed on the provider
+    and the normalized query text.
+    """
+    id = models.AutoField(primary_key=True)
+    provider = models.CharField(max_length=32)
+    query = models.CharField(max_length=512)
+    lat = models.FloatField()
+    lon = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['provider', 'query'], name='unique_geocode_provider_query'),
+        ]
@@ -1,4 +1,7 @@
-from fuel_route.data.data_types import FuelStation, Route, Coordinates
+from django.conf import settings
+from fuel_route.data.data_types import FuelStation, Route, Coordinates, VehicleSpec
+from fuel_route.data.enums import FuelType, VehicleType
+from fuel_route.services.coordinate_codecs import encode_coordinates
 from rest_framework import serializers
 
 class LocationField(serializers.Field):
@@ -19,10 +22,59 @@ class LocationField(serializers.Field):
             return f"{value.lat},{value.lon}"
         return str(value)
 
+class VehicleSerializer(serializers.Serializer):
+    """
+    Vehicle a route is planned for, validated into a ``VehicleSpec``. Fields
+    left out take the defaults of ``vehicle_type``.
+    """
+    vehicle_type = serializers.ChoiceField(
+        choices=[_type.value for _type in VehicleType], default=VehicleType.TRUCK.value
+    )
+    fuel_type = serializers.ChoiceField(choices=[_type.value for _type in FuelType], required=False)
+    tank_gallons = serializers.FloatField(min_value=1, required=False)
+    tanks = serializers.IntegerField(min_value=1, max_value=4, required=False)
+    mpg = serializers.FloatField(min_value=0.5, max_value=150, required=False)
+    starting_fuel_gallons = serializers.FloatField(min_value=0, required=False, allow_null=True)
+    reserve_gallons = serializers.FloatField(min_value=0, required=False)
+    range_miles = serializers.FloatField(read_only=True)
+
+    def validate(self, data):
+        if data.get('fuel_type') == FuelType.ELECTRIC.value:
+            raise serializers.ValidationError("Electric vehicles can't be planned against fuel station prices")
+        vehicle = VehicleSpec.for_type(
+            VehicleType(data.pop('vehicle_type')),
+            **dict(data, fuel_type=FuelType(data['fuel_type']) if 'fuel_type' in data else None),
+        )
+        if vehicle.reserve_gallons >= vehicle.capacity_gallons:
+            raise serializers.ValidationError("The reserve must be smaller than the tank capacity")
+        if vehicle.starting_fuel_gallons is not None and vehicle.starting_fuel_gallons > vehicle.capacity_gallons:
+            raise serializers.ValidationError("The starting fuel can't exceed the tank capacity")
+        return vehicle
+
+    def to_representation(self, instance: VehicleSpec):
+        return {
+            'vehicle_type': instance.vehicle_type.value,
+            'fuel_type': instance.fuel_type.value,
+            'tank_gallons': instance.tank_gallons,
+            'tanks': instance.tanks,
+            'mpg': instance.mpg,
+            'starting_fuel_gallons': instance.starting_fuel_gallons,
+            'reserve_gallons': instance.reserve_gallons,
+            'range_miles': instance.range_miles,
+        }
+
 class RouteInputSerializer(serializers.Serializer):
     start = LocationField()
     end = LocationField()
-    include_map_html = serializers.BooleanField(default=True)
+    include_map_html = serializers.BooleanField(default=False)
+    vehicle = VehicleSerializer(required=False)
+    # Planned over the same directions and corridor as ``vehicle``, for comparing configurations
+    compare_vehicles = VehicleSerializer(many=True, required=False)
+
+    def validate_compare_vehicles(self, vehicles):
+        if len(vehicles) > settings.MAX_COMPARE_VEHICLES:
+            raise serializers.ValidationError(f"At most {settings.MAX_COMPARE_VEHICLES} vehicles to compare")
+        return vehicles
 
     def validate(self, data):
         """
@@ -30,9 +82,16 @@ class RouteInputSerializer(serializers.Serializer):
         """
         if data['start'] == data['end']:
             raise serializers.ValidationError("Start and end locations must be different")
-        print(f"Map HTML: {data['include_map_html']}")
         return data
 
+class BatchRouteInputSerializer(serializers.Serializer):
+    lanes = RouteInputSerializer(many=True, allow_empty=False)
+
+    def validate_lanes(self, lanes):
+        if len(lanes) > settings.BATCH_MAX_LANES:
+            raise serializers.ValidationError(f"At most {settings.BATCH_MAX_LANES} lanes per request")
+        return lanes
+
 class FuelStationSerializer(serializers.Serializer):
     id = serializers.IntegerField()
     truckstop_name = serializers.CharField()
@@ -42,9 +101,15 @@ class FuelStationSerializer(serializers.Serializer):
     lat = serializers.FloatField(source='location.y')
     lon = serializers.FloatField(source='location.x')
     retail_price = serializers.FloatField()
+    purchased_gallons = serializers.FloatField(required=False)
+    route_mileage = serializers.FloatField(required=False)
 
 
 class RouteOutputSerializer(serializers.Serializer):
+    """
+    ``coordinates_format`` in the context picks how ``coordinates`` is sent:
+    ``json`` (nested lists), ``polyline``, ``delta`` or ``none``.
+    """
     start = serializers.CharField()
     end = serializers.CharField()
     distance = serializers.FloatField()
@@ -53,11 +118,23 @@ class RouteOutputSerializer(serializers.Serializer):
     coordinates = serializers.ListField(child=serializers.ListField(child=serializers.FloatField()))
 
     def to_representation(self, instance: Route):
-        return {
+        _representation = {
             'start': instance.start,
             'end': instance.end,
             'distance': instance.distance,
             'fuel_stops': FuelStationSerializer(instance.fuel_stops, many=True).data,
             'total_cost': instance.total_cost,
-            'coordinates': instance.coordinates
-        }
\ No newline at end of file
+            **encode_coordinates(instance.coordinates, self.context.get('coordinates_format', 'json')),
+        }
+        if instance.vehicle is not None:
+            _representation['vehicle'] = VehicleSerializer(instance.vehicle).data
+        if instance.vehicle_plans is not None:
+            _representation['vehicle_plans'] = [
+                {
+                    'vehicle': VehicleSerializer(plan.vehicle).data,
+                    'fuel_stops': FuelStationSerializer(plan.fuel_stops, many=True).data,
+                    'total_cost': plan.total_cost,
+                }
+                for plan in instance.vehicle_plans
+            ]
+        return _representation
\ No newline at end of file
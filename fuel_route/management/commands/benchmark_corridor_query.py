@@ -0,0 +1,94 @@
+import time
+
+import numpy as np
+from django.contrib.gis.geos import LineString
+from django.core.management.base import BaseCommand, CommandError
+
+from fuel_route.benchmarks.routes import synthetic_route
+from fuel_route.data.models import DirectionsCacheModel, FuelStationModel
+from fuel_route.services.fuel_station_service import FuelStationService
+from fuel_route.services.route_geometry import RouteGeometry
+
+
+class Command(BaseCommand):
+    help = 'Compare the degree-buffer corridor query with the geography ST_DWithin search'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lengths', type=float, nargs='+', default=[300, 1200, 2400],
+            help='Lengths in miles of the synthetic routes',
+        )
+        parser.add_argument(
+            '--vertex-miles', type=float, default=0.1,
+            help='Vertex spacing of the synthetic routes, close to what ORS returns',
+        )
+        parser.add_argument(
+            '--cached-routes', type=int, default=0,
+            help='Also run the N most recent routes of the directions cache',
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per route and query')
+        parser.add_argument('--corridor-km', type=float, default=1, help='Corridor half width in km')
+
+    def handle(self, *args, **options):
+        routes = []
+        for length in options['lengths']:
+            try:
+                route, _ = synthetic_route(length)
+            except ValueError as e:
+                raise CommandError(str(e))
+            routes.append((f"synthetic {length:.0f} mi", self._densify(route, options['vertex_miles'])))
+        for _entry in DirectionsCacheModel.objects.order_by('-created_at')[:options['cached_routes']]:
+            _coordinates = _entry.response["features"][0]["geometry"]["coordinates"]
+            routes.append((f"cached {_entry.key[:8]}", LineString(_coordinates, srid=4326)))
+
+        self.stdout.write(
+            f"{'route':>18} {'vertices':>9} {'buffer':>7} {'ms':>9} {'dwithin':>8} {'ms':>9} "
+            f"{'common':>7} {'index used':>11}"
+        )
+        for _name, route in routes:
+            _buffer_ids, _buffer_ms = self._run(
+                lambda: set(self._buffer_query(route, options['corridor_km']).values_list('id', flat=True)),
+                options['repeat'],
+            )
+            _dwithin_ids, _dwithin_ms = self._run(
+                lambda: {
+                    station.id
+                    for station in FuelStationService.get_stations_along_route(
+                        route=route, max_distance_km=options['corridor_km']
+                    )
+                },
+                options['repeat'],
+            )
+            _plan = FuelStationService.get_stations_along_route(
+                route=route, max_distance_km=options['corridor_km']
+            ).explain()
+            self.stdout.write(
+                f"{_name:>18} {route.num_points:>9} {len(_buffer_ids):>7} {_buffer_ms:>9.1f} "
+                f"{len(_dwithin_ids):>8} {_dwithin_ms:>9.1f} {len(_buffer_ids & _dwithin_ids):>7} "
+                f"{str('fuel_route_station_location_geog_gist' in _plan):>11}"
+            )
+
+    @staticmethod
+    def _buffer_query(route: LineString, max_distance_km: float):
+        """
+        The corridor filter ``get_stations_along_route`` used before: a GEOS buffer
+        of the full route with the km width converted to degrees.
+        """
+        _conversion_to_degrees = ((max_distance_km * 1000) * 0.000000039) / 0.00362333
+        return FuelStationModel.objects.filter(location__intersects=route.buffer(_conversion_to_degrees))
+
+    @staticmethod
+    def _run(query, repeat):
+        _timings = []
+        for _ in range(repeat):
+            _start = time.perf_counter()
+            _ids = query()
+            _timings.append((time.perf_counter() - _start) * 1000)
+        return _ids, min(_timings)
+
+    @staticmethod
+    def _densify(route: LineString, vertex_miles: float) -> LineString:
+        geometry = RouteGeometry(route.coords)
+        _mileages = np.arange(0.0, geometry.length, vertex_miles)
+        _coordinates = [geometry.point_at(_mileage) for _mileage in _mileages] + [route.coords[-1]]
+        return LineString(_coordinates, srid=4326)
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from fuel_route.benchmarks.routes import synthetic_route
+from fuel_route.services.fuel_station_service import FuelStationService
+
+
+class Command(BaseCommand):
+    help = 'Compare the PostGIS re-query fuel stop loop with the in-memory solver'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lengths', type=float, nargs='+', default=[600, 1200, 1800, 2400],
+            help='Route lengths in miles',
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per route and mode')
+        parser.add_argument('--corridor-km', type=float, default=1, help='Corridor half width in km')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'length mi':>10} {'stations':>9} {'query ms':>10} {'queries':>8} "
+            f"{'memory ms':>10} {'queries':>8} {'same stops':>11}"
+        )
+        for length in options['lengths']:
+            try:
+                route, total_distance = synthetic_route(length)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+            _stations = FuelStationService.get_stations_along_route(
+                route=route, max_distance_km=options['corridor_km']
+            )
+            _query = self._run(
+                FuelStationService.calculate_optimal_fuel_stops, _stations, route, total_distance, options['repeat']
+            )
+            _memory = self._run(
+                FuelStationService.calculate_optimal_fuel_stops_in_memory, _stations, route, total_distance,
+                options['repeat'],
+            )
+            _same_stops = [stop.opis_id for stop in _query[0]] == [stop.opis_id for stop in _memory[0]]
+            self.stdout.write(
+                f"{total_distance:>10.0f} {len(_stations):>9} {_query[1]:>10.1f} {_query[2]:>8} "
+                f"{_memory[1]:>10.1f} {_memory[2]:>8} {str(_same_stops):>11}"
+            )
+
+    @staticmethod
+    def _run(optimizer, stations, route, total_distance, repeat):
+        _timings = []
+        for _ in range(repeat):
+            # A fresh clone per run so neither mode reuses the other's result cache
+            with CaptureQueriesContext(connection) as _queries:
+                _start = time.perf_counter()
+                fuel_stops, _ = optimizer(stations.all(), route, total_distance)
+                _timings.append((time.perf_counter() - _start) * 1000)
+        return fuel_stops, min(_timings), len(_queries.captured_queries)
@@ -0,0 +1,100 @@
+import csv
+import os
+import tempfile
+import time
+import uuid
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from fuel_route.benchmarks.mock_services import MockORSServer
+from fuel_route.data.models import FuelStationModel, GeocodeCacheModel, StationTableGenerationModel
+from fuel_route.services.geocode_cache import GeocodeCache
+
+# Synthetic stations use OPIS ids from here up, far above the real ones
+SYNTHETIC_OPIS_ID_START = 900_000_000
+
+
+class Command(BaseCommand):
+    help = 'Compare the threaded and the asyncio importers against a local mock geocoder'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000, help='Synthetic CSV rows')
+        parser.add_argument('--latency-ms', type=float, default=50, help='Mock geocoder latency')
+        parser.add_argument('--workers', type=int, default=8, help='Threads of the sync importer')
+        parser.add_argument('--concurrency', type=int, default=64, help='In-flight geocodes of the async importer')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows written per upsert')
+
+    def handle(self, *args, **options):
+        """
+        Both importers read the same synthetic CSV with unique addresses, so every
+        row is a geocoder call. The synthetic stations and their geocode cache
+        entries are deleted before each run and at the end.
+        """
+        _token = f"benchmark-{uuid.uuid4().hex[:8]}"
+        _results = []
+        with tempfile.TemporaryDirectory() as _directory, MockORSServer(options['latency_ms']) as server:
+            _csv_path = os.path.join(_directory, 'stations.csv')
+            self._write_csv(_csv_path, options['rows'], _token)
+            _runs = [
+                ('sync', 'import_fuel_stations', [
+                    '--workers', str(options['workers']), '--rate', '0', '--restart',
+                    '--checkpoint', os.path.join(_directory, 'checkpoint'),
+                ]),
+                ('async', 'import_fuel_stations_async', ['--concurrency', str(options['concurrency'])]),
+            ]
+            try:
+                with override_settings(OPENROUTESERVICE_BASE_URL=server.base_url, GEOCODE_CACHE_ENABLED=True):
+                    for _name, _command, _arguments in _runs:
+                        self._cleanup(_token)
+                        _requests = server.requests
+                        _start = time.perf_counter()
+                        call_command(
+                            _command, _csv_path, *_arguments,
+                            '--batch-size', str(options['batch_size']),
+                            stdout=open(os.devnull, 'w'),
+                        )
+                        _elapsed = time.perf_counter() - _start
+                        _imported = FuelStationModel.objects.filter(opis_id__gte=SYNTHETIC_OPIS_ID_START).count()
+                        _results.append((_name, _elapsed, _imported, server.requests - _requests))
+            finally:
+                self._cleanup(_token)
+
+        self.stdout.write(f"{'importer':>9} {'seconds':>9} {'rows/s':>9} {'imported':>9} {'geocodes':>9}")
+        for _name, _elapsed, _imported, _requests in _results:
+            self.stdout.write(
+                f"{_name:>9} {_elapsed:>9.2f} {options['rows'] / _elapsed:>9.1f} {_imported:>9} {_requests:>9}"
+            )
+
+    @staticmethod
+    def _write_csv(path: str, rows: int, token: str) -> None:
+        with open(path, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow([
+                'OPIS Truckstop ID', 'Truckstop Name', 'Address', 'City', 'State', 'Rack ID', 'Retail Price',
+            ])
+            for _row in range(rows):
+                writer.writerow([
+                    SYNTHETIC_OPIS_ID_START + _row,
+                    f"BENCHMARK STOP {_row}",
+                    f"{_row} {token} RD",
+                    'Benchmark',
+                    'TX',
+                    1,
+                    f"{3 + (_row % 100) / 100:.3f}",
+                ])
+
+    @staticmethod
+    def _cleanup(token: str) -> None:
+        # A raw delete skips the per-row post_delete signals, so the generation is bumped once
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {FuelStationModel._meta.db_table} WHERE opis_id >= %s", [SYNTHETIC_OPIS_ID_START]
+            )
+            _deleted = cursor.rowcount
+        if _deleted:
+            StationTableGenerationModel.bump()
+        GeocodeCacheModel.objects.filter(query__contains=token).delete()
+        GeocodeCache.default().memory.clear()
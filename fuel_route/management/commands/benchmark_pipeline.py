@@ -0,0 +1,223 @@
+import json
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from fuel_route.benchmarks.fixtures import FixtureORSClient, ORSFixtures
+from fuel_route.benchmarks.routes import corridor_stations, lane_of_length
+from fuel_route.controllers.fuel_route_controller import FuelRouteController
+from fuel_route.data.models import FuelStationModel
+from fuel_route.data.serializers import LocationField
+from fuel_route.services.station_index import StationIndex
+from fuel_route.services.tracing import start_trace
+
+# Settings that change what the pipeline does, written with the results so runs compare like with like
+REPORTED_SETTINGS = (
+    'FUEL_STOP_SOLVER', 'STATION_CORRIDOR_SOURCE', 'ROUTE_STITCHING',
+    'ROUTE_SIMPLIFY_METHOD', 'ROUTE_SIMPLIFY_CORRIDOR_METERS',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every route pipeline stage over route lengths x station densities, replaying recorded ORS '
+        'responses against a seeded station table; writes JSON results and compares them with a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fixtures', type=str, default=None,
+            help='Recorded ORS responses; without it every directions call gets a straight mock route',
+        )
+        parser.add_argument(
+            '--record', action='store_true',
+            help='Call the configured routing backend instead and save its responses to --fixtures',
+        )
+        parser.add_argument(
+            '--lengths', type=float, nargs='+', default=[250, 1000, 2500],
+            help='Straight-line lane lengths in miles',
+        )
+        parser.add_argument(
+            '--densities', type=float, nargs='+', default=[5, 20, 80],
+            help='Seeded stations per 100 route miles',
+        )
+        parser.add_argument('--spread-km', type=float, default=2, help='Farthest a seeded station is from the route')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per lane and density')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the station generator')
+        parser.add_argument('--output', type=str, default=None, help='JSON file to write the results to')
+        parser.add_argument('--baseline', type=str, default=None, help='JSON results to compare against')
+        parser.add_argument(
+            '--max-regression', type=float, default=0.25,
+            help='Fail when a stage median is slower than the baseline by more than this fraction',
+        )
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=2,
+            help='Slowdowns below this many milliseconds are noise and never fail',
+        )
+        parser.add_argument(
+            '--confirm-database', type=str, default=None,
+            help='Name of the configured database, confirming it is a dedicated one the benchmark may lock; '
+                 'not needed for test_ databases',
+        )
+
+    def handle(self, *args, **options):
+        if options['record'] and not options['fixtures']:
+            raise CommandError('--record needs --fixtures to save the responses to')
+        # The seeded stations replace every row of the station table for the whole run; the
+        # rollback undoes it, but the rows stay locked against imports and price refreshes meanwhile
+        _database = str(connection.settings_dict['NAME'])
+        if not _database.startswith('test_') and options['confirm_database'] != _database:
+            raise CommandError(
+                f"The benchmark replaces the station table of database '{_database}' while it runs. "
+                f"Run it against a dedicated benchmark or test database and pass --confirm-database {_database}"
+            )
+        if options['fixtures'] and not options['record']:
+            fixtures = ORSFixtures.load(options['fixtures'])
+        else:
+            fixtures = ORSFixtures()
+        ors_client = FixtureORSClient(fixtures, record=options['record'])
+        controller = FuelRouteController()
+        controller.ors_client = ors_client
+
+        # Every run has to search its corridor, never read a cached one
+        with override_settings(CORRIDOR_CACHE_ENABLED=False):
+            _results = self._run_matrix(controller, ors_client, options)
+        StationIndex.invalidate()
+
+        if options['record']:
+            fixtures.save(options['fixtures'])
+            self.stdout.write(f"Recorded {fixtures.as_dict()} to {options['fixtures']}")
+        _report = {
+            'created_at': timezone.now().isoformat(),
+            'settings': {_name: getattr(settings, _name) for _name in REPORTED_SETTINGS},
+            'fixtures': fixtures.as_dict(),
+            'repeat': options['repeat'],
+            'results': _results,
+        }
+        if fixtures.misses and not options['record']:
+            self.stdout.write(f"{fixtures.misses} calls had no recorded response and got a mock one")
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(_report, output_file, indent=2, sort_keys=True)
+            self.stdout.write(f"Results written to {options['output']}")
+        if options['baseline']:
+            self._compare(options['baseline'], _results, options['max_regression'], options['min_delta_ms'])
+
+    def _run_matrix(self, controller: FuelRouteController, ors_client: FixtureORSClient, options) -> List[dict]:
+        _location_field = LocationField()
+        _results = []
+        self.stdout.write(
+            f"{'lane mi':>8} {'route mi':>9} {'density':>8} {'stations':>9} {'stops':>6} {'total ms':>9}  stages (median ms)"
+        )
+        # The seeded stations replace the table for the benchmark and are rolled back afterwards
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {FuelStationModel._meta.db_table}")
+            for length in options['lengths']:
+                try:
+                    start, end = lane_of_length(length)
+                except ValueError as e:
+                    raise CommandError(str(e))
+                start, end = _location_field.to_internal_value(start), _location_field.to_internal_value(end)
+                _coordinates = ors_client.get_directions(start=start, end=end).features[0].geometry.coordinates
+                for _index, density in enumerate(options['densities']):
+                    _rng = np.random.default_rng([options['seed'], int(length), _index])
+                    with transaction.atomic():
+                        _stations = corridor_stations(_coordinates, density, options['spread_km'], _rng)
+                        FuelStationModel.objects.bulk_create(_stations, batch_size=1000)
+                        StationIndex.invalidate()
+                        _result = self._run_lane(controller, start, end, options['repeat'])
+                        transaction.set_rollback(True)
+                    _result.update(lane_miles=length, density=density, stations=len(_stations))
+                    _results.append(_result)
+                    self._write_result(_result)
+            transaction.set_rollback(True)
+        return _results
+
+    @staticmethod
+    def _run_lane(controller: FuelRouteController, start, end, repeat: int) -> dict:
+        """
+        One untimed run loading the station index, then ``repeat`` traced runs;
+        stages repeated within a run, like detour legs, are summed per run.
+        """
+        try:
+            controller.optimize_route(start, end)
+        except ValueError as e:
+            return {'error': str(e)}
+
+        _totals: List[float] = []
+        _stages: Dict[str, List[float]] = {}
+        for _ in range(repeat):
+            with start_trace() as trace:
+                _start = time.perf_counter()
+                route = controller.optimize_route(start, end)
+                controller._route_response(route, 'benchmark')
+                _totals.append((time.perf_counter() - _start) * 1000)
+            _run: Dict[str, float] = {}
+            for _span in trace.spans:
+                _run[_span.name] = _run.get(_span.name, 0.0) + _span.seconds * 1000
+            for _name, _ms in _run.items():
+                _stages.setdefault(_name, []).append(_ms)
+        return {
+            'route_miles': round(route.distance, 1),
+            'stops': len(route.fuel_stops),
+            'total_ms': {'median': float(np.median(_totals)), 'min': float(np.min(_totals))},
+            'stages': {
+                _name: {'median': float(np.median(_ms)), 'min': float(np.min(_ms))}
+                for _name, _ms in _stages.items()
+            },
+        }
+
+    def _write_result(self, result: dict) -> None:
+        if 'error' in result:
+            self.stdout.write(
+                f"{result['lane_miles']:>8.0f} {'':>9} {result['density']:>8.0f} {result['stations']:>9} "
+                f"{'':>6} {'':>9}  {result['error']}"
+            )
+            return
+        _stages = ", ".join(f"{_name} {_ms['median']:.1f}" for _name, _ms in result['stages'].items())
+        self.stdout.write(
+            f"{result['lane_miles']:>8.0f} {result['route_miles']:>9.0f} {result['density']:>8.0f} "
+            f"{result['stations']:>9} {result['stops']:>6} {result['total_ms']['median']:>9.1f}  {_stages}"
+        )
+
+    def _compare(self, path: str, results: List[dict], max_regression: float, min_delta_ms: float) -> None:
+        """
+        Compares the stage and total medians of every lane and density found in
+        both runs, and fails when any got slower than the thresholds allow.
+        """
+        with open(path, 'r') as baseline_file:
+            _baseline = json.load(baseline_file)
+        _previous = {(_result['lane_miles'], _result['density']): _result for _result in _baseline['results']}
+        _regressions = []
+        self.stdout.write(f"\nAgainst {path} (created {_baseline.get('created_at')}):")
+        for result in results:
+            _before: Optional[dict] = _previous.get((result['lane_miles'], result['density']))
+            if _before is None or 'error' in result or 'error' in _before:
+                continue
+            _pairs = [('total', _before['total_ms'], result['total_ms'])] + [
+                (_name, _before['stages'][_name], _ms)
+                for _name, _ms in result['stages'].items() if _name in _before['stages']
+            ]
+            for _name, _old, _new in _pairs:
+                _delta = _new['median'] - _old['median']
+                _change = _delta / _old['median'] if _old['median'] else 0.0
+                if _delta > min_delta_ms and _change > max_regression:
+                    _regressions.append(
+                        f"{result['lane_miles']:.0f} mi, density {result['density']:g}, {_name}: "
+                        f"{_old['median']:.1f} -> {_new['median']:.1f} ms ({_change:+.0%})"
+                    )
+                elif _name == 'total':
+                    self.stdout.write(
+                        f"  {result['lane_miles']:.0f} mi, density {result['density']:g}: "
+                        f"{_old['median']:.1f} -> {_new['median']:.1f} ms ({_change:+.0%})"
+                    )
+        if _regressions:
+            raise CommandError("Stages slower than the baseline:\n  " + "\n  ".join(_regressions))
+        self.stdout.write("No regressions")
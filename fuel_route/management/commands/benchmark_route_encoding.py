@@ -0,0 +1,51 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from fuel_route.benchmarks.routes import LANES
+from fuel_route.data.data_types import Route
+from fuel_route.data.serializers import LocationField, RouteOutputSerializer
+from fuel_route.services.coordinate_codecs import COORDINATE_FORMATS
+from fuel_route.services.ors_service_client import ORSClient
+from fuel_route.views.renderers import ORJSONRenderer, orjson
+
+
+class Command(BaseCommand):
+    help = 'Response size and serialization time of route responses per coordinates format and renderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lanes', type=int, default=len(LANES), help='Benchmark lanes to run')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per lane, format and renderer')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write("orjson is not installed, the orjson renderer falls back to DRF's")
+        ors_client = ORSClient.shared()
+        _location_field = LocationField()
+        _renderers = {"drf": JSONRenderer(), "orjson": ORJSONRenderer()}
+        self.stdout.write(
+            f"{'lane':>5} {'vertices':>9} {'format':>9} {'renderer':>9} {'bytes':>10} {'gzip':>9} {'ms':>8}"
+        )
+        for _lane, (start, end) in enumerate(LANES[:options['lanes']]):
+            directions_response = ors_client.get_directions(
+                start=_location_field.to_internal_value(start), end=_location_field.to_internal_value(end)
+            )
+            _feature = directions_response.features[0]
+            route = Route(
+                start, end, _feature.properties.summary.distance, [], 0.0, _feature.geometry.coordinates
+            )
+            for _format in COORDINATE_FORMATS:
+                for _name, renderer in _renderers.items():
+                    _timings = []
+                    for _ in range(options['repeat']):
+                        _start = time.perf_counter()
+                        _body = renderer.render(
+                            RouteOutputSerializer(route, context={"coordinates_format": _format}).data
+                        )
+                        _timings.append((time.perf_counter() - _start) * 1000)
+                    self.stdout.write(
+                        f"{_lane:>5} {len(route.coordinates):>9} {_format:>9} {_name:>9} {len(_body):>10} "
+                        f"{len(gzip.compress(_body)):>9} {min(_timings):>8.1f}"
+                    )
@@ -0,0 +1,89 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from fuel_route.benchmarks.routes import LANES
+from fuel_route.controllers.fuel_route_controller import FuelRouteController
+from fuel_route.data.serializers import LocationField
+from fuel_route.services.ors_service_client import ORSClient
+from fuel_route.services.route_geometry import RouteGeometry, haversine_meters
+from fuel_route.services.route_simplifier import RouteSimplifier
+from fuel_route.services.station_index import StationIndex
+
+
+class Command(BaseCommand):
+    help = 'Vertex counts, deviation and corridor changes of simplified routes, to tune ROUTE_SIMPLIFY_*_METERS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lanes', type=int, default=len(LANES), help='Benchmark lanes to run')
+        parser.add_argument(
+            '--tolerances', type=float, nargs='+', default=[5, 10, 30, 100], help='Tolerances in meters'
+        )
+        parser.add_argument(
+            '--methods', nargs='+', default=['douglas-peucker', 'visvalingam'],
+            choices=[_method for _method in RouteSimplifier.METHODS if _method != 'none'],
+        )
+
+    def handle(self, *args, **options):
+        ors_client = ORSClient.shared()
+        index = StationIndex.get()
+        _location_field = LocationField()
+        self.stdout.write(
+            f"{'lane':>5} {'method':>16} {'m':>6} {'vertices':>9} {'kept':>7} {'ms':>8} "
+            f"{'max dev m':>10} {'length %':>9} {'stations':>9} {'changed':>8} {'max off mi':>11}"
+        )
+        for _lane, (start, end) in enumerate(LANES[:options['lanes']]):
+            directions_response = ors_client.get_directions(
+                start=_location_field.to_internal_value(start), end=_location_field.to_internal_value(end)
+            )
+            _feature = directions_response.features[0]
+            _full = np.asarray(_feature.geometry.coordinates, dtype=float)[:, :2]
+            _distance = _feature.properties.summary.distance
+            _full_length = RouteGeometry(_full).length
+            _reference = index.corridor(_full, _distance, FuelRouteController.CORRIDOR_KM)
+            _reference_offsets = dict(zip(_reference.station_ids.tolist(), _reference.offsets.tolist()))
+
+            for _method in options['methods']:
+                for _tolerance in options['tolerances']:
+                    _start = time.perf_counter()
+                    _kept = RouteSimplifier.METHODS[_method](_full, _tolerance)
+                    _ms = (time.perf_counter() - _start) * 1000
+                    _simplified = _full[_kept]
+
+                    geometry = RouteGeometry(_simplified)
+                    _deviation = self._max_deviation_meters(_full, _kept)
+                    _length_error = (geometry.length - _full_length) / _full_length * 100 if _full_length else 0.0
+                    corridor = index.corridor(_simplified, _distance, FuelRouteController.CORRIDOR_KM)
+                    _offsets = dict(zip(corridor.station_ids.tolist(), corridor.offsets.tolist()))
+                    _common = _offsets.keys() & _reference_offsets.keys()
+                    _changed = len(_offsets.keys() ^ _reference_offsets.keys())
+                    _max_offset_error = max(
+                        (abs(_offsets[_id] - _reference_offsets[_id]) for _id in _common), default=0.0
+                    )
+                    self.stdout.write(
+                        f"{_lane:>5} {_method:>16} {_tolerance:>6.0f} {len(_full):>9} {len(_simplified):>7} "
+                        f"{_ms:>8.1f} {_deviation:>10.1f} "
+                        f"{_length_error:>9.3f} {len(_offsets):>9} {_changed:>8} {_max_offset_error:>11.3f}"
+                    )
+
+    @staticmethod
+    def _max_deviation_meters(full: np.ndarray, kept: np.ndarray) -> float:
+        """
+        Farthest any full route vertex lies from the simplified segment that
+        replaced it, in the same local frame the simplification works in.
+        """
+        _segments = np.searchsorted(kept, np.arange(len(full)), side="right") - 1
+        _segments = np.minimum(_segments, len(kept) - 2)
+        _starts, _ends = full[kept[_segments]], full[kept[_segments + 1]]
+        _scale = np.cos(np.radians((_starts[:, 1] + _ends[:, 1]) / 2))
+        _dx, _dy = (_ends[:, 0] - _starts[:, 0]) * _scale, _ends[:, 1] - _starts[:, 1]
+        _px, _py = (full[:, 0] - _starts[:, 0]) * _scale, full[:, 1] - _starts[:, 1]
+        _squared_length = _dx * _dx + _dy * _dy
+        _t = np.clip(
+            np.divide(_px * _dx + _py * _dy, _squared_length, out=np.zeros_like(_px), where=_squared_length > 0),
+            0.0, 1.0,
+        )
+        _nearest_lons = _starts[:, 0] + (_ends[:, 0] - _starts[:, 0]) * _t
+        _nearest_lats = _starts[:, 1] + _dy * _t
+        return float(haversine_meters(full[:, 0], full[:, 1], _nearest_lons, _nearest_lats).max())
@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import List
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from fuel_route.benchmarks.routes import LANES
+from fuel_route.controllers.fuel_route_controller import FuelRouteController
+from fuel_route.data.serializers import LocationField
+from fuel_route.services.ors_service_client import ORSClient
+from fuel_route.services.route_geometry import RouteGeometry
+from fuel_route.services.routing_backends import RoutingBackend
+
+
+class CountingRoutingBackend(RoutingBackend):
+    """
+    Passes directions calls through to ``backend``, counting them.
+    """
+
+    name = "counting"
+
+    def __init__(self, backend: RoutingBackend):
+        self.backend = backend
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def directions(self, coordinates: List[List[float]], vehicle_profile: str, **options) -> dict:
+        with self._lock:
+            self.calls += 1
+        return self.backend.directions(coordinates, vehicle_profile, **options)
+
+
+class Command(BaseCommand):
+    help = 'Compare the distance and latency of stitched final routes with routing start -> stops -> end again'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lanes', type=int, default=len(LANES), help='Benchmark lanes to run')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per lane and mode')
+
+    def handle(self, *args, **options):
+        # Every directions call goes upstream, so the timings include the routing backend
+        with override_settings(DIRECTIONS_CACHE_ENABLED=False):
+            controller = FuelRouteController()
+            controller.ors_client = ORSClient()
+        # Counts the upstream calls each mode makes for the final route
+        backend = CountingRoutingBackend(controller.ors_client.routing_backend)
+        controller.ors_client.routing_backend = backend
+
+        _location_field = LocationField()
+        self.stdout.write(
+            f"{'lane':>5} {'stops':>6} {'none mi':>9} {'ms':>8} {'calls':>6} "
+            f"{'estimate mi':>12} {'err %':>7} {'ms':>8} {'calls':>6} "
+            f"{'legs mi':>9} {'err %':>7} {'ms':>8} {'calls':>6}"
+        )
+        _errors = {"estimate": [], "legs": []}
+        for _lane, (start, end) in enumerate(LANES[:options['lanes']]):
+            with override_settings(DIRECTIONS_CACHE_ENABLED=False):
+                directions_response = controller.ors_client.get_directions(
+                    start=_location_field.to_internal_value(start), end=_location_field.to_internal_value(end)
+                )
+                fuel_stops, _new_route, _ = controller._plan_fuel_stops(directions_response)
+
+                _results = {}
+                for _mode in ("none", "estimate", "legs"):
+                    _timings = []
+                    _calls_before = backend.calls
+                    for _ in range(options['repeat']):
+                        with override_settings(ROUTE_STITCHING=_mode):
+                            _start = time.perf_counter()
+                            _directions = controller._final_directions(directions_response, fuel_stops, _new_route)
+                            _timings.append((time.perf_counter() - _start) * 1000)
+                    _miles = RouteGeometry(_directions.features[0].geometry.coordinates).length
+                    _calls = (backend.calls - _calls_before) / options['repeat']
+                    _results[_mode] = (_miles, min(_timings), _calls)
+
+            _reference = _results["none"][0]
+            _line = (
+                f"{_lane:>5} {len(fuel_stops):>6} {_reference:>9.1f} {_results['none'][1]:>8.1f} "
+                f"{_results['none'][2]:>6.0f}"
+            )
+            for _mode, _width in (("estimate", 12), ("legs", 9)):
+                _error = (_results[_mode][0] - _reference) / _reference * 100 if _reference else 0.0
+                _errors[_mode].append(abs(_error))
+                _line += (
+                    f" {_results[_mode][0]:>{_width}.1f} {_error:>7.2f} {_results[_mode][1]:>8.1f} "
+                    f"{_results[_mode][2]:>6.0f}"
+                )
+            self.stdout.write(_line)
+
+        for _mode, _mode_errors in _errors.items():
+            if _mode_errors:
+                self.stdout.write(
+                    f"{_mode}: mean |error| {sum(_mode_errors) / len(_mode_errors):.2f}%, "
+                    f"max {max(_mode_errors):.2f}%"
+                )
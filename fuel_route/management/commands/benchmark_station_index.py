@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fuel_route.benchmarks.routes import synthetic_route
+from fuel_route.services.fuel_station_service import FuelStationService
+from fuel_route.services.station_index import StationIndex
+
+
+class Command(BaseCommand):
+    help = 'Compare the PostGIS corridor query with the in-process station index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lengths', type=float, nargs='+', default=[300, 600, 1200, 2400],
+            help='Route lengths in miles',
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per route and mode')
+        parser.add_argument('--corridor-km', type=float, default=1, help='Corridor half width in km')
+
+    def handle(self, *args, **options):
+        _start = time.perf_counter()
+        index = StationIndex.load()
+        self.stdout.write(f"Index of {len(index)} stations built in {(time.perf_counter() - _start) * 1000:.1f} ms")
+        self.stdout.write(
+            f"{'length mi':>10} {'vertices':>9} {'postgis':>8} {'ms':>9} {'index':>8} {'ms':>9} {'common':>8}"
+        )
+        for length in options['lengths']:
+            try:
+                route, total_distance = synthetic_route(length)
+            except ValueError as e:
+                raise CommandError(str(e))
+
+            _postgis_timings = []
+            _index_timings = []
+            for _ in range(options['repeat']):
+                _start = time.perf_counter()
+                _postgis_ids = {
+                    station.id
+                    for station in FuelStationService.get_stations_along_route(
+                        route=route, max_distance_km=options['corridor_km']
+                    )
+                }
+                _postgis_timings.append((time.perf_counter() - _start) * 1000)
+
+                _start = time.perf_counter()
+                _corridor = index.corridor(route.coords, total_distance, options['corridor_km'])
+                _index_timings.append((time.perf_counter() - _start) * 1000)
+
+            _index_ids = set(_corridor.station_ids.tolist())
+            self.stdout.write(
+                f"{total_distance:>10.0f} {route.num_points:>9} {len(_postgis_ids):>8} {min(_postgis_timings):>9.1f} "
+                f"{len(_index_ids):>8} {min(_index_timings):>9.1f} {len(_postgis_ids & _index_ids):>8}"
+            )
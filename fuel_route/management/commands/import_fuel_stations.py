@@ -1,104 +1,122 @@
 import csv
+import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
 from django.contrib.gis.geos import Point
 from django.core.management.base import BaseCommand
-from django.db import transaction
-from geopy import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 
-from fuel_route.data.models import FuelStationModel
 from fuel_route.data.data_types import FuelStation
-from typing import List
-
-from fuel_route.services.geocoding_service import GeocodingService
+from fuel_route.services.fuel_station_import_service import (
+    FuelStationImportService,
+    ImportCheckpoint,
+    RateLimiter,
+)
+from fuel_route.services.geocode_cache import GeocodeCache
 from fuel_route.services.ors_service_client import ORSClient
 
+logger = logging.getLogger(__name__)
+
 
 class Command(BaseCommand):
     help = 'Import fuel stations from a CSV file'
-    ors_client: ORSClient = ORSClient()
 
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent geocoding requests')
+        parser.add_argument(
+            '--rate', type=float, default=5, help='Maximum geocoding requests per second (0 disables the limit)'
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows written per upsert')
+        parser.add_argument(
+            '--checkpoint', type=str, default=None, help='Checkpoint file (defaults to <csv_file>.checkpoint)'
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
 
     def handle(self, *args, **options):
         csv_file_path = options['csv_file']
-        fuel_stations = self.read_csv(csv_file_path)
-        self.import_fuel_stations(fuel_stations)
-        self.stdout.write(self.style.SUCCESS(f'Successfully imported {len(fuel_stations)} fuel stations'))
-        self.saved_records = FuelStationModel.objects.all()
-
-
-    def read_csv(self, file_path: str) -> List[FuelStation]:
-        fuel_stations = []
-        geolocator = Nominatim(user_agent="spotter-test")
-
-        geocoding_service = GeocodingService()
-        with (open(file_path, 'r') as csvfile):
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if FuelStationModel.objects.filter(opis_id=row['OPIS Truckstop ID']).exists():
-                    print(f"Fuel station with OPIS ID {row['OPIS Truckstop ID']} already exists")
+        self.ors_client = ORSClient()
+        self.geocode_cache = self.ors_client.geocode_cache or GeocodeCache.default()
+        self.rate_limiter = RateLimiter(options['rate'])
+        checkpoint = ImportCheckpoint(options['checkpoint'] or f"{csv_file_path}.checkpoint")
+
+        _resume_from = 0 if options['restart'] else checkpoint.load()
+        if _resume_from:
+            self.stdout.write(f"Resuming after row {_resume_from}")
+        _existing_ids = FuelStationImportService.existing_opis_ids()
+
+        _start = time.perf_counter()
+        _rows_read = _imported = _failed = 0
+        with open(csv_file_path, 'r') as csvfile, ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for _batch_start, rows in FuelStationImportService.batches(csv.DictReader(csvfile), options['batch_size']):
+                _rows_read = _batch_start + len(rows)
+                if _rows_read <= _resume_from:
                     continue
 
-                time.sleep(0.3)
-                # formatted_address = geocoding_service.format_address(
-                #     row['Address'], row['City'], row['State']
-                # )
-                # print(f"Geocoding: {formatted_address}")
-                # coords = geocoding_service.geocode(formatted_address)
-                address = f"{row['Address']}, {row['City']}, {row['State']}"
-                try:
-                    coords = self.ors_client.geocode(address)
-                except Exception as e:
-                    print(f"Couldn't geocode: {address}")
-                    continue
-
-                if coords:
-                    print(f"Geocoded: {address}, {coords}")
-                    lat = coords.lat
-                    lon = coords.lon
-                    fuel_station = FuelStation(
-                        opis_id=int(row['OPIS Truckstop ID']),
-                        truckstop_name=row['Truckstop Name'],
-                        address=row['Address'],
-                        city=row['City'],
-                        state=row['State'],
-                        rack_id=int(row['Rack ID']),
-                        location=Point(lon, lat),
-                        retail_price=float(row['Retail Price']),
-                        id=None
-                    )
-                    self.import_fuel_stations(fuel_station)
-                    fuel_stations.append(fuel_station)
-                else:
-                    print(f"Couldn't geocode: {address}")
-
-        return fuel_stations
-
-    @transaction.atomic
-    def import_fuel_stations(self, fuel_station: FuelStation):
-        FuelStationModel.objects.update_or_create(
-            opis_id=fuel_station.opis_id,
-            location=fuel_station.location,
-            defaults={
-                'truckstop_name': fuel_station.truckstop_name,
-                'address': fuel_station.address,
-                'city': fuel_station.city,
-                'state': fuel_station.state,
-                'rack_id': fuel_station.rack_id,
-                'retail_price': fuel_station.retail_price
-            }
+                pending: List[FuelStation] = []
+                for _row_number, row in enumerate(rows, _batch_start):
+                    if _row_number < _resume_from:
+                        continue
+                    station = FuelStationImportService.parse_row(row)
+                    if station.opis_id in _existing_ids:
+                        continue
+                    _existing_ids.add(station.opis_id)
+                    pending.append(station)
+
+                _addresses = {FuelStationImportService.format_address(station) for station in pending}
+                _located = self.geocode_cache.lookup_many(self.ors_client.geocode_provider, _addresses)
+                _uncached = [address for address in _addresses if address not in _located]
+                _geocoded = {
+                    address: lat_lon
+                    for address, lat_lon in zip(_uncached, executor.map(self._geocode, _uncached))
+                    if lat_lon is not None
+                }
+                self.geocode_cache.store_many(self.ors_client.geocode_provider, _geocoded)
+                _located.update(_geocoded)
+
+                located = []
+                for station in pending:
+                    _lat_lon = _located.get(FuelStationImportService.format_address(station))
+                    if _lat_lon is None:
+                        continue
+                    station.location = Point(_lat_lon[1], _lat_lon[0], srid=4326)
+                    located.append(station)
+                _imported += FuelStationImportService.upsert_stations(located)
+                _failed += len(pending) - len(located)
+                checkpoint.save(_rows_read, imported=_imported, failed=_failed)
+
+                self.stdout.write(
+                    f"{_rows_read} rows read, {_imported} imported, {_failed} not geocoded, "
+                    f"{FuelStationImportService.rows_per_second(_rows_read - _resume_from, _start):.1f} rows/s"
+                )
+
+        checkpoint.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully imported {_imported} fuel stations from {_rows_read - _resume_from} rows '
+            f'in {time.perf_counter() - _start:.1f}s '
+            f'({FuelStationImportService.rows_per_second(_rows_read - _resume_from, _start):.1f} rows/s)'
+        ))
+        _stats = self.geocode_cache.stats.as_dict()
+        self.stdout.write(
+            f"Geocode cache: {_stats['memory_hits'] + _stats['shared_hits']} hits, {_stats['misses']} misses"
         )
-        print(f"Imported fuel station: {fuel_station.truckstop_name}")
-
-
-    def geocode(self, geolocator, address, max_attempts=3):
-        for attempt in range(max_attempts):
-            try:
-                return geolocator.geocode(address, timeout=10)
-            except (GeocoderTimedOut, GeocoderServiceError):
-                if attempt == max_attempts - 1:
-                    return None
-                time.sleep(1)
\ No newline at end of file
+        _connections = self.ors_client.connection_stats
+        if _connections:
+            self.stdout.write(
+                f"ORS connections: {_connections['requests']} requests over {_connections['connections_opened']} "
+                f"connections, {_connections['retries']} retries ({_connections['throttled']} throttled)"
+            )
+
+    def _geocode(self, address: str) -> Optional[Tuple[float, float]]:
+        """
+        Runs on the worker threads, which only talk to the geocoder; cache reads
+        and writes stay on the main thread's database connection.
+        """
+        self.rate_limiter.acquire()
+        try:
+            coords = self.ors_client.geocode(address, use_cache=False)
+        except Exception as e:
+            logger.warning(f"Couldn't geocode: {address} ({e})")
+            return None
+        return coords.lat, coords.lon
@@ -1,57 +1,161 @@
-import csv
 import asyncio
-from django.core.management.base import BaseCommand
-from django.contrib.gis.geos import Point
-from fuel_route.data.models import FuelStationModel
-from fuel_route.services.async_geocoding_service import AsyncGeocodingService
+import csv
 import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand
+
+from fuel_route.data.data_types import FuelStation
+from fuel_route.services.async_ors_client import AsyncORSClient
+from fuel_route.services.fuel_station_import_service import FuelStationImportService, RateLimiter
+from fuel_route.services.geocode_cache import GeocodeCache
+from fuel_route.services.ors_service_client import ORSClient
 
 logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
-    help = 'Import fuel stations from CSV file'
+    help = 'Import fuel stations from a CSV file with asyncio'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', type=str, help='Path to the CSV file')
+        parser.add_argument('--concurrency', type=int, default=32, help='Maximum geocoding requests in flight')
+        parser.add_argument(
+            '--rate', type=float, default=0, help='Maximum geocoding requests per second (0 disables the limit)'
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows written per upsert')
 
     def handle(self, *args, **options):
-        asyncio.run(self.async_import())
-
-    async def async_import(self):
-        geocoding_service = AsyncGeocodingService()
-        tasks = []
-
-        with open('fuel-prices-for-be-assessment_short.csv', 'r') as file:
-            reader = csv.DictReader(file)
-            async with geocoding_service.geolocator as geolocator:
-                for row in reader:
-                    formatted_address = geocoding_service.format_address(
-                        row['Address'], row['City'], row['State']
+        asyncio.run(self.async_import(
+            options['csv_file'], options['concurrency'], options['rate'], options['batch_size']
+        ))
+
+    async def async_import(self, csv_file_path: str, concurrency: int, rate: float, batch_size: int):
+        """
+        Reads the CSV in batches, resolves cached addresses with one query per batch
+        and geocodes the rest with at most ``concurrency`` requests in flight.
+
+        Located stations go through a bounded queue to a single writer task, which
+        upserts them ``batch_size`` at a time, so geocoding never waits on the
+        database and the database never sees one-row writes.
+        """
+        self.geocode_cache = GeocodeCache.default()
+        self.geocode_provider = ORSClient.ors_geocode_provider(settings.OPENROUTESERVICE_BASE_URL)
+        self.rate_limiter = RateLimiter(rate)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self._failed = 0
+        self._writer_error: Optional[Exception] = None
+        queue: asyncio.Queue = asyncio.Queue(maxsize=batch_size * 2)
+        _existing_ids = await sync_to_async(FuelStationImportService.existing_opis_ids)()
+
+        _start = time.perf_counter()
+        _rows_read = 0
+        writer = asyncio.create_task(self._write_batches(queue, batch_size))
+        tasks = set()
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrency)) as session:
+            client = AsyncORSClient(session)
+            with open(csv_file_path, 'r') as csvfile:
+                for _, rows in FuelStationImportService.batches(csv.DictReader(csvfile), batch_size):
+                    if self._writer_error is not None:
+                        break
+                    _rows_read += len(rows)
+                    pending: Dict[str, List[FuelStation]] = defaultdict(list)
+                    for row in rows:
+                        station = FuelStationImportService.parse_row(row)
+                        if station.opis_id in _existing_ids:
+                            continue
+                        _existing_ids.add(station.opis_id)
+                        pending[FuelStationImportService.format_address(station)].append(station)
+
+                    _located = await sync_to_async(self.geocode_cache.lookup_many)(self.geocode_provider, set(pending))
+                    for address, stations in pending.items():
+                        if address in _located:
+                            await self._enqueue(queue, stations, _located[address])
+                            continue
+                        # Acquire before creating the task, so pending tasks stay bounded too
+                        await self.semaphore.acquire()
+                        task = asyncio.create_task(self._geocode(client, queue, address, stations))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+
+                    self.stdout.write(
+                        f"{_rows_read} rows read, {self._failed} not geocoded, "
+                        f"{FuelStationImportService.rows_per_second(_rows_read, _start):.1f} rows/s"
                     )
-                    task = asyncio.create_task(self.process_row(geocoding_service, row, formatted_address))
-                    tasks.append(task)
 
+            if tasks:
                 await asyncio.gather(*tasks)
+        await queue.put(None)
+        _imported = await writer
 
-        self.stdout.write(self.style.SUCCESS('Successfully imported fuel stations'))
-
-    async def process_row(self, geocoding_service, row, formatted_address):
-        coords = await geocoding_service.geocode(formatted_address)
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully imported {_imported} fuel stations from {_rows_read} rows '
+            f'in {time.perf_counter() - _start:.1f}s '
+            f'({FuelStationImportService.rows_per_second(_rows_read, _start):.1f} rows/s)'
+        ))
 
-        if coords:
-            lat, lon = coords
-            await self.create_fuel_station(row, lat, lon)
-            logger.info(f"Successfully imported: {formatted_address}")
-        else:
-            logger.warning(f"Couldn't geocode: {formatted_address}")
+    async def _geocode(self, client: AsyncORSClient, queue: asyncio.Queue, address: str, stations: List[FuelStation]):
+        try:
+            await self.rate_limiter.acquire_async()
+            try:
+                _lat_lon = await client.geocode(address, use_cache=False)
+            except Exception as e:
+                logger.warning(f"Couldn't geocode: {address} ({e})")
+                self._failed += len(stations)
+                return
+            await self._enqueue(queue, stations, _lat_lon, address=address)
+        finally:
+            self.semaphore.release()
 
     @staticmethod
-    async def create_fuel_station(row, lat, lon):
-        await asyncio.to_thread(
-            FuelStationModel.objects.create,
-            opis_id=int(row['OPIS Truckstop ID']),
-            name=row['Truckstop Name'],
-            address=row['Address'],
-            city=row['City'],
-            state=row['State'],
-            location=Point(lon, lat),
-            price=float(row['Retail Price'])
-        )
\ No newline at end of file
+    async def _enqueue(
+        queue: asyncio.Queue,
+        stations: List[FuelStation],
+        lat_lon: Tuple[float, float],
+        address: Optional[str] = None,
+    ):
+        """
+        ``address`` is only set for fresh geocodes, which the writer also stores in
+        the geocode cache.
+        """
+        for station in stations:
+            station.location = Point(lat_lon[1], lat_lon[0], srid=4326)
+        await queue.put((stations, address, lat_lon))
+
+    async def _write_batches(self, queue: asyncio.Queue, batch_size: int) -> int:
+        """
+        Consumes the queue until the ``None`` sentinel. After a failed write it
+        keeps draining the queue, so producers never block, and re-raises the
+        error once the sentinel arrives.
+        """
+        _imported = 0
+        batch: List[FuelStation] = []
+        geocoded: Dict[str, Tuple[float, float]] = {}
+        while True:
+            _item = await queue.get()
+            if _item is not None and self._writer_error is None:
+                stations, address, lat_lon = _item
+                batch.extend(stations)
+                if address is not None:
+                    geocoded[address] = lat_lon
+            if batch and (_item is None or len(batch) >= batch_size):
+                try:
+                    _imported += await sync_to_async(self._flush)(batch, geocoded)
+                except Exception as e:
+                    logger.error(f"Failed to write {len(batch)} fuel stations: {e}")
+                    self._writer_error = e
+                batch, geocoded = [], {}
+            if _item is None:
+                if self._writer_error is not None:
+                    raise self._writer_error
+                return _imported
+
+    def _flush(self, stations: List[FuelStation], geocoded: Dict[str, Tuple[float, float]]) -> int:
+        self.geocode_cache.store_many(self.geocode_provider, geocoded)
+        return FuelStationImportService.upsert_stations(stations)
@@ -0,0 +1,61 @@
+import asyncio
+import csv
+from typing import List, Tuple
+
+from django.core.management.base import BaseCommand
+
+from fuel_route.benchmarks.load import lane_mix, run_load
+
+
+class Command(BaseCommand):
+    help = 'Load test a route-planning endpoint and report throughput and latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'url', type=str, help='Endpoint to load, e.g. http://127.0.0.1:8000/api/async/optimal-route/'
+        )
+        parser.add_argument('--requests', type=int, default=200, help='Total requests')
+        parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight')
+        parser.add_argument(
+            '--lanes', type=str, default=None,
+            help='CSV with start and end columns; the regional and long-haul benchmark lane mix by default',
+        )
+        parser.add_argument(
+            '--jitter', type=float, default=0.0,
+            help='Random offset in degrees added to the endpoints of non-repeat requests, to defeat the caches',
+        )
+        parser.add_argument(
+            '--repeat-share', type=float, default=0.0, help='Share of requests sent for a lane exactly, without jitter'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the lane mix')
+        parser.add_argument(
+            '--server-workers', type=int, default=1, help='Worker processes of the server, to report per-worker rates'
+        )
+
+    def handle(self, *args, **options):
+        _lanes = self._load_lanes(options['lanes']) if options['lanes'] else None
+        _payloads = lane_mix(
+            options['requests'], _lanes, repeat_share=options['repeat_share'], jitter=options['jitter'],
+            seed=options['seed'],
+        )
+        result = asyncio.run(run_load(options['url'], _payloads, options['concurrency']))
+
+        _ok = result.statuses.get(200, 0)
+        self.stdout.write(
+            f"{len(result.latencies)} requests in {result.elapsed:.2f}s, concurrency {options['concurrency']}"
+        )
+        self.stdout.write(f"  statuses: {dict(sorted(result.statuses.items(), key=lambda item: str(item[0])))}")
+        self.stdout.write(
+            f"  throughput: {result.throughput:.1f} req/s, "
+            f"{result.throughput / options['server_workers']:.1f} req/s per worker "
+            f"({_ok / result.elapsed if result.elapsed else 0.0:.1f} successful req/s)"
+        )
+        self.stdout.write(
+            f"  latency ms: p50 {result.percentile_ms(50):.0f}, p95 {result.percentile_ms(95):.0f}, "
+            f"p99 {result.percentile_ms(99):.0f}, max {result.percentile_ms(100):.0f}"
+        )
+
+    @staticmethod
+    def _load_lanes(path: str) -> List[Tuple[str, str]]:
+        with open(path, 'r') as lanes_file:
+            return [(row['start'], row['end']) for row in csv.DictReader(lanes_file)]
@@ -0,0 +1,132 @@
+import asyncio
+import json
+from typing import List, Optional
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from fuel_route.benchmarks.load import WORKER_CLASSES, GunicornServer, lane_mix, run_load
+from fuel_route.benchmarks.mock_services import MockORSServer
+from fuel_route.benchmarks.routes import LANES, REGIONAL_LANES
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve the app with gunicorn per worker class and worker count against a local mock ORS, load it with '
+        'the benchmark lane mix and report throughput and p50/p95/p99 latency against a latency SLO'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--worker-classes', type=str, nargs='+', default=list(WORKER_CLASSES), choices=list(WORKER_CLASSES),
+        )
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='Worker process counts')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gthread worker')
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[8, 32], help='Requests in flight, per run'
+        )
+        parser.add_argument('--requests', type=int, default=200, help='Requests per run')
+        parser.add_argument('--path', type=str, default='/api/optimal-route/', help='Endpoint to load')
+        parser.add_argument('--mock-latency-ms', type=float, default=50, help='Delay of every mock ORS response')
+        parser.add_argument(
+            '--repeat-share', type=float, default=0.5,
+            help='Share of requests for a lane seen before, served from the route result cache',
+        )
+        parser.add_argument(
+            '--no-result-cache', action='store_true',
+            help='Serve without the route result cache, so repeats only skip directions and corridor work',
+        )
+        parser.add_argument('--jitter', type=float, default=0.05, help='Offset in degrees of non-repeat requests')
+        parser.add_argument('--slo-p95-ms', type=float, default=2000, help='p95 latency target')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the lane mix')
+        parser.add_argument('--output', type=str, default=None, help='JSON file to write the results to')
+
+    def handle(self, *args, **options):
+        _url_path = options['path']
+        _results = []
+        with MockORSServer(options['mock_latency_ms']) as mock_ors:
+            _env = {
+                'OPENROUTESERVICE_BASE_URL': mock_ors.base_url,
+                'ROUTING_BACKEND': 'ors',
+                'ROUTING_BACKEND_URL': '',
+                'TRACE_DEBUG_HEADER': 'False',
+                'ROUTE_RESULT_CACHE_ENABLED': str(not options['no_result_cache']),
+            }
+            self.stdout.write(
+                f"{'class':>8} {'workers':>8} {'conc':>5} {'req/s':>7} {'/worker':>8} {'ok':>5} "
+                f"{'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'SLO':>4}"
+            )
+            for worker_class in options['worker_classes']:
+                for workers in options['workers']:
+                    try:
+                        server = GunicornServer(worker_class, workers, threads=options['threads'], env=_env)
+                        server.start()
+                    except RuntimeError as e:
+                        raise CommandError(f"{worker_class} x {workers}: {e}")
+                    try:
+                        _url = f"{server.base_url}{_url_path}"
+                        # Every exact lane once, so repeat requests find the caches warm in every configuration
+                        asyncio.run(run_load(
+                            _url, [{'start': _start, 'end': _end} for _start, _end in REGIONAL_LANES + LANES],
+                            workers,
+                        ))
+                        for concurrency in options['concurrency']:
+                            # A seed per run, so no jittered lane is ever a repeat of an earlier run's
+                            _payloads = lane_mix(
+                                options['requests'], repeat_share=options['repeat_share'], jitter=options['jitter'],
+                                seed=f"{options['seed']}-{worker_class}-{workers}-{concurrency}",
+                            )
+                            result = asyncio.run(run_load(_url, _payloads, concurrency))
+                            _row = dict(
+                                result.as_dict(), worker_class=worker_class, workers=workers, concurrency=concurrency,
+                                threads=options['threads'] if worker_class == 'gthread' else 1,
+                            )
+                            _row['meets_slo'] = (
+                                _row['p95_ms'] <= options['slo_p95_ms'] and _row['ok'] == _row['requests']
+                            )
+                            _results.append(_row)
+                            self._write_row(_row)
+                    finally:
+                        server.stop()
+
+        _best = self._best(_results)
+        if _best is None:
+            self.stdout.write(f"No configuration served every request within p95 {options['slo_p95_ms']:.0f} ms")
+        else:
+            self.stdout.write(
+                f"Best within p95 {options['slo_p95_ms']:.0f} ms: {_best['worker_class']} x {_best['workers']} "
+                f"at concurrency {_best['concurrency']}, {_best['throughput'] / _best['workers']:.1f} req/s per worker"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(
+                    {
+                        'created_at': timezone.now().isoformat(),
+                        'path': _url_path,
+                        'mock_latency_ms': options['mock_latency_ms'],
+                        'repeat_share': options['repeat_share'],
+                        'result_cache': not options['no_result_cache'],
+                        'slo_p95_ms': options['slo_p95_ms'],
+                        'results': _results,
+                    },
+                    output_file, indent=2,
+                )
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def _write_row(self, row: dict) -> None:
+        self.stdout.write(
+            f"{row['worker_class']:>8} {row['workers']:>8} {row['concurrency']:>5} {row['throughput']:>7.1f} "
+            f"{row['throughput'] / row['workers']:>8.1f} {row['ok']:>5} {row['p50_ms']:>7.0f} {row['p95_ms']:>7.0f} "
+            f"{row['p99_ms']:>7.0f} {'yes' if row['meets_slo'] else 'no':>4}"
+        )
+
+    @staticmethod
+    def _best(results: List[dict]) -> Optional[dict]:
+        """
+        Run with the most throughput per worker among those meeting the SLO,
+        the figure deployments are sized by.
+        """
+        _within = [_row for _row in results if _row['meets_slo']]
+        if not _within:
+            return None
+        return max(_within, key=lambda row: row['throughput'] / row['workers'])
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fuel_route.data.exceptions import InvalidPriceFileException
+from fuel_route.services.fuel_station_import_service import FuelStationImportService
+
+
+class Command(BaseCommand):
+    help = 'Refresh fuel station retail prices from an OPIS CSV file, without geocoding'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', type=str, help='Path to the CSV file')
+
+    def handle(self, *args, **options):
+        _start = time.perf_counter()
+        with open(options['csv_file'], 'r', newline='') as csvfile:
+            try:
+                result = FuelStationImportService.refresh_prices(csvfile)
+            except InvalidPriceFileException as e:
+                raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {result.updated} of {result.matched} matched stations from {result.staged_rows} rows "
+            f"in {time.perf_counter() - _start:.2f}s"
+        ))
+        if result.updated:
+            self.stdout.write(
+                "Bumped the station table generation: every worker reloads its station index "
+                "on its next check and stops serving cached routes planned on the old prices"
+            )
+        if result.skipped_rows:
+            self.stdout.write(self.style.WARNING(
+                f"Skipped {result.skipped_rows} rows with a blank or non-numeric OPIS id or price"
+            ))
+        if result.unknown:
+            self.stdout.write(self.style.WARNING(
+                f"{result.unknown} OPIS ids are not imported yet, run import_fuel_stations to add them"
+            ))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from fuel_route.benchmarks.mock_services import MockORSServer
+
+
+class Command(BaseCommand):
+    help = 'Serve mock openrouteservice geocoding and directions endpoints for load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8010)
+        parser.add_argument('--latency-ms', type=float, default=50, help='Delay before every response')
+
+    def handle(self, *args, **options):
+        with MockORSServer(options['latency_ms'], host=options['host'], port=options['port']) as server:
+            self.stdout.write(
+                f"Mock ORS listening on {server.base_url}, start the app with OPENROUTESERVICE_BASE_URL={server.base_url}"
+            )
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                self.stdout.write(f"Served {server.requests} requests")
@@ -0,0 +1,61 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fuel_route.data.enums import VehicleProfile
+from fuel_route.data.serializers import LocationField
+from fuel_route.services.directions_cache import DirectionsCache
+from fuel_route.services.ors_service_client import ORSClient
+
+
+class Command(BaseCommand):
+    help = 'Warm the ORS directions cache from a CSV of lanes with "start" and "end" columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('lanes_file', type=str, help='CSV file with start and end columns')
+        parser.add_argument(
+            '--profile', type=str, default=VehicleProfile.TRUCK.value, help='ORS routing profile'
+        )
+        parser.add_argument(
+            '--refresh', action='store_true', help='Fetch every lane again even if it is cached'
+        )
+        parser.add_argument(
+            '--purge-expired', action='store_true', help='Delete expired entries before warming'
+        )
+
+    def handle(self, *args, **options):
+        cache = DirectionsCache.default()
+        ors_client = ORSClient(directions_cache=cache)
+        if options['purge_expired']:
+            self.stdout.write(f"Purged {cache.purge_expired()} expired directions")
+
+        _location_field = LocationField()
+        _warmed = 0
+        with open(options['lanes_file'], 'r') as lanes_file:
+            for row in csv.DictReader(lanes_file):
+                try:
+                    _start, _end = row['start'], row['end']
+                except KeyError:
+                    raise CommandError('The lanes file needs "start" and "end" columns')
+                try:
+                    start = self._coordinates(ors_client, _location_field.to_internal_value(_start))
+                    end = self._coordinates(ors_client, _location_field.to_internal_value(_end))
+                    ors_client.get_directions(
+                        start=start, end=end, vehicle_profile=options['profile'], refresh_cache=options['refresh']
+                    )
+                    _warmed += 1
+                except Exception as e:
+                    self.stderr.write(f"Couldn't warm {_start} -> {_end}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f'Warmed {_warmed} lanes'))
+        for _name, _value in cache.stats.as_dict().items():
+            self.stdout.write(f"  {_name}: {_value}")
+        self.stdout.write("ORS connections:")
+        for _name, _value in ors_client.connection_stats.items():
+            self.stdout.write(f"  {_name}: {_value}")
+
+    @staticmethod
+    def _coordinates(ors_client, location):
+        if isinstance(location, str):
+            return ors_client.geocode(location)
+        return location
@@ -0,0 +1,35 @@
+import asyncio
+
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+from fuel_route.services.tracing import Trace, span, start_trace
+
+
+def _add_timing_header(response, trace: Trace):
+    if settings.TRACE_DEBUG_HEADER:
+        response["Server-Timing"] = trace.server_timing()
+    return response
+
+
+@sync_and_async_middleware
+def tracing_middleware(get_response):
+    """
+    Collects the spans of every request into a trace. With ``TRACE_DEBUG_HEADER``
+    on, the response carries them in a ``Server-Timing`` header, which browser dev
+    tools show next to the request. Streamed responses only carry the spans
+    finished before streaming starts.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            with start_trace() as trace:
+                with span("request"):
+                    response = await get_response(request)
+                return _add_timing_header(response, trace)
+    else:
+        def middleware(request):
+            with start_trace() as trace:
+                with span("request"):
+                    response = get_response(request)
+                return _add_timing_header(response, trace)
+    return middleware
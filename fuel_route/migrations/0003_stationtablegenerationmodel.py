@@ -0,0 +1,21 @@
+# Generated by Django 3.2.23 on 2026-10-18 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fuel_route', '0002_auto_20241011_1220'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StationTableGenerationModel',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('generation', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
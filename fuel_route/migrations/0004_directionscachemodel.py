@@ -0,0 +1,25 @@
+# Generated by Django 3.2.23 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fuel_route', '0003_stationtablegenerationmodel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirectionsCacheModel',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('profile', models.CharField(max_length=32)),
+                ('coordinates', models.JSONField()),
+                ('response', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
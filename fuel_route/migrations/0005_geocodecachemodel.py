@@ -0,0 +1,28 @@
+# Generated by Django 3.2.23 on 2026-10-18 16:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fuel_route', '0004_directionscachemodel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCacheModel',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('provider', models.CharField(max_length=32)),
+                ('query', models.CharField(max_length=512)),
+                ('lat', models.FloatField()),
+                ('lon', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='geocodecachemodel',
+            constraint=models.UniqueConstraint(fields=('provider', 'query'), name='unique_geocode_provider_query'),
+        ),
+    ]
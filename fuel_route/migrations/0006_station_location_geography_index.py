@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    GiST index on ``location::geography`` for the ``ST_DWithin`` corridor search of
+    ``FuelStationService.get_stations_along_route``. Expression indexes can't be
+    declared on the model in this Django version, so it is created in SQL.
+    """
+
+    dependencies = [
+        ('fuel_route', '0005_geocodecachemodel'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=(
+                'CREATE INDEX IF NOT EXISTS fuel_route_station_location_geog_gist '
+                'ON fuel_route_fuelstationmodel USING GIST ((location::geography));'
+            ),
+            reverse_sql='DROP INDEX IF EXISTS fuel_route_station_location_geog_gist;',
+        ),
+    ]
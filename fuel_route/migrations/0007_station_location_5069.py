@@ -0,0 +1,56 @@
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Stored EPSG:5069 copy of ``location``, so the corridor query measures and
+    locates stations in meters without transforming every row. A trigger keeps it
+    in sync with ``location`` for every writer, bulk writes included.
+
+    Also drops the B-tree index on ``location``: the spatial GiST index Django
+    creates for the field is the one spatial lookups can use.
+    """
+
+    dependencies = [
+        ('fuel_route', '0006_station_location_geography_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fuelstationmodel',
+            name='location_5069',
+            field=django.contrib.gis.db.models.fields.PointField(editable=False, null=True, srid=5069),
+        ),
+        migrations.RunSQL(
+            sql=[
+                """
+                CREATE OR REPLACE FUNCTION fuel_route_station_location_5069() RETURNS trigger AS $$
+                BEGIN
+                    NEW.location_5069 := ST_Transform(NEW.location, 5069);
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+                """,
+                """
+                CREATE TRIGGER fuel_route_station_location_5069
+                BEFORE INSERT OR UPDATE OF location ON fuel_route_fuelstationmodel
+                FOR EACH ROW EXECUTE PROCEDURE fuel_route_station_location_5069();
+                """,
+                'UPDATE fuel_route_fuelstationmodel SET location_5069 = ST_Transform(location, 5069);',
+            ],
+            reverse_sql=[
+                'DROP TRIGGER IF EXISTS fuel_route_station_location_5069 ON fuel_route_fuelstationmodel;',
+                'DROP FUNCTION IF EXISTS fuel_route_station_location_5069();',
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='fuelstationmodel',
+            name='fuel_route__locatio_194c86_idx',
+        ),
+        migrations.AlterField(
+            model_name='fuelstationmodel',
+            name='rack_id',
+            field=models.IntegerField(),
+        ),
+    ]
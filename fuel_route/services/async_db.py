@@ -0,0 +1,19 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def database_sync_to_async(function):
+    """
+    ``sync_to_async`` for ORM work called from async views.
+
+    Runs on the thread pool rather than the single thread-sensitive thread, so
+    concurrent requests don't queue behind each other's queries, and closes the
+    thread's expired connections afterwards like the end of a sync request would.
+    """
+    def _run(*args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(_run, thread_sensitive=False)
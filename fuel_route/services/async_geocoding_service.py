@@ -1,16 +1,27 @@
+from django.conf import settings
 from geopy.geocoders import Nominatim
 from geopy.adapters import AioHTTPAdapter
 from typing import Optional, Tuple
 import logging
 
+from fuel_route.services.geocode_cache import GeocodeCache
+
 logger = logging.getLogger(__name__)
 
 
 class AsyncGeocodingService:
-    def __init__(self):
+    def __init__(self, geocode_cache: Optional[GeocodeCache] = None):
         self.geolocator = Nominatim(user_agent="fuel_route_app", adapter_factory=AioHTTPAdapter)
+        if geocode_cache is None and settings.GEOCODE_CACHE_ENABLED:
+            geocode_cache = GeocodeCache.default()
+        self.geocode_cache = geocode_cache
 
     async def geocode(self, address: str, max_attempts: int = 3) -> Optional[Tuple[float, float]]:
+        if self.geocode_cache is None:
+            return await self._geocode(address, max_attempts)
+        return await self.geocode_cache.resolve_async("nominatim", address, lambda: self._geocode(address, max_attempts))
+
+    async def _geocode(self, address: str, max_attempts: int = 3) -> Optional[Tuple[float, float]]:
         for attempt in range(max_attempts):
             try:
                 location = await self.geolocator.geocode(address)
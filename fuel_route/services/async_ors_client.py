@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import time
+import weakref
+from typing import List, Optional, Tuple
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from fuel_route.data.data_types import Coordinates, DirectionsResponseType
+from fuel_route.data.enums import VehicleProfile
+from fuel_route.data.exceptions import RouteNotFoundException
+from fuel_route.services.async_db import database_sync_to_async
+from fuel_route.services.directions_cache import DirectionsCache
+from fuel_route.services.geocode_cache import GeocodeCache
+from fuel_route.services.ors_service_client import ORSClient
+from fuel_route.services.routing_backends import ORSRoutingBackend, RoutingBackend, get_routing_backend
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncORSClient:
+    """
+    openrouteservice calls over an ``aiohttp.ClientSession``, so every request of
+    an import or a view reuses the same connection pool.
+
+    Uses the same directions and geocode caches as ``ORSClient``; their shared
+    tiers are read and written through ``database_sync_to_async``. Directions go
+    to ``ROUTING_BACKEND_URL`` when ORS is self-hosted, and to the thread pool
+    when another ``ROUTING_BACKEND`` is configured.
+    """
+
+    _sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = (
+        weakref.WeakKeyDictionary()
+    )
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        base_url: Optional[str] = None,
+        key: Optional[str] = None,
+        directions_cache: Optional[DirectionsCache] = None,
+        geocode_cache: Optional[GeocodeCache] = None,
+        routing_backend: Optional[RoutingBackend] = None,
+    ):
+        self.session = session
+        self.base_url = (base_url or settings.OPENROUTESERVICE_BASE_URL).rstrip("/")
+        self.directions_url = (base_url or settings.ROUTING_BACKEND_URL or self.base_url).rstrip("/")
+        self.geocode_provider = ORSClient.ors_geocode_provider(self.base_url)
+        if routing_backend is None and settings.ROUTING_BACKEND != ORSRoutingBackend.name:
+            routing_backend = get_routing_backend(settings.ROUTING_BACKEND)
+        self.routing_backend = routing_backend
+        self.key = key if key is not None else settings.OPENROUTESERVICE_API_KEY
+        if directions_cache is None and settings.DIRECTIONS_CACHE_ENABLED:
+            directions_cache = DirectionsCache.default()
+        if geocode_cache is None and settings.GEOCODE_CACHE_ENABLED:
+            geocode_cache = GeocodeCache.default()
+        self.directions_cache = directions_cache
+        self.geocode_cache = geocode_cache
+
+    @classmethod
+    def shared(cls) -> "AsyncORSClient":
+        """
+        Client on the running event loop's pooled session, created on first use
+        and kept for the life of the loop (one per ASGI worker).
+        """
+        _loop = asyncio.get_running_loop()
+        _session = cls._sessions.get(_loop)
+        if _session is None or _session.closed:
+            _session = cls._sessions[_loop] = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=settings.ORS_ASYNC_POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(total=settings.ORS_ASYNC_TIMEOUT_SECONDS),
+            )
+        return cls(_session)
+
+    @classmethod
+    async def close_shared(cls) -> None:
+        """
+        Closes the pooled session of the running event loop, at worker shutdown
+        or when the loop only lives for one request.
+        """
+        _session = cls._sessions.pop(asyncio.get_running_loop(), None)
+        if _session is not None and not _session.closed:
+            await _session.close()
+
+    async def geocode(self, address: str, use_cache: bool = True) -> Tuple[float, float]:
+        """
+        Same Pelias search as ``ORSClient.geocode``, returning ``(lat, lon)``.
+        Concurrent lookups of the same query on this loop share one search.
+        """
+        if self.geocode_cache is None or not use_cache:
+            return await self._pelias_search(address)
+        return await self.geocode_cache.resolve_async(
+            self.geocode_provider, address, lambda: self._pelias_search(address)
+        )
+
+    async def _pelias_search(self, address: str) -> Tuple[float, float]:
+        _params = {
+            "text": address,
+            "sources": "osm,gn,wof",
+            "layers": "venue,address,street",
+            "boundary.country": "US",
+            "size": 1,
+        }
+        _geocoding_response = await self._request("GET", f"{self.base_url}/geocode/search", params=_params)
+        return ORSClient.parse_pelias_response(address, _geocoding_response)
+
+    async def get_directions(
+        self,
+        start: Coordinates,
+        end: Coordinates,
+        vehicle_profile: VehicleProfile = VehicleProfile.TRUCK.value,
+        output_format: str = "geojson",
+        instructions: bool = False,
+        include_geometry: bool = True,
+    ) -> DirectionsResponseType:
+        return await self._directions(
+            [[start.lon, start.lat], [end.lon, end.lat]],
+            vehicle_profile, output_format, instructions, include_geometry,
+        )
+
+    async def get_directions_from_multipoint(
+        self,
+        route: List[Coordinates],
+        vehicle_profile: VehicleProfile = VehicleProfile.TRUCK.value,
+        output_format: str = "geojson",
+        instructions: bool = False,
+        include_geometry: bool = True,
+    ) -> DirectionsResponseType:
+        return await self._directions(
+            [[coord.lon, coord.lat] for coord in route],
+            vehicle_profile, output_format, instructions, include_geometry,
+        )
+
+    async def _directions(
+        self,
+        coordinates: List[List[float]],
+        vehicle_profile: str,
+        output_format: str,
+        instructions: bool,
+        include_geometry: bool,
+    ) -> DirectionsResponseType:
+        _options = ORSClient.directions_options(output_format, instructions, include_geometry)
+        _backend_name = self.routing_backend.name if self.routing_backend is not None else ORSRoutingBackend.name
+        _cache_key = None
+        if self.directions_cache is not None:
+            _cache_key = self.directions_cache.make_key(
+                coordinates, vehicle_profile, **ORSClient.cache_key_options(_backend_name, _options, self.directions_url)
+            )
+            _directions = self.directions_cache.get_from_memory(_cache_key)
+            if _directions is None:
+                _directions = await database_sync_to_async(self.directions_cache.get_from_shared)(_cache_key)
+            if _directions is not None:
+                return DirectionsResponseType.from_dict(_directions)
+
+        _start = time.perf_counter()
+        if self.routing_backend is not None:
+            _directions = await sync_to_async(self.routing_backend.directions, thread_sensitive=False)(
+                coordinates, vehicle_profile, **_options
+            )
+        else:
+            _directions = await self._ors_directions(coordinates, vehicle_profile, _options)
+        if self.directions_cache is not None:
+            self.directions_cache.record_upstream(time.perf_counter() - _start)
+            await database_sync_to_async(self.directions_cache.set)(
+                _cache_key, coordinates, vehicle_profile, _directions
+            )
+        return DirectionsResponseType.from_dict(_directions)
+
+    async def _ors_directions(self, coordinates: List[List[float]], vehicle_profile: str, options: dict) -> dict:
+        _options = dict(options)
+        _format = _options.pop("format")
+        try:
+            return await self._request(
+                "POST",
+                f"{self.directions_url}/v2/directions/{vehicle_profile}/{_format}",
+                json={"coordinates": coordinates, **_options},
+            )
+        except aiohttp.ClientResponseError as e:
+            if e.status in (400, 404):
+                raise RouteNotFoundException(f"No route between {coordinates[0]} and {coordinates[-1]}: {e.message}")
+            raise
+
+    async def _request(self, method: str, url: str, **kwargs) -> dict:
+        async with self.session.request(
+            method, url, headers={"Authorization": self.key}, **kwargs
+        ) as response:
+            response.raise_for_status()
+            return await response.json()
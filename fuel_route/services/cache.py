@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, fields
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+@dataclass
+class CacheStats:
+    """
+    Thread-safe counters for a cache: hits per tier, misses, lookups that waited
+    on an identical in-flight call, and the time spent on lookups and on the
+    upstream calls that filled the misses.
+    """
+    memory_hits: int = 0
+    shared_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    lookup_seconds: float = 0.0
+    upstream_calls: int = 0
+    upstream_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, **increments) -> None:
+        with self._lock:
+            for _name, _value in increments.items():
+                setattr(self, _name, getattr(self, _name) + _value)
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.shared_hits
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            _stats = {_field.name: getattr(self, _field.name) for _field in fields(self) if _field.repr}
+        _lookups = _stats["memory_hits"] + _stats["shared_hits"] + _stats["misses"]
+        _stats["hit_ratio"] = (_stats["memory_hits"] + _stats["shared_hits"]) / _lookups if _lookups else 0.0
+        _stats["avg_lookup_ms"] = _stats["lookup_seconds"] * 1000 / _lookups if _lookups else 0.0
+        _stats["avg_upstream_ms"] = (
+            _stats["upstream_seconds"] * 1000 / _stats["upstream_calls"] if _stats["upstream_calls"] else 0.0
+        )
+        return _stats
+
+
+class TTLLRUCache:
+    """
+    Bounded in-memory cache with per-entry expiry and least-recently-used eviction.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            _entry = self._entries.get(key)
+            if _entry is None:
+                return None
+            _expires_at, _value = _entry
+            if _expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return _value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: float = None) -> None:
+        _ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (time.monotonic() + _ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the
+    function, every other caller waits for its result (or its exception).
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, function: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Returns the result and whether it was shared with another caller.
+        """
+        with self._lock:
+            _flight = self._flights.get(key)
+            _leader = _flight is None
+            if _leader:
+                _flight = self._flights[key] = _Flight()
+
+        if not _leader:
+            _flight.event.wait()
+            if _flight.error is not None:
+                raise _flight.error
+            return _flight.result, True
+
+        try:
+            _flight.result = function()
+            return _flight.result, False
+        except BaseException as e:
+            _flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            _flight.event.set()
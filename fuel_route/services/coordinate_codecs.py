@@ -0,0 +1,94 @@
+import base64
+
+import numpy as np
+
+# Decimal places kept by the compact formats, 5 is the Google polyline standard (~1 m)
+COORDINATES_PRECISION = 5
+
+COORDINATE_FORMATS = ("json", "polyline", "delta", "none")
+
+# 5-bit chunks needed for any zigzag-encoded 32-bit value
+_MAX_CHUNKS = 7
+
+
+def _scaled(coordinates, precision: int) -> np.ndarray:
+    """
+    ``(n, 2)`` lon/lat vertices as int64 multiples of ``10 ** -precision``.
+    """
+    _coordinates = np.asarray(coordinates, dtype=float)
+    if not len(_coordinates):
+        return np.zeros((0, 2), dtype=np.int64)
+    _coordinates = _coordinates[:, :2]
+    return np.round(_coordinates * 10 ** precision).astype(np.int64)
+
+
+def encode_polyline(coordinates, precision: int = COORDINATES_PRECISION) -> str:
+    """
+    Google encoded polyline of lon/lat ``coordinates`` (the format stores
+    lat/lon), built for all vertices at once instead of one character at a time.
+    """
+    _scaled_coordinates = _scaled(coordinates, precision)
+    if not len(_scaled_coordinates):
+        return ""
+    _deltas = np.diff(_scaled_coordinates[:, ::-1], axis=0, prepend=0).ravel()
+    _zigzag = ((_deltas << 1) ^ (_deltas >> 63)).astype(np.uint64)
+
+    _shifts = np.arange(_MAX_CHUNKS, dtype=np.uint64) * np.uint64(5)
+    _chunks = (_zigzag[:, None] >> _shifts) & np.uint64(0x1F)
+    # Every value takes chunks up to its highest non-zero one, and at least one
+    _lengths = np.maximum(_MAX_CHUNKS - np.argmax((_chunks != 0)[:, ::-1], axis=1), 1)
+    _lengths[_zigzag == 0] = 1
+    _positions = np.arange(_MAX_CHUNKS)
+    _continued = _positions[None, :] < (_lengths - 1)[:, None]
+    _chunks = _chunks | (_continued.astype(np.uint64) << np.uint64(5))
+    _characters = (_chunks + np.uint64(63)).astype(np.uint8)
+    return _characters[_positions[None, :] < _lengths[:, None]].tobytes().decode("ascii")
+
+
+def decode_polyline(polyline: str, precision: int = COORDINATES_PRECISION) -> np.ndarray:
+    """
+    Lon/lat vertices of a Google encoded polyline.
+    """
+    _values = []
+    _value = _shift = 0
+    for _byte in polyline.encode("ascii"):
+        _chunk = _byte - 63
+        _value |= (_chunk & 0x1F) << _shift
+        _shift += 5
+        if _chunk < 0x20:
+            _values.append(~(_value >> 1) if _value & 1 else _value >> 1)
+            _value = _shift = 0
+    _lat_lons = np.cumsum(np.asarray(_values, dtype=np.int64).reshape(-1, 2), axis=0)
+    return _lat_lons[:, ::-1] / 10 ** precision
+
+
+def encode_delta(coordinates, precision: int = COORDINATES_PRECISION) -> str:
+    """
+    Base64 of little-endian int32 ``lon, lat`` pairs: the first vertex in
+    ``10 ** -precision`` degrees, every following one as the difference to the
+    previous vertex.
+    """
+    _scaled_coordinates = _scaled(coordinates, precision)
+    _deltas = np.diff(_scaled_coordinates, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+    return base64.b64encode(_deltas.astype("<i4").tobytes()).decode("ascii")
+
+
+def decode_delta(encoded: str, precision: int = COORDINATES_PRECISION) -> np.ndarray:
+    _deltas = np.frombuffer(base64.b64decode(encoded), dtype="<i4").reshape(-1, 2)
+    return np.cumsum(_deltas, axis=0, dtype=np.int64) / 10 ** precision
+
+
+def encode_coordinates(coordinates, coordinates_format: str) -> dict:
+    """
+    Response fields carrying ``coordinates`` in ``coordinates_format``.
+    """
+    if coordinates_format == "json":
+        return {"coordinates": coordinates}
+    if coordinates_format == "none":
+        return {"coordinates_format": "none"}
+    _encode = encode_polyline if coordinates_format == "polyline" else encode_delta
+    return {
+        "coordinates": _encode(coordinates),
+        "coordinates_format": coordinates_format,
+        "coordinates_precision": COORDINATES_PRECISION,
+    }
@@ -0,0 +1,108 @@
+import dataclasses
+import hashlib
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from fuel_route.data.data_types import StationCorridor
+from fuel_route.data.models import StationTableGenerationModel
+from fuel_route.services.cache import CacheStats, TTLLRUCache
+
+
+class CorridorCache:
+    """
+    Corridors of repeat lanes, keyed on a hash of the route geometry and the
+    corridor width: a per-worker memory tier in front of the shared
+    ``ROUTE_CACHE_ALIAS`` cache.
+
+    Entries are the corridor arrays only (station ids, offsets, distances and
+    prices), the chosen stops are loaded by id. Keys include the station table
+    generation, so any import or price refresh leaves the old entries behind.
+    """
+
+    _default: Optional["CorridorCache"] = None
+    _default_lock = threading.Lock()
+
+    # Decimal places of the route vertices hashed into the key (5 ~ 1 m)
+    PRECISION = 5
+
+    def __init__(self, ttl_seconds: float, max_entries: int, shared_cache=None):
+        self.ttl_seconds = ttl_seconds
+        self.memory = TTLLRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.shared = shared_cache if shared_cache is not None else caches[settings.ROUTE_CACHE_ALIAS]
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._checked_at: Optional[float] = None
+
+    @classmethod
+    def default(cls) -> "CorridorCache":
+        _default = cls._default
+        if _default is None:
+            with cls._default_lock:
+                _default = cls._default
+                if _default is None:
+                    _default = cls._default = cls(
+                        ttl_seconds=settings.CORRIDOR_CACHE_TTL_SECONDS,
+                        max_entries=settings.CORRIDOR_CACHE_MAX_ENTRIES,
+                    )
+        return _default
+
+    def make_key(self, route_coords, total_distance: float, max_distance_km: float, source: str) -> str:
+        _digest = hashlib.sha256(np.round(np.asarray(route_coords, dtype=float), self.PRECISION).tobytes())
+        _digest.update(f"{round(total_distance, 3)}:{max_distance_km}:{source}".encode())
+        return f"corridor:{self.generation()}:{_digest.hexdigest()}"
+
+    def generation(self) -> int:
+        """
+        Station table generation, read at most every ``STATION_INDEX_CHECK_SECONDS``
+        like the station index does.
+        """
+        with self._lock:
+            _now = time.monotonic()
+            if self._checked_at is None or _now - self._checked_at >= settings.STATION_INDEX_CHECK_SECONDS:
+                self._generation = StationTableGenerationModel.current()
+                self._checked_at = _now
+            return self._generation
+
+    def recheck_generation(self) -> None:
+        """
+        Reads the generation again on the next key, once a corridor turned out stale.
+        """
+        with self._lock:
+            self._checked_at = None
+
+    def get(self, key: str) -> Optional[StationCorridor]:
+        _start = time.perf_counter()
+        corridor = self.memory.get(key)
+        if corridor is not None:
+            self.stats.record(memory_hits=1, lookup_seconds=time.perf_counter() - _start)
+            return corridor
+
+        corridor = self.shared.get(key)
+        if corridor is not None:
+            self.memory.set(key, corridor)
+            self.stats.record(shared_hits=1, lookup_seconds=time.perf_counter() - _start)
+            return corridor
+
+        self.stats.record(misses=1, lookup_seconds=time.perf_counter() - _start)
+        return None
+
+    def set(self, key: str, corridor: StationCorridor) -> None:
+        _compact = dataclasses.replace(corridor, stations=None)
+        self.memory.set(key, _compact)
+        self.shared.set(key, _compact, timeout=self.ttl_seconds)
+
+    def resolve(self, key: str, build: Callable[[], StationCorridor]) -> StationCorridor:
+        corridor = self.get(key)
+        if corridor is not None:
+            return corridor
+        _start = time.perf_counter()
+        corridor = build()
+        self.stats.record(upstream_calls=1, upstream_seconds=time.perf_counter() - _start)
+        self.set(key, corridor)
+        return corridor
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from fuel_route.data.models import DirectionsCacheModel
+from fuel_route.services.cache import CacheStats, TTLLRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class DirectionsCache:
+    """
+    Two-tier cache for raw ORS directions responses: a per-worker TTL/LRU memory
+    tier in front of the ``DirectionsCacheModel`` table shared by every worker.
+    """
+
+    _default: Optional["DirectionsCache"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, ttl_seconds: float, max_entries: int, precision: int):
+        self.ttl_seconds = ttl_seconds
+        self.precision = precision
+        self.memory = TTLLRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.stats = CacheStats()
+
+    @classmethod
+    def default(cls) -> "DirectionsCache":
+        _default = cls._default
+        if _default is None:
+            with cls._default_lock:
+                _default = cls._default
+                if _default is None:
+                    _default = cls._default = cls(
+                        ttl_seconds=settings.DIRECTIONS_CACHE_TTL_SECONDS,
+                        max_entries=settings.DIRECTIONS_CACHE_MAX_ENTRIES,
+                        precision=settings.DIRECTIONS_CACHE_PRECISION,
+                    )
+        return _default
+
+    def make_key(self, coordinates: List[List[float]], profile: str, **options) -> str:
+        _payload = {
+            "coordinates": [[round(lon, self.precision), round(lat, self.precision)] for lon, lat in coordinates],
+            "profile": profile,
+            "options": options,
+        }
+        return hashlib.sha256(json.dumps(_payload, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        _response = self.get_from_memory(key)
+        if _response is not None:
+            return _response
+        return self.get_from_shared(key)
+
+    def get_from_memory(self, key: str) -> Optional[dict]:
+        """
+        Memory tier only, safe to call from an event loop.
+        """
+        _start = time.perf_counter()
+        _response = self.memory.get(key)
+        if _response is not None:
+            self.stats.record(memory_hits=1, lookup_seconds=time.perf_counter() - _start)
+        return _response
+
+    def get_from_shared(self, key: str) -> Optional[dict]:
+        _start = time.perf_counter()
+        _entry = DirectionsCacheModel.objects.filter(key=key).values("response", "expires_at").first()
+        if _entry is not None and _entry["expires_at"] > timezone.now():
+            _remaining = (_entry["expires_at"] - timezone.now()).total_seconds()
+            self.memory.set(key, _entry["response"], ttl_seconds=min(_remaining, self.ttl_seconds))
+            self.stats.record(shared_hits=1, lookup_seconds=time.perf_counter() - _start)
+            return _entry["response"]
+
+        self.stats.record(misses=1, lookup_seconds=time.perf_counter() - _start)
+        return None
+
+    def set(self, key: str, coordinates: List[List[float]], profile: str, response: dict) -> None:
+        self.memory.set(key, response)
+        DirectionsCacheModel.objects.update_or_create(
+            key=key,
+            defaults={
+                "profile": profile,
+                "coordinates": coordinates,
+                "response": response,
+                "expires_at": timezone.now() + timedelta(seconds=self.ttl_seconds),
+            },
+        )
+
+    def record_upstream(self, seconds: float) -> None:
+        self.stats.record(upstream_calls=1, upstream_seconds=seconds)
+
+    @staticmethod
+    def purge_expired() -> int:
+        _deleted, _ = DirectionsCacheModel.objects.filter(expires_at__lte=timezone.now()).delete()
+        return _deleted
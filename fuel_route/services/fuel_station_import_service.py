@@ -0,0 +1,264 @@
+import asyncio
+import csv
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from django.db import connection, transaction
+from psycopg2.extras import execute_values
+
+from fuel_route.data.data_types import FuelStation, PriceRefreshResult
+from fuel_route.data.exceptions import InvalidPriceFileException
+from fuel_route.data.models import FuelStationModel, StationTableGenerationModel
+
+
+class RateLimiter:
+    """
+    Spaces calls at least ``1 / rate_per_second`` apart across every thread that
+    shares the limiter. A non-positive rate disables limiting.
+    """
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        _wait = self._reserve()
+        if _wait > 0:
+            time.sleep(_wait)
+
+    async def acquire_async(self) -> None:
+        _wait = self._reserve()
+        if _wait > 0:
+            await asyncio.sleep(_wait)
+
+    def _reserve(self) -> float:
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            _now = time.monotonic()
+            _slot = max(_now, self._next_slot)
+            self._next_slot = _slot + self.interval
+        return _slot - _now
+
+
+class ImportCheckpoint:
+    """
+    Number of CSV rows already written by an import, persisted as JSON so an
+    interrupted run can resume after the last flushed batch.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> int:
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'r') as checkpoint_file:
+            return int(json.load(checkpoint_file).get('rows', 0))
+
+    def save(self, rows: int, **details) -> None:
+        _tmp_path = f"{self.path}.tmp"
+        with open(_tmp_path, 'w') as checkpoint_file:
+            json.dump({'rows': rows, **details}, checkpoint_file)
+        os.replace(_tmp_path, self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class FuelStationImportService:
+    UPSERT_SQL = """
+        INSERT INTO {table} (opis_id, truckstop_name, address, city, state, rack_id, location, retail_price)
+        VALUES %s
+        ON CONFLICT (opis_id) DO UPDATE SET
+            truckstop_name = EXCLUDED.truckstop_name,
+            address = EXCLUDED.address,
+            city = EXCLUDED.city,
+            state = EXCLUDED.state,
+            rack_id = EXCLUDED.rack_id,
+            location = EXCLUDED.location,
+            retail_price = EXCLUDED.retail_price
+    """
+    UPSERT_TEMPLATE = "(%s, %s, %s, %s, %s, %s, ST_SetSRID(ST_MakePoint(%s, %s), 4326), %s)"
+    PRICE_ID_COLUMN = 'OPIS Truckstop ID'
+    PRICE_COLUMN = 'Retail Price'
+    # Rows whose OPIS id or price would not cast are skipped rather than failing the whole refresh
+    VALID_PRICE_ROW_SQL = (
+        r"{id_column} ~ '^\s*\d{{1,9}}\s*$' AND {price_column} ~ '^\s*(\d+(\.\d*)?|\.\d+)\s*$'"
+    )
+    STAGED_ROWS_SQL = "SELECT count(*), count(*) FILTER (WHERE {valid_row}) FROM fuel_price_staging"
+    # The first valid row of an OPIS id wins, as in the importers, which skip ids they have seen
+    FILE_PRICES_SQL = """
+        CREATE TEMP TABLE fuel_price_file ON COMMIT DROP AS
+        SELECT DISTINCT ON (opis_id) opis_id, retail_price
+        FROM (
+            SELECT
+                trim({id_column})::integer AS opis_id,
+                trim({price_column})::double precision AS retail_price,
+                row_number
+            FROM fuel_price_staging
+            WHERE {valid_row}
+        ) staged
+        ORDER BY opis_id, row_number
+    """
+    PRICE_MATCH_SQL = """
+        SELECT count(station.id), count(*) - count(station.id)
+        FROM fuel_price_file price
+        LEFT JOIN {table} station ON station.opis_id = price.opis_id
+    """
+    PRICE_UPDATE_SQL = """
+        UPDATE {table} AS station
+        SET retail_price = price.retail_price
+        FROM fuel_price_file price
+        WHERE station.opis_id = price.opis_id
+          AND station.retail_price IS DISTINCT FROM price.retail_price
+    """
+
+    @staticmethod
+    def parse_row(row: Dict[str, str]) -> FuelStation:
+        """
+        Station for an OPIS CSV row, without a location until it is geocoded.
+        """
+        return FuelStation(
+            opis_id=int(row['OPIS Truckstop ID']),
+            truckstop_name=row['Truckstop Name'],
+            address=row['Address'],
+            city=row['City'],
+            state=row['State'],
+            rack_id=int(row['Rack ID']),
+            location=None,
+            retail_price=float(row['Retail Price']),
+            id=None,
+        )
+
+    @staticmethod
+    def format_address(station: FuelStation) -> str:
+        return f"{station.address}, {station.city}, {station.state}"
+
+    @staticmethod
+    def batches(rows: Iterable[dict], batch_size: int) -> Iterator[Tuple[int, List[dict]]]:
+        """
+        Yields ``(index of the first row, rows)`` for consecutive batches of rows.
+        """
+        _iterator = iter(rows)
+        _batch_start = 0
+        while True:
+            _rows = list(itertools.islice(_iterator, batch_size))
+            if not _rows:
+                return
+            yield _batch_start, _rows
+            _batch_start += len(_rows)
+
+    @staticmethod
+    def rows_per_second(rows: int, start: float) -> float:
+        _elapsed = time.perf_counter() - start
+        return rows / _elapsed if _elapsed > 0 else 0.0
+
+    @staticmethod
+    def existing_opis_ids() -> Set[int]:
+        return set(FuelStationModel.objects.values_list('opis_id', flat=True))
+
+    @staticmethod
+    def upsert_stations(stations: List[FuelStation], batch_size: Optional[int] = None) -> int:
+        """
+        Inserts the stations, updating the rows whose ``opis_id`` already exists,
+        with multi-row ``INSERT ... ON CONFLICT`` statements.
+
+        Bulk writes skip the model signals, so the station table generation is
+        bumped here once per call.
+        """
+        if not stations:
+            return 0
+        # The first row wins when the same station appears twice in one statement, as in the importers
+        _stations = {}
+        for station in stations:
+            _stations.setdefault(station.opis_id, station)
+        _stations = list(_stations.values())
+        _rows = [
+            (
+                station.opis_id,
+                station.truckstop_name,
+                station.address,
+                station.city,
+                station.state,
+                station.rack_id,
+                station.location.x,
+                station.location.y,
+                station.retail_price,
+            )
+            for station in _stations
+        ]
+        with connection.cursor() as cursor:
+            execute_values(
+                cursor.cursor,
+                FuelStationImportService.UPSERT_SQL.format(table=FuelStationModel._meta.db_table),
+                _rows,
+                template=FuelStationImportService.UPSERT_TEMPLATE,
+                page_size=batch_size or len(_rows),
+            )
+        StationTableGenerationModel.bump()
+        return len(_rows)
+
+    @staticmethod
+    def refresh_prices(csvfile: TextIO) -> PriceRefreshResult:
+        """
+        Updates ``retail_price`` from an OPIS CSV without geocoding anything.
+
+        The file is streamed into a temporary table with ``COPY``, reduced to the
+        first price of every OPIS id, and applied with one ``UPDATE ... FROM`` that
+        only touches stations whose price actually changed. Rows with a blank or
+        non-numeric OPIS id or price are counted as skipped, and unknown OPIS ids
+        are reported, never inserted.
+        """
+        _header = next(csv.reader(csvfile), None) or []
+        _missing = [
+            column for column in (FuelStationImportService.PRICE_ID_COLUMN, FuelStationImportService.PRICE_COLUMN)
+            if column not in _header
+        ]
+        if _missing:
+            raise InvalidPriceFileException(f"Price file is missing the columns: {', '.join(_missing)}")
+        csvfile.seek(0)
+
+        # Stage every column as text, so the file's layout never has to match the table's
+        _columns = [f"column_{_index}" for _index in range(len(_header))]
+        _table = FuelStationModel._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMP TABLE fuel_price_staging "
+                f"(row_number bigserial, {', '.join(f'{column} text' for column in _columns)}) ON COMMIT DROP"
+            )
+            cursor.cursor.copy_expert(
+                f"COPY fuel_price_staging ({', '.join(_columns)}) FROM STDIN WITH (FORMAT csv, HEADER true)",
+                csvfile,
+            )
+            _id_column = _columns[_header.index(FuelStationImportService.PRICE_ID_COLUMN)]
+            _price_column = _columns[_header.index(FuelStationImportService.PRICE_COLUMN)]
+            _valid_row = FuelStationImportService.VALID_PRICE_ROW_SQL.format(
+                id_column=_id_column, price_column=_price_column
+            )
+            cursor.execute(FuelStationImportService.STAGED_ROWS_SQL.format(valid_row=_valid_row))
+            _staged_rows, _valid_rows = cursor.fetchone()
+
+            cursor.execute(FuelStationImportService.FILE_PRICES_SQL.format(
+                id_column=_id_column, price_column=_price_column, valid_row=_valid_row
+            ))
+            cursor.execute(FuelStationImportService.PRICE_MATCH_SQL.format(table=_table))
+            _matched, _unknown = cursor.fetchone()
+            cursor.execute(FuelStationImportService.PRICE_UPDATE_SQL.format(table=_table))
+            _updated = cursor.rowcount
+
+            if _updated:
+                StationTableGenerationModel.bump()
+        return PriceRefreshResult(
+            staged_rows=_staged_rows,
+            skipped_rows=_staged_rows - _valid_rows,
+            matched=_matched,
+            updated=_updated,
+            unknown=_unknown,
+        )
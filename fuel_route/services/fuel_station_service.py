@@ -1,9 +1,11 @@
 import copy
-from typing import List
+import logging
+from typing import Dict, List, Optional, Union
 import numpy as np
 
+from django.conf import settings
 from django.contrib.gis.db.models import GeometryField
-from django.contrib.gis.geos import LineString, Point
+from django.contrib.gis.geos import GEOSGeometry, LineString, Point
 from django.contrib.gis.db.models.functions import (
     Distance,
     Transform,
@@ -11,11 +13,19 @@ from django.contrib.gis.db.models.functions import (
     GeomOutputGeoFunc, GeoFunc,
 )
 from django.contrib.gis.measure import D
-from django.db.models import QuerySet, Value
+from django.db.models import BooleanField, F, Func, QuerySet, Value
 from django.utils.functional import cached_property
 
+from fuel_route.data.data_types import FuelStopPlan, StationCorridor, VehiclePlan, VehicleSpec
 from fuel_route.data.models import FuelStationModel
-from fuel_route.data.exceptions import FuelStationNotFoundException
+from fuel_route.data.exceptions import FuelStationNotFoundException, StaleStationIndexException
+from fuel_route.services.corridor_cache import CorridorCache
+from fuel_route.services.fuel_stop_solvers import fill_up_purchases, FuelStopSolver, WindowFuelStopSolver
+from fuel_route.services.route_geometry import RouteGeometry
+from fuel_route.services.station_index import StationIndex
+from fuel_route.services.tracing import span
+
+logger = logging.getLogger(__name__)
 
 METERS_TO_MILES = 1609.34
 
@@ -32,7 +42,7 @@ class RouteInterpolateMine(GeomOutputGeoFunc):
 
     @cached_property
     def output_field(self):
-        return GeometryField(srid=4326)
+        return GeometryField(srid=self.source_expressions[0].output_field.srid)
 
     def as_sql(self, compiler, connection, **extra_context):
         # Use ST_LineInterpolatePoint for PostGIS
@@ -40,173 +50,369 @@ class RouteInterpolateMine(GeomOutputGeoFunc):
         return super().as_sql(compiler, connection, function=function, **extra_context)
 
 
+class GeographyDWithin(Func):
+    """
+    ``ST_DWithin(<field>::geography, <geometry>::geography, <meters>)``.
+
+    The field side is spelled exactly like the expression of the
+    ``fuel_route_station_location_geog_gist`` index, so the planner can use it.
+    """
+    template = "ST_DWithin((%(field)s)::geography, ST_GeogFromText(%(geometry)s), %(meters)s)"
+    output_field = BooleanField()
+
+    def __init__(self, field_name: str, geometry: GEOSGeometry, meters: float):
+        super().__init__(F(field_name), Value(geometry.ewkt), Value(float(meters)))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        _sql_params = [compiler.compile(_expression) for _expression in self.get_source_expressions()]
+        _field, _geometry, _meters = (_sql for _sql, _ in _sql_params)
+        return self.template % {"field": _field, "geometry": _geometry, "meters": _meters}, [
+            _param for _, _params in _sql_params for _param in _params
+        ]
+
+
 class FuelStationService:
     @staticmethod
     def calculate_optimal_fuel_stops(
         fuel_stations_distance_to_start: QuerySet[FuelStationModel],
         route: LineString,
         total_distance: float,
+        max_millage_per_tank: float = 500,
+        starting_fuel: float = None,
     ) -> List[FuelStationModel]:
+        """
+        Refill-window heuristic re-querying PostGIS for every stop. Leaving with
+        less than a full tank (``starting_fuel`` miles of range) shrinks the first
+        window, like ``WindowFuelStopSolver`` does.
+        """
         optimal_stops = []
         current_position = 0.0  # Miles along the route
-        max_millage_per_tank = 500
         min_millage_for_refill = max_millage_per_tank * 0.7
-        print(f"Stations: {len(fuel_stations_distance_to_start)}")
+        _starting_fuel = max_millage_per_tank if starting_fuel is None else min(starting_fuel, max_millage_per_tank)
+        _first_stop_min = _starting_fuel * 0.2
+        _first_stop_max = min(_starting_fuel, min_millage_for_refill)
+        logger.debug(f"Stations: {len(fuel_stations_distance_to_start)}")
         _route_np_array = route.array
         latest_point = None
         _new_route: List[Point] = []
         _new_route.append(Point(route.coords[0], srid=4326))
         _last_index = 0
         stations_to_exclude = []
-        while current_position < total_distance - max_millage_per_tank:
-            stations_in_range = []
-            print(f"Current position: {current_position}")
-
-            if current_position == 0:
-                for station in fuel_stations_distance_to_start:
-                    if (
-                        max_millage_per_tank*0.2
-                        > station.distance.mi
-                    ):
-                        stations_to_exclude.append(station.opis_id)
-                    elif(
-                        max_millage_per_tank*0.2
-                        < station.distance.mi
-                        <= min_millage_for_refill
-                    ):
-                        stations_in_range.append(station)
-                        print(f"Station in range: {station}")
-                    elif(
-                        station.distance.mi
-                        > min_millage_for_refill
-                    ):
-                        break
-            else:
-                _new_stations = copy.deepcopy(fuel_stations_distance_to_start)
-                _new_stations = _new_stations.exclude(opis_id__in=stations_to_exclude).annotate(
-                    distance_to_last_point=Distance(
-                        "location",
-                        latest_point, srid=4326),
-                    ).order_by("distance")
-                if _new_stations:
-                    print(f"New stations: {len(_new_stations)}")
-                    print(f"last station: {_new_stations.last().distance_to_last_point.mi}")
-                for station in _new_stations:
-                    if (
-                        station.distance.mi
-                        < optimal_stops[-1].distance.mi
-                    ):
-                        stations_to_exclude.append(station.opis_id)
-                        continue
-                    if (
-                        max_millage_per_tank*0.5
-                        < station.distance_to_last_point.mi
-                        <= min_millage_for_refill
-                    ):
-                        stations_in_range.append(station)
-                        print(f"Station in range: {station}")
-
-            if not stations_in_range:
-                print("no stations_in_range")
-            else:
-                # Get the cheapest station
+        while current_position < total_distance - (max_millage_per_tank if optimal_stops else _starting_fuel):
+            with span("optimizer_iteration", position=current_position) as _span:
+                stations_in_range = []
+                logger.debug(f"Current position: {current_position}")
+
                 if current_position == 0:
-                    optimal_station = min(stations_in_range, key=lambda x: x.retail_price)
-                    print(
-                        f"segment length = {optimal_station.distance.mi - current_position}"
-                    )
-                    optimal_stops.append(optimal_station)
+                    for station in fuel_stations_distance_to_start:
+                        if (
+                            _first_stop_min
+                            > station.distance.mi
+                        ):
+                            stations_to_exclude.append(station.opis_id)
+                        elif(
+                            _first_stop_min
+                            < station.distance.mi
+                            <= _first_stop_max
+                        ):
+                            stations_in_range.append(station)
+                            logger.debug(f"Station in range: {station}")
+                        elif(
+                            station.distance.mi
+                            > _first_stop_max
+                        ):
+                            break
                 else:
-                    optimal_station = min(stations_in_range, key=lambda x: x.retail_price)
-                    print(
-                        f"segment length = {optimal_station.distance_to_last_point.mi}"
+                    _new_stations = copy.deepcopy(fuel_stations_distance_to_start)
+                    _new_stations = _new_stations.exclude(opis_id__in=stations_to_exclude).annotate(
+                        distance_to_last_point=Distance(
+                            "location_5069",
+                            latest_point.transform(5069, clone=True)),
+                        ).order_by("distance")
+                    if _new_stations:
+                        # Reads the result cache filled by the truth test, ``last()`` would query again
+                        logger.debug(
+                            f"New stations: {len(_new_stations)}, last station: "
+                            f"{_new_stations[len(_new_stations) - 1].distance_to_last_point.mi}"
+                        )
+                    for station in _new_stations:
+                        if (
+                            station.distance.mi
+                            < optimal_stops[-1].distance.mi
+                        ):
+                            stations_to_exclude.append(station.opis_id)
+                            continue
+                        if (
+                            max_millage_per_tank*0.5
+                            < station.distance_to_last_point.mi
+                            <= min_millage_for_refill
+                        ):
+                            stations_in_range.append(station)
+                            logger.debug(f"Station in range: {station}")
+
+                _span.set(candidates=len(stations_in_range))
+                if not stations_in_range:
+                    raise FuelStationNotFoundException(
+                        f"No fuel station in the refill window after mile {current_position:.0f}"
                     )
-                    optimal_stops.append(optimal_station)
-                for station in stations_in_range:
-                    if station.opis_id == optimal_station.opis_id:
+                else:
+                    # Get the cheapest station
+                    if current_position == 0:
+                        optimal_station = min(stations_in_range, key=lambda x: x.retail_price)
+                        logger.debug(f"Segment length = {optimal_station.distance.mi - current_position}")
+                        optimal_stops.append(optimal_station)
+                    else:
+                        optimal_station = min(stations_in_range, key=lambda x: x.retail_price)
+                        logger.debug(f"Segment length = {optimal_station.distance_to_last_point.mi}")
+                        optimal_stops.append(optimal_station)
+                    for station in stations_in_range:
+                        if station.opis_id == optimal_station.opis_id:
+                            stations_to_exclude.append(station.opis_id)
+                            break
                         stations_to_exclude.append(station.opis_id)
-                        break
-                    stations_to_exclude.append(station.opis_id)
-                stations_to_exclude.extend([station.opis_id for station in stations_in_range])
-                _point_on_route = optimal_station.closest_point_on_route_coords
-                _new_route.append(optimal_station.tranformed_location)
-                _new_position = D(m=LineString(_new_route, srid=4326).transform(5069, clone=True).length).mi
-                print(f"New position: {_new_position}")
-                latest_point = optimal_station.tranformed_location
-                current_position = _new_position
+                    stations_to_exclude.extend([station.opis_id for station in stations_in_range])
+                    _point_on_route = optimal_station.closest_point_on_route_coords
+                    _new_route.append(optimal_station.tranformed_location)
+                    _new_position = D(m=LineString(_new_route, srid=4326).transform(5069, clone=True).length).mi
+                    logger.debug(f"New position: {_new_position}")
+                    latest_point = optimal_station.tranformed_location
+                    current_position = _new_position
+        _new_route.append(Point(route.coords[-1], srid=4326))
+        logger.debug(f"Optimal stops: {optimal_stops}, total distance: {total_distance}")
+        return optimal_stops, _new_route
+
+    @staticmethod
+    def build_corridor(
+        fuel_stations_distance_to_start: QuerySet[FuelStationModel],
+        total_distance: float,
+    ) -> StationCorridor:
+        """
+        Evaluates the annotated corridor queryset once and projects every station
+        to its offset in miles along the route.
+        """
+        stations = list(fuel_stations_distance_to_start)
+        return StationCorridor(
+            stations=stations,
+            station_ids=np.array([station.id for station in stations], dtype=np.int64),
+            lons=np.array([station.tranformed_location.x for station in stations], dtype=float),
+            lats=np.array([station.tranformed_location.y for station in stations], dtype=float),
+            prices=np.array([station.retail_price for station in stations], dtype=float),
+            distances_from_start=np.array([station.distance.mi for station in stations], dtype=float),
+            offsets=np.array(
+                [station.closest_point_on_route * total_distance for station in stations], dtype=float
+            ),
+            distances_to_route=np.array([station.distance_to_route.mi for station in stations], dtype=float),
+        )
+
+    @staticmethod
+    def get_corridor(
+        route: LineString, total_distance: float, max_distance_km: float = 0.5
+    ) -> StationCorridor:
+        """
+        Corridor stations from the in-process ``StationIndex`` or from PostGIS,
+        depending on ``STATION_CORRIDOR_SOURCE``. Repeat lanes come from the
+        ``CorridorCache`` when ``CORRIDOR_CACHE_ENABLED``.
+        """
+        if settings.CORRIDOR_CACHE_ENABLED:
+            cache = CorridorCache.default()
+            return cache.resolve(
+                cache.make_key(route.coords, total_distance, max_distance_km, settings.STATION_CORRIDOR_SOURCE),
+                lambda: FuelStationService._find_corridor(route, total_distance, max_distance_km),
+            )
+        return FuelStationService._find_corridor(route, total_distance, max_distance_km)
+
+    @staticmethod
+    def _find_corridor(route: LineString, total_distance: float, max_distance_km: float) -> StationCorridor:
+        if settings.STATION_CORRIDOR_SOURCE == "index":
+            return StationIndex.get().corridor(route.coords, total_distance, max_distance_km)
+        return FuelStationService.build_corridor(
+            FuelStationService.get_stations_along_route(route=route, max_distance_km=max_distance_km),
+            total_distance,
+        )
+
+    @staticmethod
+    def calculate_optimal_fuel_stops_in_memory(
+        fuel_stations_distance_to_start: Union[QuerySet[FuelStationModel], StationCorridor],
+        route: LineString,
+        total_distance: float,
+        solver: FuelStopSolver = None,
+        plan: FuelStopPlan = None,
+    ) -> List[FuelStationModel]:
+        """
+        Same contract as ``calculate_optimal_fuel_stops`` but fetches the corridor
+        stations once and runs the stop selection in memory, instead of re-querying
+        PostGIS on every iteration. A ``plan`` already solved for the corridor
+        skips the solver.
+
+        When the solver plans partial fills, each stop also gets ``purchased_gallons``.
+        """
+        corridor = fuel_stations_distance_to_start
+        if not isinstance(corridor, StationCorridor):
+            corridor = FuelStationService.build_corridor(fuel_stations_distance_to_start, total_distance)
+        _plan = plan or (solver or WindowFuelStopSolver()).solve(corridor, total_distance)
+        _stations = FuelStationService._load_stops(corridor, _plan.stop_indices, total_distance)
+        optimal_stops = []
+        _new_route: List[Point] = [Point(route.coords[0], srid=4326)]
+        for _stop, (_index, _leg_distance) in enumerate(zip(_plan.stop_indices, _plan.leg_distances)):
+            station = _stations[_index]
+            if optimal_stops:
+                station.distance_to_last_point = D(mi=_leg_distance)
+            if _plan.gallons is not None:
+                station.purchased_gallons = _plan.gallons[_stop]
+            optimal_stops.append(station)
+            _new_route.append(station.tranformed_location)
         _new_route.append(Point(route.coords[-1], srid=4326))
-        print(f"Optimal stops: {optimal_stops}")
-        print(f"Total distance: {total_distance}")
-        print(f"Total stops: {len(optimal_stops)}")
         return optimal_stops, _new_route
 
+    @staticmethod
+    def vehicle_plans(
+        corridor: StationCorridor,
+        plans: List[FuelStopPlan],
+        vehicles: List[VehicleSpec],
+        geometry: RouteGeometry,
+        total_distance: float,
+    ) -> List[VehiclePlan]:
+        """
+        Stops and fuel cost of the plans solved for ``vehicles`` over one
+        corridor, located on ``geometry``. The stations of every plan are
+        loaded together.
+        """
+        _stations = FuelStationService._load_stops(
+            corridor, sorted({_index for _plan in plans for _index in _plan.stop_indices}), total_distance
+        )
+        vehicle_plans = []
+        for vehicle, _plan in zip(vehicles, plans):
+            fuel_stops = []
+            for _stop, _index in enumerate(_plan.stop_indices):
+                # Plans share station instances but buy different amounts at them
+                station = copy.copy(_stations[_index])
+                if _plan.gallons is not None:
+                    station.purchased_gallons = _plan.gallons[_stop]
+                fuel_stops.append(station)
+            FuelStationService.locate_stops(geometry, fuel_stops)
+            total_cost = FuelStationService.calculate_total_cost(
+                route=None, fuel_stops=fuel_stops, total_distance=total_distance,
+                fuel_efficiency=vehicle.mpg, geometry=geometry,
+                max_millage_per_tank=vehicle.range_miles, starting_fuel=vehicle.starting_range_miles,
+            )
+            vehicle_plans.append(VehiclePlan(vehicle=vehicle, fuel_stops=fuel_stops, total_cost=total_cost))
+        return vehicle_plans
+
+    @staticmethod
+    def _load_stops(
+        corridor: StationCorridor, indices: List[int], total_distance: float
+    ) -> Dict[int, FuelStationModel]:
+        """
+        Model instances for the chosen corridor entries, carrying the same
+        attributes the PostGIS corridor query annotates. Raises
+        ``StaleStationIndexException`` when one of them was deleted since the
+        corridor was built.
+        """
+        if corridor.stations is not None:
+            return {_index: corridor.stations[_index] for _index in indices}
+
+        _stations = FuelStationModel.objects.in_bulk([int(corridor.station_ids[_index]) for _index in indices])
+        stops = {}
+        for _index in indices:
+            station = _stations.get(int(corridor.station_ids[_index]))
+            if station is None:
+                # Deleted after the station index or the cached corridor was loaded, so the plan is void
+                raise StaleStationIndexException(
+                    f"Fuel station {int(corridor.station_ids[_index])} of the corridor no longer exists"
+                )
+            station.tranformed_location = station.location
+            station.distance = D(mi=corridor.distances_from_start[_index])
+            station.distance_to_route = D(mi=corridor.distances_to_route[_index])
+            station.closest_point_on_route = corridor.offsets[_index] / total_distance if total_distance else 0.0
+            stops[_index] = station
+        return stops
+
     @staticmethod
     def get_stations_along_route(
         route: LineString, max_distance_km: float = 0.5
     ) -> List[FuelStationModel]:
-        _conversion_to_degrees = ((max_distance_km*1000)*0.000000039)/0.00362333
-        route_buffer = route.buffer(_conversion_to_degrees)
-        stations = FuelStationModel.objects.filter(location__intersects=route_buffer)
+        """
+        Stations within ``max_distance_km`` of the route, measured on the
+        geography so the corridor is as wide at every latitude.
+
+        ``route`` is the corridor route, already reduced by the ``corridor`` stage
+        of ``RouteSimplifier`` where it comes from ORS. Candidates come from
+        ``ST_DWithin`` against it, which the GiST index on ``location::geography``
+        answers; the distance in EPSG:5069 then trims them to the corridor.
+        """
+        _max_distance_m = max_distance_km * 1000
+        stations = FuelStationModel.objects.filter(GeographyDWithin("location", route, _max_distance_m))
 
+        # Measured and located on the stored EPSG:5069 column, in meters, against
+        # the route projected once here rather than on every row
+        _route_5069 = route.transform(5069, clone=True)
         stations_distance_to_origin_not_transformed = (
             stations
-            .annotate(tranformed_location=Transform("location", 4326, clone=True))
+            .annotate(tranformed_location=F("location"))
+            .annotate(distance=Distance("location_5069", Point(_route_5069.coords[0], srid=5069)))
+            .annotate(closest_point_on_route=LineLocatePoint(_route_5069, "location_5069"))
+            .annotate(distance_to_route=Distance("location_5069", _route_5069))
             .annotate(
-                distance=Distance(
-                    "tranformed_location",
-                    Point(route.coords[0], srid=4326),
+                closest_point_on_route_coords=Transform(
+                    RouteInterpolateMine(_route_5069, "closest_point_on_route"), 4326
                 )
             )
-            .annotate(closest_point_on_route=LineLocatePoint(route, "tranformed_location"))
-            .annotate(distance_to_route=Distance("tranformed_location", route))
-            .annotate(closest_point_on_route_coords=RouteInterpolateMine(route, "closest_point_on_route"))
+            .filter(distance_to_route__lte=D(m=_max_distance_m))
 
         ).order_by("distance")
-        print(f"Farthest station to route: {stations_distance_to_origin_not_transformed.last().distance_to_route}")
-        print(
-            f"Station closest to origin: {list(stations_distance_to_origin_not_transformed)[0].distance.mi}"
-        )
-        print(
-            f"Station closest to origin coords: {list(stations_distance_to_origin_not_transformed)[0].location.coords}"
-        )
-        print(
-            f"Station closest to origin distance to route: {list(stations_distance_to_origin_not_transformed)[0].distance_to_route.mi}"
-        )
-        print(
-            f"Point in route closest to station: {list(stations_distance_to_origin_not_transformed)[0].closest_point_on_route_coords.coords}"
-        )
-        print(
-            f"Station further from origin: {list(stations_distance_to_origin_not_transformed)[-1].distance.mi}"
-        )
-        if not stations:
+        # Evaluated once here; the printouts and the emptiness check read the result cache
+        _stations = list(stations_distance_to_origin_not_transformed)
+        if not _stations:
             raise FuelStationNotFoundException("No fuel stations found along the route")
+        logger.debug(
+            f"Corridor: {len(_stations)} stations along {route.num_points} vertices, "
+            f"closest to origin {_stations[0].distance.mi:.1f} mi at {_stations[0].location.coords}, farthest {_stations[-1].distance.mi:.1f} mi"
+        )
 
         return stations_distance_to_origin_not_transformed
 
+    @staticmethod
+    def locate_stops(geometry: RouteGeometry, fuel_stops: List[FuelStationModel]) -> None:
+        """
+        Sets ``route_mileage`` on every stop: the along-route miles from the start
+        of ``geometry`` to the stop's projection, never decreasing from one stop
+        to the next.
+        """
+        if not fuel_stops:
+            return
+        _mileages, _ = geometry.snap(
+            [stop.location.x for stop in fuel_stops], [stop.location.y for stop in fuel_stops]
+        )
+        for stop, _mileage in zip(fuel_stops, np.maximum.accumulate(_mileages)):
+            stop.route_mileage = float(_mileage)
+
     @staticmethod
     def calculate_total_cost(
         route: LineString,
         fuel_stops: List[FuelStationModel],
         total_distance: float = 0,
         fuel_efficiency: float = 6,
+        geometry: Optional[RouteGeometry] = None,
+        max_millage_per_tank: float = 500,
+        starting_fuel: float = None,
     ) -> float:
-        total_cost = 0
-        last_stop_distance = 0
-
-        for idx, stop in enumerate(fuel_stops):
-            if idx == 0:
-                stop_distance = stop.distance.mi
-            else:
-                stop_distance = stop.distance_to_last_point.mi
-            distance_traveled = stop_distance - last_stop_distance
-            fuel_used = distance_traveled / fuel_efficiency
-            total_cost += stop.retail_price * fuel_used
-            last_stop_distance = stop_distance
-
-        # Account for any remaining distance
-        if total_distance > last_stop_distance:
-            remaining_distance = total_distance - last_stop_distance
-            fuel_used = remaining_distance / fuel_efficiency
-            total_cost += fuel_stops[-1].retail_price * fuel_used
-
-        return total_cost
+        """
+        Cost of the fuel bought along the route, the fuel on board at the start
+        excluded. Stops without planned purchases fill the tank, measured along
+        the route, and the last one buys what the rest of the route needs, as
+        ``fill_up_purchases`` costs the window solver's plans.
+        """
+        if not fuel_stops:
+            return 0.0
+        if all(hasattr(stop, "purchased_gallons") for stop in fuel_stops):
+            # The solver already planned how much to buy at every stop
+            return sum(stop.retail_price * stop.purchased_gallons for stop in fuel_stops)
+
+        if not all(hasattr(stop, "route_mileage") for stop in fuel_stops):
+            FuelStationService.locate_stops(geometry or RouteGeometry(route.coords), fuel_stops)
+        _purchases = fill_up_purchases(
+            [stop.route_mileage for stop in fuel_stops], total_distance, max_millage_per_tank,
+            max_millage_per_tank if starting_fuel is None else starting_fuel,
+        )
+        _prices = np.array([stop.retail_price for stop in fuel_stops])
+        return float((_prices * _purchases).sum()) / fuel_efficiency
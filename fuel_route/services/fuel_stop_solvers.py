@@ -0,0 +1,330 @@
+from collections import deque
+from typing import List
+
+import numpy as np
+from django.core.exceptions import ImproperlyConfigured
+
+from fuel_route.data.data_types import StationCorridor, FuelStopPlan, VehicleSpec
+from fuel_route.data.exceptions import FuelStationNotFoundException
+from fuel_route.services.route_geometry import haversine_miles
+
+def fill_up_purchases(stop_mileages, total_distance: float, tank: float, starting_fuel: float) -> np.ndarray:
+    """
+    Miles of fuel bought at every stop of a fill-up plan: the tank is filled at
+    each stop but the last, which only buys what the rest of the route needs.
+    The fuel on board at the start is not bought, as in ``CheapestFuelStopSolver``.
+    """
+    _purchases = np.zeros(len(stop_mileages))
+    _fuel = min(starting_fuel, tank)
+    _position = 0.0
+    for _stop, _mileage in enumerate(stop_mileages):
+        _fuel -= _mileage - _position
+        _position = _mileage
+        if _stop == len(stop_mileages) - 1:
+            _purchases[_stop] = max(0.0, min(tank, total_distance - _position) - _fuel)
+        else:
+            _purchases[_stop] = max(0.0, tank - _fuel)
+        _fuel += _purchases[_stop]
+    return _purchases
+
+
+class FuelStopSolver:
+    """
+    Picks fuel stops from the stations of a corridor. Implementations only see the
+    corridor arrays, so they never touch the database.
+    """
+
+    def solve(self, corridor: StationCorridor, total_distance: float) -> FuelStopPlan:
+        raise NotImplementedError
+
+    def for_vehicle(self, vehicle: VehicleSpec) -> "FuelStopSolver":
+        """
+        Same solver with the tank range, fuel economy and starting fuel of ``vehicle``.
+        """
+        raise NotImplementedError
+
+    def solve_many(
+        self, corridor: StationCorridor, total_distance: float, vehicles: List[VehicleSpec]
+    ) -> List[FuelStopPlan]:
+        """
+        One plan per vehicle over the same corridor, in the order of ``vehicles``.
+        """
+        return [self.for_vehicle(vehicle).solve(corridor, total_distance) for vehicle in vehicles]
+
+
+class WindowFuelStopSolver(FuelStopSolver):
+    """
+    In-memory version of the refill-window heuristic used by
+    ``FuelStationService.calculate_optimal_fuel_stops``.
+
+    The first stop is the cheapest station between 20% and 70% of a tank from the
+    start, every following stop is the cheapest station between 50% and 70% of a
+    tank from the previous stop. Stations behind the previous stop, or already
+    considered in an earlier window, are never revisited. Leaving with less than
+    a full tank (``starting_fuel`` miles of range) shrinks the first window. A
+    window without stations raises ``FuelStationNotFoundException``.
+
+    Every stop fills the tank but the last, which buys what the rest of the
+    route needs; the plan is costed on those purchases (``fill_up_purchases``).
+
+    ``solve_many`` runs the windows of every vehicle side by side as rows of
+    vehicle x station arrays, one step per stop instead of one per vehicle and stop.
+    """
+
+    def __init__(
+        self,
+        max_millage_per_tank: float = 500,
+        first_stop_ratio: float = 0.2,
+        next_stop_ratio: float = 0.5,
+        refill_ratio: float = 0.7,
+        starting_fuel: float = None,
+        fuel_efficiency: float = 6,
+    ):
+        self.max_millage_per_tank = max_millage_per_tank
+        self.first_stop_ratio = first_stop_ratio
+        self.next_stop_ratio = next_stop_ratio
+        self.refill_ratio = refill_ratio
+        self.starting_fuel = max_millage_per_tank if starting_fuel is None else starting_fuel
+        self.fuel_efficiency = fuel_efficiency
+
+    def for_vehicle(self, vehicle: VehicleSpec) -> "WindowFuelStopSolver":
+        return WindowFuelStopSolver(
+            vehicle.range_miles, self.first_stop_ratio, self.next_stop_ratio, self.refill_ratio,
+            vehicle.starting_range_miles, vehicle.mpg,
+        )
+
+    def solve(self, corridor: StationCorridor, total_distance: float) -> FuelStopPlan:
+        return self._solve_ranges(
+            corridor, total_distance, np.array([self.max_millage_per_tank]), np.array([self.starting_fuel]),
+            np.array([self.fuel_efficiency]),
+        )[0]
+
+    def solve_many(
+        self, corridor: StationCorridor, total_distance: float, vehicles: List[VehicleSpec]
+    ) -> List[FuelStopPlan]:
+        return self._solve_ranges(
+            corridor, total_distance,
+            np.array([vehicle.range_miles for vehicle in vehicles], dtype=float),
+            np.array([vehicle.starting_range_miles for vehicle in vehicles], dtype=float),
+            np.array([vehicle.mpg for vehicle in vehicles], dtype=float),
+        )
+
+    def _solve_ranges(
+        self,
+        corridor: StationCorridor,
+        total_distance: float,
+        tanks: np.ndarray,
+        starting_fuel: np.ndarray,
+        fuel_efficiencies: np.ndarray,
+    ) -> List[FuelStopPlan]:
+        _distances = corridor.distances_from_start
+        _starting = np.minimum(starting_fuel, tanks)
+        _excluded = np.zeros((len(tanks), len(corridor)), dtype=bool)
+        _last = np.full(len(tanks), -1)
+        _positions = np.zeros(len(tanks))
+        stop_indices = [[] for _ in tanks]
+        leg_distances = [[] for _ in tanks]
+
+        _active = _positions < total_distance - _starting
+        while _active.any():
+            _rows = np.flatnonzero(_active)
+            _first = _last[_rows] < 0
+            _tanks = tanks[_rows]
+            _legs = np.empty((len(_rows), len(corridor)))
+            _legs[_first] = _distances
+            _lower = np.where(_first, _starting[_rows], _tanks) * np.where(
+                _first, self.first_stop_ratio, self.next_stop_ratio
+            )
+            _upper = _tanks * self.refill_ratio
+            _upper[_first] = np.minimum(_starting[_rows][_first], _upper[_first])
+            _excluded_rows = _excluded[_rows]
+            if _first.any():
+                _excluded_rows[_first] |= _legs[_first] < _lower[_first, None]
+            if not _first.all():
+                _previous = _last[_rows[~_first]]
+                _legs[~_first] = haversine_miles(
+                    corridor.lons[_previous, None], corridor.lats[_previous, None], corridor.lons, corridor.lats
+                )
+                _excluded_rows[~_first] |= _distances < _distances[_previous, None]
+            _in_range = ~_excluded_rows & (_legs > _lower[:, None]) & (_legs <= _upper[:, None])
+
+            # Candidates keep the corridor order, so ties resolve like min() over the queryset
+            _optimal = np.argmin(np.where(_in_range, corridor.prices, np.inf), axis=1)
+            _found = _in_range.any(axis=1)
+            _excluded[_rows] = _excluded_rows | _in_range
+            for _row, _vehicle in enumerate(_rows):
+                if not _found[_row]:
+                    raise FuelStationNotFoundException(
+                        f"No fuel station in the refill window after mile {_positions[_vehicle]:.0f}"
+                    )
+                _stop = int(_optimal[_row])
+                _leg = float(_legs[_row, _stop])
+                stop_indices[_vehicle].append(_stop)
+                leg_distances[_vehicle].append(_leg)
+                _positions[_vehicle] += _leg
+                _last[_vehicle] = _stop
+                _active[_vehicle] = _positions[_vehicle] < total_distance - tanks[_vehicle]
+
+        plans = []
+        for _vehicle, (_stops, _legs) in enumerate(zip(stop_indices, leg_distances)):
+            _gallons = fill_up_purchases(
+                np.cumsum(_legs), total_distance, tanks[_vehicle], starting_fuel[_vehicle]
+            ) / fuel_efficiencies[_vehicle]
+            plans.append(FuelStopPlan(
+                stop_indices=_stops,
+                leg_distances=_legs,
+                gallons=_gallons.tolist(),
+                total_cost=float((_gallons * corridor.prices[_stops]).sum()) if _stops else 0.0,
+            ))
+        return plans
+
+
+class CheapestFuelStopSolver(FuelStopSolver):
+    """
+    Cheapest total fuel cost over every corridor station, with partial fills.
+
+    Stations are swept in route order. At each stop the truck buys just enough
+    fuel to reach the next cheaper station within a tank; when there is none it
+    fills up and drives to the cheapest station within a tank. Next-cheaper links
+    come from a monotone stack and the window minimums from a monotone deque, so
+    the plan costs O(n log n), dominated by sorting the offsets.
+
+    The truck leaves with ``starting_fuel`` miles of range (a full tank by
+    default), and the plan cost only covers the fuel bought along the way.
+
+    The route order and the next-cheaper links only depend on the corridor, so
+    ``solve_many`` computes them once and sweeps them for every vehicle.
+    """
+
+    def __init__(
+        self,
+        max_millage_per_tank: float = 500,
+        fuel_efficiency: float = 6,
+        starting_fuel: float = None,
+    ):
+        self.max_millage_per_tank = max_millage_per_tank
+        self.fuel_efficiency = fuel_efficiency
+        self.starting_fuel = max_millage_per_tank if starting_fuel is None else starting_fuel
+
+    def for_vehicle(self, vehicle: VehicleSpec) -> "CheapestFuelStopSolver":
+        return CheapestFuelStopSolver(vehicle.range_miles, vehicle.mpg, vehicle.starting_range_miles)
+
+    def solve(self, corridor: StationCorridor, total_distance: float) -> FuelStopPlan:
+        return self._sweep(self._prepare(corridor), total_distance)
+
+    def solve_many(
+        self, corridor: StationCorridor, total_distance: float, vehicles: List[VehicleSpec]
+    ) -> List[FuelStopPlan]:
+        _prepared = self._prepare(corridor)
+        return [self.for_vehicle(vehicle)._sweep(_prepared, total_distance) for vehicle in vehicles]
+
+    def _prepare(self, corridor: StationCorridor):
+        """
+        Route order of the stations, their offsets and prices in that order, and
+        the next-cheaper links.
+        """
+        _order = np.argsort(corridor.offsets, kind="stable")
+        _prices = corridor.prices[_order]
+        return _order, corridor.offsets[_order], _prices, self._next_cheaper(_prices)
+
+    def _sweep(self, prepared, total_distance: float) -> FuelStopPlan:
+        _order, _offsets, _prices, _next_cheaper = prepared
+        _count = len(_order)
+        _tank = self.max_millage_per_tank
+
+        _window = deque()
+        _window_end = 0
+        _current = -1  # -1 is the route start, where no fuel can be bought
+        _position = 0.0
+        _fuel = min(self.starting_fuel, _tank)
+        _last_stop_position = 0.0
+        stop_indices, leg_distances, gallons = [], [], []
+        total_cost = 0.0
+
+        while True:
+            _remaining = total_distance - _position
+            _cheaper = _next_cheaper[_current] if _current >= 0 else _count
+            _cheaper_in_range = (
+                _cheaper < _count
+                and _offsets[_cheaper] - _position <= _tank
+                and _offsets[_cheaper] < total_distance
+            )
+
+            if _current < 0:
+                _purchase = 0.0
+            elif _cheaper_in_range:
+                _purchase = max(0.0, _offsets[_cheaper] - _position - _fuel)
+            elif _remaining <= _tank:
+                _purchase = max(0.0, _remaining - _fuel)
+            else:
+                _purchase = _tank - _fuel
+
+            if _purchase > 0:
+                _gallons = _purchase / self.fuel_efficiency
+                stop_indices.append(int(_order[_current]))
+                leg_distances.append(_position - _last_stop_position)
+                gallons.append(_gallons)
+                total_cost += _gallons * _prices[_current]
+                _last_stop_position = _position
+                _fuel += _purchase
+
+            if _remaining <= _fuel and not (_current >= 0 and _cheaper_in_range):
+                break
+
+            if _current >= 0 and _cheaper_in_range:
+                _next = _cheaper
+            else:
+                # Cheapest station reachable with the fuel on board
+                _reach = _position + _fuel
+                while _window_end < _count and _offsets[_window_end] <= _reach:
+                    while _window and _prices[_window[-1]] >= _prices[_window_end]:
+                        _window.pop()
+                    _window.append(_window_end)
+                    _window_end += 1
+                while _window and _window[0] <= _current:
+                    _window.popleft()
+                if not _window:
+                    raise FuelStationNotFoundException(
+                        f"No fuel station reachable within {_fuel:.0f} mi after mile {_position:.0f}"
+                    )
+                _next = _window[0]
+
+            _fuel -= _offsets[_next] - _position
+            _position = float(_offsets[_next])
+            _current = int(_next)
+
+        return FuelStopPlan(
+            stop_indices=stop_indices,
+            leg_distances=leg_distances,
+            gallons=gallons,
+            total_cost=total_cost,
+        )
+
+    @staticmethod
+    def _next_cheaper(prices: np.ndarray) -> np.ndarray:
+        """
+        Index of the first strictly cheaper station further along the route,
+        or ``len(prices)`` when there is none.
+        """
+        _next = np.full(len(prices), len(prices), dtype=np.int64)
+        _stack = []
+        for _index, _price in enumerate(prices):
+            while _stack and _price < prices[_stack[-1]]:
+                _next[_stack.pop()] = _index
+            _stack.append(_index)
+        return _next
+
+
+FUEL_STOP_SOLVERS = {
+    "window": WindowFuelStopSolver,
+    "cheapest": CheapestFuelStopSolver,
+}
+
+
+def get_fuel_stop_solver(name: str, **kwargs) -> FuelStopSolver:
+    try:
+        return FUEL_STOP_SOLVERS[name](**kwargs)
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"Unknown fuel stop solver '{name}', expected one of {sorted(FUEL_STOP_SOLVERS)}"
+        )
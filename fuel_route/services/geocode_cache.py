@@ -0,0 +1,182 @@
+import asyncio
+import re
+import threading
+import time
+import unicodedata
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+
+from fuel_route.data.models import GeocodeCacheModel
+from fuel_route.services.async_db import database_sync_to_async
+from fuel_route.services.cache import CacheStats, SingleFlight, TTLLRUCache
+
+LatLon = Tuple[float, float]
+
+
+class GeocodeCache:
+    """
+    Geocoding results keyed on provider and normalized query text: a per-worker
+    memory tier in front of ``GeocodeCacheModel``, with concurrent lookups of the
+    same query coalesced into a single upstream call.
+    """
+
+    _default: Optional["GeocodeCache"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.memory = TTLLRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.stats = CacheStats()
+        self._single_flight = SingleFlight()
+        self._async_flights: Dict[Tuple[int, str, str], asyncio.Future] = {}
+
+    @classmethod
+    def default(cls) -> "GeocodeCache":
+        _default = cls._default
+        if _default is None:
+            with cls._default_lock:
+                _default = cls._default
+                if _default is None:
+                    _default = cls._default = cls(
+                        ttl_seconds=settings.GEOCODE_CACHE_TTL_SECONDS,
+                        max_entries=settings.GEOCODE_CACHE_MAX_ENTRIES,
+                    )
+        return _default
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        _query = unicodedata.normalize("NFKC", query).lower()
+        _query = re.sub(r"\s*,\s*", ", ", _query)
+        _query = re.sub(r"\s+", " ", _query)
+        return _query.strip(" ,.;")[:512]
+
+    def lookup(self, provider: str, query: str) -> Optional[LatLon]:
+        _start = time.perf_counter()
+        _key = (provider, self.normalize(query))
+        _lat_lon = self.memory.get(_key)
+        if _lat_lon is not None:
+            self.stats.record(memory_hits=1, lookup_seconds=time.perf_counter() - _start)
+            return _lat_lon
+
+        _lat_lon = GeocodeCacheModel.objects.filter(provider=_key[0], query=_key[1]).values_list("lat", "lon").first()
+        if _lat_lon is not None:
+            self.memory.set(_key, _lat_lon)
+            self.stats.record(shared_hits=1, lookup_seconds=time.perf_counter() - _start)
+            return _lat_lon
+
+        self.stats.record(misses=1, lookup_seconds=time.perf_counter() - _start)
+        return None
+
+    def lookup_many(self, provider: str, queries: Iterable[str]) -> Dict[str, LatLon]:
+        """
+        Cached coordinates for every query that has them, keyed on the original
+        query text. Memory misses are fetched with a single database query.
+        """
+        _start = time.perf_counter()
+        _found = {}
+        _missing = {}
+        for query in queries:
+            _normalized = self.normalize(query)
+            _lat_lon = self.memory.get((provider, _normalized))
+            if _lat_lon is not None:
+                _found[query] = _lat_lon
+            else:
+                _missing.setdefault(_normalized, []).append(query)
+        _memory_hits = len(_found)
+
+        if _missing:
+            _rows = GeocodeCacheModel.objects.filter(provider=provider, query__in=list(_missing))
+            for _normalized, _lat, _lon in _rows.values_list("query", "lat", "lon"):
+                self.memory.set((provider, _normalized), (_lat, _lon))
+                for query in _missing.pop(_normalized):
+                    _found[query] = (_lat, _lon)
+
+        self.stats.record(
+            memory_hits=_memory_hits,
+            shared_hits=len(_found) - _memory_hits,
+            misses=sum(len(_queries) for _queries in _missing.values()),
+            lookup_seconds=time.perf_counter() - _start,
+        )
+        return _found
+
+    def store(self, provider: str, query: str, lat_lon: LatLon) -> None:
+        _key = (provider, self.normalize(query))
+        self.memory.set(_key, lat_lon)
+        GeocodeCacheModel.objects.get_or_create(
+            provider=_key[0], query=_key[1], defaults={"lat": lat_lon[0], "lon": lat_lon[1]}
+        )
+
+    def store_many(self, provider: str, lat_lons: Dict[str, LatLon]) -> None:
+        _rows = {}
+        for query, lat_lon in lat_lons.items():
+            _normalized = self.normalize(query)
+            self.memory.set((provider, _normalized), lat_lon)
+            _rows[_normalized] = GeocodeCacheModel(provider=provider, query=_normalized, lat=lat_lon[0], lon=lat_lon[1])
+        GeocodeCacheModel.objects.bulk_create(_rows.values(), ignore_conflicts=True)
+
+    def resolve(self, provider: str, query: str, geocode: Callable[[], Optional[LatLon]]) -> Optional[LatLon]:
+        """
+        Cached coordinates for ``query``, calling ``geocode`` at most once per
+        worker for concurrent lookups of the same normalized query. Failed
+        lookups are not cached.
+        """
+        _lat_lon = self.lookup(provider, query)
+        if _lat_lon is not None:
+            return _lat_lon
+
+        def _geocode_and_store():
+            _start = time.perf_counter()
+            _result = geocode()
+            self.stats.record(upstream_calls=1, upstream_seconds=time.perf_counter() - _start)
+            if _result is not None:
+                self.store(provider, query, _result)
+            return _result
+
+        _lat_lon, _shared = self._single_flight.do((provider, self.normalize(query)), _geocode_and_store)
+        if _shared:
+            self.stats.record(coalesced=1)
+        return _lat_lon
+
+    async def resolve_async(
+        self, provider: str, query: str, geocode: Callable[[], Awaitable[Optional[LatLon]]]
+    ) -> Optional[LatLon]:
+        """
+        ``resolve`` for an event loop: concurrent lookups of the same normalized
+        query on one loop await a single ``geocode`` call.
+        """
+        _lat_lon = await database_sync_to_async(self.lookup)(provider, query)
+        if _lat_lon is not None:
+            return _lat_lon
+
+        _flight_key = (id(asyncio.get_running_loop()), provider, self.normalize(query))
+        _flight = self._async_flights.get(_flight_key)
+        if _flight is not None:
+            self.stats.record(coalesced=1)
+            try:
+                return await asyncio.shield(_flight)
+            except asyncio.CancelledError:
+                if not _flight.cancelled():
+                    # This lookup was cancelled, not the one calling upstream
+                    raise
+            # The lookup calling upstream was cancelled, which says nothing about this one: try again
+            return await self.resolve_async(provider, query, geocode)
+
+        _flight = self._async_flights[_flight_key] = asyncio.get_running_loop().create_future()
+        try:
+            _start = time.perf_counter()
+            _lat_lon = await geocode()
+            self.stats.record(upstream_calls=1, upstream_seconds=time.perf_counter() - _start)
+            if _lat_lon is not None:
+                await database_sync_to_async(self.store)(provider, query, _lat_lon)
+            _flight.set_result(_lat_lon)
+            return _lat_lon
+        except asyncio.CancelledError:
+            _flight.cancel()
+            raise
+        except Exception as e:
+            _flight.set_exception(e)
+            # Retrieved here so an exception nobody else awaited is not logged as unhandled
+            _flight.exception()
+            raise
+        finally:
+            del self._async_flights[_flight_key]
@@ -1,14 +1,25 @@
+from django.conf import settings
 from geopy.geocoders import Nominatim, GoogleV3
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 import time
 from typing import Optional, Tuple
 
+from fuel_route.services.geocode_cache import GeocodeCache
+
 
 class GeocodingService:
-    def __init__(self):
+    def __init__(self, geocode_cache: Optional[GeocodeCache] = None):
         self.geolocator = Nominatim(user_agent="fuel_route_app")
+        if geocode_cache is None and settings.GEOCODE_CACHE_ENABLED:
+            geocode_cache = GeocodeCache.default()
+        self.geocode_cache = geocode_cache
 
     def geocode(self, address: str, max_attempts: int = 3) -> Optional[Tuple[float, float]]:
+        if self.geocode_cache is None:
+            return self._geocode(address, max_attempts)
+        return self.geocode_cache.resolve("nominatim", address, lambda: self._geocode(address, max_attempts))
+
+    def _geocode(self, address: str, max_attempts: int = 3) -> Optional[Tuple[float, float]]:
         for attempt in range(max_attempts):
             try:
                 location = self.geolocator.geocode(address, timeout=30)
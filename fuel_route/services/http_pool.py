@@ -0,0 +1,131 @@
+import threading
+import time
+from dataclasses import dataclass, field, fields
+from typing import Dict
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+
+@dataclass
+class ConnectionStats:
+    """
+    Thread-safe counters for a pooled session: requests sent, connections the
+    pools had to open for them, retries (and how many answered 429) and the time
+    spent in requests. ``reuse_ratio`` close to 1 means few handshakes.
+    """
+    requests: int = 0
+    connections_opened: int = 0
+    retries: int = 0
+    throttled: int = 0
+    request_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, **increments) -> None:
+        with self._lock:
+            for _name, _value in increments.items():
+                setattr(self, _name, getattr(self, _name) + _value)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            _stats = {_field.name: getattr(self, _field.name) for _field in fields(self) if _field.repr}
+        _attempts = _stats["requests"] + _stats["retries"]
+        _stats["reuse_ratio"] = 1 - min(_stats["connections_opened"] / _attempts, 1.0) if _attempts else 0.0
+        _stats["avg_request_ms"] = _stats["request_seconds"] * 1000 / _stats["requests"] if _stats["requests"] else 0.0
+        return _stats
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    ``HTTPAdapter`` whose connection pools count the connections they open, and
+    which records every request, with its retries, in ``stats``.
+    """
+
+    def __init__(self, stats: ConnectionStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": self._counting_pool(HTTPConnectionPool),
+            "https": self._counting_pool(HTTPSConnectionPool),
+        }
+
+    def send(self, request, **kwargs):
+        _start = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        finally:
+            self.stats.record(requests=1, request_seconds=time.perf_counter() - _start)
+        _retries = getattr(response.raw, "retries", None)
+        _history = _retries.history if _retries is not None else ()
+        self.stats.record(
+            retries=len(_history),
+            throttled=sum(1 for _attempt in _history if _attempt.status == 429) + (response.status_code == 429),
+        )
+        return response
+
+    def _counting_pool(self, pool_class):
+        stats = self.stats
+
+        class CountingConnectionPool(pool_class):
+            def _new_conn(self):
+                stats.record(connections_opened=1)
+                return super()._new_conn()
+
+        return CountingConnectionPool
+
+
+class PooledSession(requests.Session):
+    """
+    ``requests.Session`` with keep-alive pools of ``pool_size`` connections per
+    host and retries with exponential backoff on connection errors, 429 and
+    502/503/504. A 429 waits for its ``Retry-After`` header when there is one.
+
+    ``shared`` keeps one session per name for the whole process, so every client
+    of the same API reuses the same connections.
+    """
+
+    _shared: Dict[str, "PooledSession"] = {}
+    _shared_lock = threading.Lock()
+
+    RETRY_STATUSES = (429, 502, 503, 504)
+
+    def __init__(self, pool_size: int, max_retries: int, backoff_factor: float):
+        super().__init__()
+        self.stats = ConnectionStats()
+        _retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=self.RETRY_STATUSES,
+            # Directions are POSTs, and as idempotent as the geocoding GETs
+            allowed_methods=frozenset(["GET", "POST"]),
+            respect_retry_after_header=True,
+            # Hand the last response to the caller, which raises its own errors for it
+            raise_on_status=False,
+        )
+        _adapter = PooledHTTPAdapter(self.stats, pool_connections=4, pool_maxsize=pool_size, max_retries=_retry)
+        self.mount("https://", _adapter)
+        self.mount("http://", _adapter)
+
+    @classmethod
+    def shared(cls, name: str) -> "PooledSession":
+        _session = cls._shared.get(name)
+        if _session is None:
+            with cls._shared_lock:
+                _session = cls._shared.get(name)
+                if _session is None:
+                    _session = cls._shared[name] = cls(
+                        pool_size=settings.ORS_POOL_SIZE,
+                        max_retries=settings.ORS_MAX_RETRIES,
+                        backoff_factor=settings.ORS_RETRY_BACKOFF_SECONDS,
+                    )
+        return _session
+
+    @classmethod
+    def shared_stats(cls) -> Dict[str, dict]:
+        return {_name: _session.stats.as_dict() for _name, _session in list(cls._shared.items())}
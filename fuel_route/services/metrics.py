@@ -0,0 +1,81 @@
+from typing import Dict, List
+
+from fuel_route.services.corridor_cache import CorridorCache
+from fuel_route.services.directions_cache import DirectionsCache
+from fuel_route.services.geocode_cache import GeocodeCache
+from fuel_route.services.http_pool import PooledSession
+from fuel_route.services.route_result_cache import RouteResultCache
+from fuel_route.services.route_simplifier import RouteSimplifier
+from fuel_route.services.tracing import StageMetrics
+
+PREFIX = "fuel_route"
+
+# Stats keys that are point-in-time values rather than running totals
+_GAUGE_MARKERS = ("ratio", "avg_", "reduction")
+
+
+def _labels(**labels) -> str:
+    _escaped = {
+        _name: str(_value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for _name, _value in labels.items()
+    }
+    return "{" + ",".join(f'{_name}="{_value}"' for _name, _value in _escaped.items()) + "}"
+
+
+def _stage_lines() -> List[str]:
+    _stages = StageMetrics.default().snapshot()
+    _name = f"{PREFIX}_stage_seconds"
+    _lines = [f"# HELP {_name} Duration of the route pipeline stages", f"# TYPE {_name} histogram"]
+    for _stage, _metrics in sorted(_stages.items()):
+        for _bound, _count in zip(StageMetrics.BUCKETS, _metrics["buckets"]):
+            _lines.append(f"{_name}_bucket{_labels(stage=_stage, le=_bound)} {_count}")
+        _lines.append(f"{_name}_bucket{_labels(stage=_stage, le='+Inf')} {_metrics['count']}")
+        _lines.append(f"{_name}_sum{_labels(stage=_stage)} {_metrics['seconds']}")
+        _lines.append(f"{_name}_count{_labels(stage=_stage)} {_metrics['count']}")
+
+    _name = f"{PREFIX}_stage_items_total"
+    _lines += [f"# HELP {_name} Items (stations, vertices, stops...) processed by each stage", f"# TYPE {_name} counter"]
+    for _stage, _metrics in sorted(_stages.items()):
+        for _item, _total in sorted(_metrics["totals"].items()):
+            _lines.append(f"{_name}{_labels(stage=_stage, item=_item)} {_total}")
+    return _lines
+
+
+def _stats_lines(group: str, label: str, stats: Dict[str, dict]) -> List[str]:
+    """
+    One metric per stats key of ``group``, labelled with the stats owner.
+    """
+    _metrics: Dict[str, List[str]] = {}
+    for _owner, _values in sorted(stats.items()):
+        for _key, _value in _values.items():
+            _gauge = any(_marker in _key for _marker in _GAUGE_MARKERS)
+            _name = f"{PREFIX}_{group}_{_key}" + ("" if _gauge else "_total")
+            _metrics.setdefault(_name, [f"# TYPE {_name} {'gauge' if _gauge else 'counter'}"]).append(
+                f"{_name}{_labels(**{label: _owner})} {_value}"
+            )
+    return [_line for _lines in _metrics.values() for _line in _lines]
+
+
+def render_prometheus() -> str:
+    """
+    Metrics of this process in the Prometheus text format: stage timings and
+    counts from tracing, HTTP pool, cache and route simplification stats.
+    Only stats objects already created are read, nothing is built for it.
+    """
+    _caches = {
+        _name: cache.stats.as_dict()
+        for _name, cache in (
+            ("directions", DirectionsCache._default),
+            ("geocode", GeocodeCache._default),
+            ("corridor", CorridorCache._default),
+            ("route_result", RouteResultCache._default),
+        )
+        if cache is not None
+    }
+    _lines = (
+        _stage_lines()
+        + _stats_lines("http_pool", "pool", PooledSession.shared_stats())
+        + _stats_lines("cache", "cache", _caches)
+        + _stats_lines("route_simplification", "stage", RouteSimplifier.stage_stats())
+    )
+    return "\n".join(_lines) + "\n"
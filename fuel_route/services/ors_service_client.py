@@ -1,11 +1,13 @@
-from typing import List
+import hashlib
+import threading
+import time
+from typing import List, Optional, Tuple
 
-import openrouteservice
+import requests
 from django.conf import settings
 import logging
 
 from geopy import Point
-from openrouteservice import Client
 
 from fuel_route.data.data_types import (
     PeliasSearchResponseType,
@@ -14,33 +16,103 @@ from fuel_route.data.data_types import (
 )
 from fuel_route.data.enums import VehicleProfile
 from fuel_route.data.exceptions import GeocodeNotFoundException
+from fuel_route.services.directions_cache import DirectionsCache
+from fuel_route.services.geocode_cache import GeocodeCache
+from fuel_route.services.http_pool import PooledSession
+from fuel_route.services.routing_backends import (
+    ORSRoutingBackend,
+    RoutingBackend,
+    SessionORSClient,
+    get_routing_backend,
+)
 
 logger = logging.getLogger(__name__)
 
+# Hosted openrouteservice API; cache keys of every other ORS server name its URL
+HOSTED_ORS_URL = "https://api.openrouteservice.org"
+
 
 class ORSClient:
-    def __init__(self):
-        self.client: Client = openrouteservice.Client(
-            key=settings.OPENROUTESERVICE_API_KEY
-        )
+    """
+    Geocoding with openrouteservice, and directions from the configured
+    ``RoutingBackend`` (the hosted ORS API by default). openrouteservice calls go
+    through the process-wide pooled ``"ors"`` session unless ``session`` is given.
+    """
+
+    _shared: Optional["ORSClient"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(
+        self,
+        directions_cache: Optional[DirectionsCache] = None,
+        geocode_cache: Optional[GeocodeCache] = None,
+        session: Optional[requests.Session] = None,
+        routing_backend: Optional[RoutingBackend] = None,
+    ):
+        self.client: SessionORSClient = ORSRoutingBackend.make_client(settings.OPENROUTESERVICE_BASE_URL, session)
+        if routing_backend is None:
+            if settings.ROUTING_BACKEND == ORSRoutingBackend.name and not settings.ROUTING_BACKEND_URL:
+                routing_backend = ORSRoutingBackend(self.client)
+            else:
+                routing_backend = get_routing_backend(settings.ROUTING_BACKEND)
+        self.routing_backend = routing_backend
+        self.directions_url = settings.ROUTING_BACKEND_URL or settings.OPENROUTESERVICE_BASE_URL
+        self.geocode_provider = self.ors_geocode_provider(settings.OPENROUTESERVICE_BASE_URL)
+        if directions_cache is None and settings.DIRECTIONS_CACHE_ENABLED:
+            directions_cache = DirectionsCache.default()
+        if geocode_cache is None and settings.GEOCODE_CACHE_ENABLED:
+            geocode_cache = GeocodeCache.default()
+        self.directions_cache = directions_cache
+        self.geocode_cache = geocode_cache
+
+    @classmethod
+    def shared(cls) -> "ORSClient":
+        """
+        Client with the default caches, created on first use and kept for the
+        life of the process.
+        """
+        _client = cls._shared
+        if _client is None:
+            with cls._shared_lock:
+                _client = cls._shared
+                if _client is None:
+                    _client = cls._shared = cls()
+        return _client
+
+    @property
+    def connection_stats(self) -> dict:
+        return self.client.session.stats.as_dict() if isinstance(self.client.session, PooledSession) else {}
 
-    def geocode(self, address: str, dry_run: bool = False) -> Coordinates:
+    def geocode(self, address: str, dry_run: bool = False, use_cache: bool = True) -> Coordinates:
+        if self.geocode_cache is None or not use_cache:
+            _lat, _lon = self._pelias_search(address)
+        else:
+            _lat, _lon = self.geocode_cache.resolve(self.geocode_provider, address, lambda: self._pelias_search(address))
+        _coordinates: Coordinates = Coordinates(lat=_lat, lon=_lon)
+        logger.info(f"ORS Geocoding response coordenates: {_coordinates}")
+        return _coordinates
+
+    def _pelias_search(self, address: str) -> Tuple[float, float]:
+        return self.parse_pelias_response(address, self._pelias_response(address))
+
+    def _pelias_response(self, address: str) -> dict:
         _sources = ["osm", "gn", "wof"]
         _country = "US"
         _layers = ["venue", "address", "street"]
         _size = 1
-        _geocoding_response = self.client.pelias_search(
+        return self.client.pelias_search(
             text=address, sources=_sources, country=_country, layers=_layers, size=_size
         )
-        _pelias_response = PeliasSearchResponseType.from_dict(_geocoding_response)
+
+    @staticmethod
+    def parse_pelias_response(address: str, geocoding_response: dict) -> Tuple[float, float]:
+        _pelias_response = PeliasSearchResponseType.from_dict(geocoding_response)
         if not _pelias_response.features:
             raise GeocodeNotFoundException(f"Unable to geocode location: {address}")
-        _coordinates: Coordinates = Coordinates(
-            lat=_pelias_response.features[0].geometry.coordinates[1],
-            lon=_pelias_response.features[0].geometry.coordinates[0],
+        return (
+            _pelias_response.features[0].geometry.coordinates[1],
+            _pelias_response.features[0].geometry.coordinates[0],
         )
-        logger.info(f"ORS Geocoding response coordenates: {_coordinates}")
-        return _coordinates
 
     def get_directions(
         self,
@@ -50,20 +122,16 @@ class ORSClient:
         output_format: str = "geojson",
         instructions: bool = False,
         include_geometry: bool = True,
+        refresh_cache: bool = False,
     ):
-        _directions = self.client.directions(
+        return self._directions(
             coordinates=[[start.lon, start.lat], [end.lon, end.lat]],
-            profile=vehicle_profile,
-            format=output_format,
+            vehicle_profile=vehicle_profile,
+            output_format=output_format,
             instructions=instructions,
-            geometry=include_geometry,
-            units="mi",
-            language="en",
-            dry_run=False,
+            include_geometry=include_geometry,
+            refresh_cache=refresh_cache,
         )
-        _ors_directions = DirectionsResponseType.from_dict(_directions)
-        return _ors_directions
-
 
     def get_directions_from_multipoint(
         self,
@@ -72,17 +140,78 @@ class ORSClient:
         output_format: str = "geojson",
         instructions: bool = False,
         include_geometry: bool = True,
+        refresh_cache: bool = False,
     ):
-        _route_coords = [[coord.lon, coord.lat] for coord in route]
-        _directions = self.client.directions(
-            coordinates=_route_coords,
-            profile=vehicle_profile,
+        return self._directions(
+            coordinates=[[coord.lon, coord.lat] for coord in route],
+            vehicle_profile=vehicle_profile,
+            output_format=output_format,
+            instructions=instructions,
+            include_geometry=include_geometry,
+            refresh_cache=refresh_cache,
+        )
+
+    def _directions(
+        self,
+        coordinates: List[List[float]],
+        vehicle_profile: str,
+        output_format: str,
+        instructions: bool,
+        include_geometry: bool,
+        refresh_cache: bool = False,
+    ) -> DirectionsResponseType:
+        _options = self.directions_options(output_format, instructions, include_geometry)
+        _cache_key = None
+        if self.directions_cache is not None:
+            _cache_key = self.directions_cache.make_key(
+                coordinates, vehicle_profile, **self.cache_key_options(self.routing_backend.name, _options, self.directions_url)
+            )
+            _directions = None if refresh_cache else self.directions_cache.get(_cache_key)
+            if _directions is not None:
+                return DirectionsResponseType.from_dict(_directions)
+
+        _start = time.perf_counter()
+        _directions = self.routing_backend.directions(coordinates, vehicle_profile, **_options)
+        if self.directions_cache is not None:
+            self.directions_cache.record_upstream(time.perf_counter() - _start)
+            self.directions_cache.set(_cache_key, coordinates, vehicle_profile, _directions)
+        _ors_directions = DirectionsResponseType.from_dict(_directions)
+        return _ors_directions
+
+    @staticmethod
+    def cache_key_options(backend_name: str, options: dict, url: str = HOSTED_ORS_URL) -> dict:
+        """
+        Options of the directions cache key. Responses of other backends, and of
+        any server other than the hosted API at ``url`` (self-hosted, or the mock
+        of a load test), are kept apart from hosted ORS ones, whose keys stay as
+        they were so warmed caches survive.
+        """
+        _options = dict(options)
+        if backend_name != ORSRoutingBackend.name:
+            _options["backend"] = backend_name
+        if url and url.rstrip("/") != HOSTED_ORS_URL:
+            _options["url"] = url.rstrip("/")
+        return _options
+
+    @staticmethod
+    def ors_geocode_provider(base_url: str) -> str:
+        """
+        Geocode cache provider of the ORS server at ``base_url``: ``ors`` for the
+        hosted API, and one per other server so their results never mix.
+        """
+        if base_url.rstrip("/") == HOSTED_ORS_URL:
+            return "ors"
+        return f"ors:{hashlib.sha256(base_url.rstrip('/').encode()).hexdigest()[:16]}"
+
+    @staticmethod
+    def directions_options(output_format: str, instructions: bool, include_geometry: bool) -> dict:
+        """
+        Request options of a directions call, also part of its cache key.
+        """
+        return dict(
             format=output_format,
             instructions=instructions,
             geometry=include_geometry,
             units="mi",
             language="en",
-            dry_run=False,
         )
-        _ors_directions = DirectionsResponseType.from_dict(_directions)
-        return _ors_directions
@@ -0,0 +1,286 @@
+import heapq
+import json
+import logging
+import math
+import re
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from fuel_route.data.enums import EARTH_RADIUS_METERS
+from fuel_route.data.exceptions import RouteNotFoundException
+from fuel_route.services.cache import TTLLRUCache
+from fuel_route.services.route_geometry import haversine_miles, MILES_PER_METER
+
+logger = logging.getLogger(__name__)
+
+
+class RoadGraph:
+    """
+    Directed road graph in compressed sparse row form: node ``lons``/``lats`` and,
+    for every node, its outgoing edges ``indptr[n]:indptr[n + 1]`` into
+    ``indices`` (target node), ``miles`` and ``seconds``.
+
+    Edges are straight segments between their nodes, so an edge is never shorter
+    than the great circle between them and the A* heuristic stays admissible.
+    """
+
+    # Targets whose A* heuristic is kept between searches, so repeat routes and
+    # the legs of multi-stop routes reuse what earlier searches computed
+    HEURISTIC_CACHE_TARGETS = 256
+
+    def __init__(self, lons, lats, indptr, indices, miles, seconds):
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.miles = np.asarray(miles, dtype=np.float64)
+        self.seconds = np.asarray(seconds, dtype=np.float64)
+        # Fastest edge speed, bounds the remaining travel time from below
+        self.max_speed_mph = float((self.miles / self.seconds).max() * 3600) if len(self.seconds) else 1.0
+        # Plain lists make the per-edge loop of the search several times faster than NumPy scalars
+        self._indptr = self.indptr.tolist()
+        self._indices = self.indices.tolist()
+        self._seconds = self.seconds.tolist()
+        self._lat_radians = np.radians(self.lats).tolist()
+        self._lon_radians = np.radians(self.lons).tolist()
+        self._heuristics = TTLLRUCache(max_entries=self.HEURISTIC_CACHE_TARGETS, ttl_seconds=math.inf)
+
+    def __len__(self):
+        return len(self.lons)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices)
+
+    @classmethod
+    def from_edges(cls, lons, lats, sources, targets, speeds_mph) -> "RoadGraph":
+        """
+        Graph over the given nodes and directed ``sources -> targets`` edges.
+        """
+        _lons = np.asarray(lons, dtype=np.float64)
+        _lats = np.asarray(lats, dtype=np.float64)
+        _sources = np.asarray(sources, dtype=np.int64)
+        _targets = np.asarray(targets, dtype=np.int64)
+        _miles = haversine_miles(_lons[_sources], _lats[_sources], _lons[_targets], _lats[_targets])
+        _seconds = _miles / np.asarray(speeds_mph, dtype=np.float64) * 3600
+
+        _order = np.argsort(_sources, kind="stable")
+        _indptr = np.zeros(len(_lons) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(_sources, minlength=len(_lons)), out=_indptr[1:])
+        return cls(_lons, _lats, _indptr, _targets[_order], _miles[_order], _seconds[_order])
+
+    @classmethod
+    def from_geojson(cls, path: str, default_speed_mph: float = 55, precision: int = 6) -> "RoadGraph":
+        """
+        Graph of the ``LineString``/``MultiLineString`` features of a GeoJSON file,
+        e.g. an OSM or TIGER road extract. Vertices closer than ``precision``
+        decimals are the same node, which is how roads connect.
+
+        Honors the OSM ``maxspeed`` (km/h unless it says mph) and ``oneway``
+        properties of a feature.
+        """
+        with open(path, "r") as geojson_file:
+            _features = json.load(geojson_file)["features"]
+
+        _nodes = {}
+        _sources: List[int] = []
+        _targets: List[int] = []
+        _speeds: List[float] = []
+        for _feature in _features:
+            _geometry = _feature.get("geometry") or {}
+            _properties = _feature.get("properties") or {}
+            if _geometry.get("type") == "LineString":
+                _lines = [_geometry["coordinates"]]
+            elif _geometry.get("type") == "MultiLineString":
+                _lines = _geometry["coordinates"]
+            else:
+                continue
+            _speed = cls._parse_speed(_properties.get("maxspeed"), default_speed_mph)
+            _oneway = str(_properties.get("oneway", "no")).lower() in ("yes", "true", "1")
+            for _line in _lines:
+                _ids = [
+                    _nodes.setdefault((round(_lon, precision), round(_lat, precision)), len(_nodes))
+                    for _lon, _lat, *_ in _line
+                ]
+                for _source, _target in zip(_ids[:-1], _ids[1:]):
+                    if _source == _target:
+                        continue
+                    _sources.append(_source)
+                    _targets.append(_target)
+                    _speeds.append(_speed)
+                    if not _oneway:
+                        _sources.append(_target)
+                        _targets.append(_source)
+                        _speeds.append(_speed)
+
+        _coordinates = np.array(list(_nodes), dtype=np.float64).reshape(-1, 2)
+        return cls.from_edges(_coordinates[:, 0], _coordinates[:, 1], _sources, _targets, _speeds)
+
+    @staticmethod
+    def _parse_speed(maxspeed, default_speed_mph: float) -> float:
+        _match = re.match(r"\s*(\d+(?:\.\d+)?)", str(maxspeed)) if maxspeed is not None else None
+        if _match is None:
+            return default_speed_mph
+        _speed = float(_match.group(1))
+        return _speed if "mph" in str(maxspeed) else _speed * 0.621371
+
+    @classmethod
+    def load(cls, path: str) -> "RoadGraph":
+        with np.load(path) as _arrays:
+            return cls(**{_name: _arrays[_name] for _name in ("lons", "lats", "indptr", "indices", "miles", "seconds")})
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path, lons=self.lons, lats=self.lats, indptr=self.indptr,
+            indices=self.indices, miles=self.miles, seconds=self.seconds,
+        )
+
+    def nearest_nodes(self, points: Iterable[Tuple[float, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Closest node of every ``(lon, lat)`` point and its distance in miles.
+        """
+        _nodes, _distances = [], []
+        for _lon, _lat in points:
+            _node = int(np.argmin(
+                (self.lons - _lon) ** 2 * np.cos(np.radians(_lat)) ** 2 + (self.lats - _lat) ** 2
+            ))
+            _nodes.append(_node)
+            _distances.append(float(haversine_miles(_lon, _lat, self.lons[_node], self.lats[_node])))
+        return np.array(_nodes, dtype=np.int64), np.array(_distances)
+
+    def shortest_path(self, source: int, target: int) -> Tuple[List[int], float, float]:
+        """
+        Fastest path between two nodes with A*, as ``(nodes, miles, seconds)``.
+
+        The heuristic is the great-circle time to ``target`` at the graph's top
+        speed, computed only for the nodes the search reaches and kept per target.
+        """
+        if source == target:
+            return [source], 0.0, 0.0
+        _heuristic = self._heuristic(target)
+        _seconds_to_target = self._seconds_to(target)
+        _indptr, _indices, _seconds = self._indptr, self._indices, self._seconds
+
+        _best = {source: 0.0}
+        _previous = {}
+        _closed = set()
+        _heap = [(_seconds_to_target(source), 0.0, source)]
+        while _heap:
+            _, _cost, _node = heapq.heappop(_heap)
+            if _node == target:
+                break
+            if _node in _closed:
+                continue
+            _closed.add(_node)
+            for _edge in range(_indptr[_node], _indptr[_node + 1]):
+                _next = _indices[_edge]
+                _next_cost = _cost + _seconds[_edge]
+                if _next_cost < _best.get(_next, float("inf")):
+                    _best[_next] = _next_cost
+                    _previous[_next] = (_node, _edge)
+                    _estimate = _heuristic.get(_next)
+                    if _estimate is None:
+                        _estimate = _heuristic[_next] = _seconds_to_target(_next)
+                    heapq.heappush(_heap, (_next_cost + _estimate, _next_cost, _next))
+        else:
+            raise RouteNotFoundException(f"No road between nodes {source} and {target}")
+
+        _path, _edges = [target], []
+        while _path[-1] != source:
+            _node, _edge = _previous[_path[-1]]
+            _path.append(_node)
+            _edges.append(_edge)
+        _path.reverse()
+        return _path, float(self.miles[_edges].sum()), _best[target]
+
+    def _heuristic(self, target: int) -> dict:
+        """
+        Estimates already computed for ``target``, by node. Searches towards the
+        same target fill the same dict; each entry is the same for every search.
+        """
+        _estimates = self._heuristics.get(target)
+        if _estimates is None:
+            _estimates = {}
+            self._heuristics.set(target, _estimates)
+        return _estimates
+
+    def _seconds_to(self, target: int):
+        """
+        Great-circle travel time from a node to ``target`` at the top speed, as
+        ``haversine_miles`` computes it but on Python floats, one node at a time.
+        """
+        _lats, _lons = self._lat_radians, self._lon_radians
+        _target_lat, _target_lon = _lats[target], _lons[target]
+        _cos_target = math.cos(_target_lat)
+        _seconds_per_radian = 2 * EARTH_RADIUS_METERS * MILES_PER_METER / self.max_speed_mph * 3600
+
+        def _seconds(node: int) -> float:
+            _a = (
+                math.sin((_target_lat - _lats[node]) / 2) ** 2
+                + math.cos(_lats[node]) * _cos_target * math.sin((_target_lon - _lons[node]) / 2) ** 2
+            )
+            return _seconds_per_radian * math.asin(math.sqrt(min(max(_a, 0.0), 1.0)))
+
+        return _seconds
+
+    def route(self, waypoints: List[List[float]], max_snap_miles: Optional[float] = None):
+        """
+        Fastest route through ``[lon, lat]`` waypoints, as the route's
+        ``[lon, lat]`` vertices, the vertex index of every waypoint, miles and seconds.
+        """
+        _nodes, _snap_miles = self.nearest_nodes(waypoints)
+        if max_snap_miles is not None and (_snap_miles > max_snap_miles).any():
+            _far = int(np.argmax(_snap_miles))
+            raise RouteNotFoundException(
+                f"Waypoint {waypoints[_far]} is {_snap_miles[_far]:.1f} mi from the nearest road"
+            )
+
+        _path = [int(_nodes[0])]
+        _way_points = [0]
+        _miles = _seconds = 0.0
+        for _source, _target in zip(_nodes[:-1], _nodes[1:]):
+            _leg, _leg_miles, _leg_seconds = self.shortest_path(int(_source), int(_target))
+            _path.extend(_leg[1:])
+            _way_points.append(len(_path) - 1)
+            _miles += _leg_miles
+            _seconds += _leg_seconds
+        if len(_path) == 1:
+            # All waypoints snapped to one node, keep the line a line
+            _path.append(_path[0])
+        _coordinates = np.column_stack((self.lons[_path], self.lats[_path])).tolist()
+        return _coordinates, _way_points, _miles, _seconds
+
+
+def grid_road_graph(
+    west: float,
+    south: float,
+    east: float,
+    north: float,
+    step_degrees: float = 0.1,
+    speed_mph: float = 55,
+) -> RoadGraph:
+    """
+    Two-way grid of roads every ``step_degrees`` over a bounding box, with
+    diagonals so routes are not staircases.
+
+    For benchmarks only: it gives the offline routing backend a network with no
+    road data, but its routes ignore real roads, and a large box at a fine step
+    makes a graph of millions of edges that every search crawls through.
+    """
+    _lons = np.arange(west, east + step_degrees / 2, step_degrees)
+    _lats = np.arange(south, north + step_degrees / 2, step_degrees)
+    _grid_lons, _grid_lats = np.meshgrid(_lons, _lats)
+    _ids = np.arange(_grid_lons.size).reshape(_grid_lons.shape)
+
+    _pairs = [
+        (_ids[:, :-1], _ids[:, 1:]),  # east
+        (_ids[:-1, :], _ids[1:, :]),  # north
+        (_ids[:-1, :-1], _ids[1:, 1:]),  # north-east
+        (_ids[1:, :-1], _ids[:-1, 1:]),  # south-east
+    ]
+    _sources = np.concatenate([_a.ravel() for _a, _ in _pairs] + [_b.ravel() for _, _b in _pairs])
+    _targets = np.concatenate([_b.ravel() for _, _b in _pairs] + [_a.ravel() for _a, _ in _pairs])
+    return RoadGraph.from_edges(
+        _grid_lons.ravel(), _grid_lats.ravel(), _sources, _targets, np.full(len(_sources), speed_mph)
+    )
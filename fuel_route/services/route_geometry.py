@@ -0,0 +1,217 @@
+import heapq
+
+import numpy as np
+from django.contrib.gis.measure import D
+
+from fuel_route.data.enums import EARTH_RADIUS_METERS
+
+MILES_PER_METER = D(m=1).mi
+METERS_PER_DEGREE = EARTH_RADIUS_METERS * np.pi / 180
+
+
+def haversine_meters(lon1, lat1, lon2, lat2) -> np.ndarray:
+    """
+    Great-circle distance in meters between two sets of lon/lat points.
+
+    Uses the same sphere as PostGIS ``ST_DistanceSphere`` so results line up with
+    the ``Distance`` annotations computed on ``FuelStationModel.location``.
+    Arguments may be scalars or NumPy arrays and are broadcast together.
+    """
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    _dlat = lat2 - lat1
+    _dlon = lon2 - lon1
+    _a = np.sin(_dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(_dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(_a, 0.0, 1.0)))
+
+
+def haversine_miles(lon1, lat1, lon2, lat2) -> np.ndarray:
+    return haversine_meters(lon1, lat1, lon2, lat2) * MILES_PER_METER
+
+
+def douglas_peucker(coordinates, tolerance_meters: float) -> np.ndarray:
+    """
+    Indices of the vertices Douglas-Peucker keeps, so that no dropped vertex is
+    more than ``tolerance_meters`` from the simplified line. Distances are taken
+    in a local equirectangular frame around each anchor segment, like ``snap``.
+    """
+    _coordinates = np.asarray(coordinates, dtype=float)[:, :2]
+    if len(_coordinates) < 3 or tolerance_meters <= 0:
+        return np.arange(len(_coordinates))
+
+    _keep = np.zeros(len(_coordinates), dtype=bool)
+    _keep[[0, -1]] = True
+    _tolerance_degrees = tolerance_meters / METERS_PER_DEGREE
+    _stack = [(0, len(_coordinates) - 1)]
+    while _stack:
+        _first, _last = _stack.pop()
+        if _last - _first < 2:
+            continue
+        _scale = np.cos(np.radians((_coordinates[_first, 1] + _coordinates[_last, 1]) / 2))
+        _ax, _ay = _coordinates[_first, 0] * _scale, _coordinates[_first, 1]
+        _dx, _dy = _coordinates[_last, 0] * _scale - _ax, _coordinates[_last, 1] - _ay
+        _px = _coordinates[_first + 1:_last, 0] * _scale - _ax
+        _py = _coordinates[_first + 1:_last, 1] - _ay
+        _squared_length = _dx * _dx + _dy * _dy
+        if _squared_length > 0:
+            _t = np.clip((_px * _dx + _py * _dy) / _squared_length, 0.0, 1.0)
+            _distances = np.hypot(_px - _t * _dx, _py - _t * _dy)
+        else:
+            _distances = np.hypot(_px, _py)
+        _farthest = int(np.argmax(_distances))
+        if _distances[_farthest] > _tolerance_degrees:
+            _split = _first + 1 + _farthest
+            _keep[_split] = True
+            _stack.extend(((_first, _split), (_split, _last)))
+    return np.flatnonzero(_keep)
+
+
+def visvalingam(coordinates, tolerance_meters: float) -> np.ndarray:
+    """
+    Indices of the vertices Visvalingam-Whyatt keeps: vertices are dropped
+    smallest effective area first while that area is under ``tolerance_meters``
+    squared. Smoother than Douglas-Peucker at the same vertex count, but slower.
+    """
+    _coordinates = np.asarray(coordinates, dtype=float)[:, :2]
+    _count = len(_coordinates)
+    if _count < 3 or tolerance_meters <= 0:
+        return np.arange(_count)
+
+    _x = _coordinates[:, 0] * np.cos(np.radians(_coordinates[:, 1])) * METERS_PER_DEGREE
+    _y = _coordinates[:, 1] * METERS_PER_DEGREE
+
+    def _area(_previous: int, _vertex: int, _next: int) -> float:
+        return abs(
+            (_x[_previous] - _x[_vertex]) * (_y[_next] - _y[_vertex])
+            - (_x[_next] - _x[_vertex]) * (_y[_previous] - _y[_vertex])
+        ) / 2
+
+    _previous = list(range(-1, _count - 1))
+    _next = list(range(1, _count + 1))
+    _areas = [float("inf")] * _count
+    _heap = []
+    for _vertex in range(1, _count - 1):
+        _areas[_vertex] = _area(_vertex - 1, _vertex, _vertex + 1)
+        _heap.append((_areas[_vertex], _vertex))
+    heapq.heapify(_heap)
+
+    _keep = np.ones(_count, dtype=bool)
+    _threshold = tolerance_meters ** 2
+    _floor = 0.0
+    while _heap:
+        _vertex_area, _vertex = heapq.heappop(_heap)
+        if not _keep[_vertex] or _vertex_area != _areas[_vertex]:
+            continue
+        # A neighbour's area never counts as smaller than the area already removed
+        _floor = max(_floor, _vertex_area)
+        if _floor >= _threshold:
+            break
+        _keep[_vertex] = False
+        _before, _after = _previous[_vertex], _next[_vertex]
+        _next[_before], _previous[_after] = _after, _before
+        for _neighbour in (_before, _after):
+            if 0 < _neighbour < _count - 1:
+                _areas[_neighbour] = max(_area(_previous[_neighbour], _neighbour, _next[_neighbour]), _floor)
+                heapq.heappush(_heap, (_areas[_neighbour], _neighbour))
+    return np.flatnonzero(_keep)
+
+
+class RouteGeometry:
+    """
+    Route polyline of lon/lat vertices with its cumulative mileage, computed once
+    so along-route distances never need a GEOS reprojection.
+
+    Stations are snapped to their nearest segment in one vectorized projection,
+    after which any along-route mileage is a lookup in ``cumulative_miles``.
+    """
+
+    # Upper bound on station x segment pairs projected at once
+    SNAP_CHUNK_PAIRS = 2_000_000
+
+    def __init__(self, coordinates):
+        self.coordinates = np.asarray(coordinates, dtype=float)[:, :2]
+        _lons, _lats = self.coordinates[:, 0], self.coordinates[:, 1]
+        self.segment_miles = haversine_miles(_lons[:-1], _lats[:-1], _lons[1:], _lats[1:])
+        self.cumulative_miles = np.concatenate(([0.0], np.cumsum(self.segment_miles)))
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    @property
+    def length(self) -> float:
+        return float(self.cumulative_miles[-1])
+
+    def mileage_at_vertex(self, index: int) -> float:
+        return float(self.cumulative_miles[index])
+
+    def point_at(self, mileage: float):
+        """
+        ``(lon, lat)`` of the point ``mileage`` miles along the route, in O(log n).
+        """
+        _mileage = min(max(mileage, 0.0), self.length)
+        _segment = int(np.searchsorted(self.cumulative_miles, _mileage, side="right")) - 1
+        _segment = min(_segment, len(self.segment_miles) - 1)
+        if _segment < 0:
+            return float(self.coordinates[0, 0]), float(self.coordinates[0, 1])
+        _leg = self.segment_miles[_segment]
+        _t = (_mileage - self.cumulative_miles[_segment]) / _leg if _leg else 0.0
+        _start, _end = self.coordinates[_segment], self.coordinates[_segment + 1]
+        _point = _start + (_end - _start) * _t
+        return float(_point[0]), float(_point[1])
+
+    def between(self, start_mileage: float, end_mileage: float) -> np.ndarray:
+        """
+        Vertices of the stretch of route between two mileages, starting and
+        ending on the interpolated points at those mileages.
+        """
+        _inner = np.flatnonzero(
+            (self.cumulative_miles > start_mileage) & (self.cumulative_miles < end_mileage)
+        )
+        return np.vstack((
+            self.point_at(start_mileage),
+            self.coordinates[_inner],
+            self.point_at(end_mileage),
+        ))
+
+    def snap(self, lons, lats):
+        """
+        Projects points onto their nearest segment in a local equirectangular
+        frame. Returns the along-route mileage of every projection and the
+        distance in miles from each point to the route.
+        """
+        _lons = np.atleast_1d(np.asarray(lons, dtype=float))
+        _lats = np.atleast_1d(np.asarray(lats, dtype=float))
+        _mileages = np.empty(len(_lons))
+        _distances = np.empty(len(_lons))
+        if len(self.coordinates) < 2:
+            _mileages[:] = 0.0
+            _distances[:] = haversine_miles(self.coordinates[0, 0], self.coordinates[0, 1], _lons, _lats)
+            return _mileages, _distances
+
+        _lon0, _lat0 = self.coordinates[:-1, 0], self.coordinates[:-1, 1]
+        _lon1, _lat1 = self.coordinates[1:, 0], self.coordinates[1:, 1]
+        _scale = np.cos(np.radians((_lat0 + _lat1) / 2))
+        _ax, _ay = _lon0 * _scale, _lat0
+        _dx, _dy = _lon1 * _scale - _ax, _lat1 - _ay
+        _squared_length = _dx * _dx + _dy * _dy
+
+        _chunk = max(1, self.SNAP_CHUNK_PAIRS // len(_lon0))
+        for _begin in range(0, len(_lons), _chunk):
+            _end = _begin + _chunk
+            _px = _lons[_begin:_end, None] * _scale - _ax
+            _py = _lats[_begin:_end, None] - _ay
+            _t = np.divide(
+                _px * _dx + _py * _dy, _squared_length,
+                out=np.zeros_like(_px), where=_squared_length > 0,
+            )
+            _t = np.clip(_t, 0.0, 1.0)
+            _squared_distances = (_px - _t * _dx) ** 2 + (_py - _t * _dy) ** 2
+            _nearest = np.argmin(_squared_distances, axis=1)
+            _rows = np.arange(len(_nearest))
+            _t_nearest = _t[_rows, _nearest]
+            _mileages[_begin:_end] = self.cumulative_miles[_nearest] + _t_nearest * self.segment_miles[_nearest]
+            _starts = self.coordinates[_nearest]
+            _snapped = _starts + (self.coordinates[_nearest + 1] - _starts) * _t_nearest[:, None]
+            _distances[_begin:_end] = haversine_miles(
+                _lons[_begin:_end], _lats[_begin:_end], _snapped[:, 0], _snapped[:, 1]
+            )
+        return _mileages, _distances
@@ -0,0 +1,145 @@
+import logging
+import uuid
+from typing import Optional
+
+import folium
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from folium import PolyLine
+
+from fuel_route.data.data_types import MapRoute, MapStop, Route
+from fuel_route.services.cache import SingleFlight
+from fuel_route.services.coordinate_codecs import decode_delta, encode_delta
+from fuel_route.services.route_geometry import RouteGeometry
+from fuel_route.services.route_simplifier import RouteSimplifier
+from fuel_route.services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class RouteMapService:
+    """
+    Keeps computed routes in the ``ROUTE_CACHE_ALIAS`` cache under a route id, so
+    the folium map is only rendered when a client asks for it, and only once per
+    route: the rendered HTML is cached next to the route.
+
+    Only what the map draws is stored, as it is written for every planned route:
+    the vertices delta-encoded and the name, price and location of each stop.
+    """
+
+    _single_flight = SingleFlight()
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else caches[settings.ROUTE_CACHE_ALIAS]
+
+    def store_route(self, route: Route) -> str:
+        route_id = uuid.uuid4().hex
+        _stops = [
+            (stop.id, stop.truckstop_name, float(stop.retail_price), stop.location.x, stop.location.y)
+            for stop in route.fuel_stops
+        ]
+        self.cache.set(self._route_key(route_id), {"coordinates": encode_delta(route.coordinates), "stops": _stops})
+        return route_id
+
+    def has_route(self, route_id: str) -> bool:
+        return self.cache.has_key(self._route_key(route_id))
+
+    def get_route(self, route_id: str) -> Optional[MapRoute]:
+        _stored = self.cache.get(self._route_key(route_id))
+        if _stored is None:
+            return None
+        return MapRoute(
+            coordinates=decode_delta(_stored["coordinates"]),
+            fuel_stops=[MapStop(*_stop) for _stop in _stored["stops"]],
+        )
+
+    def get_map_html(self, route_id: str) -> Optional[str]:
+        """
+        Rendered map of a stored route, or ``None`` when the route expired.
+        Concurrent requests for the same map in a worker share one rendering.
+        """
+        _map_html = self.cache.get(self._map_key(route_id))
+        if _map_html is not None:
+            return _map_html
+        _map_html, _ = self._single_flight.do(route_id, lambda: self._render_and_store(route_id))
+        return _map_html
+
+    def _render_and_store(self, route_id: str) -> Optional[str]:
+        route = self.get_route(route_id)
+        if route is None:
+            return None
+        with span("map", vertices=len(route.coordinates), stops=len(route.fuel_stops)) as _span:
+            _map_html = self.render_route_map(route)
+            _span.set(bytes=len(_map_html))
+        self.cache.set(self._map_key(route_id), _map_html)
+        return _map_html
+
+    @staticmethod
+    def _route_key(route_id: str) -> str:
+        return f"route:{route_id}"
+
+    @staticmethod
+    def _map_key(route_id: str) -> str:
+        return f"route-map:{route_id}"
+
+    @staticmethod
+    def render_route_map(route: MapRoute) -> str:
+        m = folium.Map(location=[route.coordinates[0][1], route.coordinates[0][0]], zoom_start=6)
+
+        folium.Marker([route.coordinates[0][1], route.coordinates[0][0]], popup="Start",
+                      icon=folium.Icon(color="green")).add_to(m)
+        folium.Marker([route.coordinates[-1][1], route.coordinates[-1][0]], popup="End",
+                      icon=folium.Icon(color="red")).add_to(m)
+
+        geometry = RouteGeometry(route.coordinates)
+        _total_distance = geometry.length
+        # Mileages never decrease from one stop to the next, as in FuelStationService.locate_stops
+        _mileages, _distances_to_route = geometry.snap(
+            [stop.lon for stop in route.fuel_stops], [stop.lat for stop in route.fuel_stops]
+        )
+        _mileages = np.maximum.accumulate(_mileages) if len(_mileages) else _mileages
+
+        previous_mileage = 0.0
+        for stop, _mileage, _distance_to_route in zip(route.fuel_stops, _mileages, _distances_to_route):
+            segment_distance = _mileage - previous_mileage
+            folium.Marker(
+                location=[stop.lat, stop.lon],
+                popup=f"{stop.truckstop_name}<br>Price: ${stop.retail_price:.2f}, Distance to last point: {segment_distance:.1f} mi, Distance to route: {_distance_to_route:.4f} mi",
+                icon=folium.Icon(color="blue", icon="gas-pump", prefix="fa")
+            ).add_to(m)
+            RouteMapService._add_segment_label(m, geometry, previous_mileage, _mileage)
+            previous_mileage = _mileage
+
+        RouteMapService._add_segment_label(m, geometry, previous_mileage, _total_distance)
+        # Create a PolyLine for the complete route, reduced to what the map can show
+        _polyline = RouteSimplifier.for_stage("map").simplify(route.coordinates)
+        PolyLine(
+            [(lat, lon) for lon, lat in _polyline.tolist()],
+            weight=5,
+            color="red",
+            opacity=0.8
+        ).add_to(m)
+
+        folium.Marker(
+            [route.coordinates[0][1], route.coordinates[0][0]],
+            icon=folium.DivIcon(
+                html=f'<div style="font-size: 12pt"><strong>Total: {_total_distance:.1f} mi</strong></div>'),
+            popup=f"Total distance: {_total_distance:.1f} miles"
+        ).add_to(m)
+
+        m.fit_bounds([(lat, lon) for lon, lat in _polyline.tolist()])
+
+        return m._repr_html_()
+
+    @staticmethod
+    def _add_segment_label(m: folium.Map, geometry: RouteGeometry, start_mileage: float, end_mileage: float):
+        """
+        Mileage of a route segment, placed on the route halfway through it.
+        """
+        _lon, _lat = geometry.point_at((start_mileage + end_mileage) / 2)
+        folium.Marker(
+            [_lat, _lon],
+            icon=folium.DivIcon(
+                html=f'<div style="font-size: 12pt;font-weight: bolder;">{end_mileage - start_mileage:.1f} mi</div>')
+        ).add_to(m)
@@ -0,0 +1,346 @@
+import asyncio
+import dataclasses
+import hashlib
+import json
+import math
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from fuel_route.data.data_types import Coordinates, VehicleSpec
+from fuel_route.data.enums import CORRIDOR_KM, VEHICLE_DEFAULTS
+from fuel_route.data.models import StationTableGenerationModel
+from fuel_route.services.async_db import database_sync_to_async
+from fuel_route.services.cache import CacheStats, SingleFlight, TTLLRUCache
+from fuel_route.services.geocode_cache import GeocodeCache
+from fuel_route.services.route_map_service import RouteMapService
+
+# Settings read while planning a route, hashed into every key: the directions backend, the corridor
+# lookup, the stop solver and the stitching of the final route
+KEY_SETTINGS = (
+    "ROUTING_BACKEND", "ROUTING_BACKEND_URL", "OPENROUTESERVICE_BASE_URL", "ROUTING_OSRM_PROFILE",
+    "ROUTING_GRAPH_PATH", "ROUTING_GRAPH_MAX_SNAP_MILES",
+    "STATION_CORRIDOR_SOURCE", "STATION_INDEX_CELL_DEGREES", "CORRIDOR_CACHE_ENABLED",
+    "ROUTE_SIMPLIFY_METHOD", "ROUTE_SIMPLIFY_CORRIDOR_METERS",
+    "FUEL_STOP_SOLVER", "ROUTE_STITCHING", "ROUTE_STITCH_LEG_MILES",
+)
+
+
+class RouteResultCache:
+    """
+    Serialized responses of ``FuelRouteController.get_optimal_route``, keyed on
+    the normalized endpoints, the vehicles, the coordinates format and the
+    settings that shape the route: a per-worker memory tier in front of the
+    shared ``ROUTE_CACHE_ALIAS`` cache, so a route computed by one worker
+    answers the same request on every other.
+
+    Keys include the station table generation, so an import or price refresh
+    leaves the old results behind. Concurrent misses of the same key are
+    coalesced: within a worker they share one computation, across workers the
+    first one holds a lock in the shared cache while the others wait for its
+    result, for at most ``lock_seconds``.
+    """
+
+    _default: Optional["RouteResultCache"] = None
+    _default_lock = threading.Lock()
+
+    # Seconds between two reads of the shared cache by a worker waiting on another
+    POLL_SECONDS = 0.05
+
+    def __init__(
+        self, ttl_seconds: float, max_entries: int, precision: int, lock_seconds: float, shared_cache=None
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.precision = precision
+        self.lock_seconds = lock_seconds
+        self.memory = TTLLRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.shared = shared_cache if shared_cache is not None else caches[settings.ROUTE_CACHE_ALIAS]
+        # Routes are stored in the same cache as the results pointing at them
+        self.route_map_service = RouteMapService(self.shared)
+        self.stats = CacheStats()
+        self._single_flight = SingleFlight()
+        self._async_flights: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._checked_at: Optional[float] = None
+
+    @classmethod
+    def default(cls) -> "RouteResultCache":
+        _default = cls._default
+        if _default is None:
+            with cls._default_lock:
+                _default = cls._default
+                if _default is None:
+                    _default = cls._default = cls(
+                        # Results point at a stored route by id, so they never outlive it
+                        ttl_seconds=min(settings.ROUTE_RESULT_CACHE_TTL_SECONDS, settings.ROUTE_CACHE_TTL_SECONDS),
+                        max_entries=settings.ROUTE_RESULT_CACHE_MAX_ENTRIES,
+                        precision=settings.ROUTE_RESULT_CACHE_PRECISION,
+                        lock_seconds=settings.ROUTE_RESULT_CACHE_LOCK_SECONDS,
+                    )
+        return _default
+
+    def normalize_location(self, location) -> str:
+        if isinstance(location, Coordinates):
+            return f"{round(location.lat, self.precision)},{round(location.lon, self.precision)}"
+        return GeocodeCache.normalize(str(location))
+
+    @staticmethod
+    def _vehicle_key(vehicle: Optional[VehicleSpec]) -> dict:
+        vehicle = vehicle or VehicleSpec()
+        return {
+            _name: _value.value if hasattr(_value, "value") else _value
+            for _name, _value in dataclasses.asdict(vehicle).items()
+        }
+
+    def make_key(
+        self,
+        start,
+        end,
+        coordinates_format: str,
+        vehicle: Optional[VehicleSpec] = None,
+        compare_vehicles: List[VehicleSpec] = None,
+    ) -> str:
+        _payload = {
+            "start": self.normalize_location(start),
+            "end": self.normalize_location(end),
+            "format": coordinates_format,
+            "vehicle": self._vehicle_key(vehicle),
+            "compare": [self._vehicle_key(_vehicle) for _vehicle in compare_vehicles or []],
+            "settings": [getattr(settings, _name) for _name in KEY_SETTINGS],
+            "corridor_km": CORRIDOR_KM,
+            "vehicle_defaults": {
+                _type.value: self._vehicle_key(VehicleSpec.for_type(_type)) for _type in VEHICLE_DEFAULTS
+            },
+        }
+        _digest = hashlib.sha256(json.dumps(_payload, sort_keys=True).encode()).hexdigest()
+        return f"route-result:{self.generation()}:{_digest}"
+
+    def generation(self) -> int:
+        """
+        Station table generation, read at most every ``STATION_INDEX_CHECK_SECONDS``
+        like the station index does.
+        """
+        with self._lock:
+            _now = time.monotonic()
+            if self._checked_at is None or _now - self._checked_at >= settings.STATION_INDEX_CHECK_SECONDS:
+                self._generation = StationTableGenerationModel.current()
+                self._checked_at = _now
+            return self._generation
+
+    def get_from_memory(self, key: str) -> Optional[dict]:
+        """
+        Memory tier only, safe to call from an event loop.
+        """
+        _start = time.perf_counter()
+        _result = self.memory.get(key)
+        if _result is not None:
+            self.stats.record(memory_hits=1, lookup_seconds=time.perf_counter() - _start)
+        return _result
+
+    def get_from_shared(self, key: str) -> Optional[dict]:
+        _start = time.perf_counter()
+        _result = self._read_shared(key)
+        if _result is not None:
+            self.stats.record(shared_hits=1, lookup_seconds=time.perf_counter() - _start)
+            return _result
+
+        self.stats.record(misses=1, lookup_seconds=time.perf_counter() - _start)
+        return None
+
+    def get(self, key: str) -> Optional[dict]:
+        _result = self.get_from_memory(key)
+        if _result is not None:
+            return _result
+        return self.get_from_shared(key)
+
+    def _read_shared(self, key: str) -> Optional[dict]:
+        """
+        Result of ``key`` in the shared cache, copied to the memory tier for what
+        is left of its lifetime, so no tier keeps it past the stored route. A
+        result whose route was evicted early, by culling or memory pressure, is
+        a miss: its ``route_id`` would only lead to a 404 on the map endpoint.
+        """
+        _entry = self.shared.get(key)
+        if _entry is None:
+            return None
+        _remaining = _entry["expires_at"] - time.time()
+        if _remaining <= 0:
+            return None
+        if not self.route_map_service.has_route(_entry["result"]["route_id"]):
+            return None
+        self.memory.set(key, _entry["result"], ttl_seconds=_remaining)
+        return _entry["result"]
+
+    def set(self, key: str, result: dict, expires_at: Optional[float] = None) -> None:
+        """
+        Stores ``result`` until ``expires_at`` (a Unix time, ``ttl_seconds`` from
+        now by default), with the expiry kept in the shared entry for the memory
+        tiers of other workers.
+        """
+        if expires_at is None:
+            expires_at = time.time() + self.ttl_seconds
+        _remaining = expires_at - time.time()
+        if _remaining <= 0:
+            return
+        self.memory.set(key, result, ttl_seconds=_remaining)
+        self.shared.set(key, {"result": result, "expires_at": expires_at}, timeout=math.ceil(_remaining))
+
+    def resolve(self, key: str, build: Callable[[], dict]) -> dict:
+        """
+        Cached result of ``key``, calling ``build`` once for concurrent misses of
+        it in this worker and, while another worker builds it, not at all.
+        Failures are not cached.
+        """
+        _result = self.get(key)
+        if _result is not None:
+            return _result
+        _result, _shared = self._single_flight.do(key, lambda: self._fill(key, build))
+        if _shared:
+            self.stats.record(coalesced=1)
+        return _result
+
+    async def resolve_async(self, key_function: Callable[[], str], build: Callable[[], Awaitable[dict]]) -> dict:
+        """
+        ``resolve`` for the async controller. The key is made on the thread pool,
+        as it may read the station table generation, and so are the shared cache
+        calls; concurrent misses of the same key on this event loop await one
+        ``build``.
+        """
+        key = await database_sync_to_async(key_function)()
+        return await self._resolve_key_async(key, build)
+
+    async def _resolve_key_async(self, key: str, build: Callable[[], Awaitable[dict]]) -> dict:
+        _result = self.get_from_memory(key)
+        if _result is None:
+            _result = await database_sync_to_async(self.get_from_shared)(key)
+        if _result is not None:
+            return _result
+
+        _flight_key = (id(asyncio.get_running_loop()), key)
+        _flight = self._async_flights.get(_flight_key)
+        if _flight is not None:
+            self.stats.record(coalesced=1)
+            try:
+                return await asyncio.shield(_flight)
+            except asyncio.CancelledError:
+                if not _flight.cancelled():
+                    # This request was cancelled, not the one building the result
+                    raise
+            # The request building it was cancelled, which says nothing about this one: try again
+            return await self._resolve_key_async(key, build)
+
+        _flight = self._async_flights[_flight_key] = asyncio.get_running_loop().create_future()
+        try:
+            _result = await self._fill_async(key, build)
+            _flight.set_result(_result)
+            return _result
+        except asyncio.CancelledError:
+            _flight.cancel()
+            raise
+        except Exception as e:
+            _flight.set_exception(e)
+            # Retrieved here so an exception nobody else awaited is not logged as unhandled
+            _flight.exception()
+            raise
+        finally:
+            del self._async_flights[_flight_key]
+
+    def _fill(self, key: str, build: Callable[[], dict]) -> dict:
+        _token = self._acquire(key)
+        if _token is None:
+            _result = self._wait_for(key)
+            if _result is not None:
+                return _result
+        try:
+            return self._build_and_store(key, build)
+        finally:
+            if _token is not None:
+                self._release(key, _token)
+
+    async def _fill_async(self, key: str, build: Callable[[], Awaitable[dict]]) -> dict:
+        _token = await database_sync_to_async(self._acquire)(key)
+        if _token is None:
+            _result = await self._wait_for_async(key)
+            if _result is not None:
+                return _result
+        try:
+            # Taken before the route is stored, so the result expires no later than it
+            _expires_at = time.time() + self.ttl_seconds
+            _start = time.perf_counter()
+            _result = await build()
+            self.stats.record(upstream_calls=1, upstream_seconds=time.perf_counter() - _start)
+            await database_sync_to_async(self.set)(key, _result, _expires_at)
+            return _result
+        finally:
+            if _token is not None:
+                await database_sync_to_async(self._release)(key, _token)
+
+    def _build_and_store(self, key: str, build: Callable[[], dict]) -> dict:
+        # Taken before the route is stored, so the result expires no later than it
+        _expires_at = time.time() + self.ttl_seconds
+        _start = time.perf_counter()
+        _result = build()
+        self.stats.record(upstream_calls=1, upstream_seconds=time.perf_counter() - _start)
+        self.set(key, _result, _expires_at)
+        return _result
+
+    @staticmethod
+    def _lock_key(key: str) -> str:
+        return f"{key}:lock"
+
+    def _acquire(self, key: str) -> Optional[str]:
+        """
+        Token of the lock on ``key`` in the shared cache, or ``None`` when another
+        worker holds it. ``add`` is atomic on Redis and memcached; on the file
+        cache two workers may both win and both build, which is only wasted work.
+        """
+        _token = uuid.uuid4().hex
+        if self.shared.add(self._lock_key(key), _token, timeout=self.lock_seconds):
+            return _token
+        return None
+
+    def _release(self, key: str, token: str) -> None:
+        if self.shared.get(self._lock_key(key)) == token:
+            self.shared.delete(self._lock_key(key))
+
+    def _poll(self, key: str) -> Tuple[Optional[dict], bool]:
+        """
+        Result of ``key`` if another worker stored it, and whether it still holds the lock.
+        """
+        _result = self._read_shared(key)
+        if _result is not None:
+            return _result, False
+        return None, self.shared.get(self._lock_key(key)) is not None
+
+    def _wait_for(self, key: str) -> Optional[dict]:
+        """
+        Result stored by the worker holding the lock on ``key``; ``None`` when it
+        failed or took longer than ``lock_seconds``, and this worker builds it.
+        """
+        _deadline = time.monotonic() + self.lock_seconds
+        while time.monotonic() < _deadline:
+            time.sleep(self.POLL_SECONDS)
+            _result, _locked = self._poll(key)
+            if _result is not None:
+                self.stats.record(coalesced=1)
+                return _result
+            if not _locked:
+                return None
+        return None
+
+    async def _wait_for_async(self, key: str) -> Optional[dict]:
+        _deadline = time.monotonic() + self.lock_seconds
+        while time.monotonic() < _deadline:
+            await asyncio.sleep(self.POLL_SECONDS)
+            _result, _locked = await database_sync_to_async(self._poll)(key)
+            if _result is not None:
+                self.stats.record(coalesced=1)
+                return _result
+            if not _locked:
+                return None
+        return None
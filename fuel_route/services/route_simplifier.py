@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, field, fields
+from typing import Dict
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from fuel_route.services.route_geometry import douglas_peucker, visvalingam
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SimplificationStats:
+    """
+    Thread-safe counters for a simplification stage: routes simplified, their
+    vertices before and after, and the time spent. ``reduction`` is the share of
+    vertices dropped, the number to watch when tuning the tolerance.
+    """
+    routes: int = 0
+    vertices_in: int = 0
+    vertices_out: int = 0
+    seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def record(self, **increments) -> None:
+        with self._lock:
+            for _name, _value in increments.items():
+                setattr(self, _name, getattr(self, _name) + _value)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            _stats = {_field.name: getattr(self, _field.name) for _field in fields(self) if _field.repr}
+        _stats["reduction"] = 1 - _stats["vertices_out"] / _stats["vertices_in"] if _stats["vertices_in"] else 0.0
+        _stats["avg_ms"] = _stats["seconds"] * 1000 / _stats["routes"] if _stats["routes"] else 0.0
+        return _stats
+
+
+class RouteSimplifier:
+    """
+    Reduces a route polyline before it is used where vertex count drives the
+    cost but a few meters don't matter: the ``corridor`` stage feeds the station
+    corridor and offset queries, the ``map`` stage the folium polyline. Distances
+    returned to clients are always measured on the full geometry.
+
+    ``ROUTE_SIMPLIFY_METHOD`` picks the algorithm for every stage, each stage has
+    its own tolerance in meters, 0 turns it off.
+    """
+
+    METHODS = {
+        "none": None,
+        "douglas-peucker": douglas_peucker,
+        "visvalingam": visvalingam,
+    }
+
+    _stages: Dict[str, "RouteSimplifier"] = {}
+    _stages_lock = threading.Lock()
+
+    def __init__(self, stage: str, method: str, tolerance_meters: float):
+        if method not in self.METHODS:
+            raise ImproperlyConfigured(
+                f"Unknown route simplification method '{method}', expected one of {list(self.METHODS)}"
+            )
+        self.stage = stage
+        self.method = method
+        self.tolerance_meters = tolerance_meters
+        self.stats = SimplificationStats()
+
+    @classmethod
+    def for_stage(cls, stage: str) -> "RouteSimplifier":
+        """
+        Process-wide simplifier of ``stage``, configured from settings, so its
+        stats add up across requests.
+        """
+        _tolerances = {
+            "corridor": settings.ROUTE_SIMPLIFY_CORRIDOR_METERS,
+            "map": settings.ROUTE_SIMPLIFY_MAP_METERS,
+        }
+        if stage not in _tolerances:
+            raise ValueError(f"Unknown route simplification stage '{stage}'")
+        with cls._stages_lock:
+            simplifier = cls._stages.get(stage)
+            if (
+                simplifier is None
+                or simplifier.method != settings.ROUTE_SIMPLIFY_METHOD
+                or simplifier.tolerance_meters != _tolerances[stage]
+            ):
+                simplifier = cls._stages[stage] = cls(stage, settings.ROUTE_SIMPLIFY_METHOD, _tolerances[stage])
+            return simplifier
+
+    @classmethod
+    def stage_stats(cls) -> Dict[str, dict]:
+        with cls._stages_lock:
+            return {_stage: simplifier.stats.as_dict() for _stage, simplifier in cls._stages.items()}
+
+    def simplify(self, coordinates) -> np.ndarray:
+        """
+        ``(n, 2)`` array of the kept lon/lat vertices, first and last included.
+        """
+        _coordinates = np.asarray(coordinates, dtype=float)[:, :2]
+        _simplify = self.METHODS[self.method]
+        if _simplify is None or self.tolerance_meters <= 0:
+            return _coordinates
+
+        _start = time.perf_counter()
+        _simplified = _coordinates[_simplify(_coordinates, self.tolerance_meters)]
+        _seconds = time.perf_counter() - _start
+        self.stats.record(
+            routes=1, vertices_in=len(_coordinates), vertices_out=len(_simplified), seconds=_seconds
+        )
+        logger.debug(
+            f"Simplified {self.stage} route from {len(_coordinates)} to {len(_simplified)} vertices "
+            f"({self.method}, {self.tolerance_meters} m) in {_seconds * 1000:.1f} ms"
+        )
+        return _simplified
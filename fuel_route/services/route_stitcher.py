@@ -0,0 +1,123 @@
+from typing import List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from fuel_route.data.data_types import Coordinates, DirectionsResponseType
+from fuel_route.services.route_geometry import RouteGeometry, haversine_miles
+from fuel_route.services.routing_backends import directions_geojson
+
+
+class RouteStitcher:
+    """
+    Builds the final start -> stops -> end directions from the first directions
+    response, instead of routing the whole path again.
+
+    Every stop gets a window on the route around its projection. In ``estimate``
+    mode the window is the projection itself and the detour is a straight line
+    out to the station and back. In ``legs`` mode the window reaches
+    ``leg_miles`` to each side. The caller routes the short leg
+    window start -> station -> window end (``leg_waypoints``) and passes it to
+    ``stitch``. Outside the windows the first route is kept as it is.
+    """
+
+    MODES = ("none", "estimate", "legs")
+
+    def __init__(self, directions_response: DirectionsResponseType, fuel_stops: list, leg_miles: float = 0.0):
+        _feature = directions_response.features[0]
+        self.geometry = RouteGeometry(_feature.geometry.coordinates)
+        self.distance = _feature.properties.summary.distance
+        self.duration = _feature.properties.summary.duration
+        self.stations = np.array([stop.location.coords[:2] for stop in fuel_stops], dtype=float).reshape(-1, 2)
+
+        _mileages, _ = self.geometry.snap(self.stations[:, 0], self.stations[:, 1])
+        _mileages = np.maximum.accumulate(_mileages) if len(_mileages) else _mileages
+        self.window_starts = np.empty(len(_mileages))
+        self.window_ends = np.empty(len(_mileages))
+        _previous_end = 0.0
+        for _stop, _mileage in enumerate(_mileages):
+            self.window_starts[_stop] = max(_mileage - leg_miles, _previous_end)
+            self.window_ends[_stop] = _previous_end = max(
+                min(_mileage + leg_miles, self.geometry.length), self.window_starts[_stop]
+            )
+
+    @classmethod
+    def mode(cls) -> str:
+        if settings.ROUTE_STITCHING not in cls.MODES:
+            raise ImproperlyConfigured(
+                f"Unknown route stitching mode '{settings.ROUTE_STITCHING}', expected one of {list(cls.MODES)}"
+            )
+        return settings.ROUTE_STITCHING
+
+    @classmethod
+    def for_mode(cls, mode: str, directions_response: DirectionsResponseType, fuel_stops: list) -> "RouteStitcher":
+        return cls(directions_response, fuel_stops, settings.ROUTE_STITCH_LEG_MILES if mode == "legs" else 0.0)
+
+    def leg_waypoints(self) -> List[List[Coordinates]]:
+        """
+        Waypoints of the detour leg of every stop: window start, station, window end.
+        """
+        _legs = []
+        for _start, _station, _end in zip(self.window_starts, self.stations, self.window_ends):
+            _start_lon, _start_lat = self.geometry.point_at(_start)
+            _end_lon, _end_lat = self.geometry.point_at(_end)
+            _legs.append([
+                Coordinates(lat=_start_lat, lon=_start_lon),
+                Coordinates(lat=float(_station[1]), lon=float(_station[0])),
+                Coordinates(lat=_end_lat, lon=_end_lon),
+            ])
+        return _legs
+
+    def stitch(self, legs: Optional[List[DirectionsResponseType]] = None) -> DirectionsResponseType:
+        """
+        Final directions: the first route outside the windows and, inside them,
+        the routed ``legs`` or, without legs, straight detours to the stations.
+        """
+        _pieces = []
+        _way_points = [0]
+        _kept_miles = _detour_miles = _detour_seconds = 0.0
+        _previous_end = 0.0
+        _vertex_count = 0
+        for _stop, (_start, _station, _end) in enumerate(zip(self.window_starts, self.stations, self.window_ends)):
+            _kept_miles += _start - _previous_end
+            # Legs start and end on the first route, so the kept stretches drop those shared points
+            _kept = self.geometry.between(_previous_end, _start)[(1 if _stop else 0):-1]
+            if legs is not None:
+                _leg_feature = legs[_stop].features[0]
+                _leg = np.asarray(_leg_feature.geometry.coordinates, dtype=float)[:, :2]
+                _station_vertex = _leg_feature.properties.way_points[1]
+                _detour_miles += _leg_feature.properties.summary.distance
+                _detour_seconds += _leg_feature.properties.summary.duration
+            else:
+                _point = self._point_at(_start)
+                _leg = np.vstack((_point, _station, _point))
+                _station_vertex = 1
+                _miles = float(haversine_miles(_point[0], _point[1], _station[0], _station[1])) * 2
+                _detour_miles += _miles
+                _detour_seconds += _miles / self._average_mph() * 3600
+            _pieces.extend((_kept, _leg))
+            _way_points.append(_vertex_count + len(_kept) + _station_vertex)
+            _vertex_count += len(_kept) + len(_leg)
+            _previous_end = _end
+
+        _kept_miles += self.geometry.length - _previous_end
+        _pieces.append(self.geometry.between(_previous_end, self.geometry.length)[(1 if _pieces else 0):])
+        _coordinates = np.vstack(_pieces)
+        _way_points.append(len(_coordinates) - 1)
+
+        _scale = _kept_miles / self.geometry.length if self.geometry.length else 1.0
+        return DirectionsResponseType.from_dict(directions_geojson(
+            "stitched",
+            _coordinates.tolist(),
+            _way_points,
+            self.distance * _scale + _detour_miles,
+            self.duration * _scale + _detour_seconds,
+            {"coordinates": [_coordinates[0].tolist(), *self.stations.tolist(), _coordinates[-1].tolist()]},
+        ))
+
+    def _point_at(self, mileage: float) -> np.ndarray:
+        return np.array(self.geometry.point_at(mileage))
+
+    def _average_mph(self) -> float:
+        return self.distance / self.duration * 3600 if self.duration else 55.0
@@ -0,0 +1,241 @@
+import logging
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import openrouteservice
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from fuel_route.data.exceptions import RouteNotFoundException
+from fuel_route.services.http_pool import PooledSession
+from fuel_route.services.road_graph import RoadGraph
+from fuel_route.services.route_geometry import MILES_PER_METER
+
+logger = logging.getLogger(__name__)
+
+
+def directions_geojson(
+    engine: str,
+    coordinates: List[List[float]],
+    way_points: List[int],
+    distance_miles: float,
+    duration_seconds: float,
+    query: dict,
+) -> dict:
+    """
+    Directions response in the ORS GeoJSON shape, for routes that did not come
+    from ORS.
+    """
+    _coordinates = np.asarray(coordinates, dtype=float)
+    _bbox = [
+        float(_coordinates[:, 0].min()), float(_coordinates[:, 1].min()),
+        float(_coordinates[:, 0].max()), float(_coordinates[:, 1].max()),
+    ]
+    return {
+        "type": "FeatureCollection",
+        "bbox": _bbox,
+        "features": [{
+            "bbox": _bbox,
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": coordinates},
+            "properties": {
+                "summary": {"distance": distance_miles, "duration": duration_seconds},
+                "way_points": way_points,
+            },
+        }],
+        "metadata": {
+            "attribution": engine,
+            "service": "routing",
+            "timestamp": int(time.time() * 1000),
+            "query": query,
+            "engine": {"version": engine},
+        },
+    }
+
+
+class RoutingBackend:
+    """
+    Answers the directions calls of ``ORSClient`` with a raw response in the
+    GeoJSON shape of ORS directions, distances in miles, so the directions cache
+    and ``DirectionsResponseType`` work the same for every backend.
+    """
+
+    name: str = None
+
+    @classmethod
+    def from_settings(cls) -> "RoutingBackend":
+        raise NotImplementedError
+
+    def directions(self, coordinates: List[List[float]], vehicle_profile: str, **options) -> dict:
+        raise NotImplementedError
+
+
+class SessionORSClient(openrouteservice.Client):
+    """
+    ``openrouteservice.Client`` that sends its requests through ``session``.
+
+    The library opens a ``requests.Session`` of its own for every client and takes
+    no argument for one, so this is the one place that replaces its private
+    ``_session``. Written against openrouteservice 2.3.3, the version pinned in
+    requirements.txt and the Pipfile; the check below fails loudly if a release
+    stops keeping its session there.
+    """
+
+    def __init__(self, session: requests.Session, **kwargs):
+        super().__init__(**kwargs)
+        if not isinstance(getattr(self, "_session", None), requests.Session):
+            raise ImproperlyConfigured(
+                f"openrouteservice {openrouteservice.__version__} no longer keeps its session in Client._session"
+            )
+        self._session = session
+
+    @property
+    def session(self) -> requests.Session:
+        return self._session
+
+
+class ORSRoutingBackend(RoutingBackend):
+    """
+    openrouteservice directions, hosted or self-hosted: ``ROUTING_BACKEND_URL``
+    points it at a self-hosted instance, the hosted API is the default.
+    """
+
+    name = "ors"
+
+    def __init__(self, client: openrouteservice.Client):
+        self.client = client
+
+    @classmethod
+    def from_settings(cls) -> "ORSRoutingBackend":
+        return cls(cls.make_client(settings.ROUTING_BACKEND_URL or settings.OPENROUTESERVICE_BASE_URL))
+
+    @staticmethod
+    def make_client(base_url: str, session: Optional[requests.Session] = None) -> SessionORSClient:
+        """
+        Library client on ``session``, the process-wide pooled ``"ors"`` session
+        by default. Retries and backoff, 429 included, happen in the session, so
+        the library's own retry on 429 is turned off.
+        """
+        return SessionORSClient(
+            session if session is not None else PooledSession.shared("ors"),
+            key=settings.OPENROUTESERVICE_API_KEY,
+            base_url=base_url,
+            timeout=settings.ORS_TIMEOUT_SECONDS,
+            retry_over_query_limit=False,
+        )
+
+    def directions(self, coordinates: List[List[float]], vehicle_profile: str, **options) -> dict:
+        return self.client.directions(coordinates=coordinates, profile=vehicle_profile, dry_run=False, **options)
+
+
+class OSRMRoutingBackend(RoutingBackend):
+    """
+    Self-hosted OSRM ``/route/v1`` service at ``ROUTING_BACKEND_URL``. OSRM
+    serves the one profile it was built with, ``ROUTING_OSRM_PROFILE``, and
+    always answers in the GeoJSON shape.
+    """
+
+    name = "osrm"
+
+    def __init__(self, base_url: str, profile: str = "driving"):
+        self.base_url = base_url.rstrip("/")
+        self.profile = profile
+        self.session = PooledSession.shared("osrm")
+
+    @classmethod
+    def from_settings(cls) -> "OSRMRoutingBackend":
+        if not settings.ROUTING_BACKEND_URL:
+            raise ImproperlyConfigured("The osrm routing backend needs ROUTING_BACKEND_URL")
+        return cls(settings.ROUTING_BACKEND_URL, settings.ROUTING_OSRM_PROFILE)
+
+    def directions(self, coordinates: List[List[float]], vehicle_profile: str, **options) -> dict:
+        _waypoints = ";".join(f"{_lon},{_lat}" for _lon, _lat in coordinates)
+        _response = self.session.get(
+            f"{self.base_url}/route/v1/{self.profile}/{_waypoints}",
+            params={"overview": "full", "geometries": "geojson", "steps": "false"},
+            timeout=settings.ORS_TIMEOUT_SECONDS,
+        )
+        if _response.status_code >= 500:
+            _response.raise_for_status()
+        _body = _response.json()
+        if _body.get("code") != "Ok" or not _body.get("routes"):
+            raise RouteNotFoundException(f"OSRM found no route: {_body.get('message', _body.get('code'))}")
+
+        _route = _body["routes"][0]
+        _coordinates = _route["geometry"]["coordinates"]
+        return directions_geojson(
+            self.name,
+            _coordinates,
+            self._way_points(_coordinates, [_waypoint["location"] for _waypoint in _body["waypoints"]]),
+            _route["distance"] * MILES_PER_METER,
+            _route["duration"],
+            {"coordinates": coordinates, "profile": self.profile},
+        )
+
+    @staticmethod
+    def _way_points(coordinates: List[List[float]], locations: List[List[float]]) -> List[int]:
+        """
+        Vertex index of every snapped waypoint, searched in order along the route.
+        """
+        _vertices = np.asarray(coordinates, dtype=float)
+        _way_points, _from = [], 0
+        for _lon, _lat in locations:
+            _from += int(np.argmin(np.hypot(_vertices[_from:, 0] - _lon, _vertices[_from:, 1] - _lat)))
+            _way_points.append(_from)
+        return _way_points
+
+
+class GraphRoutingBackend(RoutingBackend):
+    """
+    Offline, in-process A* routing over the ``RoadGraph`` file at
+    ``ROUTING_GRAPH_PATH``, for benchmarks, tests and deployments without a
+    routing service. The graph is loaded once per process.
+    """
+
+    name = "graph"
+
+    _graphs: Dict[str, RoadGraph] = {}
+
+    def __init__(self, graph: RoadGraph, max_snap_miles: float = None):
+        self.graph = graph
+        self.max_snap_miles = max_snap_miles
+
+    @classmethod
+    def from_settings(cls) -> "GraphRoutingBackend":
+        if not settings.ROUTING_GRAPH_PATH:
+            raise ImproperlyConfigured("The graph routing backend needs ROUTING_GRAPH_PATH")
+        _graph = cls._graphs.get(settings.ROUTING_GRAPH_PATH)
+        if _graph is None:
+            _start = time.perf_counter()
+            _graph = cls._graphs[settings.ROUTING_GRAPH_PATH] = RoadGraph.load(settings.ROUTING_GRAPH_PATH)
+            logger.info(
+                f"Loaded road graph with {len(_graph)} nodes and {_graph.edge_count} edges "
+                f"in {time.perf_counter() - _start:.2f}s"
+            )
+        return cls(_graph, settings.ROUTING_GRAPH_MAX_SNAP_MILES)
+
+    def directions(self, coordinates: List[List[float]], vehicle_profile: str, **options) -> dict:
+        _coordinates, _way_points, _miles, _seconds = self.graph.route(coordinates, self.max_snap_miles)
+        return directions_geojson(
+            self.name, _coordinates, _way_points, _miles, _seconds,
+            {"coordinates": coordinates, "profile": vehicle_profile},
+        )
+
+
+ROUTING_BACKENDS = {
+    "ors": ORSRoutingBackend,
+    "osrm": OSRMRoutingBackend,
+    "graph": GraphRoutingBackend,
+}
+
+
+def get_routing_backend(name: str) -> RoutingBackend:
+    try:
+        backend_class = ROUTING_BACKENDS[name]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"Unknown routing backend '{name}', expected one of {sorted(ROUTING_BACKENDS)}"
+        )
+    return backend_class.from_settings()
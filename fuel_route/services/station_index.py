@@ -0,0 +1,252 @@
+import logging
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+from django.conf import settings
+
+from fuel_route.data.data_types import StationCorridor
+from fuel_route.data.enums import EARTH_RADIUS_METERS
+from fuel_route.data.exceptions import FuelStationNotFoundException
+from fuel_route.data.models import FuelStationModel, StationTableGenerationModel
+from fuel_route.services.route_geometry import haversine_miles, MILES_PER_METER
+
+logger = logging.getLogger(__name__)
+
+KM_PER_DEGREE = EARTH_RADIUS_METERS * np.pi / 180 / 1000
+
+
+class StationIndex:
+    """
+    Uniform lon/lat grid over every fuel station, kept in NumPy arrays so corridor
+    lookups run in process without PostGIS.
+
+    One index is shared per worker through ``StationIndex.get()``, which reloads it
+    whenever ``StationTableGenerationModel`` reports a write to the station table.
+    """
+
+    _lock = threading.Lock()
+    _instance: Optional["StationIndex"] = None
+    _checked_at: float = 0.0
+
+    def __init__(
+        self,
+        station_ids: np.ndarray,
+        lons: np.ndarray,
+        lats: np.ndarray,
+        prices: np.ndarray,
+        generation: int = 0,
+        cell_degrees: float = 0.1,
+    ):
+        self.station_ids = station_ids
+        self.lons = lons
+        self.lats = lats
+        self.prices = prices
+        self.generation = generation
+        self.cell_degrees = cell_degrees
+        self._rows = int(np.ceil(180 / cell_degrees)) + 1
+        _cells = self._cell_keys(self._column(lons), self._row(lats))
+        self._order = np.argsort(_cells, kind="stable")
+        self._sorted_cells = _cells[self._order]
+
+    def __len__(self):
+        return len(self.station_ids)
+
+    @classmethod
+    def load(cls, generation: int = 0) -> "StationIndex":
+        _rows = list(FuelStationModel.objects.values_list("id", "location", "retail_price"))
+        logger.info(f"Loaded {len(_rows)} stations into the station index (generation {generation})")
+        return cls(
+            station_ids=np.array([row[0] for row in _rows], dtype=np.int64),
+            lons=np.array([row[1].x for row in _rows], dtype=float),
+            lats=np.array([row[1].y for row in _rows], dtype=float),
+            prices=np.array([row[2] for row in _rows], dtype=float),
+            generation=generation,
+            cell_degrees=settings.STATION_INDEX_CELL_DEGREES,
+        )
+
+    @classmethod
+    def get(cls) -> "StationIndex":
+        """
+        Returns the worker's index, checking the station table generation at most
+        every ``STATION_INDEX_CHECK_SECONDS``.
+        """
+        with cls._lock:
+            _now = time.monotonic()
+            if cls._instance is None or _now - cls._checked_at >= settings.STATION_INDEX_CHECK_SECONDS:
+                # Read the generation before the rows, so a concurrent write triggers another reload
+                _generation = StationTableGenerationModel.current()
+                if cls._instance is None or cls._instance.generation != _generation:
+                    cls._instance = cls.load(_generation)
+                cls._checked_at = _now
+            return cls._instance
+
+    @classmethod
+    def invalidate(cls) -> None:
+        with cls._lock:
+            cls._instance = None
+
+    def corridor(self, route_coords, total_distance: float, max_distance_km: float = 0.5) -> StationCorridor:
+        """
+        Stations within ``max_distance_km`` of the polyline ``route_coords`` (lon/lat
+        pairs), with their offset along the route and their distance to it.
+
+        Offsets are scaled to ``total_distance`` like the PostGIS corridor query does.
+        """
+        corridor = self.corridors([route_coords], [total_distance], max_distance_km)[0]
+        if corridor is None:
+            raise FuelStationNotFoundException("No fuel stations found along the route")
+        return corridor
+
+    def corridors(
+        self, routes: List, total_distances: List[float], max_distance_km: float = 0.5
+    ) -> List[Optional[StationCorridor]]:
+        """
+        ``corridor`` for several routes in one vectorized pass over the index.
+        Routes without stations nearby get ``None``.
+        """
+        _routes = [np.asarray(route_coords, dtype=float) for route_coords in routes]
+        _groups, _positions, _offsets, _distances_to_route = self.near_polylines(_routes, max_distance_km)
+        _bounds = np.searchsorted(_groups, np.arange(len(_routes) + 1))
+        return [
+            self._build_corridor(
+                _route,
+                total_distance,
+                _positions[_bounds[_index]:_bounds[_index + 1]],
+                _offsets[_bounds[_index]:_bounds[_index + 1]],
+                _distances_to_route[_bounds[_index]:_bounds[_index + 1]],
+            )
+            for _index, (_route, total_distance) in enumerate(zip(_routes, total_distances))
+        ]
+
+    def _build_corridor(
+        self,
+        route: np.ndarray,
+        total_distance: float,
+        positions: np.ndarray,
+        offsets: np.ndarray,
+        distances_to_route: np.ndarray,
+    ) -> Optional[StationCorridor]:
+        if not positions.size:
+            return None
+        _route_length = float(
+            haversine_miles(route[:-1, 0], route[:-1, 1], route[1:, 0], route[1:, 1]).sum()
+        )
+        _scale = total_distance / _route_length if _route_length else 1.0
+        _distances_from_start = haversine_miles(
+            route[0, 0], route[0, 1], self.lons[positions], self.lats[positions]
+        )
+        _order = np.argsort(_distances_from_start, kind="stable")
+        positions = positions[_order]
+        return StationCorridor(
+            stations=None,
+            station_ids=self.station_ids[positions],
+            lons=self.lons[positions],
+            lats=self.lats[positions],
+            prices=self.prices[positions],
+            distances_from_start=_distances_from_start[_order],
+            offsets=offsets[_order] * _scale,
+            distances_to_route=distances_to_route[_order],
+        )
+
+    def near_polyline(self, route: np.ndarray, max_distance_km: float):
+        """
+        Vectorized point-to-polyline search.
+
+        Returns station positions in the index, offsets along the polyline in miles
+        and distances to the polyline in miles.
+        """
+        _, _stations, _offsets, _distances = self.near_polylines([route], max_distance_km)
+        return _stations, _offsets, _distances
+
+    def near_polylines(self, routes: List[np.ndarray], max_distance_km: float):
+        """
+        Vectorized point-to-polyline search over several polylines at once.
+
+        Every segment is expanded to the grid cells its padded bounding box covers,
+        stations in those cells are projected onto the segment in a local
+        equirectangular frame, and each station keeps its closest segment of every
+        polyline. Returns, sorted by polyline, the polyline of each match, station
+        positions in the index, offsets along the polyline in miles and distances
+        to the polyline in miles.
+        """
+        _lon0 = np.concatenate([route[:-1, 0] for route in routes])
+        _lat0 = np.concatenate([route[:-1, 1] for route in routes])
+        _lon1 = np.concatenate([route[1:, 0] for route in routes])
+        _lat1 = np.concatenate([route[1:, 1] for route in routes])
+        _segment_routes = np.repeat(np.arange(len(routes)), [len(route) - 1 for route in routes])
+        _segment_lengths = haversine_miles(_lon0, _lat0, _lon1, _lat1)
+        # Offset of every segment start within its own polyline
+        _cumulative = np.cumsum(_segment_lengths) - _segment_lengths
+        _route_starts = np.searchsorted(_segment_routes, np.arange(len(routes)))
+        _segment_starts = _cumulative - _cumulative[_route_starts][_segment_routes] if len(_lon0) else _cumulative
+
+        _lat_pad = max_distance_km / KM_PER_DEGREE
+        _cos = np.cos(np.radians(np.maximum(np.abs(_lat0), np.abs(_lat1)) + _lat_pad))
+        _lon_pad = _lat_pad / np.maximum(_cos, 0.01)
+        _x0 = self._column(np.minimum(_lon0, _lon1) - _lon_pad)
+        _x1 = self._column(np.maximum(_lon0, _lon1) + _lon_pad)
+        _y0 = self._row(np.minimum(_lat0, _lat1) - _lat_pad)
+        _y1 = self._row(np.maximum(_lat0, _lat1) + _lat_pad)
+
+        # Enumerate (segment, cell) pairs
+        _heights = _y1 - _y0 + 1
+        _cell_counts = (_x1 - _x0 + 1) * _heights
+        _segments = np.repeat(np.arange(len(_lon0)), _cell_counts)
+        _local = self._local_positions(_cell_counts)
+        _heights = np.repeat(_heights, _cell_counts)
+        _cells = self._cell_keys(
+            np.repeat(_x0, _cell_counts) + _local // _heights,
+            np.repeat(_y0, _cell_counts) + _local % _heights,
+        )
+
+        # Expand to (segment, station) pairs
+        _first = np.searchsorted(self._sorted_cells, _cells, side="left")
+        _station_counts = np.searchsorted(self._sorted_cells, _cells, side="right") - _first
+        _segments = np.repeat(_segments, _station_counts)
+        _stations = self._order[np.repeat(_first, _station_counts) + self._local_positions(_station_counts)]
+        if not _stations.size:
+            _empty = np.empty(0, dtype=np.int64)
+            return _empty, _empty, np.empty(0), np.empty(0)
+
+        # Project stations onto their candidate segments
+        _scale = np.cos(np.radians((_lat0[_segments] + _lat1[_segments]) / 2))
+        _ax, _ay = _lon0[_segments] * _scale, _lat0[_segments]
+        _dx, _dy = _lon1[_segments] * _scale - _ax, _lat1[_segments] - _ay
+        _px, _py = self.lons[_stations] * _scale - _ax, self.lats[_stations] - _ay
+        _squared_length = _dx * _dx + _dy * _dy
+        _t = np.divide(_px * _dx + _py * _dy, _squared_length, out=np.zeros_like(_px), where=_squared_length > 0)
+        _t = np.clip(_t, 0.0, 1.0)
+        _distances = np.hypot(_px - _t * _dx, _py - _t * _dy) * KM_PER_DEGREE
+
+        _within = _distances <= max_distance_km
+        _segments, _stations, _t, _distances = _segments[_within], _stations[_within], _t[_within], _distances[_within]
+
+        # Keep the closest segment of every station, per polyline
+        _groups = _segment_routes[_segments]
+        _closest = np.lexsort((_distances, _stations, _groups))
+        _keys = _groups[_closest] * len(self.station_ids) + _stations[_closest]
+        _, _first = np.unique(_keys, return_index=True)
+        _closest = _closest[_first]
+        _offsets = _segment_starts[_segments[_closest]] + _t[_closest] * _segment_lengths[_segments[_closest]]
+        return (
+            _groups[_closest],
+            _stations[_closest],
+            _offsets,
+            _distances[_closest] * 1000 * MILES_PER_METER,
+        )
+
+    @staticmethod
+    def _local_positions(counts: np.ndarray) -> np.ndarray:
+        """Position of every repeated element within its group, e.g. [2, 3] -> [0, 1, 0, 1, 2]."""
+        return np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    def _column(self, lons) -> np.ndarray:
+        return np.floor((np.asarray(lons) + 180.0) / self.cell_degrees).astype(np.int64)
+
+    def _row(self, lats) -> np.ndarray:
+        return np.floor((np.asarray(lats) + 90.0) / self.cell_degrees).astype(np.int64)
+
+    def _cell_keys(self, columns, rows) -> np.ndarray:
+        return columns * self._rows + rows
@@ -0,0 +1,159 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from numbers import Number
+from typing import Dict, Iterator, List, Optional
+
+
+def _is_count(value) -> bool:
+    return isinstance(value, Number) and not isinstance(value, bool)
+
+
+@dataclass
+class Span:
+    """
+    One timed stage of a request, with the counts it worked on (stations,
+    vertices, stops...) as attributes.
+    """
+    name: str
+    start: float
+    seconds: float = 0.0
+    attributes: Dict[str, object] = field(default_factory=dict)
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+
+class Trace:
+    """
+    Spans of one request, in the order they finished. Spans may finish on
+    worker threads, so adding is locked.
+    """
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def server_timing(self) -> str:
+        """
+        ``Server-Timing`` header value: one entry per stage, repeated stages
+        summed, with the count and the summed numeric attributes as description.
+        """
+        _stages: Dict[str, dict] = {}
+        with self._lock:
+            _spans = list(self.spans)
+        for span in _spans:
+            _stage = _stages.setdefault(span.name, {"seconds": 0.0, "count": 0, "attributes": {}})
+            _stage["seconds"] += span.seconds
+            _stage["count"] += 1
+            for _name, _value in span.attributes.items():
+                if _is_count(_value):
+                    _stage["attributes"][_name] = _stage["attributes"].get(_name, 0) + _value
+                else:
+                    _stage["attributes"][_name] = _value
+        _entries = []
+        for _name, _stage in _stages.items():
+            _description = " ".join(
+                [f"n={_stage['count']}"] + [f"{_key}={_value}" for _key, _value in _stage["attributes"].items()]
+            )
+            _entries.append(f'{_name};dur={_stage["seconds"] * 1000:.1f};desc="{_description}"')
+        return ", ".join(_entries)
+
+
+class StageMetrics:
+    """
+    Process-wide duration histogram and attribute totals per stage, exported on
+    the ``/metrics/`` endpoint.
+    """
+
+    _default: Optional["StageMetrics"] = None
+    _default_lock = threading.Lock()
+
+    # Upper bounds in seconds of the duration histogram buckets
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, dict] = {}
+
+    @classmethod
+    def default(cls) -> "StageMetrics":
+        _default = cls._default
+        if _default is None:
+            with cls._default_lock:
+                _default = cls._default
+                if _default is None:
+                    _default = cls._default = cls()
+        return _default
+
+    def observe(self, span: Span) -> None:
+        with self._lock:
+            _stage = self._stages.get(span.name)
+            if _stage is None:
+                _stage = self._stages[span.name] = {
+                    "buckets": [0] * len(self.BUCKETS), "count": 0, "seconds": 0.0, "totals": {},
+                }
+            for _bucket, _bound in enumerate(self.BUCKETS):
+                if span.seconds <= _bound:
+                    _stage["buckets"][_bucket] += 1
+            _stage["count"] += 1
+            _stage["seconds"] += span.seconds
+            for _name, _value in span.attributes.items():
+                if _is_count(_value):
+                    _stage["totals"][_name] = _stage["totals"].get(_name, 0) + _value
+
+    def snapshot(self) -> Dict[str, dict]:
+        """
+        Copy of every stage: cumulative ``buckets`` counts matching ``BUCKETS``,
+        ``count``, ``seconds`` and the ``totals`` of numeric attributes.
+        """
+        with self._lock:
+            return {
+                _name: {**_stage, "buckets": list(_stage["buckets"]), "totals": dict(_stage["totals"])}
+                for _name, _stage in self._stages.items()
+            }
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("fuel_route_trace", default=None)
+
+
+@contextmanager
+def start_trace() -> Iterator[Trace]:
+    """
+    Collects the spans finished in this context, asgiref threads included,
+    into a new ``Trace``.
+    """
+    trace = Trace()
+    _token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(_token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """
+    Times the block as stage ``name``. Counts known up front go in
+    ``attributes``, the rest through ``Span.set`` from values already at hand;
+    tracing never evaluates anything on its own.
+    """
+    _span = Span(name, time.perf_counter(), attributes=dict(attributes))
+    try:
+        yield _span
+    finally:
+        _span.seconds = time.perf_counter() - _span.start
+        StageMetrics.default().observe(_span)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(_span)
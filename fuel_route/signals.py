@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from fuel_route.data.models import FuelStationModel, StationTableGenerationModel
+
+
+@receiver(post_save, sender=FuelStationModel)
+@receiver(post_delete, sender=FuelStationModel)
+def bump_station_generation(sender, **kwargs):
+    StationTableGenerationModel.bump()
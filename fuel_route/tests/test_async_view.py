@@ -0,0 +1,52 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase
+from rest_framework.throttling import SimpleRateThrottle
+
+from fuel_route.controllers.fuel_route_controller import FuelRouteController
+
+ROUTE = {
+    "distance": 721.0, "fuel_stops": [], "total_cost": 0.0, "coordinates": [[-96.797, 32.7767], [-84.388, 33.749]],
+}
+
+
+class OptimalRouteAsyncViewTests(SimpleTestCase):
+    url = "/api/async/optimal-route/"
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client(enforce_csrf_checks=True)
+        _patcher = mock.patch.object(FuelRouteController, "get_optimal_route_async", return_value=ROUTE)
+        self.get_optimal_route_async = _patcher.start()
+        self.addCleanup(_patcher.stop)
+
+    def _post(self, body, **extra):
+        return self.client.post(self.url, body, content_type="application/json", **extra)
+
+    def test_plans_the_route_without_a_csrf_token(self):
+        response = self._post(json.dumps({"start": "Dallas, TX", "end": "Atlanta, GA"}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), ROUTE)
+        self.assertEqual(self.get_optimal_route_async.call_args.args[:4], ("Dallas, TX", "Atlanta, GA", False, "json"))
+
+    def test_invalid_requests_are_rejected(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.assertEqual(self._post("{").status_code, 400)
+        self.assertEqual(self._post(json.dumps({"start": "Dallas, TX"})).status_code, 400)
+        _body = json.dumps({"start": "Dallas, TX", "end": "Atlanta, GA"})
+        self.assertEqual(self._post(_body, HTTP_ACCEPT="application/json; coordinates=wkt").status_code, 400)
+        self.get_optimal_route_async.assert_not_called()
+
+    def test_throttled_like_the_sync_view(self):
+        _body = json.dumps({"start": "Dallas, TX", "end": "Atlanta, GA"})
+        with mock.patch.object(SimpleRateThrottle, "THROTTLE_RATES", {"anon": "1/min", "user": "1/min"}):
+            self.assertEqual(self._post(_body).status_code, 200)
+            response = self._post(_body)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("throttled", response.json()["detail"])
+        self.assertLessEqual(int(response["Retry-After"]), 60)
+        self.assertEqual(self.get_optimal_route_async.call_count, 1)
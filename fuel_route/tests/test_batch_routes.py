@@ -0,0 +1,135 @@
+import json
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from fuel_route.controllers.batch_route_controller import BatchRouteController
+from fuel_route.controllers.fuel_route_controller import FuelRouteController
+from fuel_route.data.data_types import Coordinates
+from fuel_route.data.exceptions import GeocodeNotFoundException
+
+PLACES = {
+    "Dallas, TX": Coordinates(lat=32.7767, lon=-96.797),
+    "Atlanta, GA": Coordinates(lat=33.749, lon=-84.388),
+    "Denver, CO": Coordinates(lat=39.7392, lon=-104.9903),
+}
+
+
+class FakeLanePlanner:
+    """
+    Stands in for geocoding, ORS and the optimizer, counting the calls of every
+    stage. Geocoding errors still go through the controller's error mapping.
+    """
+
+    def __init__(self, failing_routes=()):
+        self.failing_routes = set(failing_routes)
+        self.calls = {"geocode": [], "directions": [], "plan": []}
+        self._lock = threading.Lock()
+
+    def _record(self, stage, item):
+        with self._lock:
+            self.calls[stage].append(item)
+
+    def geocode(self, controller, location):
+        if isinstance(location, Coordinates):
+            return location
+        self._record("geocode", location)
+        if location not in PLACES:
+            raise GeocodeNotFoundException(f"Unable to geocode location: {location}")
+        return PLACES[location]
+
+    def get_directions(self, controller, key):
+        self._record("directions", key[:4])
+        return f"directions {key[:4]}"
+
+    def plan_lane(self, controller, key, directions, corridor):
+        self._record("plan", key[:4])
+        if key[:4] in self.failing_routes:
+            raise RuntimeError("optimizer crashed")
+        return {"distance": 100.0, "directions": directions}
+
+    def patch(self, test_case):
+        for _class, _name, _function in (
+            (FuelRouteController, "_ensure_coordinates", self.geocode),
+            (BatchRouteController, "_get_directions", self.get_directions),
+            (BatchRouteController, "_plan_lane", self.plan_lane),
+        ):
+            _patcher = mock.patch.object(_class, _name, autospec=True, side_effect=_function)
+            _patcher.start()
+            test_case.addCleanup(_patcher.stop)
+        _patcher = mock.patch.object(BatchRouteController, "_corridors", return_value={})
+        _patcher.start()
+        test_case.addCleanup(_patcher.stop)
+
+
+def lane(start, end, **fields) -> dict:
+    return {"start": start, "end": end, "include_map_html": False, **fields}
+
+
+class BatchRouteControllerTests(SimpleTestCase):
+    def setUp(self):
+        self.planner = FakeLanePlanner()
+        self.planner.patch(self)
+
+    def _plan(self, lanes):
+        return {result["index"]: result for result in BatchRouteController(max_workers=4).plan_lanes(lanes)}
+
+    def test_shared_locations_and_lanes_are_resolved_once(self):
+        _coordinates = Coordinates(lat=32.7767, lon=-96.797)
+        results = self._plan([
+            lane("Dallas, TX", "Atlanta, GA"),
+            lane("Dallas, TX", "Atlanta, GA"),
+            lane(_coordinates, "Atlanta, GA"),
+            lane("Atlanta, GA", "Denver, CO"),
+        ])
+
+        self.assertEqual(sorted(results), [0, 1, 2, 3])
+        self.assertEqual(sorted(self.planner.calls["geocode"]), ["Atlanta, GA", "Dallas, TX", "Denver, CO"])
+        self.assertEqual(len(self.planner.calls["directions"]), 2)
+        self.assertEqual(len(self.planner.calls["plan"]), 2)
+        self.assertEqual(results[2]["start"], "32.7767,-96.797")
+        self.assertEqual(results[0]["directions"], results[2]["directions"])
+        self.assertEqual(results[3]["end"], "Denver, CO")
+
+    def test_failed_lanes_get_an_error_line_and_the_others_still_plan(self):
+        _denver = PLACES["Denver, CO"]
+        _dallas = PLACES["Dallas, TX"]
+        self.planner.failing_routes = {(_denver.lat, _denver.lon, _dallas.lat, _dallas.lon)}
+        results = self._plan([
+            lane("Dallas, TX", "Atlantis"),
+            lane("Dallas, TX", "Atlanta, GA"),
+            lane("Denver, CO", "Dallas, TX"),
+        ])
+
+        self.assertEqual(results[0]["error"], "Unable to geocode location: Atlantis")
+        self.assertEqual(results[0]["end"], "Atlantis")
+        self.assertEqual(results[1]["distance"], 100.0)
+        self.assertEqual(results[2]["error"], "Unable to plan this lane")
+        self.assertEqual(len(self.planner.calls["directions"]), 2)
+
+
+class BatchOptimalRouteViewTests(SimpleTestCase):
+    url = "/api/batch/optimal-routes/"
+
+    def setUp(self):
+        FakeLanePlanner().patch(self)
+
+    def test_streams_one_json_line_per_lane(self):
+        response = self.client.post(self.url, json.dumps({"lanes": [
+            {"start": "Dallas, TX", "end": "Atlanta, GA"},
+            {"start": "Dallas, TX", "end": "Atlantis"},
+        ]}), content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        _lines = b"".join(response.streaming_content).decode().splitlines()
+        results = {result["index"]: result for result in map(json.loads, _lines)}
+        self.assertEqual(len(_lines), 2)
+        self.assertEqual(results[0]["distance"], 100.0)
+        self.assertIn("error", results[1])
+
+    def test_rejects_an_empty_batch(self):
+        response = self.client.post(self.url, json.dumps({"lanes": []}), content_type="application/json")
+
+        self.assertEqual(response.status_code, 400)
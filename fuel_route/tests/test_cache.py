@@ -0,0 +1,110 @@
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from fuel_route.services.cache import CacheStats, SingleFlight, TTLLRUCache
+
+
+class TTLLRUCacheTests(SimpleTestCase):
+    def test_evicts_the_least_recently_used_entry(self):
+        cache = TTLLRUCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_entries_expire_after_their_ttl(self):
+        cache = TTLLRUCache(ttl_seconds=60)
+        cache.set("kept", 1)
+        cache.set("expired", 2, ttl_seconds=0)
+
+        self.assertEqual(cache.get("kept"), 1)
+        self.assertIsNone(cache.get("expired"))
+        self.assertEqual(len(cache), 1)
+
+    def test_delete_and_clear(self):
+        cache = TTLLRUCache()
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.delete("a")
+        self.assertIsNone(cache.get("a"))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+class CacheStatsTests(SimpleTestCase):
+    def test_ratios_and_averages(self):
+        stats = CacheStats()
+        stats.record(memory_hits=2, shared_hits=1, misses=1, lookup_seconds=0.004)
+        stats.record(upstream_calls=1, upstream_seconds=0.25)
+
+        _stats = stats.as_dict()
+        self.assertEqual(stats.hits, 3)
+        self.assertAlmostEqual(_stats["hit_ratio"], 0.75)
+        self.assertAlmostEqual(_stats["avg_lookup_ms"], 1.0)
+        self.assertAlmostEqual(_stats["avg_upstream_ms"], 250.0)
+
+    def test_empty_stats_have_no_ratios(self):
+        _stats = CacheStats().as_dict()
+
+        self.assertEqual(_stats["hit_ratio"], 0.0)
+        self.assertEqual(_stats["avg_upstream_ms"], 0.0)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_calls_share_one_result(self):
+        single_flight = SingleFlight()
+        _release = threading.Event()
+        _calls = []
+        _results = []
+
+        def _compute():
+            _calls.append(1)
+            _release.wait(5)
+            return "route"
+
+        def _call():
+            _results.append(single_flight.do("lane", _compute))
+
+        _threads = [threading.Thread(target=_call) for _ in range(4)]
+        for _thread in _threads:
+            _thread.start()
+        time.sleep(0.2)
+        _release.set()
+        for _thread in _threads:
+            _thread.join(5)
+
+        self.assertEqual(len(_calls), 1)
+        self.assertEqual(sorted(_results), [("route", False)] + [("route", True)] * 3)
+
+    def test_waiters_get_the_exception_and_later_calls_run_again(self):
+        single_flight = SingleFlight()
+        _release = threading.Event()
+        _errors = []
+
+        def _fail():
+            _release.wait(5)
+            raise ValueError("no route")
+
+        def _call():
+            try:
+                single_flight.do("lane", _fail)
+            except ValueError as e:
+                _errors.append(e)
+
+        _threads = [threading.Thread(target=_call) for _ in range(3)]
+        for _thread in _threads:
+            _thread.start()
+        time.sleep(0.2)
+        _release.set()
+        for _thread in _threads:
+            _thread.join(5)
+
+        self.assertEqual(len(_errors), 3)
+        self.assertEqual(single_flight.do("lane", lambda: 1), (1, False))
@@ -0,0 +1,63 @@
+import numpy as np
+from django.test import RequestFactory, SimpleTestCase
+
+from fuel_route.services.coordinate_codecs import (
+    COORDINATES_PRECISION,
+    decode_delta,
+    decode_polyline,
+    encode_coordinates,
+    encode_polyline,
+)
+from fuel_route.views.fuel_route_view import coordinates_format
+
+
+class CoordinateCodecsTests(SimpleTestCase):
+    coordinates = [[-87.62979, 41.87811], [-87.6298, 41.87812], [-90.19789, 38.62727], [-96.79699, 32.77666]]
+
+    def test_polyline_matches_the_reference_encoding(self):
+        # Example of the Google encoded polyline format documentation, in lon/lat
+        _coordinates = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+
+        self.assertEqual(encode_polyline(_coordinates), "_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+        np.testing.assert_allclose(decode_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@"), _coordinates)
+
+    def test_compact_formats_round_trip(self):
+        for _format, decode in (("polyline", decode_polyline), ("delta", decode_delta)):
+            with self.subTest(_format):
+                fields = encode_coordinates(self.coordinates, _format)
+
+                self.assertEqual(fields["coordinates_format"], _format)
+                self.assertEqual(fields["coordinates_precision"], COORDINATES_PRECISION)
+                np.testing.assert_allclose(decode(fields["coordinates"]), self.coordinates, atol=1e-5)
+
+    def test_json_and_none_formats(self):
+        self.assertEqual(encode_coordinates(self.coordinates, "json"), {"coordinates": self.coordinates})
+        self.assertEqual(encode_coordinates(self.coordinates, "none"), {"coordinates_format": "none"})
+
+    def test_empty_route_round_trips(self):
+        self.assertEqual(len(decode_polyline(encode_polyline([]))), 0)
+        self.assertEqual(len(decode_delta(encode_coordinates([], "delta")["coordinates"])), 0)
+
+
+class CoordinatesFormatTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_query_parameter_wins_over_the_accept_header(self):
+        _request = self.factory.get(
+            "/api/optimal-route/", {"coordinates": "delta"}, HTTP_ACCEPT="application/json; coordinates=polyline"
+        )
+
+        self.assertEqual(coordinates_format(_request), "delta")
+
+    def test_accept_header_parameter(self):
+        _request = self.factory.get(
+            "/api/optimal-route/", HTTP_ACCEPT='text/html, application/json; q=0.9; coordinates="polyline"'
+        )
+
+        self.assertEqual(coordinates_format(_request), "polyline")
+
+    def test_defaults_to_json_and_rejects_unknown_formats(self):
+        self.assertEqual(coordinates_format(self.factory.get("/api/optimal-route/")), "json")
+        with self.assertRaises(ValueError):
+            coordinates_format(self.factory.get("/api/optimal-route/", {"coordinates": "wkb"}))
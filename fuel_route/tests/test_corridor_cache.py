@@ -0,0 +1,87 @@
+from unittest import mock
+
+import numpy as np
+from django.contrib.gis.geos import LineString
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, override_settings
+
+from fuel_route.services.corridor_cache import CorridorCache
+from fuel_route.services.fuel_station_service import FuelStationService
+from fuel_route.tests.utils import assert_created_once, corridor_of
+
+
+@mock.patch("fuel_route.services.corridor_cache.StationTableGenerationModel.current", return_value=7)
+class CorridorCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.shared = LocMemCache("corridor-cache-tests", {})
+        self.shared.clear()
+        self.cache = CorridorCache(ttl_seconds=60, max_entries=10, shared_cache=self.shared)
+        self.route = [[-96.797, 32.7767], [-84.388, 33.749]]
+        self.corridor = corridor_of([100, 200], [3.5, 3.2])
+
+    def test_key_covers_the_generation_width_and_source(self, current):
+        _key = self.cache.make_key(self.route, 800.0, 0.5, "index")
+
+        self.assertTrue(_key.startswith("corridor:7:"))
+        self.assertEqual(_key, self.cache.make_key([[-96.797001, 32.776700], [-84.388, 33.749]], 800.0, 0.5, "index"))
+        self.assertNotEqual(_key, self.cache.make_key(self.route, 800.0, 1.0, "index"))
+        self.assertNotEqual(_key, self.cache.make_key(self.route, 800.0, 0.5, "postgis"))
+        self.assertNotEqual(_key, self.cache.make_key(self.route, 801.0, 0.5, "index"))
+        self.assertNotEqual(_key, self.cache.make_key([self.route[1], self.route[0]], 800.0, 0.5, "index"))
+
+    @override_settings(STATION_INDEX_CHECK_SECONDS=3600)
+    def test_generation_is_read_at_most_once_per_check_interval(self, current):
+        self.cache.make_key(self.route, 800.0, 0.5, "index")
+        current.return_value = 8
+        self.assertTrue(self.cache.make_key(self.route, 800.0, 0.5, "index").startswith("corridor:7:"))
+
+        self.cache.recheck_generation()
+        self.assertTrue(self.cache.make_key(self.route, 800.0, 0.5, "index").startswith("corridor:8:"))
+        self.assertEqual(current.call_count, 2)
+
+    def test_set_keeps_the_arrays_only(self, current):
+        _corridor = corridor_of([100], [3.5])
+        _corridor.stations = ["loaded stations"]
+        self.cache.set("corridor:7:abc", _corridor)
+
+        self.assertIsNone(self.cache.get("corridor:7:abc").stations)
+        self.assertIsNone(self.shared.get("corridor:7:abc").stations)
+        self.assertEqual(_corridor.stations, ["loaded stations"])
+
+    def test_resolve_builds_once_then_hits_memory_and_shared_tiers(self, current):
+        build = mock.Mock(return_value=self.corridor)
+
+        _first = self.cache.resolve("corridor:7:abc", build)
+        _second = self.cache.resolve("corridor:7:abc", build)
+        other_worker = CorridorCache(ttl_seconds=60, max_entries=10, shared_cache=self.shared)
+        _third = other_worker.resolve("corridor:7:abc", build)
+
+        build.assert_called_once_with()
+        np.testing.assert_array_equal(_first.prices, self.corridor.prices)
+        np.testing.assert_array_equal(_second.offsets, self.corridor.offsets)
+        np.testing.assert_array_equal(_third.station_ids, self.corridor.station_ids)
+        _stats = self.cache.stats.as_dict()
+        self.assertEqual((_stats["misses"], _stats["memory_hits"], _stats["upstream_calls"]), (1, 1, 1))
+        self.assertEqual(other_worker.stats.as_dict()["shared_hits"], 1)
+
+    def test_default_is_created_once(self, current):
+        assert_created_once(self, CorridorCache, CorridorCache.default)
+
+
+@override_settings(CORRIDOR_CACHE_ENABLED=True, STATION_CORRIDOR_SOURCE="index")
+@mock.patch("fuel_route.services.corridor_cache.StationTableGenerationModel.current", return_value=1)
+class GetCorridorTests(SimpleTestCase):
+    def test_repeat_lanes_skip_the_corridor_query(self, current):
+        _route = LineString((-96.797, 32.7767), (-84.388, 33.749), srid=4326)
+        cache = CorridorCache(ttl_seconds=60, max_entries=10, shared_cache=LocMemCache("get-corridor-tests", {}))
+        _corridor = corridor_of([100], [3.5])
+
+        with mock.patch.object(CorridorCache, "_default", cache), \
+                mock.patch.object(FuelStationService, "_find_corridor", return_value=_corridor) as find_corridor:
+            FuelStationService.get_corridor(_route, 800.0)
+            FuelStationService.get_corridor(_route, 800.0)
+            FuelStationService.get_corridor(_route, 800.0, max_distance_km=1.0)
+
+        self.assertEqual(
+            find_corridor.call_args_list, [mock.call(_route, 800.0, 0.5), mock.call(_route, 800.0, 1.0)]
+        )
@@ -0,0 +1,102 @@
+import math
+
+from django.contrib.gis.geos import LineString, Point
+from django.db import connection
+from django.test import TestCase
+
+from fuel_route.data.exceptions import FuelStationNotFoundException
+from fuel_route.data.models import FuelStationModel
+from fuel_route.services.fuel_station_service import FuelStationService, GeographyDWithin
+
+METERS_PER_DEGREE_LAT = 111320.0
+
+
+def station_at(opis_id: int, lon: float, lat: float, retail_price: float = 3.0) -> FuelStationModel:
+    return FuelStationModel(
+        opis_id=opis_id,
+        truckstop_name=f"Station {opis_id}",
+        address="Corridor",
+        city="Test",
+        state="TS",
+        rack_id=1,
+        location=Point(lon, lat, srid=4326),
+        retail_price=retail_price,
+    )
+
+
+class CorridorQueryTests(TestCase):
+    """
+    The ``ST_DWithin`` corridor is as wide across an east-west route as across a
+    north-south one, with stations 400 m off the route kept and 600 m off left out.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.east_west = LineString((-100.0, 40.0), (-99.0, 40.0), srid=4326)
+        cls.north_south = LineString((-95.0, 35.0), (-95.0, 36.0), srid=4326)
+        _north = 400 / METERS_PER_DEGREE_LAT
+        _east = 400 / (METERS_PER_DEGREE_LAT * math.cos(math.radians(35.5)))
+        FuelStationModel.objects.bulk_create([
+            station_at(1, -99.5, 40.0 + _north),
+            station_at(2, -99.5, 40.0 - _north * 1.5),
+            station_at(3, -95.0 + _east, 35.5),
+            station_at(4, -95.0 - _east * 1.5, 35.5),
+        ])
+
+    def _opis_ids(self, route):
+        return sorted(station.opis_id for station in FuelStationService.get_stations_along_route(route, 0.5))
+
+    def test_corridor_has_the_same_width_across_both_directions(self):
+        self.assertEqual(self._opis_ids(self.east_west), [1])
+        self.assertEqual(self._opis_ids(self.north_south), [3])
+
+    def test_stations_are_ordered_from_the_start_with_their_distances(self):
+        station_at(5, -99.9, 40.0).save()
+        stations = list(FuelStationService.get_stations_along_route(self.east_west, 0.5))
+
+        self.assertEqual([station.opis_id for station in stations], [5, 1])
+        self.assertAlmostEqual(stations[1].distance_to_route.m, 400, delta=5)
+        self.assertAlmostEqual(stations[1].closest_point_on_route, 0.5, delta=0.01)
+
+    def test_empty_corridor_raises(self):
+        with self.assertRaises(FuelStationNotFoundException):
+            FuelStationService.get_stations_along_route(LineString((-80.0, 30.0), (-79.0, 30.0), srid=4326), 0.5)
+
+    def test_search_uses_the_geography_index(self):
+        _queryset = FuelStationModel.objects.filter(GeographyDWithin("location", self.east_west, 500))
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            _plan = _queryset.explain()
+
+        self.assertIn("fuel_route_station_location_geog_gist", _plan)
+
+
+class ProjectedLocationTests(TestCase):
+    """
+    The trigger keeps ``location_5069`` in sync with ``location`` for every writer.
+    """
+
+    def _assert_projected(self, opis_id: int, lon: float, lat: float):
+        station = FuelStationModel.objects.get(opis_id=opis_id)
+        _expected = Point(lon, lat, srid=4326).transform(5069, clone=True)
+
+        self.assertEqual(station.location_5069.srid, 5069)
+        self.assertAlmostEqual(station.location_5069.x, _expected.x, delta=0.01)
+        self.assertAlmostEqual(station.location_5069.y, _expected.y, delta=0.01)
+
+    def test_bulk_and_single_inserts_are_projected(self):
+        FuelStationModel.objects.bulk_create([station_at(1, -99.5, 40.0)])
+        station_at(2, -95.0, 35.5).save()
+
+        self._assert_projected(1, -99.5, 40.0)
+        self._assert_projected(2, -95.0, 35.5)
+
+    def test_location_updates_are_projected_again(self):
+        station = station_at(1, -99.5, 40.0)
+        station.save()
+        station.location = Point(-90.0, 38.0, srid=4326)
+        station.save()
+        self._assert_projected(1, -90.0, 38.0)
+
+        FuelStationModel.objects.filter(opis_id=1).update(location=Point(-88.0, 37.0, srid=4326))
+        self._assert_projected(1, -88.0, 37.0)
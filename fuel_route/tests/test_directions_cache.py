@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from fuel_route.data.models import DirectionsCacheModel
+from fuel_route.services.directions_cache import DirectionsCache
+from fuel_route.tests.utils import assert_created_once
+
+
+class DirectionsCacheKeyTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = DirectionsCache(ttl_seconds=60, max_entries=10, precision=4)
+
+    def test_coordinates_are_rounded_to_the_precision(self):
+        self.assertEqual(
+            self.cache.make_key([[-96.79701, 32.77671], [-84.38801, 33.74901]], "driving-hgv"),
+            self.cache.make_key([[-96.79699, 32.77669], [-84.38799, 33.74899]], "driving-hgv"),
+        )
+
+    def test_profile_and_options_change_the_key(self):
+        _coordinates = [[-96.797, 32.7767], [-84.388, 33.749]]
+        _key = self.cache.make_key(_coordinates, "driving-hgv")
+
+        self.assertNotEqual(_key, self.cache.make_key(_coordinates, "driving-car"))
+        self.assertNotEqual(_key, self.cache.make_key(_coordinates, "driving-hgv", radiuses=[-1, -1]))
+        self.assertNotEqual(_key, self.cache.make_key(_coordinates[::-1], "driving-hgv"))
+
+    def test_default_cache_is_created_once(self):
+        assert_created_once(self, DirectionsCache, DirectionsCache.default)
+
+
+class SharedDirectionsCacheTests(TestCase):
+    def setUp(self):
+        self.cache = DirectionsCache(ttl_seconds=60, max_entries=10, precision=4)
+        self.coordinates = [[-96.797, 32.7767], [-84.388, 33.749]]
+        self.key = self.cache.make_key(self.coordinates, "driving-hgv")
+
+    def test_shared_hit_fills_the_memory_tier(self):
+        self.cache.set(self.key, self.coordinates, "driving-hgv", {"routes": []})
+        self.cache.memory.clear()
+
+        self.assertEqual(self.cache.get(self.key), {"routes": []})
+        self.assertEqual(self.cache.get(self.key), {"routes": []})
+        self.assertEqual(self.cache.stats.shared_hits, 1)
+        self.assertEqual(self.cache.stats.memory_hits, 1)
+
+    def test_expired_entries_are_misses_and_purged(self):
+        DirectionsCacheModel.objects.create(
+            key=self.key, profile="driving-hgv", coordinates=self.coordinates, response={},
+            expires_at=timezone.now() - timedelta(seconds=1),
+        )
+
+        self.assertIsNone(self.cache.get(self.key))
+        self.assertEqual(self.cache.stats.misses, 1)
+        self.assertEqual(DirectionsCache.purge_expired(), 1)
+        self.assertFalse(DirectionsCacheModel.objects.exists())
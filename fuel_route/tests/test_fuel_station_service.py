@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+from django.contrib.gis.geos import LineString
+from django.test import SimpleTestCase, TestCase
+
+from fuel_route.data.exceptions import FuelStationNotFoundException
+from fuel_route.data.models import FuelStationModel
+from fuel_route.services.fuel_station_service import FuelStationService
+from fuel_route.services.fuel_stop_solvers import WindowFuelStopSolver
+from fuel_route.tests.utils import parallel_route, stations_at
+
+
+class QueryFuelStopsTests(TestCase):
+    """
+    The PostGIS re-query loop against the in-memory window solver, on stations
+    along the 40th parallel from -100 to -92 (about 425 miles).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.coordinates = parallel_route(-100.0, -92.0, 40.0)
+        cls.route = LineString(cls.coordinates.tolist(), srid=4326)
+        cls.total_distance = 425.0
+        FuelStationModel.objects.bulk_create(
+            stations_at(cls.coordinates, [30, 100, 150, 250], [2.0, 3.5, 3.0, 1.0])
+        )
+
+    def _stations(self):
+        return FuelStationService.get_stations_along_route(route=self.route, max_distance_km=0.5)
+
+    def test_full_tank_needs_no_stop(self):
+        stops, _ = FuelStationService.calculate_optimal_fuel_stops(
+            self._stations(), self.route, self.total_distance, max_millage_per_tank=500
+        )
+
+        self.assertEqual(stops, [])
+
+    def test_starting_fuel_is_honoured_like_the_in_memory_solver(self):
+        stops, _ = FuelStationService.calculate_optimal_fuel_stops(
+            self._stations(), self.route, self.total_distance, max_millage_per_tank=500, starting_fuel=200
+        )
+        in_memory, _ = FuelStationService.calculate_optimal_fuel_stops_in_memory(
+            self._stations(), self.route, self.total_distance,
+            solver=WindowFuelStopSolver(max_millage_per_tank=500, starting_fuel=200),
+        )
+
+        # Mile 30 is under 20% of the starting range and mile 250 beyond it
+        self.assertEqual([stop.opis_id for stop in stops], [1002])
+        self.assertEqual([stop.opis_id for stop in in_memory], [1002])
+
+    def test_raises_when_the_refill_window_is_empty(self):
+        # Leaving with 20 mi of range, the first station at mile 30 is out of reach
+        with self.assertRaises(FuelStationNotFoundException):
+            FuelStationService.calculate_optimal_fuel_stops(
+                self._stations(), self.route, self.total_distance, max_millage_per_tank=500, starting_fuel=20
+            )
+
+
+class TotalCostTests(SimpleTestCase):
+    @staticmethod
+    def _stop(route_mileage: float, retail_price: float, **attributes):
+        return SimpleNamespace(route_mileage=route_mileage, retail_price=retail_price, **attributes)
+
+    def test_planned_purchases_are_costed_as_they_are(self):
+        _stops = [self._stop(100, 3.0, purchased_gallons=10), self._stop(300, 4.0, purchased_gallons=5)]
+
+        self.assertAlmostEqual(FuelStationService.calculate_total_cost(None, _stops, 600), 50.0)
+
+    def test_stops_fill_up_and_the_starting_fuel_is_free(self):
+        _stops = [self._stop(150, 3.0)]
+
+        _cost = FuelStationService.calculate_total_cost(
+            None, _stops, 450, fuel_efficiency=10, max_millage_per_tank=500, starting_fuel=200
+        )
+        self.assertAlmostEqual(_cost, 25 * 3.0)
+
+    def test_no_stops_cost_nothing(self):
+        self.assertEqual(FuelStationService.calculate_total_cost(None, [], 300), 0.0)
@@ -0,0 +1,152 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from fuel_route.data.data_types import VehicleSpec
+from fuel_route.data.exceptions import FuelStationNotFoundException
+from fuel_route.services.fuel_stop_solvers import CheapestFuelStopSolver, fill_up_purchases, WindowFuelStopSolver
+from fuel_route.tests.utils import corridor_of
+
+
+class WindowFuelStopSolverTests(SimpleTestCase):
+    def test_picks_the_cheapest_station_of_each_window(self):
+        solver = WindowFuelStopSolver(max_millage_per_tank=500)
+        plan = solver.solve(
+            corridor_of([50, 150, 300, 400, 500, 600, 620], [1.0, 4.0, 3.0, 2.0, 5.0, 3.0, 2.5]), 1000
+        )
+
+        # First window (100, 350] from the start: 150 or 300; next one (250, 350] past 300: 600 or 620
+        self.assertEqual(plan.stop_indices, [2, 6])
+        np.testing.assert_allclose(plan.leg_distances, [300, 320], rtol=1e-6)
+
+    def test_solve_many_matches_solving_every_vehicle_alone(self):
+        _rng = np.random.default_rng(7)
+        _miles = np.sort(_rng.uniform(0, 2500, 400))
+        corridor = corridor_of(_miles, _rng.uniform(3.0, 5.0, len(_miles)))
+        vehicles = [
+            VehicleSpec(),
+            VehicleSpec(tank_gallons=100, tanks=2, mpg=7.5),
+            VehicleSpec(tank_gallons=60, mpg=9, starting_fuel_gallons=20),
+            VehicleSpec(tank_gallons=120, mpg=6, reserve_gallons=15),
+        ]
+        solver = WindowFuelStopSolver()
+
+        plans = solver.solve_many(corridor, 2500, vehicles)
+
+        self.assertEqual(len(plans), len(vehicles))
+        for vehicle, plan in zip(vehicles, plans):
+            _alone = solver.for_vehicle(vehicle).solve(corridor, 2500)
+            self.assertEqual(plan.stop_indices, _alone.stop_indices)
+            np.testing.assert_allclose(plan.leg_distances, _alone.leg_distances)
+            np.testing.assert_allclose(plan.gallons, _alone.gallons)
+
+    def test_starting_fuel_shrinks_the_first_window(self):
+        corridor = corridor_of([150, 300, 450], [3.0, 2.0, 3.5])
+
+        self.assertEqual(WindowFuelStopSolver(max_millage_per_tank=500).solve(corridor, 600).stop_indices, [1])
+        # With 200 mi of range the first stop has to be within (40, 200]
+        plan = WindowFuelStopSolver(max_millage_per_tank=500, starting_fuel=200).solve(corridor, 600)
+        self.assertEqual(plan.stop_indices, [0])
+
+    def test_route_within_range_needs_no_stop(self):
+        plan = WindowFuelStopSolver(max_millage_per_tank=500).solve(corridor_of([100, 200], [3.0, 3.0]), 450)
+
+        self.assertEqual(plan.stop_indices, [])
+        self.assertEqual(plan.total_cost, 0.0)
+
+    def test_fills_up_at_every_stop_but_the_last(self):
+        solver = WindowFuelStopSolver(max_millage_per_tank=500, fuel_efficiency=10)
+        plan = solver.solve(corridor_of([300, 600], [3.0, 4.0]), 1000)
+
+        self.assertEqual(plan.stop_indices, [0, 1])
+        # Refills the 300 mi burned, then tops up the 200 mi left to the 400 mi still to drive
+        np.testing.assert_allclose(plan.gallons, [30, 20], rtol=1e-6)
+        self.assertAlmostEqual(plan.total_cost, 30 * 3.0 + 20 * 4.0, places=4)
+
+    def test_raises_when_a_window_has_no_station(self):
+        solver = WindowFuelStopSolver(max_millage_per_tank=500)
+        with self.assertRaises(FuelStationNotFoundException):
+            solver.solve(corridor_of([150, 700], [3.0, 3.0]), 1200)
+        with self.assertRaises(FuelStationNotFoundException):
+            solver.solve_many(corridor_of([150, 400], [3.0, 3.0]), 800, [VehicleSpec(), VehicleSpec(mpg=3)])
+
+
+class CheapestFuelStopSolverTests(SimpleTestCase):
+    def test_fills_up_where_no_cheaper_station_is_in_range(self):
+        solver = CheapestFuelStopSolver(max_millage_per_tank=500, fuel_efficiency=10)
+        plan = solver.solve(corridor_of([100, 300, 700], [4.0, 3.0, 5.0]), 1000)
+
+        self.assertEqual(plan.stop_indices, [1, 2])
+        np.testing.assert_allclose(plan.gallons, [30, 20])
+        self.assertAlmostEqual(plan.total_cost, 30 * 3.0 + 20 * 5.0)
+
+    def test_buys_just_enough_to_reach_a_cheaper_station(self):
+        solver = CheapestFuelStopSolver(max_millage_per_tank=500, fuel_efficiency=10, starting_fuel=150)
+        plan = solver.solve(corridor_of([100, 300, 450], [3.0, 4.0, 2.0]), 900)
+
+        self.assertEqual(plan.stop_indices, [0, 2])
+        np.testing.assert_allclose(plan.leg_distances, [100, 350])
+        np.testing.assert_allclose(plan.gallons, [30, 45])
+        self.assertAlmostEqual(plan.total_cost, 30 * 3.0 + 45 * 2.0)
+
+    def test_stops_only_as_much_as_the_route_needs(self):
+        plan = CheapestFuelStopSolver(max_millage_per_tank=500).solve(corridor_of([100], [3.0]), 400)
+
+        self.assertEqual(plan.stop_indices, [])
+        self.assertEqual(plan.total_cost, 0.0)
+
+    def test_raises_when_a_gap_is_longer_than_a_tank(self):
+        solver = CheapestFuelStopSolver(max_millage_per_tank=500)
+        with self.assertRaises(FuelStationNotFoundException):
+            solver.solve(corridor_of([100, 700], [3.0, 3.0]), 1200)
+
+
+class SolverAgreementTests(SimpleTestCase):
+    """
+    Where a corridor leaves one way to drive the route, both solvers plan the
+    same stops and cost them the same way.
+    """
+
+    solvers = (WindowFuelStopSolver, CheapestFuelStopSolver)
+
+    def _plans(self, corridor, total_distance, vehicle):
+        return [_solver().for_vehicle(vehicle).solve(corridor, total_distance) for _solver in self.solvers]
+
+    def test_single_stop_costs_the_same(self):
+        vehicle = VehicleSpec(tank_gallons=50, mpg=10)
+        window, cheapest = self._plans(corridor_of([300], [3.0]), 800, vehicle)
+
+        self.assertEqual(window.stop_indices, cheapest.stop_indices)
+        np.testing.assert_allclose(window.gallons, cheapest.gallons, rtol=1e-6)
+        self.assertAlmostEqual(window.total_cost, cheapest.total_cost, places=4)
+        self.assertAlmostEqual(cheapest.total_cost, 30 * 3.0)
+
+    def test_starting_fuel_is_not_costed(self):
+        vehicle = VehicleSpec(tank_gallons=50, mpg=10, starting_fuel_gallons=20)
+        window, cheapest = self._plans(corridor_of([150], [3.0]), 450, vehicle)
+
+        self.assertEqual(window.stop_indices, cheapest.stop_indices)
+        # 50 of the 200 starting miles left at mile 150, 300 more miles to go
+        self.assertAlmostEqual(window.total_cost, 25 * 3.0, places=4)
+        self.assertAlmostEqual(cheapest.total_cost, 25 * 3.0, places=4)
+
+    def test_no_stop_within_the_starting_range(self):
+        for plan in self._plans(corridor_of([100], [3.0]), 400, VehicleSpec(tank_gallons=50, mpg=10)):
+            self.assertEqual(plan.stop_indices, [])
+            self.assertEqual(plan.total_cost, 0.0)
+
+    def test_both_raise_on_a_gap_no_tank_covers(self):
+        vehicle = VehicleSpec(tank_gallons=50, mpg=10)
+        for _solver in self.solvers:
+            with self.subTest(_solver.__name__), self.assertRaises(FuelStationNotFoundException):
+                _solver().for_vehicle(vehicle).solve(corridor_of([150, 700], [3.0, 3.0]), 1200)
+
+
+class FillUpPurchasesTests(SimpleTestCase):
+    def test_fills_up_and_buys_what_the_rest_needs_at_the_last_stop(self):
+        np.testing.assert_allclose(fill_up_purchases([300, 600], 1000, 500, 500), [300, 200])
+
+    def test_starting_fuel_is_not_bought(self):
+        np.testing.assert_allclose(fill_up_purchases([150], 450, 500, 200), [250])
+
+    def test_nothing_bought_when_the_tank_already_reaches_the_end(self):
+        np.testing.assert_allclose(fill_up_purchases([100], 300, 500, 500), [0])
@@ -0,0 +1,109 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from fuel_route.data.exceptions import GeocodeNotFoundException
+from fuel_route.data.models import GeocodeCacheModel
+from fuel_route.services.geocode_cache import GeocodeCache
+from fuel_route.tests.utils import assert_created_once
+
+
+class GeocodeCacheNormalizeTests(SimpleTestCase):
+    def test_case_spacing_and_punctuation_are_normalized(self):
+        self.assertEqual(GeocodeCache.normalize("  Dallas ,TX.  "), "dallas, tx")
+        self.assertEqual(GeocodeCache.normalize("Dallas,   TX"), GeocodeCache.normalize("dallas, tx"))
+
+    def test_default_cache_is_created_once(self):
+        # Concurrent lookups only coalesce when they share the cache's single-flight map
+        assert_created_once(self, GeocodeCache, GeocodeCache.default)
+
+
+class AsyncGeocodeCoalescingTests(SimpleTestCase):
+    """
+    The shared tier is patched out, so only the coalescing on the event loop runs.
+    """
+
+    def setUp(self):
+        self.cache = GeocodeCache(ttl_seconds=60, max_entries=10)
+        for _name in ("lookup", "store"):
+            _patcher = mock.patch.object(self.cache, _name, return_value=None)
+            setattr(self, _name, _patcher.start())
+            self.addCleanup(_patcher.stop)
+
+    def test_concurrent_lookups_share_one_search(self):
+        _calls = []
+
+        async def _search():
+            _calls.append(1)
+            await asyncio.sleep(0.05)
+            return 32.7767, -96.797
+
+        async def _lookups():
+            return await asyncio.gather(*(
+                self.cache.resolve_async("ors", _query, _search) for _query in ("Dallas, TX", "dallas,tx", "DALLAS, TX")
+            ))
+
+        self.assertEqual(asyncio.run(_lookups()), [(32.7767, -96.797)] * 3)
+        self.assertEqual(len(_calls), 1)
+        self.assertEqual(self.cache.stats.coalesced, 2)
+        self.store.assert_called_once_with("ors", "Dallas, TX", (32.7767, -96.797))
+
+    def test_waiters_get_the_error_and_failed_lookups_are_not_stored(self):
+        async def _not_found():
+            await asyncio.sleep(0.05)
+            raise GeocodeNotFoundException("Unable to geocode location: Nowhere")
+
+        async def _empty():
+            return None
+
+        async def _lookups():
+            _results = await asyncio.gather(
+                *(self.cache.resolve_async("ors", "Nowhere", _not_found) for _ in range(2)), return_exceptions=True
+            )
+            return _results, await self.cache.resolve_async("ors", "Nowhere", _empty)
+
+        _results, _empty_result = asyncio.run(_lookups())
+        self.assertTrue(all(isinstance(_result, GeocodeNotFoundException) for _result in _results))
+        self.assertIsNone(_empty_result)
+        self.store.assert_not_called()
+
+    def test_waiters_retry_when_the_search_they_joined_is_cancelled(self):
+        _calls = []
+
+        async def _search():
+            _calls.append(1)
+            await asyncio.sleep(0.1)
+            return 33.749, -84.388
+
+        async def _lookups():
+            _first = asyncio.ensure_future(self.cache.resolve_async("ors", "Atlanta, GA", _search))
+            await asyncio.sleep(0.01)
+            _second = asyncio.ensure_future(self.cache.resolve_async("ors", "Atlanta, GA", _search))
+            await asyncio.sleep(0.01)
+            _first.cancel()
+            return await _second
+
+        self.assertEqual(asyncio.run(_lookups()), (33.749, -84.388))
+        self.assertEqual(len(_calls), 2)
+
+
+class SharedGeocodeCacheTests(TestCase):
+    def setUp(self):
+        self.cache = GeocodeCache(ttl_seconds=60, max_entries=10)
+
+    def test_store_many_and_lookup_many_share_the_normalized_rows(self):
+        self.cache.store_many("ors", {"Dallas, TX": (32.7767, -96.797)})
+        self.cache.memory.clear()
+
+        _found = self.cache.lookup_many("ors", ["dallas,tx", "Atlanta, GA"])
+        self.assertEqual(_found, {"dallas,tx": (32.7767, -96.797)})
+        self.assertEqual(GeocodeCacheModel.objects.get().query, "dallas, tx")
+        self.assertEqual((self.cache.stats.shared_hits, self.cache.stats.misses), (1, 1))
+
+    def test_resolve_calls_upstream_once_per_query(self):
+        _geocode = mock.Mock(return_value=(33.749, -84.388))
+
+        self.assertEqual(self.cache.resolve("ors", "Atlanta, GA", _geocode), (33.749, -84.388))
+        self.assertEqual(self.cache.resolve("ors", "atlanta,  ga", _geocode), (33.749, -84.388))
+        _geocode.assert_called_once_with()
@@ -0,0 +1,97 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from fuel_route.services.http_pool import ConnectionStats, PooledSession
+from fuel_route.services.ors_service_client import ORSClient
+from fuel_route.services.routing_backends import ORSRoutingBackend, SessionORSClient
+from fuel_route.tests.utils import assert_created_once, run_concurrently
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Statuses answered before the first 200, shared by the test and the server thread
+    statuses = []
+
+    def do_GET(self):
+        _status = self.statuses.pop(0) if self.statuses else 200
+        _body = b'{"ok": true}'
+        self.send_response(_status)
+        if _status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(_body)))
+        self.end_headers()
+        self.wfile.write(_body)
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledSessionTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        _KeepAliveHandler.statuses = []
+        self.session = PooledSession(pool_size=2, max_retries=2, backoff_factor=0)
+        self.addCleanup(self.session.close)
+
+    def test_requests_reuse_one_connection(self):
+        for _ in range(5):
+            self.assertEqual(self.session.get(self.url).status_code, 200)
+
+        _stats = self.session.stats.as_dict()
+        self.assertEqual((_stats["requests"], _stats["connections_opened"]), (5, 1))
+        self.assertAlmostEqual(_stats["reuse_ratio"], 0.8)
+
+    def test_throttled_requests_are_retried_and_counted(self):
+        _KeepAliveHandler.statuses = [429, 503]
+
+        self.assertEqual(self.session.get(self.url).status_code, 200)
+        _stats = self.session.stats.as_dict()
+        self.assertEqual((_stats["requests"], _stats["retries"], _stats["throttled"]), (1, 2, 1))
+
+    def test_last_response_is_returned_once_retries_run_out(self):
+        _KeepAliveHandler.statuses = [429, 429, 429]
+
+        self.assertEqual(self.session.get(self.url).status_code, 429)
+        self.assertEqual(self.session.stats.throttled, 3)
+
+
+class SharedClientsTests(SimpleTestCase):
+    def test_shared_session_is_created_once_per_name(self):
+        with mock.patch.dict(PooledSession._shared, clear=True):
+            _sessions = run_concurrently(lambda: PooledSession.shared("test"))
+
+            self.assertEqual(len({id(_session) for _session in _sessions}), 1)
+            self.assertIsNot(PooledSession.shared("other"), _sessions[0])
+
+    def test_shared_ors_client_is_created_once(self):
+        assert_created_once(self, ORSClient, ORSClient.shared, attribute="_shared")
+
+    def test_ors_clients_share_the_pooled_session(self):
+        _client = ORSRoutingBackend.make_client("http://localhost:8080/ors")
+
+        self.assertIsInstance(_client, SessionORSClient)
+        self.assertIs(_client.session, PooledSession.shared("ors"))
+        self.assertIn("reuse_ratio", ORSClient(directions_cache=None, geocode_cache=None).connection_stats)
+
+
+class ConnectionStatsTests(SimpleTestCase):
+    def test_no_requests_have_no_ratios(self):
+        _stats = ConnectionStats().as_dict()
+
+        self.assertEqual((_stats["reuse_ratio"], _stats["avg_request_ms"]), (0.0, 0.0))
@@ -0,0 +1,242 @@
+import asyncio
+import csv
+import os
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.gis.geos import Point
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from fuel_route.data.data_types import Coordinates
+from fuel_route.data.exceptions import GeocodeNotFoundException, InvalidPriceFileException
+from fuel_route.data.models import FuelStationModel, StationTableGenerationModel
+from fuel_route.management.commands.import_fuel_stations_async import Command as AsyncImportCommand
+from fuel_route.services.async_ors_client import AsyncORSClient
+from fuel_route.services.fuel_station_import_service import FuelStationImportService, ImportCheckpoint, RateLimiter
+from fuel_route.services.geocode_cache import GeocodeCache
+
+CSV_COLUMNS = ['OPIS Truckstop ID', 'Truckstop Name', 'Address', 'City', 'State', 'Rack ID', 'Retail Price']
+
+
+def opis_row(opis_id: int, price: float = 3.0, city: str = None) -> dict:
+    return {
+        'OPIS Truckstop ID': str(opis_id),
+        'Truckstop Name': f"Station {opis_id}",
+        'Address': f"I-{opis_id}, EXIT 1",
+        'City': city or f"City {opis_id}",
+        'State': "TX",
+        'Rack ID': "1",
+        'Retail Price': str(price),
+    }
+
+
+def write_opis_csv(directory: str, rows) -> str:
+    _path = os.path.join(directory, "stations.csv")
+    with open(_path, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return _path
+
+
+class ImportHelpersTests(SimpleTestCase):
+    def test_batches_report_the_index_of_their_first_row(self):
+        self.assertEqual(
+            list(FuelStationImportService.batches(range(5), 2)), [(0, [0, 1]), (2, [2, 3]), (4, [4])]
+        )
+
+    def test_parse_row(self):
+        station = FuelStationImportService.parse_row(opis_row(7, price=3.25, city="Dallas"))
+
+        self.assertEqual((station.opis_id, station.rack_id, station.retail_price), (7, 1, 3.25))
+        self.assertIsNone(station.location)
+        self.assertEqual(FuelStationImportService.format_address(station), "I-7, EXIT 1, Dallas, TX")
+
+    def test_checkpoint_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = ImportCheckpoint(os.path.join(directory, "import.checkpoint"))
+            self.assertEqual(checkpoint.load(), 0)
+            checkpoint.save(500, imported=480)
+            self.assertEqual(checkpoint.load(), 500)
+            checkpoint.clear()
+            self.assertEqual(checkpoint.load(), 0)
+
+    def test_rate_limiter_spaces_calls(self):
+        limiter = RateLimiter(rate_per_second=50)
+        _start = time.monotonic()
+        for _ in range(4):
+            limiter.acquire()
+
+        self.assertGreaterEqual(time.monotonic() - _start, 3 / 50 - 0.005)
+
+
+class ImportFuelStationsCommandTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        _patcher = mock.patch("fuel_route.management.commands.import_fuel_stations.ORSClient")
+        self.ors_client = _patcher.start().return_value
+        self.addCleanup(_patcher.stop)
+        self.ors_client.geocode_cache = GeocodeCache(ttl_seconds=60, max_entries=100)
+        self.ors_client.geocode_provider = "test"
+        self.ors_client.connection_stats = {}
+        self.ors_client.geocode.side_effect = lambda address, use_cache=True: Coordinates(lat=32.0, lon=-96.0)
+
+    def _import(self, path: str, *args):
+        call_command("import_fuel_stations", path, "--workers", "2", "--rate", "0", *args, stdout=StringIO())
+
+    def test_resumes_after_the_checkpointed_rows(self):
+        _path = write_opis_csv(self.directory.name, [opis_row(_id) for _id in range(1, 6)])
+        ImportCheckpoint(f"{_path}.checkpoint").save(2)
+
+        self._import(_path, "--batch-size", "2")
+
+        self.assertEqual(sorted(FuelStationModel.objects.values_list("opis_id", flat=True)), [3, 4, 5])
+        self.assertFalse(os.path.exists(f"{_path}.checkpoint"))
+
+    def test_skips_existing_stations_and_geocodes_each_address_once(self):
+        FuelStationModel.objects.create(
+            opis_id=1, truckstop_name="Existing", address="Old", city="Old", state="TX", rack_id=1,
+            location=Point(-95.0, 31.0, srid=4326), retail_price=2.0,
+        )
+        _rows = [opis_row(1, price=9.0), opis_row(2, city="Dallas"), opis_row(3, city="Dallas"), opis_row(3)]
+        _rows[2]['Address'] = _rows[1]['Address']
+        _path = write_opis_csv(self.directory.name, _rows)
+
+        self._import(_path)
+
+        self.assertEqual(FuelStationModel.objects.get(opis_id=1).retail_price, 2.0)
+        self.assertEqual(FuelStationModel.objects.get(opis_id=3).city, "Dallas")
+        self.assertEqual(self.ors_client.geocode.call_count, 1)
+
+
+class UpsertStationsTests(TestCase):
+    def test_updates_existing_rows_and_keeps_the_first_duplicate(self):
+        FuelStationModel.objects.create(
+            opis_id=1, truckstop_name="Old", address="Old", city="Old", state="TX", rack_id=1,
+            location=Point(-95.0, 31.0, srid=4326), retail_price=2.0,
+        )
+        _stations = [
+            FuelStationImportService.parse_row(opis_row(_id, price=_price))
+            for _id, _price in ((1, 3.5), (2, 3.0), (2, 4.0))
+        ]
+        for station in _stations:
+            station.location = Point(-96.0, 32.0, srid=4326)
+
+        self.assertEqual(FuelStationImportService.upsert_stations(_stations, batch_size=1), 2)
+        self.assertEqual(
+            dict(FuelStationModel.objects.values_list("opis_id", "retail_price")), {1: 3.5, 2: 3.0}
+        )
+        self.assertEqual(FuelStationModel.objects.get(opis_id=1).location.x, -96.0)
+
+
+class AsyncImportWriterTests(SimpleTestCase):
+    def test_writes_full_batches_then_the_rest_at_the_sentinel(self):
+        command = AsyncImportCommand(stdout=StringIO())
+        command._writer_error = None
+        _flushed = []
+
+        def _flush(stations, geocoded):
+            _flushed.append((len(stations), sorted(geocoded)))
+            return len(stations)
+
+        async def _write():
+            queue = asyncio.Queue()
+            for _index in range(5):
+                _address = f"address {_index}" if _index % 2 else None
+                await queue.put(([FuelStationImportService.parse_row(opis_row(_index))], _address, (32.0, -96.0)))
+            await queue.put(None)
+            return await command._write_batches(queue, batch_size=2)
+
+        with mock.patch.object(command, "_flush", side_effect=_flush):
+            self.assertEqual(asyncio.run(_write()), 5)
+        self.assertEqual(_flushed, [(2, ["address 1"]), (2, ["address 3"]), (1, [])])
+
+
+class AsyncImportFuelStationsCommandTests(TransactionTestCase):
+    """
+    ``sync_to_async`` runs the writes on another thread, so they have to be
+    committed for the test to see them.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        _patcher = mock.patch.object(
+            GeocodeCache, "default", return_value=GeocodeCache(ttl_seconds=60, max_entries=100)
+        )
+        _patcher.start()
+        self.addCleanup(_patcher.stop)
+        self.geocoded = []
+
+    async def _geocode(self, address, use_cache=True):
+        self.geocoded.append(address)
+        await asyncio.sleep(0.01)
+        if address.startswith("Nowhere"):
+            raise GeocodeNotFoundException(f"Unable to geocode location: {address}")
+        return 32.0, -96.0
+
+    def test_imports_every_geocoded_row_in_batches(self):
+        _rows = [opis_row(_id) for _id in range(1, 7)] + [opis_row(3)]
+        _rows[1]['Address'] = _rows[0]['Address']
+        _rows[1]['City'] = _rows[0]['City']
+        _rows[5]['Address'] = "Nowhere"
+        _path = write_opis_csv(self.directory.name, _rows)
+        _stdout = StringIO()
+
+        with mock.patch.object(AsyncORSClient, "geocode", new=self._geocode):
+            call_command(
+                "import_fuel_stations_async", _path, "--concurrency", "2", "--batch-size", "2", stdout=_stdout
+            )
+
+        self.assertEqual(sorted(FuelStationModel.objects.values_list("opis_id", flat=True)), [1, 2, 3, 4, 5])
+        self.assertEqual(len(self.geocoded), 5)
+        self.assertIn("Successfully imported 5 fuel stations from 7 rows", _stdout.getvalue())
+
+
+class RefreshPricesTests(TestCase):
+    def setUp(self):
+        for _opis_id in (1, 2):
+            FuelStationModel.objects.create(
+                opis_id=_opis_id, truckstop_name=f"Station {_opis_id}", address="I-1", city="Dallas", state="TX",
+                rack_id=1, location=Point(-96.0, 32.0, srid=4326), retail_price=3.0,
+            )
+
+    @staticmethod
+    def _price_file(rows) -> StringIO:
+        _file = StringIO()
+        writer = csv.DictWriter(_file, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+        _file.seek(0)
+        return _file
+
+    def test_updates_changed_prices_and_skips_rows_that_would_not_cast(self):
+        _rows = [opis_row(1, price=3.5), opis_row(1, price=9.0), opis_row(2), opis_row(3, price=2.5)]
+        _rows += [{**opis_row(4), 'OPIS Truckstop ID': ""}, {**opis_row(5), 'OPIS Truckstop ID': "N/A"}]
+        _rows += [{**opis_row(2), 'Retail Price': "n/a"}, {**opis_row(99999999999)}]
+        _generation = StationTableGenerationModel.current()
+
+        result = FuelStationImportService.refresh_prices(self._price_file(_rows))
+
+        self.assertEqual((result.staged_rows, result.skipped_rows), (8, 4))
+        self.assertEqual((result.matched, result.updated, result.unknown), (2, 1, 1))
+        self.assertEqual(dict(FuelStationModel.objects.values_list("opis_id", "retail_price")), {1: 3.5, 2: 3.0})
+        self.assertGreater(StationTableGenerationModel.current(), _generation)
+
+    def test_missing_columns_are_rejected(self):
+        with self.assertRaises(InvalidPriceFileException):
+            FuelStationImportService.refresh_prices(StringIO("OPIS Truckstop ID,Price\n1,3.0\n"))
+
+    def test_command_reports_skipped_rows_and_the_generation_bump(self):
+        with tempfile.TemporaryDirectory() as directory:
+            _path = write_opis_csv(directory, [opis_row(1, price=3.5), {**opis_row(2), 'Retail Price': ""}])
+            _stdout = StringIO()
+            call_command("refresh_fuel_prices", _path, stdout=_stdout)
+
+        self.assertIn("Updated 1 of 1 matched stations from 2 rows", _stdout.getvalue())
+        self.assertIn("Skipped 1 rows", _stdout.getvalue())
+        self.assertIn("Bumped the station table generation", _stdout.getvalue())
@@ -0,0 +1,134 @@
+import heapq
+import json
+import os
+import tempfile
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command, CommandError
+from django.test import SimpleTestCase
+
+from fuel_route.data.exceptions import RouteNotFoundException
+from fuel_route.services.road_graph import grid_road_graph, RoadGraph
+from fuel_route.services.route_geometry import haversine_miles
+
+
+def dijkstra_seconds(graph: RoadGraph, source: int, target: int) -> float:
+    _best = {source: 0.0}
+    _heap = [(0.0, source)]
+    while _heap:
+        _cost, _node = heapq.heappop(_heap)
+        if _node == target:
+            return _cost
+        for _edge in range(graph.indptr[_node], graph.indptr[_node + 1]):
+            _next = int(graph.indices[_edge])
+            if _cost + graph.seconds[_edge] < _best.get(_next, float("inf")):
+                _best[_next] = _cost + graph.seconds[_edge]
+                heapq.heappush(_heap, (_best[_next], _next))
+    return float("inf")
+
+
+class RoadGraphTests(SimpleTestCase):
+    def setUp(self):
+        # 3 x 3 grid with diagonals, node ids row by row from the south-west corner
+        self.graph = grid_road_graph(0.0, 0.0, 0.2, 0.2, step_degrees=0.1, speed_mph=60)
+
+    def test_shortest_path_takes_the_diagonal(self):
+        nodes, miles, seconds = self.graph.shortest_path(0, 8)
+
+        self.assertEqual(nodes, [0, 4, 8])
+        self.assertAlmostEqual(miles, float(haversine_miles(0.0, 0.0, 0.2, 0.2)), places=3)
+        self.assertAlmostEqual(seconds, miles / 60 * 3600, places=6)
+
+    def test_shortest_path_to_itself(self):
+        self.assertEqual(self.graph.shortest_path(3, 3), ([3], 0.0, 0.0))
+
+    def test_unreachable_node_raises(self):
+        # One-way road from node 0 to node 1
+        graph = RoadGraph.from_edges([0.0, 0.1], [0.0, 0.0], [0], [1], [55])
+
+        self.assertEqual(graph.shortest_path(0, 1)[0], [0, 1])
+        with self.assertRaises(RouteNotFoundException):
+            graph.shortest_path(1, 0)
+
+    def test_a_star_matches_dijkstra_with_mixed_speeds(self):
+        graph = grid_road_graph(-100.0, 35.0, -98.0, 37.0, step_degrees=0.1)
+        _speeds = np.random.default_rng(3).uniform(25, 75, graph.edge_count)
+        graph = RoadGraph(
+            graph.lons, graph.lats, graph.indptr, graph.indices, graph.miles, graph.miles / _speeds * 3600
+        )
+
+        for _source, _target in ((0, len(graph) - 1), (25, 300), (400, 7)):
+            _, _, _seconds = graph.shortest_path(_source, _target)
+            self.assertAlmostEqual(_seconds, dijkstra_seconds(graph, _source, _target), places=6)
+
+    def test_heuristic_is_kept_per_target(self):
+        graph = grid_road_graph(-100.0, 35.0, -99.0, 36.0, step_degrees=0.1)
+        _first = graph.shortest_path(0, 60)
+        _estimates = dict(graph._heuristic(60))
+
+        self.assertEqual(graph.shortest_path(0, 60), _first)
+        self.assertEqual(graph.shortest_path(120, 60)[0][-1], 60)
+        self.assertTrue(_estimates)
+        self.assertTrue(set(_estimates) <= set(graph._heuristic(60)))
+        self.assertLess(len(graph._heuristic(60)), len(graph))
+
+    def test_route_through_waypoints(self):
+        _coordinates, _way_points, _miles, _seconds = self.graph.route([[0.0, 0.0], [0.2, 0.2], [0.2, 0.0]])
+
+        self.assertEqual(_coordinates[_way_points[1]], [0.2, 0.2])
+        self.assertEqual(_way_points[0], 0)
+        self.assertEqual(_way_points[-1], len(_coordinates) - 1)
+        self.assertAlmostEqual(_seconds, _miles / 60 * 3600, places=6)
+
+    def test_route_rejects_waypoints_far_from_the_roads(self):
+        with self.assertRaises(RouteNotFoundException):
+            self.graph.route([[0.0, 0.0], [5.0, 5.0]], max_snap_miles=10)
+
+    def test_save_and_load_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            _path = os.path.join(directory, "graph.npz")
+            self.graph.save(_path)
+            graph = RoadGraph.load(_path)
+
+        self.assertEqual((len(graph), graph.edge_count), (len(self.graph), self.graph.edge_count))
+        self.assertEqual(graph.shortest_path(0, 8), self.graph.shortest_path(0, 8))
+
+
+class RoadGraphGeoJSONTests(SimpleTestCase):
+    def test_roads_connect_on_shared_vertices_and_honor_oneway_and_maxspeed(self):
+        _features = [
+            {"type": "Feature", "properties": {"maxspeed": "60 mph"},
+             "geometry": {"type": "LineString", "coordinates": [[0.0, 0.0], [0.1, 0.0]]}},
+            {"type": "Feature", "properties": {"maxspeed": "100", "oneway": "yes"},
+             "geometry": {"type": "LineString", "coordinates": [[0.1, 0.0], [0.2, 0.0]]}},
+            {"type": "Feature", "properties": {}, "geometry": {"type": "Point", "coordinates": [0.0, 0.0]}},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            _path = os.path.join(directory, "roads.geojson")
+            with open(_path, "w") as geojson_file:
+                json.dump({"type": "FeatureCollection", "features": _features}, geojson_file)
+            graph = RoadGraph.from_geojson(_path)
+
+        self.assertEqual((len(graph), graph.edge_count), (3, 3))
+        _nodes, _miles, _seconds = graph.shortest_path(0, 2)
+        self.assertEqual(_nodes, [0, 1, 2])
+        _leg = float(haversine_miles(0.0, 0.0, 0.1, 0.0))
+        self.assertAlmostEqual(_seconds, _leg / 60 * 3600 + _leg / (100 * 0.621371) * 3600, places=3)
+        with self.assertRaises(RouteNotFoundException):
+            graph.shortest_path(2, 0)
+
+
+class BuildRoadGraphCommandTests(SimpleTestCase):
+    def test_grid_needs_an_explicit_bounding_box(self):
+        with self.assertRaises(CommandError):
+            call_command("build_road_graph", "graph.npz", "--grid", "-100,35", stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command("build_road_graph", "graph.npz", stdout=StringIO())
+
+    def test_writes_the_grid(self):
+        with tempfile.TemporaryDirectory() as directory:
+            _path = os.path.join(directory, "grid.npz")
+            call_command("build_road_graph", _path, "--grid=-100,35,-99.5,35.5", "--step", "0.1", stdout=StringIO())
+
+            self.assertEqual(len(RoadGraph.load(_path)), 36)
@@ -0,0 +1,70 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from fuel_route.services.route_geometry import haversine_miles, RouteGeometry
+from fuel_route.tests.utils import DEGREES_PER_MILE
+
+
+class RouteGeometryTests(SimpleTestCase):
+    def setUp(self):
+        # East along the equator for 100 miles, then an extra vertex 50 miles further
+        self.geometry = RouteGeometry([[0.0, 0.0], [100 * DEGREES_PER_MILE, 0.0], [150 * DEGREES_PER_MILE, 0.0]])
+
+    def test_cumulative_mileage(self):
+        np.testing.assert_allclose(self.geometry.cumulative_miles, [0, 100, 150])
+        self.assertAlmostEqual(self.geometry.length, 150)
+        self.assertAlmostEqual(self.geometry.mileage_at_vertex(1), 100)
+
+    def test_point_at_interpolates_and_clamps(self):
+        self.assertAlmostEqual(self.geometry.point_at(125)[0], 125 * DEGREES_PER_MILE)
+        self.assertEqual(self.geometry.point_at(-10), (0.0, 0.0))
+        self.assertAlmostEqual(self.geometry.point_at(1000)[0], 150 * DEGREES_PER_MILE)
+
+    def test_between_starts_and_ends_on_the_interpolated_points(self):
+        _stretch = self.geometry.between(50, 125)
+
+        np.testing.assert_allclose(_stretch[:, 0] / DEGREES_PER_MILE, [50, 100, 125])
+        np.testing.assert_allclose(_stretch[:, 1], 0)
+
+    def test_snap_projects_onto_the_nearest_segment(self):
+        _mileages, _distances = self.geometry.snap(
+            [30 * DEGREES_PER_MILE, 120 * DEGREES_PER_MILE, -5 * DEGREES_PER_MILE],
+            [2 * DEGREES_PER_MILE, -1 * DEGREES_PER_MILE, 0.0],
+        )
+
+        np.testing.assert_allclose(_mileages, [30, 120, 0], atol=1e-6)
+        np.testing.assert_allclose(_distances, [2, 1, 5], rtol=1e-3)
+
+    def test_snap_picks_the_closer_of_two_passes(self):
+        # Out along the equator and back 1 mile to the north
+        _north = DEGREES_PER_MILE
+        geometry = RouteGeometry([[0.0, 0.0], [1.0, 0.0], [1.0, _north], [0.0, _north]])
+
+        _mileages, _distances = geometry.snap([0.5], [0.9 * _north])
+
+        self.assertAlmostEqual(float(_mileages[0]), geometry.length - 0.5 / DEGREES_PER_MILE, places=3)
+        self.assertAlmostEqual(float(_distances[0]), 0.1, places=3)
+
+    def test_snap_in_chunks_matches_one_pass(self):
+        _route = np.column_stack((np.linspace(-100, -90, 200), 40 + np.sin(np.linspace(0, 6, 200))))
+        geometry = RouteGeometry(_route)
+        _lons = np.random.default_rng(1).uniform(-100, -90, 50)
+        _lats = np.random.default_rng(2).uniform(39, 41, 50)
+        _expected = geometry.snap(_lons, _lats)
+
+        geometry.SNAP_CHUNK_PAIRS = 1000
+        for _chunked, _single in zip(geometry.snap(_lons, _lats), _expected):
+            np.testing.assert_allclose(_chunked, _single)
+
+    def test_single_vertex_route(self):
+        geometry = RouteGeometry([[0.0, 0.0]])
+        _mileages, _distances = geometry.snap([DEGREES_PER_MILE], [0.0])
+
+        self.assertEqual(geometry.length, 0.0)
+        np.testing.assert_allclose(_mileages, [0])
+        np.testing.assert_allclose(_distances, [1], rtol=1e-6)
+        self.assertEqual(geometry.point_at(10), (0.0, 0.0))
+
+    def test_haversine_miles(self):
+        # Dallas to Atlanta
+        self.assertAlmostEqual(float(haversine_miles(-96.797, 32.7767, -84.388, 33.749)), 721, delta=2)
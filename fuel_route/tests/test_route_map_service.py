@@ -0,0 +1,69 @@
+from unittest import mock
+
+import numpy as np
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import override_settings, SimpleTestCase
+
+from fuel_route.data.data_types import Route
+from fuel_route.services.route_map_service import RouteMapService
+from fuel_route.tests.utils import parallel_route, stations_at
+
+ROUTE_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'routes': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-routes'},
+}
+
+
+def planned_route(stops: int = 2) -> Route:
+    _coordinates = parallel_route(-100, -95, 40)
+    _stations = stations_at(_coordinates, [50, 150][:stops], [3.25, 2.75][:stops])
+    return Route(
+        start="A", end="B", distance=265.0, fuel_stops=_stations, total_cost=0.0, coordinates=_coordinates.tolist()
+    )
+
+
+class RouteMapServiceTests(SimpleTestCase):
+    def setUp(self):
+        self.service = RouteMapService(cache=LocMemCache("route-map-tests", {}))
+
+    def test_stored_route_keeps_the_vertices_and_what_the_map_shows_of_each_stop(self):
+        route = planned_route()
+        stored = self.service.get_route(self.service.store_route(route))
+
+        np.testing.assert_allclose(stored.coordinates, route.coordinates, atol=1e-5)
+        self.assertEqual([stop.truckstop_name for stop in stored.fuel_stops], ["Station 1000", "Station 1001"])
+        self.assertEqual([stop.retail_price for stop in stored.fuel_stops], [3.25, 2.75])
+        self.assertAlmostEqual(stored.fuel_stops[0].lon, route.fuel_stops[0].location.x, places=9)
+
+    def test_map_is_rendered_once_per_route(self):
+        route_id = self.service.store_route(planned_route())
+
+        with mock.patch.object(RouteMapService, "render_route_map", return_value="<div>map</div>") as render:
+            self.assertEqual(self.service.get_map_html(route_id), "<div>map</div>")
+            self.assertEqual(self.service.get_map_html(route_id), "<div>map</div>")
+        render.assert_called_once()
+
+    def test_unknown_route_has_no_map(self):
+        self.assertIsNone(self.service.get_route("missing"))
+        self.assertIsNone(self.service.get_map_html("missing"))
+
+    def test_render_draws_every_stop(self):
+        _html = RouteMapService.render_route_map(self.service.get_route(self.service.store_route(planned_route())))
+
+        self.assertIn("Station 1000", _html)
+        self.assertIn("Price: $2.75", _html)
+
+
+@override_settings(CACHES=ROUTE_CACHES)
+class RouteMapViewTests(SimpleTestCase):
+    def test_serves_the_map_of_a_stored_route(self):
+        route_id = RouteMapService().store_route(planned_route(stops=1))
+
+        response = self.client.get(f"/api/routes/{route_id}/map/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/html")
+        self.assertIn(b"Station 1000", response.content)
+
+    def test_unknown_route_is_not_found(self):
+        self.assertEqual(self.client.get("/api/routes/missing/map/").status_code, 404)
@@ -0,0 +1,201 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import override_settings, SimpleTestCase
+
+from fuel_route.data.data_types import Coordinates, Route, VehicleSpec
+from fuel_route.data.enums import VehicleType
+from fuel_route.services.route_result_cache import RouteResultCache
+from fuel_route.tests.utils import assert_created_once, run_concurrently
+
+
+@mock.patch("fuel_route.services.route_result_cache.StationTableGenerationModel.current", return_value=3)
+class RouteResultCacheKeyTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = RouteResultCache(
+            ttl_seconds=60, max_entries=10, precision=4, lock_seconds=1, shared_cache=LocMemCache("key-tests", {})
+        )
+
+    def _key(self, start="Dallas, TX", end=Coordinates(lat=33.749, lon=-84.388), **kwargs):
+        return self.cache.make_key(start, end, "json", **kwargs)
+
+    def test_endpoints_are_normalized_and_versioned_by_the_generation(self, current):
+        _key = self._key()
+
+        self.assertTrue(_key.startswith("route-result:3:"))
+        self.assertEqual(_key, self._key(start=" dallas ,tx", end=Coordinates(lat=33.74901, lon=-84.38799)))
+        self.assertNotEqual(_key, self._key(end=Coordinates(lat=33.75, lon=-84.388)))
+        self.assertNotEqual(_key, self.cache.make_key("Dallas, TX", Coordinates(lat=33.749, lon=-84.388), "polyline"))
+
+    def test_vehicles_are_part_of_the_key(self, current):
+        self.assertEqual(self._key(), self._key(vehicle=VehicleSpec()))
+        self.assertNotEqual(self._key(), self._key(vehicle=VehicleSpec(starting_fuel_gallons=20)))
+        self.assertNotEqual(self._key(), self._key(compare_vehicles=[VehicleSpec.for_type(VehicleType.VAN)]))
+
+    def test_planning_settings_and_constants_change_the_key(self, current):
+        _key = self._key()
+        for name, value in (
+            ("STATION_CORRIDOR_SOURCE", "postgis"),
+            ("ROUTING_GRAPH_PATH", "other.npz"),
+            ("ROUTE_SIMPLIFY_CORRIDOR_METERS", 55.0),
+            ("FUEL_STOP_SOLVER", "cheapest"),
+        ):
+            with self.subTest(name), override_settings(**{name: value}):
+                self.assertNotEqual(self._key(), _key)
+
+        with mock.patch("fuel_route.services.route_result_cache.CORRIDOR_KM", 2):
+            self.assertNotEqual(self._key(), _key)
+        with mock.patch.dict("fuel_route.data.enums.VEHICLE_DEFAULTS", {
+            VehicleType.CAR: {"fuel_type": VehicleSpec().fuel_type, "tank_gallons": 15.0, "mpg": 30.0},
+        }):
+            self.assertNotEqual(self._key(), _key)
+        self.assertEqual(self._key(), _key)
+
+    def test_default_is_created_once(self, current):
+        assert_created_once(self, RouteResultCache, RouteResultCache.default)
+
+
+class RouteResultCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.shared = LocMemCache("route-result-tests", {})
+        self.shared.clear()
+        self.cache = self._worker()
+        self.key = "route-result:3:abc"
+
+    def _worker(self, lock_seconds: float = 1) -> RouteResultCache:
+        return RouteResultCache(
+            ttl_seconds=60, max_entries=10, precision=4, lock_seconds=lock_seconds, shared_cache=self.shared
+        )
+
+    def _response(self) -> dict:
+        """
+        Response of a freshly planned route, stored like the controller stores it.
+        """
+        _route = Route(start="A", end="B", distance=1.0, fuel_stops=[], total_cost=0.0, coordinates=[[0, 0], [1, 0]])
+        return {"route_id": self.cache.route_map_service.store_route(_route)}
+
+    def test_other_workers_read_the_shared_result(self):
+        _response = self.cache.resolve(self.key, self._response)
+        other_worker = self._worker()
+        build = mock.Mock()
+
+        self.assertEqual(other_worker.resolve(self.key, build), _response)
+        build.assert_not_called()
+        self.assertEqual(other_worker.stats.as_dict()["shared_hits"], 1)
+        self.assertEqual(other_worker.get_from_memory(self.key), _response)
+
+    def test_result_of_an_evicted_route_is_a_miss(self):
+        _stale = self.cache.resolve(self.key, self._response)
+        self.shared.delete(f"route:{_stale['route_id']}")
+        other_worker = self._worker()
+
+        _fresh = other_worker.resolve(self.key, self._response)
+
+        self.assertNotEqual(_fresh["route_id"], _stale["route_id"])
+        self.assertEqual(other_worker.stats.as_dict()["upstream_calls"], 1)
+        self.assertTrue(other_worker.route_map_service.has_route(_fresh["route_id"]))
+        self.assertEqual(self._worker().get(self.key), _fresh)
+
+    def test_expired_results_are_not_served_or_stored(self):
+        self.cache.set(self.key, self._response(), expires_at=time.time() - 1)
+
+        self.assertIsNone(self.cache.get(self.key))
+        self.assertIsNone(self.shared.get(self.key))
+
+    def test_concurrent_misses_of_a_worker_build_once(self):
+        _calls = []
+
+        def _build():
+            _calls.append(1)
+            time.sleep(0.05)
+            return self._response()
+
+        _results = run_concurrently(lambda: self.cache.resolve(self.key, _build))
+
+        self.assertEqual(len(_calls), 1)
+        self.assertTrue(all(_result == _results[0] for _result in _results))
+
+    def test_waits_for_the_worker_holding_the_lock(self):
+        _holder = self._worker()
+        _token = _holder._acquire(self.key)
+        _response = self._response()
+
+        def _finish():
+            time.sleep(0.1)
+            _holder.set(self.key, _response)
+            _holder._release(self.key, _token)
+
+        threading.Thread(target=_finish).start()
+        build = mock.Mock()
+
+        self.assertEqual(self.cache.resolve(self.key, build), _response)
+        build.assert_not_called()
+        self.assertEqual(self.cache.stats.as_dict()["coalesced"], 1)
+
+    def test_builds_when_the_lock_holder_fails_or_stalls(self):
+        _holder = self._worker()
+        _token = _holder._acquire(self.key)
+        threading.Timer(0.1, _holder._release, (self.key, _token)).start()
+        self.assertIn("route_id", self.cache.resolve(self.key, self._response))
+
+        self.shared.clear()
+        # Held past lock_seconds by a worker that never stores its result
+        self.shared.set(f"{self.key}:lock", "stalled")
+        waiter = self._worker(lock_seconds=0.2)
+        _start = time.monotonic()
+        self.assertIn("route_id", waiter.resolve(self.key, self._response))
+        self.assertGreaterEqual(time.monotonic() - _start, 0.2)
+
+    def test_failures_are_not_cached(self):
+        with self.assertRaises(ValueError):
+            self.cache.resolve(self.key, mock.Mock(side_effect=ValueError("Unable to find route")))
+
+        self.assertIsNone(self.shared.get(f"{self.key}:lock"))
+        self.assertIn("route_id", self.cache.resolve(self.key, self._response))
+
+
+class AsyncRouteResultCacheTests(SimpleTestCase):
+    def setUp(self):
+        _shared = LocMemCache("async-route-result-tests", {})
+        _shared.clear()
+        self.cache = RouteResultCache(ttl_seconds=60, max_entries=10, precision=4, lock_seconds=1, shared_cache=_shared)
+        self.key = "route-result:3:abc"
+        self.builds = 0
+
+    async def _build(self) -> dict:
+        self.builds += 1
+        await asyncio.sleep(0.1)
+        _route = Route(start="A", end="B", distance=1.0, fuel_stops=[], total_cost=0.0, coordinates=[[0, 0], [1, 0]])
+        return {"route_id": self.cache.route_map_service.store_route(_route)}
+
+    def test_concurrent_misses_await_one_build(self):
+        async def _requests():
+            return await asyncio.gather(*(self.cache.resolve_async(lambda: self.key, self._build) for _ in range(4)))
+
+        _results = asyncio.run(_requests())
+
+        self.assertEqual(self.builds, 1)
+        self.assertTrue(all(_result == _results[0] for _result in _results))
+        self.assertEqual(self.cache.get(self.key), _results[0])
+
+    def test_waiter_builds_again_when_the_builder_is_cancelled(self):
+        async def _requests():
+            _first = asyncio.ensure_future(self.cache.resolve_async(lambda: self.key, self._build))
+            while self.builds == 0:
+                await asyncio.sleep(0.005)
+            _second = asyncio.ensure_future(self.cache.resolve_async(lambda: self.key, self._build))
+            # Cancelled once the second request joined the first one's build
+            while self.cache.stats.as_dict()["coalesced"] == 0:
+                await asyncio.sleep(0.005)
+            _first.cancel()
+            return await asyncio.gather(_first, _second, return_exceptions=True)
+
+        _first, _second = asyncio.run(_requests())
+
+        self.assertIsInstance(_first, asyncio.CancelledError)
+        self.assertIn("route_id", _second)
+        self.assertEqual(self.builds, 2)
+        self.assertEqual(self.cache._async_flights, {})
@@ -0,0 +1,79 @@
+import numpy as np
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from fuel_route.services.route_geometry import douglas_peucker, visvalingam
+from fuel_route.services.route_simplifier import RouteSimplifier
+
+
+class RouteSimplificationTests(SimpleTestCase):
+    def setUp(self):
+        _lons = np.linspace(-100, -99, 101)
+        self.straight = np.column_stack((_lons, np.full(len(_lons), 40.0)))
+        # A 0.01 degree (about 1.1 km) bump halfway along the straight line
+        self.bumped = self.straight.copy()
+        self.bumped[50, 1] += 0.01
+
+    def test_straight_line_keeps_its_ends(self):
+        for simplify in (douglas_peucker, visvalingam):
+            with self.subTest(simplify.__name__):
+                self.assertEqual(simplify(self.straight, 10).tolist(), [0, 100])
+
+    def test_deviation_over_the_tolerance_is_kept(self):
+        for simplify in (douglas_peucker, visvalingam):
+            with self.subTest(simplify.__name__):
+                _kept = simplify(self.bumped, 10).tolist()
+
+                self.assertIn(50, _kept)
+                self.assertEqual((_kept[0], _kept[-1]), (0, 100))
+                self.assertLess(len(_kept), 10)
+
+    def test_deviation_under_the_tolerance_is_dropped(self):
+        for simplify in (douglas_peucker, visvalingam):
+            with self.subTest(simplify.__name__):
+                self.assertEqual(simplify(self.bumped, 5000).tolist(), [0, 100])
+
+    def test_zero_tolerance_keeps_every_vertex(self):
+        for simplify in (douglas_peucker, visvalingam):
+            with self.subTest(simplify.__name__):
+                self.assertEqual(simplify(self.bumped, 0).tolist(), list(range(101)))
+
+
+class RouteSimplifierTests(SimpleTestCase):
+    def setUp(self):
+        _lons = np.linspace(-100, -99, 101)
+        self.bumped = np.column_stack((_lons, np.full(len(_lons), 40.0)))
+        self.bumped[50, 1] += 0.01
+
+    def test_simplify_keeps_the_vertices_and_records_stats(self):
+        simplifier = RouteSimplifier("corridor", "douglas-peucker", 10)
+        _simplified = simplifier.simplify(self.bumped)
+
+        # The bump is a spike: both of its feet stay too
+        np.testing.assert_array_equal(_simplified, self.bumped[[0, 49, 50, 51, 100]])
+        _stats = simplifier.stats.as_dict()
+        self.assertEqual((_stats["routes"], _stats["vertices_in"], _stats["vertices_out"]), (1, 101, 5))
+        self.assertAlmostEqual(_stats["reduction"], 1 - 5 / 101)
+
+    def test_none_method_and_zero_tolerance_return_the_route(self):
+        for method, tolerance in (("none", 10), ("visvalingam", 0)):
+            with self.subTest(method):
+                simplifier = RouteSimplifier("map", method, tolerance)
+
+                np.testing.assert_array_equal(simplifier.simplify(self.bumped), self.bumped)
+                self.assertEqual(simplifier.stats.as_dict()["routes"], 0)
+
+    def test_unknown_method_raises(self):
+        with self.assertRaises(ImproperlyConfigured):
+            RouteSimplifier("corridor", "radial", 10)
+
+    @override_settings(ROUTE_SIMPLIFY_METHOD="visvalingam", ROUTE_SIMPLIFY_CORRIDOR_METERS=25)
+    def test_stages_are_shared_until_their_settings_change(self):
+        simplifier = RouteSimplifier.for_stage("corridor")
+        self.assertIs(RouteSimplifier.for_stage("corridor"), simplifier)
+        self.assertEqual((simplifier.method, simplifier.tolerance_meters), ("visvalingam", 25))
+
+        with override_settings(ROUTE_SIMPLIFY_CORRIDOR_METERS=50):
+            self.assertEqual(RouteSimplifier.for_stage("corridor").tolerance_meters, 50)
+        with self.assertRaises(ValueError):
+            RouteSimplifier.for_stage("export")
@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+import numpy as np
+from django.contrib.gis.geos import Point
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from fuel_route.data.data_types import DirectionsResponseType
+from fuel_route.services.route_geometry import haversine_miles
+from fuel_route.services.route_stitcher import RouteStitcher
+from fuel_route.services.routing_backends import directions_geojson
+from fuel_route.tests.utils import directions_of, parallel_route
+
+
+def stops_at(*stations) -> list:
+    return [SimpleNamespace(location=Point(*_station, srid=4326)) for _station in stations]
+
+
+def leg_through(waypoints, distance: float) -> DirectionsResponseType:
+    return DirectionsResponseType.from_dict(directions_geojson(
+        "test", [[_point.lon, _point.lat] for _point in waypoints], [0, 1, 2], distance, distance / 60 * 3600, {},
+    ))
+
+
+class RouteStitcherTests(SimpleTestCase):
+    def setUp(self):
+        self.coordinates = parallel_route(0.0, 2.0, 0.0, step_degrees=0.01)
+        self.directions = directions_of(self.coordinates)
+        self.distance = self.directions.features[0].properties.summary.distance
+        self.station = (1.0, 0.01)
+
+    def test_estimate_detours_straight_to_the_station(self):
+        feature = RouteStitcher(self.directions, stops_at(self.station)).stitch().features[0]
+        _coordinates = np.asarray(feature.geometry.coordinates)
+        _detour = 2 * float(haversine_miles(1.0, 0.0, *self.station))
+
+        np.testing.assert_allclose(_coordinates[[0, -1]], self.coordinates[[0, -1]])
+        self.assertEqual(len(feature.properties.way_points), 3)
+        np.testing.assert_allclose(_coordinates[feature.properties.way_points[1]], self.station)
+        self.assertAlmostEqual(feature.properties.summary.distance, self.distance + _detour, places=3)
+        self.assertAlmostEqual(
+            feature.properties.summary.duration, feature.properties.summary.distance / 60 * 3600, places=3
+        )
+
+    def test_legs_replace_the_route_around_each_stop(self):
+        stitcher = RouteStitcher(self.directions, stops_at(self.station), leg_miles=5)
+        _waypoints = stitcher.leg_waypoints()
+        self.assertEqual(len(_waypoints), 1)
+        self.assertAlmostEqual((_waypoints[0][1].lon, _waypoints[0][1].lat), self.station)
+
+        feature = stitcher.stitch([leg_through(_waypoints[0], 12.0)]).features[0]
+        _coordinates = np.asarray(feature.geometry.coordinates)
+
+        np.testing.assert_allclose(_coordinates[feature.properties.way_points[1]], self.station)
+        np.testing.assert_allclose(_coordinates[[0, -1]], self.coordinates[[0, -1]])
+        # The 10 miles of route the leg replaces give way to its 12
+        self.assertAlmostEqual(feature.properties.summary.distance, self.distance - 10 + 12, places=1)
+
+    def test_overlapping_windows_do_not_run_backwards(self):
+        # The second station projects before the first one, and both windows overlap
+        stitcher = RouteStitcher(self.directions, stops_at((1.0, 0.01), (0.98, -0.01)), leg_miles=5)
+
+        self.assertTrue(np.all(stitcher.window_starts <= stitcher.window_ends))
+        self.assertLessEqual(stitcher.window_ends[0], stitcher.window_starts[1])
+        feature = stitcher.stitch().features[0]
+        _coordinates = np.asarray(feature.geometry.coordinates)
+        np.testing.assert_allclose(_coordinates[feature.properties.way_points[1:3]], [[1.0, 0.01], [0.98, -0.01]])
+
+    def test_without_stops_keeps_the_first_route(self):
+        feature = RouteStitcher(self.directions, []).stitch().features[0]
+
+        np.testing.assert_allclose(feature.geometry.coordinates, self.coordinates)
+        self.assertEqual(feature.properties.way_points, [0, len(self.coordinates) - 1])
+        self.assertAlmostEqual(feature.properties.summary.distance, self.distance, places=6)
+
+    @override_settings(ROUTE_STITCHING="legs", ROUTE_STITCH_LEG_MILES=3)
+    def test_mode_comes_from_the_settings(self):
+        self.assertEqual(RouteStitcher.mode(), "legs")
+        stitcher = RouteStitcher.for_mode("legs", self.directions, stops_at(self.station))
+        self.assertAlmostEqual(stitcher.window_ends[0] - stitcher.window_starts[0], 6, places=3)
+        stitcher = RouteStitcher.for_mode("estimate", self.directions, stops_at(self.station))
+        self.assertEqual(stitcher.window_starts[0], stitcher.window_ends[0])
+
+    @override_settings(ROUTE_STITCHING="spliced")
+    def test_unknown_mode_raises(self):
+        with self.assertRaises(ImproperlyConfigured):
+            RouteStitcher.mode()
@@ -0,0 +1,77 @@
+from unittest import mock
+
+import numpy as np
+from django.test import override_settings, SimpleTestCase
+
+from fuel_route.data.exceptions import FuelStationNotFoundException
+from fuel_route.services.route_geometry import haversine_miles
+from fuel_route.services.station_index import StationIndex
+
+
+class StationIndexTests(SimpleTestCase):
+    def setUp(self):
+        # Along, just off and far off a route on the 40th parallel from -100 to -99
+        self.index = StationIndex(
+            station_ids=np.array([11, 12, 13, 14], dtype=np.int64),
+            lons=np.array([-99.25, -99.5, -99.75, -98.0]),
+            lats=np.array([40.0, 40.002, 40.2, 40.0]),
+            prices=np.array([3.5, 3.0, 2.0, 1.0]),
+        )
+        self.route = np.column_stack((np.linspace(-100, -99, 11), np.full(11, 40.0)))
+        self.route_miles = float(haversine_miles(-100.0, 40.0, -99.0, 40.0))
+
+    def test_corridor_keeps_stations_near_the_route_in_route_order(self):
+        corridor = self.index.corridor(self.route, self.route_miles, max_distance_km=0.5)
+
+        self.assertEqual(corridor.station_ids.tolist(), [12, 11])
+        self.assertEqual(corridor.prices.tolist(), [3.0, 3.5])
+        np.testing.assert_allclose(corridor.offsets, [self.route_miles / 2, self.route_miles * 3 / 4], rtol=1e-3)
+        self.assertTrue((corridor.distances_to_route <= 0.5 / 1.609344).all())
+        self.assertAlmostEqual(float(corridor.distances_to_route[1]), 0.0, places=6)
+
+    def test_offsets_are_scaled_to_the_route_distance(self):
+        corridor = self.index.corridor(self.route, self.route_miles * 2, max_distance_km=0.5)
+
+        np.testing.assert_allclose(corridor.offsets, [self.route_miles, self.route_miles * 3 / 2], rtol=1e-3)
+
+    def test_corridor_raises_without_stations_nearby(self):
+        _route = np.column_stack((np.linspace(-90, -89, 5), np.full(5, 35.0)))
+        with self.assertRaises(FuelStationNotFoundException):
+            self.index.corridor(_route, 50.0)
+
+    def test_corridors_match_one_corridor_per_route(self):
+        _far = np.column_stack((np.linspace(-90, -89, 5), np.full(5, 35.0)))
+        _east = np.column_stack((np.linspace(-98.5, -97.5, 11), np.full(11, 40.0)))
+        corridors = self.index.corridors([self.route, _far, _east], [self.route_miles, 50.0, 60.0], 0.5)
+
+        self.assertIsNone(corridors[1])
+        for _corridor, _route, _distance in ((corridors[0], self.route, self.route_miles), (corridors[2], _east, 60.0)):
+            _alone = self.index.corridor(_route, _distance, 0.5)
+            self.assertEqual(_corridor.station_ids.tolist(), _alone.station_ids.tolist())
+            np.testing.assert_allclose(_corridor.offsets, _alone.offsets)
+        self.assertEqual(corridors[2].station_ids.tolist(), [14])
+
+
+@override_settings(STATION_INDEX_CHECK_SECONDS=0)
+class SharedStationIndexTests(SimpleTestCase):
+    def setUp(self):
+        StationIndex.invalidate()
+        self.addCleanup(StationIndex.invalidate)
+
+    @staticmethod
+    def _index(generation):
+        return StationIndex(np.array([1]), np.array([0.0]), np.array([0.0]), np.array([3.0]), generation)
+
+    def test_reloads_only_when_the_generation_changes(self):
+        with mock.patch("fuel_route.services.station_index.StationTableGenerationModel.current") as current, \
+                mock.patch.object(StationIndex, "load", side_effect=self._index) as load:
+            current.return_value = 1
+            first = StationIndex.get()
+            self.assertIs(StationIndex.get(), first)
+
+            current.return_value = 2
+            second = StationIndex.get()
+
+        self.assertIsNot(second, first)
+        self.assertEqual(second.generation, 2)
+        self.assertEqual(load.call_count, 2)
@@ -0,0 +1,98 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from fuel_route.services.metrics import render_prometheus
+from fuel_route.services.tracing import current_trace, Span, span, StageMetrics, start_trace, Trace
+from fuel_route.tests.utils import assert_created_once
+
+
+class TraceTests(SimpleTestCase):
+    def test_server_timing_sums_repeated_stages(self):
+        trace = Trace()
+        trace.add(Span("directions", 0.0, 0.25, {"vertices": 100, "profile": "driving-hgv"}))
+        trace.add(Span("directions", 0.0, 0.05, {"vertices": 20, "profile": "driving-car"}))
+        trace.add(Span("solver", 0.0, 0.002, {"cached": True}))
+
+        self.assertEqual(
+            trace.server_timing(),
+            'directions;dur=300.0;desc="n=2 vertices=120 profile=driving-car", '
+            'solver;dur=2.0;desc="n=1 cached=True"',
+        )
+
+    def test_spans_join_the_trace_of_their_context_only(self):
+        with start_trace() as trace:
+            with span("corridor", stations=3) as _span:
+                _span.set(stops=1)
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                executor.submit(contextvars.copy_context().run, self._leg).result()
+                # A worker without the copied context traces nothing
+                executor.submit(self._leg).result()
+        self.assertIsNone(current_trace())
+
+        self.assertEqual([_span.name for _span in trace.spans], ["corridor", "leg"])
+        self.assertEqual(trace.spans[0].attributes, {"stations": 3, "stops": 1})
+        self.assertGreaterEqual(trace.spans[0].seconds, 0.0)
+
+    @staticmethod
+    def _leg():
+        with span("leg"):
+            pass
+
+
+class StageMetricsTests(SimpleTestCase):
+    def setUp(self):
+        self.metrics = StageMetrics()
+
+    def test_buckets_are_cumulative_and_totals_numeric_only(self):
+        self.metrics.observe(Span("solver", 0.0, 0.003, {"stations": 10, "cached": False}))
+        self.metrics.observe(Span("solver", 0.0, 0.3, {"stations": 5}))
+        _solver = self.metrics.snapshot()["solver"]
+
+        self.assertEqual(_solver["buckets"], [1, 1, 1, 1, 1, 1, 2, 2, 2, 2, 2])
+        self.assertEqual(_solver["count"], 2)
+        self.assertAlmostEqual(_solver["seconds"], 0.303)
+        self.assertEqual(_solver["totals"], {"stations": 15})
+
+    def test_snapshot_is_a_copy(self):
+        self.metrics.observe(Span("solver", 0.0, 0.003))
+        self.metrics.snapshot()["solver"]["buckets"][0] = 99
+
+        self.assertEqual(self.metrics.snapshot()["solver"]["buckets"][0], 1)
+
+    def test_default_is_created_once(self):
+        assert_created_once(self, StageMetrics, StageMetrics.default)
+
+    def test_prometheus_histogram_of_the_stages(self):
+        self.metrics.observe(Span('odd"stage', 0.0, 0.02, {"stations": 4}))
+        with mock.patch.object(StageMetrics, "_default", self.metrics):
+            _text = render_prometheus()
+
+        self.assertIn("# TYPE fuel_route_stage_seconds histogram", _text)
+        self.assertIn('fuel_route_stage_seconds_bucket{stage="odd\\"stage",le="0.01"} 0', _text)
+        self.assertIn('fuel_route_stage_seconds_bucket{stage="odd\\"stage",le="0.025"} 1', _text)
+        self.assertIn('fuel_route_stage_seconds_bucket{stage="odd\\"stage",le="+Inf"} 1', _text)
+        self.assertIn('fuel_route_stage_items_total{stage="odd\\"stage",item="stations"} 4', _text)
+        self.assertTrue(_text.endswith("\n"))
+
+
+class TracingEndpointsTests(SimpleTestCase):
+    @override_settings(METRICS_ENABLED=False)
+    def test_metrics_are_hidden_unless_enabled(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 404)
+
+    @override_settings(METRICS_ENABLED=True, TRACE_DEBUG_HEADER=True)
+    def test_metrics_and_server_timing_header(self):
+        self.client.get("/metrics/")
+        response = self.client.get("/metrics/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn('fuel_route_stage_seconds_count{stage="request"}', response.content.decode())
+        self.assertTrue(response["Server-Timing"].startswith('request;dur='))
+
+    @override_settings(TRACE_DEBUG_HEADER=False)
+    def test_no_server_timing_header_by_default(self):
+        self.assertNotIn("Server-Timing", self.client.get("/metrics/"))
@@ -0,0 +1,121 @@
+import numpy as np
+from django.test import override_settings, SimpleTestCase
+
+from fuel_route.data.data_types import StationCorridor, VehicleSpec
+from fuel_route.data.enums import FuelType, VehicleType
+from fuel_route.data.serializers import RouteInputSerializer, VehicleSerializer
+from fuel_route.services.fuel_station_service import FuelStationService
+from fuel_route.services.fuel_stop_solvers import WindowFuelStopSolver
+from fuel_route.services.route_geometry import RouteGeometry
+from fuel_route.tests.utils import parallel_route, stations_at
+
+
+class VehicleSpecTests(SimpleTestCase):
+    def test_default_truck_keeps_the_historical_500_mile_tank(self):
+        vehicle = VehicleSpec()
+
+        self.assertAlmostEqual(vehicle.range_miles, 500)
+        self.assertAlmostEqual(vehicle.starting_range_miles, 500)
+        self.assertEqual(vehicle.routing_profile, "driving-hgv")
+
+    def test_for_type_takes_the_type_defaults_and_skips_none_overrides(self):
+        vehicle = VehicleSpec.for_type(VehicleType.VAN, mpg=20.0, tank_gallons=None)
+
+        self.assertEqual((vehicle.fuel_type, vehicle.tank_gallons, vehicle.mpg), (FuelType.GASOLINE, 25.0, 20.0))
+        self.assertEqual(vehicle.routing_profile, "driving-car")
+
+    def test_ranges_count_every_tank_and_leave_the_reserve(self):
+        vehicle = VehicleSpec(tank_gallons=100, tanks=2, mpg=7.0, starting_fuel_gallons=50, reserve_gallons=10)
+
+        self.assertEqual(vehicle.capacity_gallons, 200)
+        self.assertAlmostEqual(vehicle.range_miles, 190 * 7)
+        self.assertAlmostEqual(vehicle.starting_range_miles, 40 * 7)
+        # Starting fuel over the capacity is capped, under the reserve gives no range
+        self.assertAlmostEqual(VehicleSpec(tank_gallons=100, starting_fuel_gallons=150).starting_range_miles, 600)
+        self.assertEqual(VehicleSpec(starting_fuel_gallons=5, reserve_gallons=10).starting_range_miles, 0.0)
+
+
+class VehicleSerializerTests(SimpleTestCase):
+    def _validated(self, data) -> VehicleSpec:
+        serializer = VehicleSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def test_validates_into_a_vehicle_spec(self):
+        vehicle = self._validated({"vehicle_type": "Car", "tanks": 2, "starting_fuel_gallons": 10})
+
+        self.assertEqual(vehicle, VehicleSpec.for_type(VehicleType.CAR, tanks=2, starting_fuel_gallons=10))
+        self.assertEqual(VehicleSerializer(vehicle).data["range_miles"], 28 * 30)
+
+    def test_fuel_type_overrides_the_type_default(self):
+        self.assertEqual(self._validated({"vehicle_type": "Van", "fuel_type": "Diesel"}).fuel_type, FuelType.DIESEL)
+
+    def test_rejects_what_can_not_be_planned(self):
+        for data in (
+            {"fuel_type": "Electric"},
+            {"vehicle_type": "Car", "reserve_gallons": 14},
+            {"vehicle_type": "Car", "starting_fuel_gallons": 15},
+            {"tanks": 5},
+            {"vehicle_type": "Bus"},
+        ):
+            with self.subTest(data):
+                self.assertFalse(VehicleSerializer(data=data).is_valid())
+
+    @override_settings(MAX_COMPARE_VEHICLES=2)
+    def test_compared_vehicles_are_limited(self):
+        _data = {"start": "32.7767,-96.797", "end": "33.749,-84.388"}
+
+        _two = [{}, {"vehicle_type": "Van"}]
+        self.assertTrue(RouteInputSerializer(data=dict(_data, compare_vehicles=_two)).is_valid())
+        self.assertFalse(RouteInputSerializer(data=dict(_data, compare_vehicles=[{}, {}, {}])).is_valid())
+
+
+class VehiclePlansTests(SimpleTestCase):
+    def setUp(self):
+        # About 1060 miles along the 40th parallel
+        self.coordinates = parallel_route(-100.0, -80.0, 40.0)
+        self.geometry = RouteGeometry(self.coordinates)
+        self.total_distance = 1000.0
+        # A station every 50 miles, close enough for the van's 400 mile range
+        _miles = list(range(50, 1000, 50))
+        _stations = stations_at(self.coordinates, _miles, np.random.default_rng(5).uniform(2.5, 4.0, len(_miles)))
+        self.corridor = StationCorridor(
+            stations=_stations,
+            station_ids=np.array([station.opis_id for station in _stations]),
+            lons=np.array([station.location.x for station in _stations]),
+            lats=np.array([station.location.y for station in _stations]),
+            prices=np.array([station.retail_price for station in _stations]),
+            distances_from_start=np.array(_miles, dtype=float),
+            offsets=np.array(_miles, dtype=float),
+            distances_to_route=np.zeros(len(_miles)),
+        )
+        self.vehicles = [VehicleSpec(), VehicleSpec.for_type(VehicleType.VAN), VehicleSpec(starting_fuel_gallons=30)]
+
+    def test_every_vehicle_gets_its_own_stops_and_cost(self):
+        _plans = WindowFuelStopSolver().solve_many(self.corridor, self.total_distance, self.vehicles)
+        vehicle_plans = FuelStationService.vehicle_plans(
+            self.corridor, _plans, self.vehicles, self.geometry, self.total_distance
+        )
+
+        self.assertEqual([plan.vehicle for plan in vehicle_plans], self.vehicles)
+        for _plan, vehicle_plan in zip(_plans, vehicle_plans):
+            _stations = [self.corridor.stations[_index] for _index in _plan.stop_indices]
+            self.assertEqual(
+                [stop.opis_id for stop in vehicle_plan.fuel_stops], [station.opis_id for station in _stations]
+            )
+            self.assertEqual([stop.purchased_gallons for stop in vehicle_plan.fuel_stops], list(_plan.gallons))
+            _cost = sum(station.retail_price * _gallons for station, _gallons in zip(_stations, _plan.gallons))
+            self.assertAlmostEqual(vehicle_plan.total_cost, _cost)
+            for stop, _index in zip(vehicle_plan.fuel_stops, _plan.stop_indices):
+                self.assertAlmostEqual(stop.route_mileage, self.corridor.distances_from_start[_index], delta=1)
+
+    def test_plans_do_not_share_station_instances(self):
+        _plans = WindowFuelStopSolver().solve_many(self.corridor, self.total_distance, self.vehicles[:1] * 2)
+        _plans[1].gallons = [_gallons / 2 for _gallons in _plans[1].gallons]
+        first, second = FuelStationService.vehicle_plans(
+            self.corridor, _plans, self.vehicles[:1] * 2, self.geometry, self.total_distance
+        )
+
+        self.assertIsNot(first.fuel_stops[0], second.fuel_stops[0])
+        self.assertAlmostEqual(first.total_cost, second.total_cost * 2)
+        self.assertFalse(hasattr(self.corridor.stations[_plans[0].stop_indices[0]], "purchased_gallons"))
@@ -0,0 +1,117 @@
+import threading
+import time
+from typing import Callable, List
+from unittest import mock
+
+import numpy as np
+from django.contrib.gis.geos import Point
+
+from fuel_route.data.data_types import DirectionsResponseType, StationCorridor
+from fuel_route.data.models import FuelStationModel
+from fuel_route.services.route_geometry import haversine_miles
+from fuel_route.services.routing_backends import directions_geojson
+
+# Degrees of longitude per mile on the equator, where the in-memory test corridors run
+DEGREES_PER_MILE = 1 / float(haversine_miles(0.0, 0.0, 1.0, 0.0))
+
+
+def corridor_of(miles, prices) -> StationCorridor:
+    """
+    Corridor of stations right on an equator route, ``miles`` from its start.
+    """
+    _miles = np.asarray(miles, dtype=float)
+    return StationCorridor(
+        stations=None,
+        station_ids=np.arange(len(_miles), dtype=np.int64),
+        lons=_miles * DEGREES_PER_MILE,
+        lats=np.zeros(len(_miles)),
+        prices=np.asarray(prices, dtype=float),
+        distances_from_start=_miles,
+        offsets=_miles,
+        distances_to_route=np.zeros(len(_miles)),
+    )
+
+
+def directions_of(coordinates, distance: float = None, duration: float = None) -> DirectionsResponseType:
+    """
+    Directions response along ``coordinates``, as long as the polyline unless
+    ``distance`` says otherwise, driven at 60 mph.
+    """
+    _coordinates = np.asarray(coordinates, dtype=float)
+    if distance is None:
+        distance = float(haversine_miles(
+            _coordinates[:-1, 0], _coordinates[:-1, 1], _coordinates[1:, 0], _coordinates[1:, 1]
+        ).sum())
+    return DirectionsResponseType.from_dict(directions_geojson(
+        "test", _coordinates.tolist(), [0, len(_coordinates) - 1], distance,
+        distance / 60 * 3600 if duration is None else duration, {},
+    ))
+
+
+def parallel_route(west: float, east: float, lat: float, step_degrees: float = 0.05) -> np.ndarray:
+    """
+    Lon/lat vertices along the ``lat`` parallel, dense enough that the great
+    circles between them stay on it.
+    """
+    _lons = np.arange(west, east + step_degrees / 2, step_degrees)
+    return np.column_stack((_lons, np.full(len(_lons), lat)))
+
+
+def stations_at(route: np.ndarray, miles: List[float], prices: List[float], first_opis_id: int = 1000):
+    """
+    Unsaved stations on ``route`` at ``miles`` from its start.
+    """
+    _cumulative = np.concatenate(([0.0], np.cumsum(haversine_miles(
+        route[:-1, 0], route[:-1, 1], route[1:, 0], route[1:, 1]
+    ))))
+    stations = []
+    for _index, (_mile, _price) in enumerate(zip(miles, prices)):
+        _lon = float(np.interp(_mile, _cumulative, route[:, 0]))
+        _lat = float(np.interp(_mile, _cumulative, route[:, 1]))
+        stations.append(FuelStationModel(
+            opis_id=first_opis_id + _index,
+            truckstop_name=f"Station {first_opis_id + _index}",
+            address=f"Mile {_mile}",
+            city="Test",
+            state="TS",
+            rack_id=1,
+            location=Point(_lon, _lat, srid=4326),
+            retail_price=_price,
+        ))
+    return stations
+
+
+def run_concurrently(function: Callable, threads: int = 8) -> list:
+    """
+    Results of ``function`` called from ``threads`` threads released together.
+    """
+    _barrier = threading.Barrier(threads)
+    _results = [None] * threads
+
+    def _call(_index):
+        _barrier.wait()
+        _results[_index] = function()
+
+    _threads = [threading.Thread(target=_call, args=(_index,)) for _index in range(threads)]
+    for _thread in _threads:
+        _thread.start()
+    for _thread in _threads:
+        _thread.join(5)
+    return _results
+
+
+def assert_created_once(test_case, cls, default: Callable, attribute: str = "_default"):
+    """
+    Checks that concurrent first calls of ``default`` build a single ``cls``.
+    """
+    _created = []
+
+    def _slow_init(instance, *args, **kwargs):
+        _created.append(instance)
+        time.sleep(0.05)
+
+    with mock.patch.object(cls, attribute, None), mock.patch.object(cls, "__init__", _slow_init):
+        _instances = run_concurrently(default)
+
+    test_case.assertEqual(len(_created), 1)
+    test_case.assertTrue(all(_instance is _created[0] for _instance in _instances))
@@ -1,10 +1,21 @@
 from django.urls import path
 from django.views.generic import RedirectView
 
-from fuel_route.views.fuel_route_view import OptimalRouteView, route_planner_view
+from fuel_route.views.fuel_route_view import (
+    BatchOptimalRouteView,
+    metrics_view,
+    OptimalRouteView,
+    optimal_route_async_view,
+    route_map_view,
+    route_planner_view,
+)
 
 urlpatterns = [
     path('', RedirectView.as_view(url='planner', permanent=True), name='root_redirect'),
     path('planner', route_planner_view, name='route_planner'),
     path('api/optimal-route/', OptimalRouteView.as_view(), name='optimal_route'),
+    path('api/batch/optimal-routes/', BatchOptimalRouteView.as_view(), name='batch_optimal_routes'),
+    path('api/async/optimal-route/', optimal_route_async_view, name='optimal_route_async'),
+    path('api/routes/<str:route_id>/map/', route_map_view, name='route_map'),
+    path('metrics/', metrics_view, name='metrics'),
 ]
\ No newline at end of file
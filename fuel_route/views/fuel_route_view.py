@@ -1,10 +1,48 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import Throttled
 from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+import json
+from typing import Optional
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-from fuel_route.data.serializers import RouteInputSerializer
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_GET
+from fuel_route.data.serializers import BatchRouteInputSerializer, RouteInputSerializer
+from fuel_route.controllers.batch_route_controller import BatchRouteController
 from fuel_route.controllers.fuel_route_controller import FuelRouteController
+from fuel_route.services.async_db import database_sync_to_async
+from fuel_route.services.async_ors_client import AsyncORSClient
+from fuel_route.services.coordinate_codecs import COORDINATE_FORMATS
+from fuel_route.services.metrics import render_prometheus
+from fuel_route.services.route_map_service import RouteMapService
+from fuel_route.views.renderers import render_json
+
+
+def coordinates_format(request) -> str:
+    """
+    Format of the route coordinates asked for with ``?coordinates=<format>`` or,
+    without it, with a ``coordinates`` parameter in the Accept header
+    (``Accept: application/json; coordinates=polyline``).
+    """
+    _format = request.GET.get('coordinates')
+    if _format is None:
+        for _media_type in request.headers.get('Accept', '').split(','):
+            _params = dict(
+                _param.strip().split('=', 1) for _param in _media_type.split(';')[1:] if '=' in _param
+            )
+            _format = _params.get('coordinates')
+            if _format is not None:
+                break
+    _format = (_format or 'json').strip().strip('"')
+    if _format not in COORDINATE_FORMATS:
+        raise ValueError(f"Unknown coordinates format '{_format}', expected one of {list(COORDINATE_FORMATS)}")
+    return _format
+
 
 class OptimalRouteView(APIView):
     throttle_classes = [UserRateThrottle, AnonRateThrottle]
@@ -23,10 +61,118 @@ class OptimalRouteView(APIView):
         include_map_html = serializer.validated_data['include_map_html']
 
         try:
-            route_data = self.controller.get_optimal_route(start, end, include_map_html)
-            return Response(route_data, status=status.HTTP_200_OK)
+            route_data = self.controller.get_optimal_route(
+                start, end, include_map_html, coordinates_format(request),
+                serializer.validated_data.get('vehicle'), serializer.validated_data.get('compare_vehicles'),
+            )
+            response = Response(route_data, status=status.HTTP_200_OK)
+            patch_vary_headers(response, ['Accept'])
+            return response
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+class BatchOptimalRouteView(APIView):
+    """
+    Plans many lanes in one request and streams one JSON line per lane (NDJSON)
+    as soon as it is planned, so results arrive in completion order with their
+    ``index`` in ``lanes``.
+    """
+    throttle_classes = [UserRateThrottle, AnonRateThrottle]
+
+    def post(self, request):
+        serializer = BatchRouteInputSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            _coordinates_format = coordinates_format(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        lanes = serializer.validated_data['lanes']
+        results = BatchRouteController(coordinates_format=_coordinates_format).plan_lanes(lanes)
+        response = StreamingHttpResponse(
+            (render_json(result) + b"\n" for result in results),
+            content_type="application/x-ndjson",
+        )
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+def throttled_response(request, throttle_classes) -> Optional[JsonResponse]:
+    """
+    ``APIView.check_throttles`` for a plain Django view: the 429 response DRF
+    would send when a throttle refuses the request, otherwise ``None``.
+    """
+    _durations = []
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, None):
+            _durations.append(throttle.wait())
+    if not _durations:
+        return None
+    _throttled = Throttled(max((_duration for _duration in _durations if _duration is not None), default=None))
+    response = JsonResponse({"detail": str(_throttled.detail)}, status=_throttled.status_code)
+    if _throttled.wait is not None:
+        response["Retry-After"] = "%d" % _throttled.wait
+    return response
+
+async def optimal_route_async_view(request):
+    """
+    Async counterpart of ``OptimalRouteView`` for ASGI workers, which keep serving
+    other requests while this one waits on ORS. Throttled like it.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    # Off the event loop, as the throttles read the lazily loaded request.user
+    _throttled = await database_sync_to_async(throttled_response)(request, OptimalRouteView.throttle_classes)
+    if _throttled is not None:
+        return _throttled
+    try:
+        data = json.loads(request.body or b"{}")
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON body"}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = RouteInputSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    start = serializer.validated_data['start']
+    end = serializer.validated_data['end']
+    include_map_html = serializer.validated_data['include_map_html']
+
+    try:
+        route_data = await FuelRouteController().get_optimal_route_async(
+            start, end, include_map_html, coordinates_format(request),
+            serializer.validated_data.get('vehicle'), serializer.validated_data.get('compare_vehicles'),
+        )
+        response = HttpResponse(render_json(route_data), content_type="application/json")
+        patch_vary_headers(response, ['Accept'])
+        return response
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    finally:
+        # A WSGI worker runs each async view on an event loop of its own, which ends with the request
+        if not isinstance(request, ASGIRequest):
+            await AsyncORSClient.close_shared()
+
+# Django 3.2's csrf_exempt wraps views in a sync function, so mark the async view directly
+optimal_route_async_view.csrf_exempt = True
+
 def route_planner_view(request):
-    return render(request, 'route_planner.html')
\ No newline at end of file
+    return render(request, 'route_planner.html')
+
+@require_GET
+def metrics_view(request):
+    """
+    Prometheus metrics of the worker that answers; every worker keeps its own.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404("Metrics are disabled")
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@require_GET
+def route_map_view(request, route_id):
+    map_html = RouteMapService().get_map_html(route_id)
+    if map_html is None:
+        raise Http404("Route not found or expired")
+    return HttpResponse(map_html, content_type="text/html")
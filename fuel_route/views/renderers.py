@@ -0,0 +1,39 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from fuel_route.services.tracing import span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def render_json(data) -> bytes:
+    """
+    Compact JSON for ``data`` with orjson when it is installed, the standard
+    library otherwise. Values orjson doesn't know, like lazy translation strings
+    in serializer errors, go through DRF's encoder.
+    """
+    with span("render", renderer="orjson" if orjson is not None else "json") as _span:
+        if orjson is not None:
+            _body = orjson.dumps(data, default=JSONEncoder().default, option=orjson.OPT_SERIALIZE_NUMPY)
+        else:
+            _body = JSONRenderer().render(data)
+        _span.set(bytes=len(_body))
+        return _body
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` that encodes with orjson, several times faster on route
+    responses. Indented output, as asked for by browsers and in the Accept
+    header, still goes through DRF's renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return render_json(data)
@@ -13,4 +13,23 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'spotter_route.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from fuel_route.services.async_ors_client import AsyncORSClient  # noqa: E402, needs the apps loaded
+
+
+async def application(scope, receive, send):
+    """
+    Django's ASGI application, plus the lifespan protocol Django 3.2 leaves out,
+    so the worker's pooled ORS session is closed on shutdown.
+    """
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await AsyncORSClient.close_shared()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
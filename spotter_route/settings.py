@@ -5,6 +5,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'your-secret-key-here'
 
 OPENROUTESERVICE_API_KEY = os.getenv('OPENROUTESERVICE_API_KEY', "yor-api-key-here")
+OPENROUTESERVICE_BASE_URL = os.getenv('OPENROUTESERVICE_BASE_URL', 'https://api.openrouteservice.org')
 DB_NAME = os.getenv('POSTGRES_DB', 'spotter_route')
 DB_USER = os.getenv('POSTGRES_USER', 'spotter_route')
 DB_PASSWORD = os.getenv('POSTGRES_PASSWORD', 'spotter_route')
@@ -14,6 +15,116 @@ DEBUG = os.getenv('DEBUG', False)
 SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here')
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '*')
 
+# Fuel stop selection: "query" re-queries PostGIS on every stop, "window" runs the same
+# heuristic in memory and "cheapest" plans the cheapest partial fills over the corridor
+FUEL_STOP_SOLVER = os.getenv('FUEL_STOP_SOLVER', 'window')
+# Corridor lookup: "index" uses the per-worker StationIndex, "postgis" the spatial query
+STATION_CORRIDOR_SOURCE = os.getenv('STATION_CORRIDOR_SOURCE', 'index')
+STATION_INDEX_CELL_DEGREES = float(os.getenv('STATION_INDEX_CELL_DEGREES', 0.1))
+STATION_INDEX_CHECK_SECONDS = float(os.getenv('STATION_INDEX_CHECK_SECONDS', 5))
+
+# Directions backend: "ors" (hosted, or self-hosted at ROUTING_BACKEND_URL), "osrm" at
+# ROUTING_BACKEND_URL, or "graph" for offline A* over the road graph file at ROUTING_GRAPH_PATH
+ROUTING_BACKEND = os.getenv('ROUTING_BACKEND', 'ors')
+ROUTING_BACKEND_URL = os.getenv('ROUTING_BACKEND_URL', '')
+ROUTING_OSRM_PROFILE = os.getenv('ROUTING_OSRM_PROFILE', 'driving')
+ROUTING_GRAPH_PATH = os.getenv('ROUTING_GRAPH_PATH', '')
+# Waypoints farther than this from every road of the graph have no route
+ROUTING_GRAPH_MAX_SNAP_MILES = float(os.getenv('ROUTING_GRAPH_MAX_SNAP_MILES', 10))
+
+# Vehicles a single request may compare against its own, each planned over the same corridor
+MAX_COMPARE_VEHICLES = int(os.getenv('MAX_COMPARE_VEHICLES', 20))
+
+# Final route through the stops: "legs" splices routed detour legs reaching ROUTE_STITCH_LEG_MILES
+# before and after every stop into the first route, "estimate" splices in straight detours to the
+# stations and "none" routes start -> stops -> end again with a second full directions call
+ROUTE_STITCHING = os.getenv('ROUTE_STITCHING', 'legs')
+ROUTE_STITCH_LEG_MILES = float(os.getenv('ROUTE_STITCH_LEG_MILES', 5))
+# Route polylines are simplified ("douglas-peucker", "visvalingam" or "none") before the corridor
+# queries and before map rendering, each stage to its own tolerance in meters (0 keeps every vertex)
+ROUTE_SIMPLIFY_METHOD = os.getenv('ROUTE_SIMPLIFY_METHOD', 'douglas-peucker')
+ROUTE_SIMPLIFY_CORRIDOR_METERS = float(os.getenv('ROUTE_SIMPLIFY_CORRIDOR_METERS', 10))
+ROUTE_SIMPLIFY_MAP_METERS = float(os.getenv('ROUTE_SIMPLIFY_MAP_METERS', 30))
+
+# Every request is traced per pipeline stage; the stage metrics are served on /metrics/ and, with
+# TRACE_DEBUG_HEADER, each response lists its own stages in a Server-Timing header. The metrics are
+# unauthenticated, so they are only served when enabled for a deployment that keeps them internal
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
+TRACE_DEBUG_HEADER = os.getenv('TRACE_DEBUG_HEADER', 'False') == 'True'
+
+# Pooled HTTP session shared by every ORS client of a process: connections kept per host,
+# timeout of a call, and retries with exponential backoff on errors, 429 and 502/503/504
+ORS_POOL_SIZE = int(os.getenv('ORS_POOL_SIZE', 20))
+ORS_TIMEOUT_SECONDS = float(os.getenv('ORS_TIMEOUT_SECONDS', 30))
+ORS_MAX_RETRIES = int(os.getenv('ORS_MAX_RETRIES', 3))
+ORS_RETRY_BACKOFF_SECONDS = float(os.getenv('ORS_RETRY_BACKOFF_SECONDS', 0.5))
+
+# Corridors of repeat lanes, per-worker memory tier in front of the ROUTE_CACHE_ALIAS cache;
+# keys carry the station table generation, so imports and price refreshes invalidate them
+CORRIDOR_CACHE_ENABLED = os.getenv('CORRIDOR_CACHE_ENABLED', 'True') == 'True'
+CORRIDOR_CACHE_TTL_SECONDS = int(os.getenv('CORRIDOR_CACHE_TTL_SECONDS', 24 * 3600))
+CORRIDOR_CACHE_MAX_ENTRIES = int(os.getenv('CORRIDOR_CACHE_MAX_ENTRIES', 256))
+
+# Connection pool of the aiohttp session used by the async endpoint, per worker
+ORS_ASYNC_POOL_SIZE = int(os.getenv('ORS_ASYNC_POOL_SIZE', 100))
+ORS_ASYNC_TIMEOUT_SECONDS = float(os.getenv('ORS_ASYNC_TIMEOUT_SECONDS', 30))
+
+# Batch endpoint: threads planning the lanes of one request, and lanes accepted per request
+BATCH_ROUTE_WORKERS = int(os.getenv('BATCH_ROUTE_WORKERS', 8))
+BATCH_MAX_LANES = int(os.getenv('BATCH_MAX_LANES', 500))
+
+# ORS directions cache: per-worker memory tier in front of a shared table
+DIRECTIONS_CACHE_ENABLED = os.getenv('DIRECTIONS_CACHE_ENABLED', 'True') == 'True'
+DIRECTIONS_CACHE_TTL_SECONDS = int(os.getenv('DIRECTIONS_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+DIRECTIONS_CACHE_MAX_ENTRIES = int(os.getenv('DIRECTIONS_CACHE_MAX_ENTRIES', 256))
+# Decimal places kept from waypoint coordinates when building cache keys (4 ~ 11 m)
+DIRECTIONS_CACHE_PRECISION = int(os.getenv('DIRECTIONS_CACHE_PRECISION', 4))
+
+# Geocode cache shared by the API and the importers
+GEOCODE_CACHE_ENABLED = os.getenv('GEOCODE_CACHE_ENABLED', 'True') == 'True'
+GEOCODE_CACHE_TTL_SECONDS = int(os.getenv('GEOCODE_CACHE_TTL_SECONDS', 24 * 3600))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv('GEOCODE_CACHE_MAX_ENTRIES', 4096))
+
+# Computed routes and their rendered maps, served lazily by route id. The file cache
+# is shared by the workers of one host and meant for development; production should
+# point ROUTE_CACHE_BACKEND at Redis (django_redis.cache.RedisCache).
+ROUTE_CACHE_ALIAS = 'routes'
+ROUTE_CACHE_BACKEND = os.getenv('ROUTE_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')
+ROUTE_CACHE_LOCATION = os.getenv('ROUTE_CACHE_LOCATION', '/tmp/spotter_route_cache')
+ROUTE_CACHE_TTL_SECONDS = int(os.getenv('ROUTE_CACHE_TTL_SECONDS', 3600))
+# A route stores up to four entries (route, map, corridor, result) for ROUTE_CACHE_TTL_SECONDS, so the
+# default holds about 5000 routes an hour. Past it the file and memory backends delete 1/CULL_FREQUENCY
+# of the entries on the next write; the file backend also lists its directory on every write, so keep
+# this in the tens of thousands and move to Redis rather than raising it further. Redis ignores both
+ROUTE_CACHE_MAX_ENTRIES = int(os.getenv('ROUTE_CACHE_MAX_ENTRIES', 20000))
+ROUTE_CACHE_CULL_FREQUENCY = int(os.getenv('ROUTE_CACHE_CULL_FREQUENCY', 10))
+
+# Serialized responses of repeat requests, per-worker memory tier in front of the ROUTE_CACHE_ALIAS
+# cache and versioned by the station table generation like the corridor cache. A burst of identical
+# requests computes the route once: other workers wait up to ROUTE_RESULT_CACHE_LOCK_SECONDS on the
+# one computing it. The TTL is capped to ROUTE_CACHE_TTL_SECONDS, as results link to a stored route
+ROUTE_RESULT_CACHE_ENABLED = os.getenv('ROUTE_RESULT_CACHE_ENABLED', 'True') == 'True'
+ROUTE_RESULT_CACHE_TTL_SECONDS = int(os.getenv('ROUTE_RESULT_CACHE_TTL_SECONDS', ROUTE_CACHE_TTL_SECONDS))
+ROUTE_RESULT_CACHE_MAX_ENTRIES = int(os.getenv('ROUTE_RESULT_CACHE_MAX_ENTRIES', 256))
+# Decimal places kept from coordinate endpoints in keys (4 ~ 11 m)
+ROUTE_RESULT_CACHE_PRECISION = int(os.getenv('ROUTE_RESULT_CACHE_PRECISION', 4))
+ROUTE_RESULT_CACHE_LOCK_SECONDS = float(os.getenv('ROUTE_RESULT_CACHE_LOCK_SECONDS', 30))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    ROUTE_CACHE_ALIAS: {
+        'BACKEND': ROUTE_CACHE_BACKEND,
+        'LOCATION': ROUTE_CACHE_LOCATION,
+        'TIMEOUT': ROUTE_CACHE_TTL_SECONDS,
+        'OPTIONS': {
+            'MAX_ENTRIES': ROUTE_CACHE_MAX_ENTRIES,
+            'CULL_FREQUENCY': ROUTE_CACHE_CULL_FREQUENCY,
+        },
+    },
+}
+
 
 
 INSTALLED_APPS = [
@@ -29,6 +140,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'fuel_route.middleware.tracing_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -101,7 +213,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'fuel_route.views.renderers.ORJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',